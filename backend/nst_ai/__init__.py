@@ -99,5 +99,19 @@ def dev(
     )
 
 
+@app.command()
+def rebuild_chat_search_index():
+    """Create the chat full-text search index and re-index all chats."""
+    from nst_ai.internal.chat_search import rebuild_chat_search_index
+    from nst_ai.internal.db import engine
+
+    with engine.begin() as conn:
+        if rebuild_chat_search_index(conn):
+            typer.echo("Chat search index rebuilt")
+        else:
+            typer.echo("Chat search index is not supported by this database")
+            raise typer.Exit(code=1)
+
+
 if __name__ == "__main__":
     app()
@@ -3,11 +3,14 @@ import logging
 import os
 import shutil
 import base64
+import copy
 import redis
+import threading
+import time
 
 from datetime import datetime
 from pathlib import Path
-from typing import Generic, Optional, TypeVar
+from typing import Any, Generic, Optional, TypeVar
 from urllib.parse import urlparse
 
 import requests
@@ -216,6 +219,18 @@ class AppConfig:
     _redis: Optional[redis.Redis] = None
     _redis_key_prefix: str
 
+    # Process-local read-through cache of values fetched from Redis. Entries are
+    # dropped when another worker publishes an invalidation for the key, so a
+    # cached read costs no network I/O until the key actually changes.
+    _cache: dict[str, Any]
+    _cache_lock: threading.Lock
+    _cache_generations: dict[str, int]
+    _cache_epoch: int
+    _cache_listening: bool
+    _cache_hits: int
+    _cache_misses: int
+    _version: int
+
     def __init__(
         self,
         redis_url: Optional[str] = None,
@@ -224,11 +239,28 @@ class AppConfig:
     ):
         super().__setattr__("_state", {})
         super().__setattr__("_redis_key_prefix", redis_key_prefix)
+        super().__setattr__("_cache", {})
+        super().__setattr__("_cache_lock", threading.Lock())
+        super().__setattr__("_cache_generations", {})
+        super().__setattr__("_cache_epoch", 0)
+        super().__setattr__("_cache_listening", False)
+        super().__setattr__("_cache_hits", 0)
+        super().__setattr__("_cache_misses", 0)
+        super().__setattr__("_version", 0)
         if redis_url:
             super().__setattr__(
                 "_redis",
                 get_redis_connection(redis_url, redis_sentinels, decode_responses=True),
             )
+            threading.Thread(
+                target=self._listen_for_invalidations,
+                name="config-cache-invalidation",
+                daemon=True,
+            ).start()
+
+    @property
+    def _redis_channel(self) -> str:
+        return f"{self._redis_key_prefix}:config:invalidate"
 
     def __setattr__(self, key, value):
         if isinstance(value, PersistentConfig):
@@ -241,12 +273,33 @@ class AppConfig:
                 redis_key = f"{self._redis_key_prefix}:config:{key}"
                 self._redis.set(redis_key, json.dumps(self._state[key].value))
 
+                # Drop our own entry before notifying the other workers so the
+                # next local read cannot observe the previous value.
+                self._invalidate(key)
+                try:
+                    version = self._redis.incr(
+                        f"{self._redis_key_prefix}:config:version"
+                    )
+                    self._redis.publish(
+                        self._redis_channel,
+                        json.dumps({"key": key, "version": version}),
+                    )
+                except Exception as e:
+                    log.error(f"Failed to publish config invalidation for {key}: {e}")
+
     def __getattr__(self, key):
         if key not in self._state:
             raise AttributeError(f"Config key '{key}' not found")
 
         # If Redis is available, check for an updated value
         if self._redis:
+            if self._cache_listening and key in self._cache:
+                super().__setattr__("_cache_hits", self._cache_hits + 1)
+                return self._copy_value(self._cache[key])
+
+            super().__setattr__("_cache_misses", self._cache_misses + 1)
+            generation = (self._cache_epoch, self._cache_generations.get(key, 0))
+
             redis_key = f"{self._redis_key_prefix}:config:{key}"
             redis_value = self._redis.get(redis_key)
 
@@ -262,7 +315,70 @@ class AppConfig:
                 except json.JSONDecodeError:
                     log.error(f"Invalid JSON format in Redis for {key}: {redis_value}")
 
-        return self._state[key].value
+            # Only cache the value if no invalidation raced with the GET above.
+            with self._cache_lock:
+                if (
+                    self._cache_listening
+                    and (self._cache_epoch, self._cache_generations.get(key, 0))
+                    == generation
+                ):
+                    self._cache[key] = self._state[key].value
+
+        return self._copy_value(self._state[key].value)
+
+    @staticmethod
+    def _copy_value(value):
+        # The cached value is shared by every caller, so hand out copies of
+        # mutable values rather than letting callers edit it in place.
+        if isinstance(value, (dict, list)):
+            return copy.deepcopy(value)
+        return value
+
+    def _invalidate(self, key: Optional[str] = None):
+        with self._cache_lock:
+            if key is None:
+                self._cache.clear()
+                super().__setattr__("_cache_epoch", self._cache_epoch + 1)
+            else:
+                self._cache.pop(key, None)
+                self._cache_generations[key] = self._cache_generations.get(key, 0) + 1
+
+    def _listen_for_invalidations(self):
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self._redis_channel)
+                super().__setattr__("_cache_listening", True)
+                log.debug(f"Subscribed to {self._redis_channel}")
+
+                for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    try:
+                        data = json.loads(message["data"])
+                        self._invalidate(data.get("key"))
+                        super().__setattr__(
+                            "_version", max(self._version, int(data.get("version", 0)))
+                        )
+                    except (json.JSONDecodeError, TypeError, ValueError):
+                        log.error(f"Invalid config invalidation: {message['data']}")
+            except Exception as e:
+                log.warning(f"Config invalidation listener disconnected: {e}")
+
+            # Invalidations may have been missed while disconnected, so fall
+            # back to reading through Redis until we are subscribed again.
+            super().__setattr__("_cache_listening", False)
+            self._invalidate()
+            time.sleep(1)
+
+    def get_cache_stats(self) -> dict:
+        return {
+            "hits": self._cache_hits,
+            "misses": self._cache_misses,
+            "size": len(self._cache),
+            "version": self._version,
+            "listening": self._cache_listening,
+        }
 
 
 ####################################
@@ -896,6 +1012,18 @@ OLLAMA_API_CONFIGS = PersistentConfig(
     {},
 )
 
+# How a request picks among the OLLAMA_BASE_URLS that serve its model:
+# random, round_robin, least_in_flight, ewma_latency or resident (prefer the
+# nodes that already have the model loaded, per /api/ps).
+OLLAMA_ROUTING_STRATEGY = os.environ.get("OLLAMA_ROUTING_STRATEGY", "random").lower()
+
+try:
+    OLLAMA_ROUTING_RESIDENT_TTL = int(
+        os.environ.get("OLLAMA_ROUTING_RESIDENT_TTL", "10")
+    )
+except ValueError:
+    OLLAMA_ROUTING_RESIDENT_TTL = 10
+
 ####################################
 # OPENAI_API
 ####################################
@@ -1995,6 +2123,17 @@ PINECONE_DIMENSION = int(os.getenv("PINECONE_DIMENSION", 1536))  # or 3072, 1024
 PINECONE_METRIC = os.getenv("PINECONE_METRIC", "cosine")
 PINECONE_CLOUD = os.getenv("PINECONE_CLOUD", "aws")  # or "gcp" or "azure"
 
+# BM25 index
+# Persistent per-collection inverted index used by hybrid search, so BM25 scoring
+# does not need to load and tokenize the whole collection on every query.
+# Off by default: the index lives on the local disk of each node and only sees
+# the writes made through that node, so with several nodes writing to a shared
+# vector DB it silently goes stale. Only enable it on single-node deployments.
+ENABLE_RAG_BM25_INDEX = (
+    os.environ.get("ENABLE_RAG_BM25_INDEX", "False").lower() == "true"
+)
+RAG_BM25_INDEX_DIR = os.environ.get("RAG_BM25_INDEX_DIR", f"{CHROMA_DATA_PATH}/bm25")
+
 ####################################
 # Information Retrieval (RAG)
 ####################################
@@ -2333,6 +2472,44 @@ RAG_EMBEDDING_PREFIX_FIELD_NAME = os.environ.get(
     "RAG_EMBEDDING_PREFIX_FIELD_NAME", None
 )
 
+# Remote embedding engines (ollama, openai, azure_openai): number of batches
+# sent concurrently and how often a rate-limited batch is retried.
+try:
+    RAG_EMBEDDING_CONCURRENT_REQUESTS = int(
+        os.environ.get("RAG_EMBEDDING_CONCURRENT_REQUESTS", "4")
+    )
+except ValueError:
+    RAG_EMBEDDING_CONCURRENT_REQUESTS = 4
+
+try:
+    RAG_EMBEDDING_MAX_RETRIES = int(os.environ.get("RAG_EMBEDDING_MAX_RETRIES", "5"))
+except ValueError:
+    RAG_EMBEDDING_MAX_RETRIES = 5
+
+# Content-addressed cache of computed embeddings, keyed by
+# (engine, model, prefix, sha256(text)). Backend is "local" or "redis".
+ENABLE_RAG_EMBEDDING_CACHE = (
+    os.environ.get("ENABLE_RAG_EMBEDDING_CACHE", "True").lower() == "true"
+)
+RAG_EMBEDDING_CACHE_BACKEND = os.environ.get("RAG_EMBEDDING_CACHE_BACKEND", "local")
+RAG_EMBEDDING_CACHE_DIR = os.environ.get(
+    "RAG_EMBEDDING_CACHE_DIR", f"{CACHE_DIR}/embeddings"
+)
+
+try:
+    RAG_EMBEDDING_CACHE_MAX_SIZE_MB = int(
+        os.environ.get("RAG_EMBEDDING_CACHE_MAX_SIZE_MB", "1024")
+    )
+except ValueError:
+    RAG_EMBEDDING_CACHE_MAX_SIZE_MB = 1024
+
+try:
+    RAG_EMBEDDING_CACHE_REDIS_TTL = int(
+        os.environ.get("RAG_EMBEDDING_CACHE_REDIS_TTL", str(60 * 60 * 24 * 30))
+    )
+except ValueError:
+    RAG_EMBEDDING_CACHE_REDIS_TTL = 60 * 60 * 24 * 30
+
 RAG_RERANKING_ENGINE = PersistentConfig(
     "RAG_RERANKING_ENGINE",
     "rag.reranking_engine",
@@ -332,6 +332,86 @@ else:
     except Exception:
         DATABASE_POOL_RECYCLE = 3600
 
+# SQLite connection profile. WAL lets readers run alongside the writer and
+# the busy timeout (in milliseconds) makes writers wait for the lock instead
+# of failing with "database is locked".
+DATABASE_SQLITE_ENABLE_WAL = (
+    os.environ.get("DATABASE_SQLITE_ENABLE_WAL", "True").lower() == "true"
+)
+
+try:
+    DATABASE_SQLITE_BUSY_TIMEOUT = int(
+        os.environ.get("DATABASE_SQLITE_BUSY_TIMEOUT", "10000")
+    )
+except Exception:
+    DATABASE_SQLITE_BUSY_TIMEOUT = 10000
+
+# Page cache of each connection, in KiB
+try:
+    DATABASE_SQLITE_CACHE_SIZE = int(
+        os.environ.get("DATABASE_SQLITE_CACHE_SIZE", "65536")
+    )
+except Exception:
+    DATABASE_SQLITE_CACHE_SIZE = 65536
+
+# How much of the database file (in bytes) is memory-mapped, 0 disables it
+try:
+    DATABASE_SQLITE_MMAP_SIZE = int(
+        os.environ.get("DATABASE_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))
+    )
+except Exception:
+    DATABASE_SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+
+# How often (in seconds) to run PRAGMA optimize and checkpoint the WAL,
+# 0 disables it
+try:
+    DATABASE_SQLITE_MAINTENANCE_INTERVAL = int(
+        os.environ.get("DATABASE_SQLITE_MAINTENANCE_INTERVAL", "3600")
+    )
+except Exception:
+    DATABASE_SQLITE_MAINTENANCE_INTERVAL = 3600
+
+# Comma-separated URLs of read replicas of DATABASE_URL, used for heavy list
+# and search queries
+DATABASE_REPLICA_URLS = [
+    url.strip().replace("postgres://", "postgresql://")
+    for url in os.environ.get("DATABASE_REPLICA_URLS", "").split(",")
+    if url.strip()
+]
+
+# Replicas further behind than this (in seconds) are skipped, and for this
+# long after writing, a user's reads stay on the primary
+try:
+    DATABASE_REPLICA_MAX_LAG = float(os.environ.get("DATABASE_REPLICA_MAX_LAG", "5"))
+except Exception:
+    DATABASE_REPLICA_MAX_LAG = 5.0
+
+# Per-worker cache TTLs (in seconds). Changes made on the same worker apply
+# immediately, other workers see them once their cached copy expires.
+
+# A user's group ids
+try:
+    GROUP_MEMBERSHIP_CACHE_TTL = float(
+        os.environ.get("GROUP_MEMBERSHIP_CACHE_TTL", "5")
+    )
+except Exception:
+    GROUP_MEMBERSHIP_CACHE_TTL = 5.0
+
+# The user of a token or API key
+try:
+    USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", "5"))
+except Exception:
+    USER_CACHE_TTL = 5.0
+
+# How often (in seconds) the users' last active times are written, in one
+# batch per worker
+try:
+    USER_LAST_ACTIVE_UPDATE_INTERVAL = float(
+        os.environ.get("USER_LAST_ACTIVE_UPDATE_INTERVAL", "30")
+    )
+except Exception:
+    USER_LAST_ACTIVE_UPDATE_INTERVAL = 30.0
+
 RESET_CONFIG_ON_START = (
     os.environ.get("RESET_CONFIG_ON_START", "False").lower() == "true"
 )
@@ -340,6 +420,23 @@ ENABLE_REALTIME_CHAT_SAVE = (
     os.environ.get("ENABLE_REALTIME_CHAT_SAVE", "False").lower() == "true"
 )
 
+# With ENABLE_REALTIME_CHAT_SAVE, streamed deltas are coalesced and written at
+# most every REALTIME_CHAT_SAVE_INTERVAL seconds, or sooner once
+# REALTIME_CHAT_SAVE_MAX_BYTES of new content has accumulated.
+try:
+    REALTIME_CHAT_SAVE_INTERVAL = float(
+        os.environ.get("REALTIME_CHAT_SAVE_INTERVAL", "1")
+    )
+except Exception:
+    REALTIME_CHAT_SAVE_INTERVAL = 1.0
+
+try:
+    REALTIME_CHAT_SAVE_MAX_BYTES = int(
+        os.environ.get("REALTIME_CHAT_SAVE_MAX_BYTES", "4096")
+    )
+except Exception:
+    REALTIME_CHAT_SAVE_MAX_BYTES = 4096
+
 ####################################
 # REDIS
 ####################################
@@ -443,6 +540,22 @@ else:
     except Exception:
         MODELS_CACHE_TTL = 1
 
+# How long (in seconds) a worker serves the merged model list before
+# rebuilding it; see the per-worker cache TTLs above
+try:
+    MODELS_LIST_CACHE_TTL = float(os.environ.get("MODELS_LIST_CACHE_TTL", "10"))
+except Exception:
+    MODELS_LIST_CACHE_TTL = 10.0
+
+# How long (in seconds) an expired model list may still be served while it
+# is rebuilt in the background
+try:
+    MODELS_LIST_CACHE_MAX_STALE = float(
+        os.environ.get("MODELS_LIST_CACHE_MAX_STALE", "300")
+    )
+except Exception:
+    MODELS_LIST_CACHE_MAX_STALE = 300.0
+
 
 ####################################
 # WEBSOCKET SUPPORT
@@ -468,6 +581,31 @@ WEBSOCKET_SENTINEL_HOSTS = os.environ.get("WEBSOCKET_SENTINEL_HOSTS", "")
 
 WEBSOCKET_SENTINEL_PORT = os.environ.get("WEBSOCKET_SENTINEL_PORT", "26379")
 
+# Seconds the session, user and usage pools kept in Redis are cached per
+# worker; writes invalidate the caches of all workers through pub/sub, so
+# this only bounds staleness if invalidations are lost. 0 disables caching
+try:
+    WEBSOCKET_POOL_CACHE_TTL = float(os.environ.get("WEBSOCKET_POOL_CACHE_TTL", "30"))
+except Exception:
+    WEBSOCKET_POOL_CACHE_TTL = 30.0
+
+# Seconds over which the content updates of a streamed response are merged
+# into one chat event per message, 0 sends every update
+try:
+    WEBSOCKET_EVENT_FLUSH_INTERVAL = float(
+        os.environ.get("WEBSOCKET_EVENT_FLUSH_INTERVAL", "0.04")
+    )
+except Exception:
+    WEBSOCKET_EVENT_FLUSH_INTERVAL = 0.04
+
+# Content updates merged at most before the event is sent anyway
+try:
+    WEBSOCKET_EVENT_MAX_BATCH_SIZE = int(
+        os.environ.get("WEBSOCKET_EVENT_MAX_BATCH_SIZE", "64")
+    )
+except Exception:
+    WEBSOCKET_EVENT_MAX_BATCH_SIZE = 64
+
 AIOHTTP_CLIENT_TIMEOUT = os.environ.get("AIOHTTP_CLIENT_TIMEOUT", "")
 
 if AIOHTTP_CLIENT_TIMEOUT == "":
@@ -516,6 +654,52 @@ AIOHTTP_CLIENT_SESSION_TOOL_SERVER_SSL = (
     os.environ.get("AIOHTTP_CLIENT_SESSION_TOOL_SERVER_SSL", "True").lower() == "true"
 )
 
+# Shared per-upstream session pool used by the Ollama and OpenAI routers
+try:
+    AIOHTTP_CLIENT_POOL_LIMIT = int(os.environ.get("AIOHTTP_CLIENT_POOL_LIMIT", "100"))
+except Exception:
+    AIOHTTP_CLIENT_POOL_LIMIT = 100
+
+try:
+    AIOHTTP_CLIENT_POOL_KEEPALIVE_TIMEOUT = float(
+        os.environ.get("AIOHTTP_CLIENT_POOL_KEEPALIVE_TIMEOUT", "30")
+    )
+except Exception:
+    AIOHTTP_CLIENT_POOL_KEEPALIVE_TIMEOUT = 30.0
+
+try:
+    AIOHTTP_CLIENT_POOL_DNS_CACHE_TTL = int(
+        os.environ.get("AIOHTTP_CLIENT_POOL_DNS_CACHE_TTL", "300")
+    )
+except Exception:
+    AIOHTTP_CLIENT_POOL_DNS_CACHE_TTL = 300
+
+# Health checking and circuit breaking for the Ollama / OpenAI connections.
+# A connection is taken out of model listing and routing after
+# MODEL_CONNECTION_FAILURE_THRESHOLD consecutive failures and probed again
+# after MODEL_CONNECTION_RECOVERY_TIMEOUT seconds. An interval of 0 disables
+# the background probes (failures are still recorded from live traffic).
+try:
+    MODEL_CONNECTION_HEALTH_CHECK_INTERVAL = int(
+        os.environ.get("MODEL_CONNECTION_HEALTH_CHECK_INTERVAL", "30")
+    )
+except Exception:
+    MODEL_CONNECTION_HEALTH_CHECK_INTERVAL = 30
+
+try:
+    MODEL_CONNECTION_FAILURE_THRESHOLD = int(
+        os.environ.get("MODEL_CONNECTION_FAILURE_THRESHOLD", "3")
+    )
+except Exception:
+    MODEL_CONNECTION_FAILURE_THRESHOLD = 3
+
+try:
+    MODEL_CONNECTION_RECOVERY_TIMEOUT = int(
+        os.environ.get("MODEL_CONNECTION_RECOVERY_TIMEOUT", "30")
+    )
+except Exception:
+    MODEL_CONNECTION_RECOVERY_TIMEOUT = 30
+
 
 ####################################
 # SENTENCE TRANSFORMERS
@@ -0,0 +1,271 @@
+import logging
+import re
+
+from sqlalchemy import Float, String, text
+from sqlalchemy.exc import OperationalError
+
+from nst_ai.env import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["DB"])
+
+####################
+# Full-text index over chat titles and message contents.
+#
+# SQLite: contentless FTS5 tables `chat_fts` and `chat_message_fts`, kept in
+# sync by triggers. Their rowids come from `chat_fts_key` and
+# `chat_message_fts_key`, which map chat and message ids to an INTEGER PRIMARY
+# KEY, so entries stay attached to the right row across VACUUM and table
+# rebuilds (the implicit rowid of `chat` and `chat_message` is not stable).
+# A migration that recreates `chat` or `chat_message` (batch_alter_table)
+# drops their triggers and must call `create_chat_search_index` afterwards.
+# PostgreSQL: generated `search_vector` tsvector columns with GIN indexes.
+#
+# Both use language-agnostic tokenization (unicode61 / 'simple'), no stemming.
+####################
+
+SQLITE_CREATE_STATEMENTS = [
+    "CREATE TABLE IF NOT EXISTS chat_fts_key ("
+    "id INTEGER PRIMARY KEY, chat_id TEXT NOT NULL UNIQUE)",
+    "CREATE TABLE IF NOT EXISTS chat_message_fts_key ("
+    "id INTEGER PRIMARY KEY, chat_id TEXT NOT NULL, message_id TEXT NOT NULL, "
+    "UNIQUE (chat_id, message_id))",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS chat_fts USING fts5(title, content='')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS chat_message_fts USING fts5("
+    "content, content='')",
+    """
+    CREATE TRIGGER IF NOT EXISTS chat_fts_insert AFTER INSERT ON chat BEGIN
+        INSERT OR IGNORE INTO chat_fts_key(chat_id) VALUES (new.id);
+        INSERT INTO chat_fts(rowid, title)
+        SELECT id, new.title FROM chat_fts_key WHERE chat_id = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS chat_fts_delete AFTER DELETE ON chat BEGIN
+        INSERT INTO chat_fts(chat_fts, rowid, title)
+        SELECT 'delete', id, old.title FROM chat_fts_key WHERE chat_id = old.id;
+        DELETE FROM chat_fts_key WHERE chat_id = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS chat_fts_update AFTER UPDATE OF title ON chat BEGIN
+        INSERT INTO chat_fts(chat_fts, rowid, title)
+        SELECT 'delete', id, old.title FROM chat_fts_key WHERE chat_id = old.id;
+        INSERT INTO chat_fts(rowid, title)
+        SELECT id, new.title FROM chat_fts_key WHERE chat_id = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS chat_message_fts_insert AFTER INSERT ON chat_message BEGIN
+        INSERT OR IGNORE INTO chat_message_fts_key(chat_id, message_id)
+        VALUES (new.chat_id, new.message_id);
+        INSERT INTO chat_message_fts(rowid, content)
+        SELECT id, new.content FROM chat_message_fts_key
+        WHERE chat_id = new.chat_id AND message_id = new.message_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS chat_message_fts_delete AFTER DELETE ON chat_message BEGIN
+        INSERT INTO chat_message_fts(chat_message_fts, rowid, content)
+        SELECT 'delete', id, old.content FROM chat_message_fts_key
+        WHERE chat_id = old.chat_id AND message_id = old.message_id;
+        DELETE FROM chat_message_fts_key
+        WHERE chat_id = old.chat_id AND message_id = old.message_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS chat_message_fts_update AFTER UPDATE OF content ON chat_message BEGIN
+        INSERT INTO chat_message_fts(chat_message_fts, rowid, content)
+        SELECT 'delete', id, old.content FROM chat_message_fts_key
+        WHERE chat_id = old.chat_id AND message_id = old.message_id;
+        INSERT INTO chat_message_fts(rowid, content)
+        SELECT id, new.content FROM chat_message_fts_key
+        WHERE chat_id = new.chat_id AND message_id = new.message_id;
+    END
+    """,
+]
+
+# Contentless tables cannot 'rebuild' themselves from a content table, so the
+# keys are reassigned and every entry is re-inserted.
+SQLITE_REBUILD_STATEMENTS = [
+    "INSERT INTO chat_fts(chat_fts) VALUES ('delete-all')",
+    "DELETE FROM chat_fts_key",
+    "INSERT INTO chat_fts_key(chat_id) SELECT id FROM chat",
+    "INSERT INTO chat_fts(rowid, title) SELECT chat_fts_key.id, chat.title "
+    "FROM chat_fts_key JOIN chat ON chat.id = chat_fts_key.chat_id",
+    "INSERT INTO chat_message_fts(chat_message_fts) VALUES ('delete-all')",
+    "DELETE FROM chat_message_fts_key",
+    "INSERT INTO chat_message_fts_key(chat_id, message_id) "
+    "SELECT chat_id, message_id FROM chat_message",
+    "INSERT INTO chat_message_fts(rowid, content) "
+    "SELECT chat_message_fts_key.id, chat_message.content "
+    "FROM chat_message_fts_key JOIN chat_message "
+    "ON chat_message.chat_id = chat_message_fts_key.chat_id "
+    "AND chat_message.message_id = chat_message_fts_key.message_id",
+]
+
+SQLITE_DROP_STATEMENTS = [
+    "DROP TRIGGER IF EXISTS chat_fts_insert",
+    "DROP TRIGGER IF EXISTS chat_fts_delete",
+    "DROP TRIGGER IF EXISTS chat_fts_update",
+    "DROP TRIGGER IF EXISTS chat_message_fts_insert",
+    "DROP TRIGGER IF EXISTS chat_message_fts_delete",
+    "DROP TRIGGER IF EXISTS chat_message_fts_update",
+    "DROP TABLE IF EXISTS chat_fts",
+    "DROP TABLE IF EXISTS chat_message_fts",
+    "DROP TABLE IF EXISTS chat_fts_key",
+    "DROP TABLE IF EXISTS chat_message_fts_key",
+]
+
+POSTGRES_CREATE_STATEMENTS = [
+    "ALTER TABLE chat ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(title, ''))) STORED",
+    "CREATE INDEX IF NOT EXISTS chat_search_vector_idx "
+    "ON chat USING GIN (search_vector)",
+    "ALTER TABLE chat_message ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(content, ''))) STORED",
+    "CREATE INDEX IF NOT EXISTS chat_message_search_vector_idx "
+    "ON chat_message USING GIN (search_vector)",
+]
+
+POSTGRES_DROP_STATEMENTS = [
+    "DROP INDEX IF EXISTS chat_search_vector_idx",
+    "ALTER TABLE chat DROP COLUMN IF EXISTS search_vector",
+    "DROP INDEX IF EXISTS chat_message_search_vector_idx",
+    "ALTER TABLE chat_message DROP COLUMN IF EXISTS search_vector",
+]
+
+# Title matches rank above message matches of the same relevance.
+TITLE_WEIGHT = 2
+
+SQLITE_SEARCH_SQL = f"""
+SELECT matches.chat_id AS chat_id, MIN(matches.rank) AS rank FROM (
+    SELECT chat_message_fts_key.chat_id AS chat_id, chat_message_fts.rank AS rank
+    FROM chat_message_fts
+    JOIN chat_message_fts_key ON chat_message_fts_key.id = chat_message_fts.rowid
+    JOIN chat ON chat.id = chat_message_fts_key.chat_id
+    WHERE chat_message_fts MATCH :search_query AND chat.user_id = :search_user_id
+    UNION ALL
+    SELECT chat.id AS chat_id, {TITLE_WEIGHT} * chat_fts.rank AS rank
+    FROM chat_fts
+    JOIN chat_fts_key ON chat_fts_key.id = chat_fts.rowid
+    JOIN chat ON chat.id = chat_fts_key.chat_id
+    WHERE chat_fts MATCH :search_query AND chat.user_id = :search_user_id
+) AS matches
+GROUP BY matches.chat_id
+"""
+
+POSTGRES_SEARCH_SQL = f"""
+SELECT matches.chat_id AS chat_id, MIN(matches.rank) AS rank FROM (
+    SELECT chat_message.chat_id AS chat_id,
+        -ts_rank(chat_message.search_vector, q) AS rank
+    FROM chat_message
+    JOIN chat ON chat.id = chat_message.chat_id,
+    to_tsquery('simple', :search_query) AS q
+    WHERE chat_message.search_vector @@ q AND chat.user_id = :search_user_id
+    UNION ALL
+    SELECT chat.id AS chat_id, -{TITLE_WEIGHT} * ts_rank(chat.search_vector, q) AS rank
+    FROM chat, to_tsquery('simple', :search_query) AS q
+    WHERE chat.search_vector @@ q AND chat.user_id = :search_user_id
+) AS matches
+GROUP BY matches.chat_id
+"""
+
+_index_available: dict[str, bool] = {}
+
+
+def create_chat_search_index(conn) -> bool:
+    """
+    Create the index (idempotent). Returns False if the database does not
+    support it, e.g. SQLite builds without FTS5.
+    """
+    dialect_name = conn.dialect.name
+    if dialect_name == "sqlite":
+        statements = SQLITE_CREATE_STATEMENTS
+    elif dialect_name == "postgresql":
+        statements = POSTGRES_CREATE_STATEMENTS
+    else:
+        log.warning(f"Chat search index is not supported on {dialect_name}")
+        return False
+
+    try:
+        for statement in statements:
+            conn.execute(text(statement))
+    except OperationalError as e:
+        if dialect_name != "sqlite":
+            raise
+        log.warning(f"Chat search index not created, search falls back to LIKE: {e}")
+        for statement in SQLITE_DROP_STATEMENTS:
+            conn.execute(text(statement))
+        return False
+
+    _index_available.pop(dialect_name, None)
+    return True
+
+
+def drop_chat_search_index(conn):
+    dialect_name = conn.dialect.name
+    if dialect_name == "sqlite":
+        statements = SQLITE_DROP_STATEMENTS
+    elif dialect_name == "postgresql":
+        statements = POSTGRES_DROP_STATEMENTS
+    else:
+        return
+
+    for statement in statements:
+        conn.execute(text(statement))
+    _index_available.pop(dialect_name, None)
+
+
+def rebuild_chat_search_index(conn) -> bool:
+    """Create the index if needed and re-index every chat and message."""
+    if not create_chat_search_index(conn):
+        return False
+
+    if conn.dialect.name == "sqlite":
+        for statement in SQLITE_REBUILD_STATEMENTS:
+            conn.execute(text(statement))
+    # PostgreSQL's generated columns are computed on write and were filled
+    # for existing rows when they were added.
+    return True
+
+
+def has_chat_search_index(db) -> bool:
+    dialect_name = db.bind.dialect.name
+    if dialect_name not in _index_available:
+        if dialect_name == "sqlite":
+            sql = "SELECT 1 FROM sqlite_master WHERE name = 'chat_message_fts'"
+        elif dialect_name == "postgresql":
+            sql = (
+                "SELECT 1 FROM information_schema.columns "
+                "WHERE table_name = 'chat_message' AND column_name = 'search_vector'"
+            )
+        else:
+            return False
+        _index_available[dialect_name] = db.execute(text(sql)).first() is not None
+    return _index_available[dialect_name]
+
+
+def get_search_terms(search_text: str) -> list[str]:
+    return re.findall(r"\w+", search_text.lower())
+
+
+def get_chat_search_subquery(dialect_name: str, user_id: str, terms: list[str]):
+    """
+    (chat_id, rank) of the user's chats whose title or messages contain all
+    `terms` (as prefixes, so partially typed words match); lower rank is a
+    better match.
+    """
+    if dialect_name == "sqlite":
+        sql = SQLITE_SEARCH_SQL
+        search_query = " ".join(f'"{term}"*' for term in terms)
+    else:
+        sql = POSTGRES_SEARCH_SQL
+        search_query = " & ".join(f"{term}:*" for term in terms)
+
+    return (
+        text(sql)
+        .bindparams(search_query=search_query, search_user_id=user_id)
+        .columns(chat_id=String, rank=Float)
+        .subquery("search")
+    )
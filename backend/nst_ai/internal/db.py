@@ -1,9 +1,13 @@
+import asyncio
+import itertools
 import json
 import logging
-from contextlib import contextmanager
-from typing import Any, Optional
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable, Optional, TypeVar
 
 from nst_ai.internal.wrappers import register_connection
+from nst_ai.utils.ttl_cache import TTLCache
 from nst_ai.env import (
     nst_ai_DIR,
     DATABASE_URL,
@@ -13,12 +17,21 @@ from nst_ai.env import (
     DATABASE_POOL_RECYCLE,
     DATABASE_POOL_SIZE,
     DATABASE_POOL_TIMEOUT,
+    DATABASE_REPLICA_MAX_LAG,
+    DATABASE_REPLICA_URLS,
+    DATABASE_SQLITE_BUSY_TIMEOUT,
+    DATABASE_SQLITE_CACHE_SIZE,
+    DATABASE_SQLITE_ENABLE_WAL,
+    DATABASE_SQLITE_MAINTENANCE_INTERVAL,
+    DATABASE_SQLITE_MMAP_SIZE,
 )
 from peewee_migrate import Router
-from sqlalchemy import Dialect, create_engine, MetaData, types
+from sqlalchemy import Dialect, create_engine, event, MetaData, types
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import scoped_session, sessionmaker
-from sqlalchemy.pool import QueuePool, NullPool
+from sqlalchemy.orm import Session as OrmSession, scoped_session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool, NullPool
 from sqlalchemy.sql.type_api import _T
 from typing_extensions import Self
 
@@ -101,43 +114,120 @@ def handle_peewee_migration(DATABASE_URL):
 handle_peewee_migration(DATABASE_URL)
 
 
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout = {DATABASE_SQLITE_BUSY_TIMEOUT}")
+    if DATABASE_SQLITE_ENABLE_WAL:
+        cursor.execute("PRAGMA journal_mode = WAL")
+        # Durable at every checkpoint rather than every commit, safe with WAL
+        cursor.execute("PRAGMA synchronous = NORMAL")
+    cursor.execute(f"PRAGMA cache_size = -{DATABASE_SQLITE_CACHE_SIZE}")
+    cursor.execute(f"PRAGMA mmap_size = {DATABASE_SQLITE_MMAP_SIZE}")
+    cursor.execute("PRAGMA temp_store = MEMORY")
+    cursor.close()
+
+
+def get_sqlite_pool_options(url, poolclass) -> dict:
+    if make_url(url).database in (None, "", ":memory:"):
+        # In-memory databases live and die with their single connection
+        return {}
+
+    if isinstance(DATABASE_POOL_SIZE, int):
+        if DATABASE_POOL_SIZE > 0:
+            return {
+                "pool_size": DATABASE_POOL_SIZE,
+                "max_overflow": DATABASE_POOL_MAX_OVERFLOW,
+                "pool_timeout": DATABASE_POOL_TIMEOUT,
+                "poolclass": poolclass,
+            }
+        return {"poolclass": NullPool}
+    # SQLAlchemy's default, a QueuePool of 5 (+10 overflow) connections
+    return {}
+
+
+def get_pool_options(poolclass) -> dict:
+    if isinstance(DATABASE_POOL_SIZE, int):
+        if DATABASE_POOL_SIZE > 0:
+            return {
+                "pool_size": DATABASE_POOL_SIZE,
+                "max_overflow": DATABASE_POOL_MAX_OVERFLOW,
+                "pool_timeout": DATABASE_POOL_TIMEOUT,
+                "pool_recycle": DATABASE_POOL_RECYCLE,
+                "pool_pre_ping": True,
+                "poolclass": poolclass,
+            }
+        return {"pool_pre_ping": True, "poolclass": NullPool}
+    return {"pool_pre_ping": True}
+
+
 SQLALCHEMY_DATABASE_URL = DATABASE_URL
 if "sqlite" in SQLALCHEMY_DATABASE_URL:
     engine = create_engine(
-        SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+        SQLALCHEMY_DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        **get_sqlite_pool_options(SQLALCHEMY_DATABASE_URL, QueuePool),
     )
+    event.listen(engine, "connect", set_sqlite_pragmas)
 else:
-    if isinstance(DATABASE_POOL_SIZE, int):
-        if DATABASE_POOL_SIZE > 0:
-            engine = create_engine(
-                SQLALCHEMY_DATABASE_URL,
-                pool_size=DATABASE_POOL_SIZE,
-                max_overflow=DATABASE_POOL_MAX_OVERFLOW,
-                pool_timeout=DATABASE_POOL_TIMEOUT,
-                pool_recycle=DATABASE_POOL_RECYCLE,
-                pool_pre_ping=True,
-                poolclass=QueuePool,
-            )
-        else:
-            engine = create_engine(
-                SQLALCHEMY_DATABASE_URL, pool_pre_ping=True, poolclass=NullPool
-            )
-    else:
-        engine = create_engine(SQLALCHEMY_DATABASE_URL, pool_pre_ping=True)
+    engine = create_engine(SQLALCHEMY_DATABASE_URL, **get_pool_options(QueuePool))
 
 
 SessionLocal = sessionmaker(
     autocommit=False, autoflush=False, bind=engine, expire_on_commit=False
 )
+
+
+def get_async_database_url(url: str) -> Optional[URL]:
+    """The URL of `url`'s database through its asyncio driver, if it has one."""
+    url = make_url(url)
+    if url.drivername in ("sqlite", "sqlite+pysqlite"):
+        return url.set(drivername="sqlite+aiosqlite")
+    if url.drivername in ("postgresql", "postgresql+psycopg2"):
+        url = url.set(drivername="postgresql+asyncpg")
+        # asyncpg takes `ssl` rather than libpq's `sslmode`
+        if "sslmode" in url.query:
+            url = url.update_query_dict(
+                {"ssl": url.query["sslmode"]}
+            ).difference_update_query(["sslmode"])
+        return url
+    return None
+
+
+def create_async_database_engine(url: URL):
+    if url.get_backend_name() == "sqlite":
+        async_engine = create_async_engine(
+            url, **get_sqlite_pool_options(url, AsyncAdaptedQueuePool)
+        )
+        event.listen(async_engine.sync_engine, "connect", set_sqlite_pragmas)
+        return async_engine
+
+    return create_async_engine(url, **get_pool_options(AsyncAdaptedQueuePool))
+
+
+# The same database for async code (aiosqlite / asyncpg). Without the driver,
+# `run_with_db` falls back to running the sync session in a worker thread.
+async_engine = None
+ASYNC_DATABASE_URL = get_async_database_url(SQLALCHEMY_DATABASE_URL)
+if ASYNC_DATABASE_URL is not None:
+    try:
+        async_engine = create_async_database_engine(ASYNC_DATABASE_URL)
+    except ImportError as e:
+        log.warning(f"Async database driver not available, using threads: {e}")
+
+AsyncSessionLocal = (
+    async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+    if async_engine is not None
+    else None
+)
 metadata_obj = MetaData(schema=DATABASE_SCHEMA)
 Base = declarative_base(metadata=metadata_obj)
 Session = scoped_session(SessionLocal)
 
 
-def get_session():
+def get_session(session_factory=None):
     db = None
     try:
-        db = SessionLocal()
+        db = (session_factory or SessionLocal)()
         yield db
     except Exception as e:
         log.error(f"Database session error: {e}")
@@ -156,3 +246,196 @@ def get_session():
 
 
 get_db = contextmanager(get_session)
+
+
+@asynccontextmanager
+async def get_async_db():
+    if AsyncSessionLocal is None:
+        raise RuntimeError("No async database driver is installed")
+
+    db = None
+    try:
+        db = AsyncSessionLocal()
+        yield db
+    except Exception as e:
+        log.error(f"Database session error: {e}")
+        if db:
+            try:
+                await db.rollback()
+            except Exception as rollback_error:
+                log.error(f"Failed to rollback transaction: {rollback_error}")
+        raise
+    finally:
+        if db:
+            try:
+                await db.close()
+            except Exception as close_error:
+                log.warning(f"Error closing database session: {close_error}")
+
+
+T = TypeVar("T")
+
+
+async def run_with_db(fn: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Run `fn(db, *args, **kwargs)`, written against a sync session, without
+    blocking the event loop: on the async engine, or in a worker thread if
+    there is none.
+    """
+    if AsyncSessionLocal is None:
+
+        def run():
+            with get_db() as db:
+                return fn(db, *args, **kwargs)
+
+        return await asyncio.to_thread(run)
+
+    async with get_async_db() as db:
+        return await db.run_sync(fn, *args, **kwargs)
+
+
+def optimize_sqlite_database():
+    """Refresh the query planner statistics and checkpoint the WAL."""
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA optimize")
+        if DATABASE_SQLITE_ENABLE_WAL:
+            conn.exec_driver_sql("PRAGMA wal_checkpoint(PASSIVE)")
+
+
+async def periodic_sqlite_maintenance():
+    if engine.dialect.name != "sqlite" or DATABASE_SQLITE_MAINTENANCE_INTERVAL <= 0:
+        return
+
+    while True:
+        await asyncio.sleep(DATABASE_SQLITE_MAINTENANCE_INTERVAL)
+        try:
+            await asyncio.to_thread(optimize_sqlite_database)
+        except Exception as e:
+            log.warning(f"SQLite maintenance failed: {e}")
+
+
+####################
+# Read replicas
+####################
+
+# How far a PostgreSQL standby is behind, 0 while it has replayed all it received
+POSTGRES_REPLICA_LAG_SQL = """
+SELECT CASE
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+# Minimum time (in seconds) between lag checks of a replica that is behind
+# or unavailable
+REPLICA_RECHECK_INTERVAL = 1
+
+
+class DatabaseReplica:
+    def __init__(self, url: str):
+        options = get_pool_options(QueuePool)
+        if make_url(url).get_backend_name() == "postgresql":
+            options["execution_options"] = {"postgresql_readonly": True}
+
+        self.engine = create_engine(url, **options)
+        self.SessionLocal = sessionmaker(
+            autoflush=False, bind=self.engine, expire_on_commit=False
+        )
+        self.lag = 0.0
+        self.lag_checked_at: Optional[float] = None
+
+    def check_lag(self):
+        try:
+            if self.engine.dialect.name == "postgresql":
+                with self.engine.connect() as conn:
+                    lag = conn.exec_driver_sql(POSTGRES_REPLICA_LAG_SQL).scalar()
+                    self.lag = float(lag or 0)
+            else:
+                self.lag = 0.0
+        except Exception as e:
+            log.warning(f"Read replica {self.engine.url!r} is unavailable: {e}")
+            self.lag = float("inf")
+        self.lag_checked_at = time.monotonic()
+
+    def get_lag(self, max_lag: float) -> float:
+        """Upper bound of how far the replica is behind the primary right now."""
+        if self.lag_checked_at is None:
+            self.check_lag()
+
+        elapsed = time.monotonic() - self.lag_checked_at
+        if self.lag + elapsed > max_lag and (
+            self.lag <= max_lag or elapsed >= REPLICA_RECHECK_INTERVAL
+        ):
+            self.check_lag()
+        return self.lag + time.monotonic() - self.lag_checked_at
+
+
+class DatabaseReplicas:
+    """
+    Routes reads that tolerate lag to read replicas. A replica is only used
+    while it is at most `max_lag` seconds behind the primary, and keys (user
+    ids and table names) written by this worker in the last `max_lag`
+    seconds are read from the primary, so writers always read their writes.
+    """
+
+    def __init__(self, urls: list[str], max_lag: float):
+        self.replicas = [DatabaseReplica(url) for url in urls]
+        self.max_lag = max_lag
+        # Keys written by this worker in the last `max_lag` seconds
+        self.written = TTLCache(max_lag)
+        self._next = itertools.count()
+
+    def mark_written(self, *keys: Optional[str]):
+        if not self.replicas:
+            return
+
+        for key in keys:
+            if key:
+                self.written.set(key, True)
+
+    def was_written(self, *keys: str) -> bool:
+        return any(key in self.written for key in keys)
+
+    def get_replica(self, *keys: str) -> Optional[DatabaseReplica]:
+        if not self.replicas or self.was_written(*keys):
+            return None
+
+        start = next(self._next)
+        for i in range(len(self.replicas)):
+            replica = self.replicas[(start + i) % len(self.replicas)]
+            if replica.get_lag(self.max_lag) <= self.max_lag:
+                return replica
+        return None
+
+
+DATABASE_REPLICAS = DatabaseReplicas(DATABASE_REPLICA_URLS, DATABASE_REPLICA_MAX_LAG)
+
+
+def mark_flushed_writes(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        DATABASE_REPLICAS.mark_written(
+            getattr(obj, "__tablename__", None), getattr(obj, "user_id", None)
+        )
+
+
+def mark_bulk_writes(orm_execute_state):
+    if orm_execute_state.is_select or orm_execute_state.bind_mapper is None:
+        return
+    DATABASE_REPLICAS.mark_written(orm_execute_state.bind_mapper.local_table.name)
+
+
+if DATABASE_REPLICAS.replicas:
+    event.listen(OrmSession, "after_flush", mark_flushed_writes)
+    event.listen(OrmSession, "do_orm_execute", mark_bulk_writes)
+
+
+@contextmanager
+def get_read_db(*keys: str):
+    """
+    A session for list and search queries that may be served by a replica.
+    `keys` are the user ids and table names whose recent writes the caller
+    has to see.
+    """
+    replica = DATABASE_REPLICAS.get_replica(*keys)
+    session_factory = replica.SessionLocal if replica is not None else None
+    yield from get_session(session_factory)
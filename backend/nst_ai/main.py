@@ -11,7 +11,7 @@ import random
 from uuid import uuid4
 
 
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
 from urllib.parse import urlencode, parse_qs, urlparse
 from pydantic import BaseModel
 from sqlalchemy import text
@@ -95,12 +95,21 @@ from nst_ai.routers.retrieval import (
     get_rf,
 )
 
-from nst_ai.internal.db import Session, engine
+from nst_ai.retrieval.embedding_client import get_embedding_client
+from nst_ai.utils.session_pool import HTTP_SESSION_POOL
+
+from nst_ai.internal.db import (
+    Session,
+    async_engine,
+    engine,
+    periodic_sqlite_maintenance,
+)
 
 from nst_ai.models.functions import Functions
-from nst_ai.models.models import Models
-from nst_ai.models.users import UserModel, Users
+from nst_ai.models.models import MODEL_LIST_CACHE, Models
+from nst_ai.models.users import LAST_ACTIVE_BATCHER, UserModel, Users
 from nst_ai.models.chats import Chats
+from nst_ai.models.groups import GROUP_ID_CACHE, Groups
 
 from nst_ai.config import (
     LICENSE_KEY,
@@ -439,7 +448,7 @@ from nst_ai.utils.chat import (
 )
 from nst_ai.utils.embeddings import generate_embeddings
 from nst_ai.utils.middleware import process_chat_payload, process_chat_response
-from nst_ai.utils.access_control import has_access
+from nst_ai.utils.access_control import filter_accessible, has_access
 
 from nst_ai.utils.auth import (
     get_license_data,
@@ -548,6 +557,19 @@ async def lifespan(app: FastAPI):
         limiter.total_tokens = THREAD_POOL_SIZE
 
     asyncio.create_task(periodic_usage_pool_cleanup())
+    app.state.sqlite_maintenance_task = asyncio.create_task(
+        periodic_sqlite_maintenance()
+    )
+    app.state.last_active_task = asyncio.create_task(LAST_ACTIVE_BATCHER.run())
+
+    app.state.connection_health_tasks = [
+        asyncio.create_task(
+            ollama.OLLAMA_HEALTH.run(lambda: ollama.get_health_checks(app))
+        ),
+        asyncio.create_task(
+            openai.OPENAI_HEALTH.run(lambda: openai.get_health_checks(app))
+        ),
+    ]
 
     if app.state.config.ENABLE_BASE_MODELS_CACHE:
         await get_all_models(
@@ -575,6 +597,23 @@ async def lifespan(app: FastAPI):
     if hasattr(app.state, "redis_task_command_listener"):
         app.state.redis_task_command_listener.cancel()
 
+    for task in getattr(app.state, "connection_health_tasks", []):
+        task.cancel()
+
+    app.state.sqlite_maintenance_task.cancel()
+
+    # Let a flush in progress settle before writing what is left
+    app.state.last_active_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await app.state.last_active_task
+    await LAST_ACTIVE_BATCHER.flush()
+
+    await get_embedding_client().close()
+    await HTTP_SESSION_POOL.close()
+
+    if async_engine is not None:
+        await async_engine.dispose()
+
 
 app = FastAPI(
     title="NST-Ai",
@@ -1166,6 +1205,13 @@ async def check_url(request: Request, call_next):
     return response
 
 
+@app.middleware("http")
+async def group_id_cache_scope(request: Request, call_next):
+    # Access checks for every item of a list share one group lookup
+    with GROUP_ID_CACHE.request_scope():
+        return await call_next(request)
+
+
 @app.middleware("http")
 async def inspect_websocket(request: Request, call_next):
     if (
@@ -1265,7 +1311,18 @@ if audit_level != AuditLevel.NONE:
 async def get_models(
     request: Request, refresh: bool = False, user=Depends(get_verified_user)
 ):
-    def get_filtered_models(models, user):
+    def get_filtered_models(models, user, user_group_ids):
+        # Resolve the models' access control once
+        model_infos = Models.get_models_by_ids(
+            [model["id"] for model in models if not model.get("arena")]
+        )
+        accessible_ids = {
+            model_info.id
+            for model_info in filter_accessible(
+                user.id, model_infos, "read", user_group_ids
+            )
+        }
+
         filtered_models = []
         for model in models:
             if model.get("arena"):
@@ -1275,54 +1332,71 @@ async def get_models(
                     access_control=model.get("info", {})
                     .get("meta", {})
                     .get("access_control", {}),
+                    user_group_ids=user_group_ids,
                 ):
                     filtered_models.append(model)
                 continue
 
-            model_info = Models.get_model_by_id(model["id"])
-            if model_info:
-                if user.id == model_info.user_id or has_access(
-                    user.id, type="read", access_control=model_info.access_control
-                ):
-                    filtered_models.append(model)
+            if model["id"] in accessible_ids:
+                filtered_models.append(model)
 
         return filtered_models
 
-    all_models = await get_all_models(request, refresh=refresh, user=user)
+    def get_models_view(all_models, model_order_list, user_group_ids):
+        models = []
+        for model in all_models:
+            # Filter out filter pipelines
+            if "pipeline" in model and model["pipeline"].get("type", None) == "filter":
+                continue
 
-    models = []
-    for model in all_models:
-        # Filter out filter pipelines
-        if "pipeline" in model and model["pipeline"].get("type", None) == "filter":
-            continue
+            # The model list is cached and shared, only modify copies
+            model = {**model}
+            try:
+                model_tags = [
+                    tag.get("name")
+                    for tag in model.get("info", {}).get("meta", {}).get("tags", [])
+                ]
+                tags = [tag.get("name") for tag in model.get("tags", [])]
+
+                tags = list(set(model_tags + tags))
+                model["tags"] = [{"name": tag} for tag in tags]
+            except Exception as e:
+                log.debug(f"Error processing model tags: {e}")
+                model["tags"] = []
+                pass
 
-        try:
-            model_tags = [
-                tag.get("name")
-                for tag in model.get("info", {}).get("meta", {}).get("tags", [])
-            ]
-            tags = [tag.get("name") for tag in model.get("tags", [])]
-
-            tags = list(set(model_tags + tags))
-            model["tags"] = [{"name": tag} for tag in tags]
-        except Exception as e:
-            log.debug(f"Error processing model tags: {e}")
-            model["tags"] = []
-            pass
-
-        models.append(model)
-
-    model_order_list = request.app.state.config.MODEL_ORDER_LIST
-    if model_order_list:
-        model_order_dict = {model_id: i for i, model_id in enumerate(model_order_list)}
-        # Sort models by order list priority, with fallback for those not in the list
-        models.sort(
-            key=lambda x: (model_order_dict.get(x["id"], float("inf")), x["name"])
-        )
+            models.append(model)
 
-    # Filter out models that the user does not have access to
+        if model_order_list:
+            model_order_dict = {
+                model_id: i for i, model_id in enumerate(model_order_list)
+            }
+            # Sort models by order list priority, with fallback for those not in the list
+            models.sort(
+                key=lambda x: (model_order_dict.get(x["id"], float("inf")), x["name"])
+            )
+
+        # Filter out models that the user does not have access to
+        if user_group_ids is not None:
+            models = get_filtered_models(models, user, user_group_ids)
+
+        return models
+
+    all_models = await get_all_models(request, refresh=refresh, user=user)
+
+    model_order_list = tuple(request.app.state.config.MODEL_ORDER_LIST or [])
+    user_group_ids = None
+    view_key = (None, model_order_list)
     if user.role == "user" and not BYPASS_MODEL_ACCESS_CONTROL:
-        models = get_filtered_models(models, user)
+        user_group_ids = set(Groups.get_group_ids_by_member_id(user.id))
+        view_key = (user.id, frozenset(user_group_ids), model_order_list)
+
+    # Memoized per view until the model list changes
+    models = MODEL_LIST_CACHE.get_view(
+        all_models,
+        view_key,
+        lambda: get_models_view(all_models, model_order_list, user_group_ids),
+    )
 
     log.debug(
         f"/api/models returned filtered models accessible to the user: {json.dumps([model['id'] for model in models])}"
@@ -1438,7 +1512,7 @@ async def chat_completion(
         log.debug(f"Error processing chat payload: {e}")
         if metadata.get("chat_id") and metadata.get("message_id"):
             # Update the chat message with the error
-            Chats.upsert_message_to_chat_by_id_and_message_id(
+            await Chats.upsert_message_to_chat_by_id_and_message_id_async(
                 metadata["chat_id"],
                 metadata["message_id"],
                 {
@@ -1461,7 +1535,7 @@ async def chat_completion(
         log.debug(f"Error in chat completion: {e}")
         if metadata.get("chat_id") and metadata.get("message_id"):
             # Update the chat message with the error
-            Chats.upsert_message_to_chat_by_id_and_message_id(
+            await Chats.upsert_message_to_chat_by_id_and_message_id_async(
                 metadata["chat_id"],
                 metadata["message_id"],
                 {
@@ -0,0 +1,62 @@
+"""Add group member table
+
+Revision ID: a1c5e8f2b7d4
+Revises: f7a93d2c51e8
+Create Date: 2025-07-22 03:00:00.000000
+
+"""
+
+import json
+import time
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.sql import table, select
+
+revision = "a1c5e8f2b7d4"
+down_revision = "f7a93d2c51e8"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "group_member",
+        sa.Column("group_id", sa.Text(), nullable=False),
+        sa.Column("user_id", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.BigInteger(), nullable=True),
+        sa.PrimaryKeyConstraint("group_id", "user_id", name="pk_group_id_user_id"),
+    )
+    op.create_index("group_member_user_id_idx", "group_member", ["user_id"])
+
+    # Copy the existing `group.user_ids` lists into group_member
+    group_table = table(
+        "group",
+        sa.Column("id", sa.Text()),
+        sa.Column("user_ids", sa.JSON()),
+    )
+    group_member_table = table(
+        "group_member",
+        sa.Column("group_id", sa.Text()),
+        sa.Column("user_id", sa.Text()),
+        sa.Column("created_at", sa.BigInteger()),
+    )
+
+    conn = op.get_bind()
+    now = int(time.time())
+    rows = []
+    for group in conn.execute(select(group_table.c.id, group_table.c.user_ids)):
+        user_ids = group.user_ids
+        if isinstance(user_ids, str):
+            user_ids = json.loads(user_ids)
+
+        for user_id in set(user_ids or []):
+            rows.append({"group_id": group.id, "user_id": user_id, "created_at": now})
+
+    if rows:
+        conn.execute(group_member_table.insert(), rows)
+
+
+def downgrade():
+    op.drop_index("group_member_user_id_idx", table_name="group_member")
+    op.drop_table("group_member")
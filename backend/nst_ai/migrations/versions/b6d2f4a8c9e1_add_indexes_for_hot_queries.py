@@ -0,0 +1,86 @@
+"""Add indexes for hot queries
+
+Revision ID: b6d2f4a8c9e1
+Revises: a1c5e8f2b7d4
+Create Date: 2025-07-23 03:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "b6d2f4a8c9e1"
+down_revision = "a1c5e8f2b7d4"
+branch_labels = None
+depends_on = None
+
+# (name, table, columns), matched to the filters and orderings used in
+# ChatTable, MessageTable, FilesTable, MemoriesTable, FeedbackTable,
+# UsersTable and AuthsTable. chat.share_id, user.api_key and
+# user.oauth_sub are already covered by their unique constraints.
+INDEXES = [
+    # Chat lists: user_id (+ archived) ordered by updated_at
+    (
+        "chat_user_id_archived_updated_at_idx",
+        "chat",
+        ["user_id", "archived", "updated_at"],
+    ),
+    # Pinned chats and folder contents
+    ("chat_user_id_pinned_idx", "chat", ["user_id", "pinned"]),
+    ("chat_user_id_folder_id_idx", "chat", ["user_id", "folder_id"]),
+    # Admin listing of all chats
+    ("chat_updated_at_idx", "chat", ["updated_at"]),
+    # Channel messages and thread replies, newest first
+    (
+        "message_channel_id_parent_id_created_at_idx",
+        "message",
+        ["channel_id", "parent_id", "created_at"],
+    ),
+    ("message_parent_id_created_at_idx", "message", ["parent_id", "created_at"]),
+    ("message_reaction_message_id_idx", "message_reaction", ["message_id"]),
+    ("file_user_id_idx", "file", ["user_id"]),
+    ("memory_user_id_idx", "memory", ["user_id"]),
+    ("feedback_user_id_updated_at_idx", "feedback", ["user_id", "updated_at"]),
+    ("feedback_type_updated_at_idx", "feedback", ["type", "updated_at"]),
+    ("user_email_idx", "user", ["email"]),
+    ("auth_email_idx", "auth", ["email"]),
+]
+
+
+def get_covered_columns(inspector, table_name):
+    """Column lists of the indexes and unique constraints `table_name` has."""
+    covered = [index["column_names"] for index in inspector.get_indexes(table_name)]
+    covered += [
+        constraint["column_names"]
+        for constraint in inspector.get_unique_constraints(table_name)
+    ]
+    return covered
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    existing_tables = set(inspector.get_table_names())
+
+    for name, table_name, columns in INDEXES:
+        if table_name not in existing_tables:
+            continue
+
+        # Skip indexes an existing one (e.g. created by hand) already provides
+        if any(
+            covered[: len(columns)] == columns
+            for covered in get_covered_columns(inspector, table_name)
+        ):
+            continue
+
+        op.create_index(name, table_name, columns)
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    existing_tables = set(inspector.get_table_names())
+
+    for name, table_name, _ in reversed(INDEXES):
+        if table_name not in existing_tables:
+            continue
+        if name in {index["name"] for index in inspector.get_indexes(table_name)}:
+            op.drop_index(name, table_name=table_name)
@@ -0,0 +1,162 @@
+"""Add chat message table
+
+Revision ID: e4b1c6f0a2d3
+Revises: d31026856c01
+Create Date: 2025-07-20 03:00:00.000000
+
+"""
+
+import json
+import time
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.sql import table, select
+
+revision = "e4b1c6f0a2d3"
+down_revision = "d31026856c01"
+branch_labels = None
+depends_on = None
+
+MESSAGE_COLUMN_FIELDS = {"id", "parentId", "role", "content", "model", "timestamp"}
+
+chat_table = table(
+    "chat",
+    sa.Column("id", sa.String()),
+    sa.Column("chat", sa.JSON()),
+)
+
+chat_message_table = table(
+    "chat_message",
+    sa.Column("chat_id", sa.String()),
+    sa.Column("message_id", sa.String()),
+    sa.Column("parent_id", sa.String()),
+    sa.Column("role", sa.String()),
+    sa.Column("content", sa.Text()),
+    sa.Column("model", sa.Text()),
+    sa.Column("data", sa.JSON()),
+    sa.Column("created_at", sa.BigInteger()),
+    sa.Column("updated_at", sa.BigInteger()),
+)
+
+
+def get_message_row(chat_id, message_id, message, now):
+    content = message.get("content")
+    timestamp = message.get("timestamp")
+
+    data = {k: v for k, v in message.items() if k not in MESSAGE_COLUMN_FIELDS}
+    if content is not None and not isinstance(content, str):
+        data["content"] = content
+
+    return {
+        "chat_id": chat_id,
+        "message_id": message_id,
+        "parent_id": message.get("parentId"),
+        "role": message.get("role"),
+        "content": (content.replace("\x00", "") if isinstance(content, str) else None),
+        "model": message.get("model"),
+        "data": data,
+        "created_at": int(timestamp) if isinstance(timestamp, (int, float)) else now,
+        "updated_at": now,
+    }
+
+
+def get_chat_ids(conn):
+    return [row.id for row in conn.execute(select(chat_table.c.id))]
+
+
+def get_chat(conn, chat_id):
+    chat = conn.execute(
+        select(chat_table.c.chat).where(chat_table.c.id == chat_id)
+    ).scalar()
+    if isinstance(chat, str):
+        chat = json.loads(chat)
+    return chat
+
+
+def upgrade():
+    op.create_table(
+        "chat_message",
+        sa.Column("chat_id", sa.String(), nullable=False),
+        sa.Column("message_id", sa.String(), nullable=False),
+        sa.Column("parent_id", sa.String(), nullable=True),
+        sa.Column("role", sa.String(), nullable=True),
+        sa.Column("content", sa.Text(), nullable=True),
+        sa.Column("model", sa.Text(), nullable=True),
+        sa.Column("data", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.BigInteger(), nullable=True),
+        sa.Column("updated_at", sa.BigInteger(), nullable=True),
+        sa.PrimaryKeyConstraint("chat_id", "message_id", name="pk_chat_id_message_id"),
+    )
+
+    # Move each chat's `history.messages` into chat_message, one chat at a
+    # time so that large instances do not hold every chat in memory. Chats
+    # without a history tree keep their blob as is.
+    conn = op.get_bind()
+    now = int(time.time())
+    for chat_id in get_chat_ids(conn):
+        chat = get_chat(conn, chat_id)
+        history = chat.get("history") if isinstance(chat, dict) else None
+        if not isinstance(history, dict) or not isinstance(
+            history.get("messages"), dict
+        ):
+            continue
+
+        rows = [
+            get_message_row(chat_id, message_id, message, now)
+            for message_id, message in history["messages"].items()
+            if isinstance(message, dict)
+        ]
+        if rows:
+            conn.execute(chat_message_table.insert(), rows)
+
+        chat = {k: v for k, v in chat.items() if k != "messages"}
+        chat["history"] = {k: v for k, v in history.items() if k != "messages"}
+        conn.execute(
+            sa.update(chat_table).where(chat_table.c.id == chat_id).values(chat=chat)
+        )
+
+
+def downgrade():
+    # Put the messages back into the chat blobs before dropping the table.
+    conn = op.get_bind()
+    for chat_id in get_chat_ids(conn):
+        chat = get_chat(conn, chat_id)
+        history = chat.get("history") if isinstance(chat, dict) else None
+        if not isinstance(history, dict) or "messages" in history:
+            continue
+
+        messages = {}
+        for row in conn.execute(
+            select(chat_message_table).where(chat_message_table.c.chat_id == chat_id)
+        ):
+            message = {"id": row.message_id, "parentId": row.parent_id}
+            if row.model is not None:
+                message["model"] = row.model
+            if row.role is not None:
+                message["role"] = row.role
+            if row.content is not None:
+                message["content"] = row.content
+            message["timestamp"] = row.created_at
+            data = row.data
+            if isinstance(data, str):
+                data = json.loads(data)
+            message.update(data or {})
+            messages[row.message_id] = message
+
+        message_list = []
+        message_id = history.get("currentId")
+        while message_id in messages and len(message_list) < len(messages):
+            message_list.append(messages[message_id])
+            message_id = messages[message_id].get("parentId")
+
+        chat = {
+            **chat,
+            "history": {**history, "messages": messages},
+            "messages": message_list[::-1],
+        }
+        conn.execute(
+            sa.update(chat_table).where(chat_table.c.id == chat_id).values(chat=chat)
+        )
+
+    op.drop_table("chat_message")
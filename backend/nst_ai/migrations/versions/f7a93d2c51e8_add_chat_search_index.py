@@ -0,0 +1,28 @@
+"""Add chat search index
+
+Revision ID: f7a93d2c51e8
+Revises: e4b1c6f0a2d3
+Create Date: 2025-07-21 03:00:00.000000
+
+"""
+
+from alembic import op
+
+from nst_ai.internal.chat_search import (
+    drop_chat_search_index,
+    rebuild_chat_search_index,
+)
+
+revision = "f7a93d2c51e8"
+down_revision = "e4b1c6f0a2d3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Creates the index and fills it from the existing chats and messages.
+    rebuild_chat_search_index(op.get_bind())
+
+
+def downgrade():
+    drop_chat_search_index(op.get_bind())
@@ -1,12 +1,13 @@
+import asyncio
 import logging
 import uuid
 from typing import Optional
 
-from nst_ai.internal.db import Base, get_db
+from nst_ai.internal.db import Base, get_db, run_with_db
 from nst_ai.models.users import UserModel, Users
 from nst_ai.env import SRC_LOG_LEVELS
 from pydantic import BaseModel
-from sqlalchemy import Boolean, Column, String, Text
+from sqlalchemy import Boolean, Column, Index, String, Text
 from nst_ai.utils.auth import verify_password
 
 log = logging.getLogger(__name__)
@@ -25,6 +26,8 @@ class Auth(Base):
     password = Column(Text)
     active = Column(Boolean)
 
+    __table_args__ = (Index("auth_email_idx", "email"),)
+
 
 class AuthModel(BaseModel):
     id: str
@@ -127,6 +130,10 @@ class AuthsTable:
             else:
                 return None
 
+    def _get_password_by_id(self, db, id: str) -> Optional[str]:
+        auth = db.query(Auth).filter_by(id=id, active=True).first()
+        return auth.password if auth else None
+
     def authenticate_user(self, email: str, password: str) -> Optional[UserModel]:
         log.info(f"authenticate_user: {email}")
 
@@ -136,17 +143,33 @@ class AuthsTable:
 
         try:
             with get_db() as db:
-                auth = db.query(Auth).filter_by(id=user.id, active=True).first()
-                if auth:
-                    if verify_password(password, auth.password):
-                        return user
-                    else:
-                        return None
+                hashed = self._get_password_by_id(db, user.id)
+                if hashed and verify_password(password, hashed):
+                    return user
                 else:
                     return None
         except Exception:
             return None
 
+    async def authenticate_user_async(
+        self, email: str, password: str
+    ) -> Optional[UserModel]:
+        log.info(f"authenticate_user: {email}")
+
+        user = await Users.get_user_by_email_async(email)
+        if not user:
+            return None
+
+        try:
+            hashed = await run_with_db(self._get_password_by_id, user.id)
+            # bcrypt is deliberately slow, keep it off the event loop too
+            if hashed and await asyncio.to_thread(verify_password, password, hashed):
+                return user
+            else:
+                return None
+        except Exception:
+            return None
+
     def authenticate_user_by_api_key(self, api_key: str) -> Optional[UserModel]:
         log.info(f"authenticate_user_by_api_key: {api_key}")
         # if no api_key, return None
@@ -159,17 +182,30 @@ class AuthsTable:
         except Exception:
             return False
 
+    def _get_active_id_by_email(self, db, email: str) -> Optional[str]:
+        auth = db.query(Auth).filter_by(email=email, active=True).first()
+        return auth.id if auth else None
+
     def authenticate_user_by_email(self, email: str) -> Optional[UserModel]:
         log.info(f"authenticate_user_by_email: {email}")
         try:
             with get_db() as db:
-                auth = db.query(Auth).filter_by(email=email, active=True).first()
-                if auth:
-                    user = Users.get_user_by_id(auth.id)
+                id = self._get_active_id_by_email(db, email)
+                if id:
+                    user = Users.get_user_by_id(id)
                     return user
         except Exception:
             return None
 
+    async def authenticate_user_by_email_async(self, email: str) -> Optional[UserModel]:
+        log.info(f"authenticate_user_by_email: {email}")
+        try:
+            id = await run_with_db(self._get_active_id_by_email, email)
+            if id:
+                return await Users.get_user_by_id_async(id)
+        except Exception:
+            return None
+
     def update_user_password_by_id(self, id: str, new_password: str) -> bool:
         try:
             with get_db() as db:
@@ -4,7 +4,11 @@ import uuid
 from typing import Optional
 
 from nst_ai.internal.db import Base, get_db
-from nst_ai.utils.access_control import has_access
+from nst_ai.models.groups import Groups
+from nst_ai.utils.access_control import (
+    filter_accessible,
+    get_access_control_filter,
+)
 
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy import BigInteger, Boolean, Column, String, Text, JSON
@@ -96,13 +100,22 @@ class ChannelTable:
     def get_channels_by_user_id(
         self, user_id: str, permission: str = "read"
     ) -> list[ChannelModel]:
-        channels = self.get_channels()
-        return [
-            channel
-            for channel in channels
-            if channel.user_id == user_id
-            or has_access(user_id, permission, channel.access_control)
-        ]
+        user_group_ids = Groups.get_group_ids_by_member_id(user_id)
+        with get_db() as db:
+            query = db.query(Channel)
+            access_filter = get_access_control_filter(
+                Channel, user_id, user_group_ids, permission
+            )
+            if access_filter is not None:
+                query = query.filter(access_filter)
+            channels = query.all()
+
+            return filter_accessible(
+                user_id,
+                [ChannelModel.model_validate(channel) for channel in channels],
+                permission,
+                set(user_group_ids),
+            )
 
     def get_channel_by_id(self, id: str) -> Optional[ChannelModel]:
         with get_db() as db:
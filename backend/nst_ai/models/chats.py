@@ -4,13 +4,28 @@ import time
 import uuid
 from typing import Optional
 
-from nst_ai.internal.db import Base, get_db
+from nst_ai.internal.chat_search import (
+    get_chat_search_subquery,
+    get_search_terms,
+    has_chat_search_index,
+)
+from nst_ai.internal.db import Base, get_db, get_read_db, run_with_db
 from nst_ai.models.tags import TagModel, Tag, Tags
 from nst_ai.env import SRC_LOG_LEVELS
 
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import BigInteger, Boolean, Column, String, Text, JSON
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    Index,
+    String,
+    Text,
+    JSON,
+    PrimaryKeyConstraint,
+)
 from sqlalchemy import or_, func, select, and_, text
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.sql import exists
 from sqlalchemy.sql.expression import bindparam
 
@@ -40,6 +55,43 @@ class Chat(Base):
     meta = Column(JSON, server_default="{}")
     folder_id = Column(Text, nullable=True)
 
+    __table_args__ = (
+        Index(
+            "chat_user_id_archived_updated_at_idx", "user_id", "archived", "updated_at"
+        ),
+        Index("chat_user_id_pinned_idx", "user_id", "pinned"),
+        Index("chat_user_id_folder_id_idx", "user_id", "folder_id"),
+        Index("chat_updated_at_idx", "updated_at"),
+    )
+
+
+class ChatMessage(Base):
+    """
+    One message of a chat's `history.messages` tree. Once a chat's messages
+    are stored here, its `chat` blob keeps everything but the messages and
+    `ChatTable` puts them back together when a chat is read.
+    """
+
+    __tablename__ = "chat_message"
+
+    chat_id = Column(String)
+    message_id = Column(String)
+    parent_id = Column(String, nullable=True)
+
+    role = Column(String, nullable=True)
+    content = Column(Text, nullable=True)
+    model = Column(Text, nullable=True)
+
+    # The rest of the message (childrenIds, files, sources, statusHistory, ...)
+    data = Column(JSON, nullable=True)
+
+    created_at = Column(BigInteger)
+    updated_at = Column(BigInteger)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("chat_id", "message_id", name="pk_chat_id_message_id"),
+    )
+
 
 class ChatModel(BaseModel):
     model_config = ConfigDict(from_attributes=True)
@@ -107,7 +159,200 @@ class ChatTitleIdResponse(BaseModel):
     created_at: int
 
 
+####################
+# Chat messages
+####################
+
+MESSAGE_COLUMN_FIELDS = {"id", "parentId", "role", "content", "model", "timestamp"}
+
+
+def get_message_values(message: dict) -> dict:
+    """Column values of the chat_message row holding `message`."""
+    content = message.get("content")
+    timestamp = message.get("timestamp")
+
+    data = {k: v for k, v in message.items() if k not in MESSAGE_COLUMN_FIELDS}
+    if content is not None and not isinstance(content, str):
+        data["content"] = content
+
+    return {
+        "parent_id": message.get("parentId"),
+        "role": message.get("role"),
+        "content": content.replace("\x00", "") if isinstance(content, str) else None,
+        "model": message.get("model"),
+        "data": data,
+        "created_at": (
+            int(timestamp) if isinstance(timestamp, (int, float)) else int(time.time())
+        ),
+    }
+
+
+def get_message_from_row(row: ChatMessage) -> dict:
+    message = {"id": row.message_id, "parentId": row.parent_id}
+    if row.model is not None:
+        message["model"] = row.model
+    if row.role is not None:
+        message["role"] = row.role
+    if row.content is not None:
+        message["content"] = row.content
+    message["timestamp"] = row.created_at
+    message.update(row.data or {})
+    return message
+
+
+def get_message_list(messages: dict, message_id: Optional[str]) -> list[dict]:
+    """The thread ending at `message_id`, i.e. the legacy `messages` list."""
+    message_list = []
+    seen = set()
+    while message_id and message_id in messages and message_id not in seen:
+        seen.add(message_id)
+        message_list.append(messages[message_id])
+        message_id = messages[message_id].get("parentId")
+    return message_list[::-1]
+
+
+def split_chat_messages(chat: dict) -> tuple[dict, Optional[dict]]:
+    """
+    Split a chat into the blob that is stored in `chat.chat` and the
+    messages ({message_id: message}) that are stored as chat_message rows.
+
+    Chats without a `history.messages` tree are stored unchanged and None is
+    returned for the messages.
+    """
+    history = chat.get("history")
+    if not isinstance(history, dict) or not isinstance(history.get("messages"), dict):
+        return chat, None
+
+    # The `messages` list is the current thread, rebuilt on read.
+    chat = {k: v for k, v in chat.items() if k != "messages"}
+    chat["history"] = {k: v for k, v in history.items() if k != "messages"}
+    return chat, history["messages"]
+
+
+def is_split_chat(chat: Optional[dict]) -> bool:
+    history = (chat or {}).get("history")
+    return isinstance(history, dict) and "messages" not in history
+
+
+def merge_chat_messages(chat: dict, messages: dict) -> dict:
+    history = {**chat.get("history", {}), "messages": messages}
+    chat = {**chat, "history": history}
+    if "messages" not in chat:
+        chat["messages"] = get_message_list(messages, history.get("currentId"))
+    return chat
+
+
 class ChatTable:
+    def _get_chat_messages(self, db, chat_ids: list[str]) -> dict[str, dict]:
+        messages = {chat_id: {} for chat_id in chat_ids}
+        for i in range(0, len(chat_ids), 500):
+            rows = db.query(ChatMessage).filter(
+                ChatMessage.chat_id.in_(chat_ids[i : i + 500])
+            )
+            for row in rows:
+                messages[row.chat_id][row.message_id] = get_message_from_row(row)
+        return messages
+
+    def _to_chat_models(self, db, chats: list[Chat]) -> list[ChatModel]:
+        """Validate chats, putting their stored messages back into the blob."""
+        chats = list(chats)
+        messages = self._get_chat_messages(
+            db, [chat.id for chat in chats if is_split_chat(chat.chat)]
+        )
+
+        models = []
+        for chat in chats:
+            model = ChatModel.model_validate(chat)
+            if chat.id in messages:
+                model.chat = merge_chat_messages(model.chat, messages[chat.id])
+            models.append(model)
+        return models
+
+    def _to_chat_model(self, db, chat: Chat) -> ChatModel:
+        if chat is None:
+            raise ValueError("Chat not found")
+        return self._to_chat_models(db, [chat])[0]
+
+    def _write_messages(
+        self,
+        db,
+        chat_id: str,
+        messages: dict,
+        rows: Optional[dict[str, ChatMessage]] = None,
+        prune: bool = True,
+    ):
+        """
+        Store `messages` as rows of `chat_id`, only touching rows whose
+        message changed. `rows` are the existing rows to compare against
+        (all rows of the chat if not given); with `prune`, rows of messages
+        that are no longer in `messages` are deleted.
+        """
+        if rows is None:
+            rows = {
+                row.message_id: row
+                for row in db.query(ChatMessage).filter_by(chat_id=chat_id)
+            }
+
+        now = int(time.time())
+        for message_id, message in messages.items():
+            if not isinstance(message, dict):
+                continue
+
+            values = get_message_values(message)
+            row = rows.pop(message_id, None)
+            if row is None:
+                db.add(
+                    ChatMessage(
+                        chat_id=chat_id,
+                        message_id=message_id,
+                        **values,
+                        updated_at=now,
+                    )
+                )
+            elif any(getattr(row, key) != value for key, value in values.items()):
+                for key, value in values.items():
+                    setattr(row, key, value)
+                row.updated_at = now
+
+        if prune:
+            for row in rows.values():
+                db.delete(row)
+
+    def _set_chat(self, db, chat_item: Chat, chat: dict):
+        """Store `chat` (a full, legacy shaped chat) on `chat_item`."""
+        chat, messages = split_chat_messages(chat)
+        if messages is not None:
+            self._write_messages(db, chat_item.id, messages)
+        else:
+            db.query(ChatMessage).filter_by(chat_id=chat_item.id).delete()
+        chat_item.chat = chat
+
+    def _split_chat(self, db, chat_item: Chat):
+        """Move the messages of a chat that still has them in its blob."""
+        chat, messages = split_chat_messages(chat_item.chat or {})
+        if messages is not None:
+            self._write_messages(db, chat_item.id, messages, rows={}, prune=False)
+            chat_item.chat = chat
+
+    def _retry_on_conflict(self, db, fn, *args):
+        """
+        Run `fn(db, *args)`, and once more should it lose a race to insert the
+        same chat_message row (two first writes of a message, or two splits
+        of a legacy chat): rolled back, the row exists and is updated instead.
+        """
+        try:
+            return fn(db, *args)
+        except IntegrityError:
+            db.rollback()
+            return fn(db, *args)
+
+    def _delete_chats(self, db, *criteria):
+        chat_ids = select(Chat.id).where(*criteria)
+        db.query(ChatMessage).filter(ChatMessage.chat_id.in_(chat_ids)).delete(
+            synchronize_session=False
+        )
+        db.query(Chat).filter(*criteria).delete(synchronize_session=False)
+
     def insert_new_chat(self, user_id: str, form_data: ChatForm) -> Optional[ChatModel]:
         with get_db() as db:
             id = str(uuid.uuid4())
@@ -128,10 +373,10 @@ class ChatTable:
             )
 
             result = Chat(**chat.model_dump())
+            self._set_chat(db, result, form_data.chat)
             db.add(result)
             db.commit()
-            db.refresh(result)
-            return ChatModel.model_validate(result) if result else None
+            return chat if result else None
 
     def import_chat(
         self, user_id: str, form_data: ChatImportForm
@@ -165,25 +410,34 @@ class ChatTable:
             )
 
             result = Chat(**chat.model_dump())
+            self._set_chat(db, result, form_data.chat)
             db.add(result)
             db.commit()
-            db.refresh(result)
-            return ChatModel.model_validate(result) if result else None
+            return chat if result else None
 
-    def update_chat_by_id(self, id: str, chat: dict) -> Optional[ChatModel]:
+    def _write_chat_by_id(self, db, id: str, chat: dict) -> Chat:
+        chat_item = db.get(Chat, id)
+        self._set_chat(db, chat_item, chat)
+        chat_item.title = chat["title"] if "title" in chat else "New Chat"
+        chat_item.updated_at = int(time.time())
+        db.commit()
+        return chat_item
+
+    def _update_chat_by_id(self, db, id: str, chat: dict) -> Optional[ChatModel]:
         try:
-            with get_db() as db:
-                chat_item = db.get(Chat, id)
-                chat_item.chat = chat
-                chat_item.title = chat["title"] if "title" in chat else "New Chat"
-                chat_item.updated_at = int(time.time())
-                db.commit()
-                db.refresh(chat_item)
+            chat_item = self._retry_on_conflict(db, self._write_chat_by_id, id, chat)
+            db.refresh(chat_item)
 
-                return ChatModel.model_validate(chat_item)
+            chat_model = ChatModel.model_validate(chat_item)
+            chat_model.chat = chat
+            return chat_model
         except Exception:
             return None
 
+    def update_chat_by_id(self, id: str, chat: dict) -> Optional[ChatModel]:
+        with get_db() as db:
+            return self._update_chat_by_id(db, id, chat)
+
     def update_chat_title_by_id(self, id: str, title: str) -> Optional[ChatModel]:
         chat = self.get_chat_by_id(id)
         if chat is None:
@@ -194,6 +448,18 @@ class ChatTable:
 
         return self.update_chat_by_id(id, chat)
 
+    async def update_chat_title_by_id_async(
+        self, id: str, title: str
+    ) -> Optional[ChatModel]:
+        chat = await self.get_chat_by_id_async(id)
+        if chat is None:
+            return None
+
+        chat = chat.chat
+        chat["title"] = title
+
+        return await run_with_db(self._update_chat_by_id, id, chat)
+
     def update_chat_tags_by_id(
         self, id: str, tags: list[str], user
     ) -> Optional[ChatModel]:
@@ -221,66 +487,186 @@ class ChatTable:
 
         return chat.chat.get("title", "New Chat")
 
+    async def get_chat_title_by_id_async(self, id: str) -> Optional[str]:
+        chat = await self.get_chat_by_id_async(id)
+        if chat is None:
+            return None
+
+        return chat.chat.get("title", "New Chat")
+
+    def _get_messages_by_chat_id(self, db, id: str) -> Optional[dict]:
+        chat = db.get(Chat, id)
+        if chat is None:
+            return None
+
+        if not is_split_chat(chat.chat):
+            return chat.chat.get("history", {}).get("messages", {}) or {}
+
+        return self._get_chat_messages(db, [id])[id]
+
     def get_messages_by_chat_id(self, id: str) -> Optional[dict]:
-        chat = self.get_chat_by_id(id)
+        with get_db() as db:
+            return self._get_messages_by_chat_id(db, id)
+
+    async def get_messages_by_chat_id_async(self, id: str) -> Optional[dict]:
+        return await run_with_db(self._get_messages_by_chat_id, id)
+
+    def _get_message_by_id_and_message_id(
+        self, db, id: str, message_id: str
+    ) -> Optional[dict]:
+        chat = db.get(Chat, id)
         if chat is None:
             return None
 
-        return chat.chat.get("history", {}).get("messages", {}) or {}
+        if not is_split_chat(chat.chat):
+            return chat.chat.get("history", {}).get("messages", {}).get(message_id, {})
+
+        row = db.get(ChatMessage, (id, message_id))
+        return get_message_from_row(row) if row else {}
 
     def get_message_by_id_and_message_id(
         self, id: str, message_id: str
     ) -> Optional[dict]:
-        chat = self.get_chat_by_id(id)
-        if chat is None:
+        with get_db() as db:
+            return self._get_message_by_id_and_message_id(db, id, message_id)
+
+    async def get_message_by_id_and_message_id_async(
+        self, id: str, message_id: str
+    ) -> Optional[dict]:
+        return await run_with_db(self._get_message_by_id_and_message_id, id, message_id)
+
+    def _upsert_message_to_chat_by_id_and_message_id(
+        self, db, id: str, message_id: str, message: dict
+    ) -> Optional[dict]:
+        return self._retry_on_conflict(
+            db, self._write_message_by_id_and_message_id, id, message_id, message
+        )
+
+    def _write_message_by_id_and_message_id(
+        self, db, id: str, message_id: str, message: dict
+    ) -> Optional[dict]:
+        chat_item = db.get(Chat, id)
+        if chat_item is None:
             return None
 
-        return chat.chat.get("history", {}).get("messages", {}).get(message_id, {})
+        self._split_chat(db, chat_item)
+        db.flush()
+
+        row = db.get(ChatMessage, (id, message_id))
+        if row is not None:
+            message = {**get_message_from_row(row), **message}
+
+        self._write_messages(
+            db,
+            id,
+            {message_id: message},
+            rows={message_id: row} if row is not None else {},
+            prune=False,
+        )
+
+        # Only the (message-less) blob is rewritten for the currentId.
+        chat = chat_item.chat
+        chat_item.chat = {
+            **chat,
+            "history": {**chat.get("history", {}), "currentId": message_id},
+        }
+        chat_item.updated_at = int(time.time())
+        db.commit()
+
+        return message
 
     def upsert_message_to_chat_by_id_and_message_id(
         self, id: str, message_id: str, message: dict
-    ) -> Optional[ChatModel]:
-        chat = self.get_chat_by_id(id)
-        if chat is None:
+    ) -> Optional[dict]:
+        """
+        Merge `message` into the message of the chat, returns the message.
+        The rest of the chat is neither read nor returned.
+        """
+        # Sanitize message content for null characters before upserting
+        if isinstance(message.get("content"), str):
+            message["content"] = message["content"].replace("\x00", "")
+
+        try:
+            with get_db() as db:
+                return self._upsert_message_to_chat_by_id_and_message_id(
+                    db, id, message_id, message
+                )
+        except Exception as e:
+            log.exception(f"Error upserting message {message_id} of chat {id}: {e}")
             return None
 
+    async def upsert_message_to_chat_by_id_and_message_id_async(
+        self, id: str, message_id: str, message: dict
+    ) -> Optional[dict]:
         # Sanitize message content for null characters before upserting
         if isinstance(message.get("content"), str):
             message["content"] = message["content"].replace("\x00", "")
 
-        chat = chat.chat
-        history = chat.get("history", {})
+        try:
+            return await run_with_db(
+                self._upsert_message_to_chat_by_id_and_message_id,
+                id,
+                message_id,
+                message,
+            )
+        except Exception as e:
+            log.exception(f"Error upserting message {message_id} of chat {id}: {e}")
+            return None
 
-        if message_id in history.get("messages", {}):
-            history["messages"][message_id] = {
-                **history["messages"][message_id],
-                **message,
-            }
-        else:
-            history["messages"][message_id] = message
+    def _add_message_status_to_chat_by_id_and_message_id(
+        self, db, id: str, message_id: str, status: dict
+    ) -> Optional[dict]:
+        return self._retry_on_conflict(
+            db, self._write_message_status, id, message_id, status
+        )
+
+    def _write_message_status(
+        self, db, id: str, message_id: str, status: dict
+    ) -> Optional[dict]:
+        chat_item = db.get(Chat, id)
+        if chat_item is None:
+            return None
 
-        history["currentId"] = message_id
+        self._split_chat(db, chat_item)
+        db.flush()
 
-        chat["history"] = history
-        return self.update_chat_by_id(id, chat)
+        row = db.get(ChatMessage, (id, message_id))
+        if row is not None:
+            data = dict(row.data or {})
+            data["statusHistory"] = [*data.get("statusHistory", []), status]
+            row.data = data
+            row.updated_at = int(time.time())
+
+        chat_item.updated_at = int(time.time())
+        db.commit()
+
+        return get_message_from_row(row) if row is not None else None
 
     def add_message_status_to_chat_by_id_and_message_id(
         self, id: str, message_id: str, status: dict
-    ) -> Optional[ChatModel]:
-        chat = self.get_chat_by_id(id)
-        if chat is None:
+    ) -> Optional[dict]:
+        try:
+            with get_db() as db:
+                return self._add_message_status_to_chat_by_id_and_message_id(
+                    db, id, message_id, status
+                )
+        except Exception as e:
+            log.exception(f"Error adding status to message {message_id}: {e}")
             return None
 
-        chat = chat.chat
-        history = chat.get("history", {})
-
-        if message_id in history.get("messages", {}):
-            status_history = history["messages"][message_id].get("statusHistory", [])
-            status_history.append(status)
-            history["messages"][message_id]["statusHistory"] = status_history
-
-        chat["history"] = history
-        return self.update_chat_by_id(id, chat)
+    async def add_message_status_to_chat_by_id_and_message_id_async(
+        self, id: str, message_id: str, status: dict
+    ) -> Optional[dict]:
+        try:
+            return await run_with_db(
+                self._add_message_status_to_chat_by_id_and_message_id,
+                id,
+                message_id,
+                status,
+            )
+        except Exception as e:
+            log.exception(f"Error adding status to message {message_id}: {e}")
+            return None
 
     def insert_shared_chat_by_chat_id(self, chat_id: str) -> Optional[ChatModel]:
         with get_db() as db:
@@ -295,12 +681,13 @@ class ChatTable:
                     "id": str(uuid.uuid4()),
                     "user_id": f"shared-{chat_id}",
                     "title": chat.title,
-                    "chat": chat.chat,
+                    "chat": self._to_chat_model(db, chat).chat,
                     "created_at": chat.created_at,
                     "updated_at": int(time.time()),
                 }
             )
             shared_result = Chat(**shared_chat.model_dump())
+            self._set_chat(db, shared_result, shared_chat.chat)
             db.add(shared_result)
             db.commit()
             db.refresh(shared_result)
@@ -326,20 +713,20 @@ class ChatTable:
                     return self.insert_shared_chat_by_chat_id(chat_id)
 
                 shared_chat.title = chat.title
-                shared_chat.chat = chat.chat
+                self._set_chat(db, shared_chat, self._to_chat_model(db, chat).chat)
 
                 shared_chat.updated_at = int(time.time())
                 db.commit()
                 db.refresh(shared_chat)
 
-                return ChatModel.model_validate(shared_chat)
+                return self._to_chat_model(db, shared_chat)
         except Exception:
             return None
 
     def delete_shared_chat_by_chat_id(self, chat_id: str) -> bool:
         try:
             with get_db() as db:
-                db.query(Chat).filter_by(user_id=f"shared-{chat_id}").delete()
+                self._delete_chats(db, Chat.user_id == f"shared-{chat_id}")
                 db.commit()
 
                 return True
@@ -355,7 +742,7 @@ class ChatTable:
                 chat.share_id = share_id
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._to_chat_model(db, chat)
         except Exception:
             return None
 
@@ -367,7 +754,7 @@ class ChatTable:
                 chat.updated_at = int(time.time())
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._to_chat_model(db, chat)
         except Exception:
             return None
 
@@ -379,7 +766,7 @@ class ChatTable:
                 chat.updated_at = int(time.time())
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._to_chat_model(db, chat)
         except Exception:
             return None
 
@@ -400,7 +787,7 @@ class ChatTable:
         limit: int = 50,
     ) -> list[ChatModel]:
 
-        with get_db() as db:
+        with get_read_db(user_id) as db:
             query = db.query(Chat).filter_by(user_id=user_id, archived=True)
 
             if filter:
@@ -427,7 +814,7 @@ class ChatTable:
                 query = query.limit(limit)
 
             all_chats = query.all()
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def get_chat_list_by_user_id(
         self,
@@ -437,7 +824,7 @@ class ChatTable:
         skip: int = 0,
         limit: int = 50,
     ) -> list[ChatModel]:
-        with get_db() as db:
+        with get_read_db(user_id) as db:
             query = db.query(Chat).filter_by(user_id=user_id)
             if not include_archived:
                 query = query.filter_by(archived=False)
@@ -466,7 +853,7 @@ class ChatTable:
                 query = query.limit(limit)
 
             all_chats = query.all()
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def get_chat_title_id_list_by_user_id(
         self,
@@ -475,7 +862,7 @@ class ChatTable:
         skip: Optional[int] = None,
         limit: Optional[int] = None,
     ) -> list[ChatTitleIdResponse]:
-        with get_db() as db:
+        with get_read_db(user_id) as db:
             query = db.query(Chat).filter_by(user_id=user_id).filter_by(folder_id=None)
             query = query.filter(or_(Chat.pinned == False, Chat.pinned == None))
 
@@ -517,13 +904,21 @@ class ChatTable:
                 .order_by(Chat.updated_at.desc())
                 .all()
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
+
+    def _get_chat_by_id(self, db, id: str) -> ChatModel:
+        return self._to_chat_model(db, db.get(Chat, id))
 
     def get_chat_by_id(self, id: str) -> Optional[ChatModel]:
         try:
             with get_db() as db:
-                chat = db.get(Chat, id)
-                return ChatModel.model_validate(chat)
+                return self._get_chat_by_id(db, id)
+        except Exception:
+            return None
+
+    async def get_chat_by_id_async(self, id: str) -> Optional[ChatModel]:
+        try:
+            return await run_with_db(self._get_chat_by_id, id)
         except Exception:
             return None
 
@@ -541,11 +936,22 @@ class ChatTable:
         except Exception:
             return None
 
+    def _get_chat_by_id_and_user_id(self, db, id: str, user_id: str) -> ChatModel:
+        chat = db.query(Chat).filter_by(id=id, user_id=user_id).first()
+        return self._to_chat_model(db, chat)
+
     def get_chat_by_id_and_user_id(self, id: str, user_id: str) -> Optional[ChatModel]:
         try:
             with get_db() as db:
-                chat = db.query(Chat).filter_by(id=id, user_id=user_id).first()
-                return ChatModel.model_validate(chat)
+                return self._get_chat_by_id_and_user_id(db, id, user_id)
+        except Exception:
+            return None
+
+    async def get_chat_by_id_and_user_id_async(
+        self, id: str, user_id: str
+    ) -> Optional[ChatModel]:
+        try:
+            return await run_with_db(self._get_chat_by_id_and_user_id, id, user_id)
         except Exception:
             return None
 
@@ -556,7 +962,7 @@ class ChatTable:
                 # .limit(limit).offset(skip)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def get_chats_by_user_id(self, user_id: str) -> list[ChatModel]:
         with get_db() as db:
@@ -565,7 +971,7 @@ class ChatTable:
                 .filter_by(user_id=user_id)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def get_pinned_chats_by_user_id(self, user_id: str) -> list[ChatModel]:
         with get_db() as db:
@@ -574,7 +980,7 @@ class ChatTable:
                 .filter_by(user_id=user_id, pinned=True, archived=False)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def get_archived_chats_by_user_id(self, user_id: str) -> list[ChatModel]:
         with get_db() as db:
@@ -583,7 +989,7 @@ class ChatTable:
                 .filter_by(user_id=user_id, archived=True)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def get_chats_by_user_id_and_search_text(
         self,
@@ -594,7 +1000,10 @@ class ChatTable:
         limit: int = 60,
     ) -> list[ChatModel]:
         """
-        Filters chats based on a search query using Python, allowing pagination using skip and limit.
+        Filters chats based on a search query, allowing pagination using skip and limit.
+
+        Uses the full-text index (see `nst_ai.internal.chat_search`) when it
+        is available, ranking chats by relevance, and LIKE matching otherwise.
         """
         search_text = search_text.replace("\u0000", "").lower().strip()
 
@@ -618,16 +1027,32 @@ class ChatTable:
 
         search_text = " ".join(search_text_words)
 
-        with get_db() as db:
+        with get_read_db(user_id) as db:
             query = db.query(Chat).filter(Chat.user_id == user_id)
 
             if not include_archived:
                 query = query.filter(Chat.archived == False)
 
-            query = query.order_by(Chat.updated_at.desc())
-
             # Check if the database dialect is either 'sqlite' or 'postgresql'
             dialect_name = db.bind.dialect.name
+
+            search = None
+            terms = get_search_terms(search_text)
+            if (
+                terms
+                and dialect_name in ("sqlite", "postgresql")
+                and has_chat_search_index(db)
+            ):
+                search = get_chat_search_subquery(dialect_name, user_id, terms)
+                query = query.join(search, search.c.chat_id == Chat.id)
+
+            # Chats whose messages are stored in chat_message; the JSON
+            # clauses below cover chats that still have them in the blob.
+            message_content_clause = exists().where(
+                ChatMessage.chat_id == Chat.id,
+                func.lower(ChatMessage.content).like(f"%{search_text}%"),
+            )
+
             if dialect_name == "sqlite":
                 # SQLite case: using JSON1 extension for JSON searching
                 sqlite_content_sql = (
@@ -638,11 +1063,14 @@ class ChatTable:
                     ")"
                 )
                 sqlite_content_clause = text(sqlite_content_sql)
-                query = query.filter(
-                    or_(
-                        Chat.title.ilike(bindparam("title_key")), sqlite_content_clause
-                    ).params(title_key=f"%{search_text}%", content_key=search_text)
-                )
+                if search is None:
+                    query = query.filter(
+                        or_(
+                            Chat.title.ilike(bindparam("title_key")),
+                            sqlite_content_clause,
+                            message_content_clause,
+                        ).params(title_key=f"%{search_text}%", content_key=search_text)
+                    )
 
                 # Check if there are any tags to filter, it should have all the tags
                 if "none" in tag_ids:
@@ -684,12 +1112,14 @@ class ChatTable:
                     ")"
                 )
                 postgres_content_clause = text(postgres_content_sql)
-                query = query.filter(
-                    or_(
-                        Chat.title.ilike(bindparam("title_key")),
-                        postgres_content_clause,
-                    ).params(title_key=f"%{search_text}%", content_key=search_text)
-                )
+                if search is None:
+                    query = query.filter(
+                        or_(
+                            Chat.title.ilike(bindparam("title_key")),
+                            postgres_content_clause,
+                            message_content_clause,
+                        ).params(title_key=f"%{search_text}%", content_key=search_text)
+                    )
 
                 # Check if there are any tags to filter, it should have all the tags
                 if "none" in tag_ids:
@@ -725,13 +1155,18 @@ class ChatTable:
                     f"Unsupported dialect: {db.bind.dialect.name}"
                 )
 
+            if search is not None:
+                query = query.order_by(search.c.rank, Chat.updated_at.desc())
+            else:
+                query = query.order_by(Chat.updated_at.desc())
+
             # Perform pagination at the SQL level
             all_chats = query.offset(skip).limit(limit).all()
 
             log.info(f"The number of chats: {len(all_chats)}")
 
             # Validate and return chats
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def get_chats_by_folder_id_and_user_id(
         self, folder_id: str, user_id: str
@@ -744,7 +1179,7 @@ class ChatTable:
             query = query.order_by(Chat.updated_at.desc())
 
             all_chats = query.all()
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def get_chats_by_folder_ids_and_user_id(
         self, folder_ids: list[str], user_id: str
@@ -759,7 +1194,7 @@ class ChatTable:
             query = query.order_by(Chat.updated_at.desc())
 
             all_chats = query.all()
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def update_chat_folder_id_by_id_and_user_id(
         self, id: str, user_id: str, folder_id: str
@@ -772,7 +1207,7 @@ class ChatTable:
                 chat.pinned = False
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._to_chat_model(db, chat)
         except Exception:
             return None
 
@@ -811,7 +1246,7 @@ class ChatTable:
 
             all_chats = query.all()
             log.debug(f"all_chats: {all_chats}")
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def add_chat_tag_by_id_and_user_id_and_tag_name(
         self, id: str, user_id: str, tag_name: str
@@ -832,7 +1267,7 @@ class ChatTable:
 
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._to_chat_model(db, chat)
         except Exception:
             return None
 
@@ -908,7 +1343,7 @@ class ChatTable:
     def delete_chat_by_id(self, id: str) -> bool:
         try:
             with get_db() as db:
-                db.query(Chat).filter_by(id=id).delete()
+                self._delete_chats(db, Chat.id == id)
                 db.commit()
 
                 return True and self.delete_shared_chat_by_chat_id(id)
@@ -918,7 +1353,7 @@ class ChatTable:
     def delete_chat_by_id_and_user_id(self, id: str, user_id: str) -> bool:
         try:
             with get_db() as db:
-                db.query(Chat).filter_by(id=id, user_id=user_id).delete()
+                self._delete_chats(db, Chat.id == id, Chat.user_id == user_id)
                 db.commit()
 
                 return True and self.delete_shared_chat_by_chat_id(id)
@@ -930,7 +1365,7 @@ class ChatTable:
             with get_db() as db:
                 self.delete_shared_chats_by_user_id(user_id)
 
-                db.query(Chat).filter_by(user_id=user_id).delete()
+                self._delete_chats(db, Chat.user_id == user_id)
                 db.commit()
 
                 return True
@@ -942,7 +1377,9 @@ class ChatTable:
     ) -> bool:
         try:
             with get_db() as db:
-                db.query(Chat).filter_by(user_id=user_id, folder_id=folder_id).delete()
+                self._delete_chats(
+                    db, Chat.user_id == user_id, Chat.folder_id == folder_id
+                )
                 db.commit()
 
                 return True
@@ -955,7 +1392,7 @@ class ChatTable:
                 chats_by_user = db.query(Chat).filter_by(user_id=user_id).all()
                 shared_chat_ids = [f"shared-{chat.id}" for chat in chats_by_user]
 
-                db.query(Chat).filter(Chat.user_id.in_(shared_chat_ids)).delete()
+                self._delete_chats(db, Chat.user_id.in_(shared_chat_ids))
                 db.commit()
 
                 return True
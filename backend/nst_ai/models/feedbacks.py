@@ -3,12 +3,12 @@ import time
 import uuid
 from typing import Optional
 
-from nst_ai.internal.db import Base, get_db
+from nst_ai.internal.db import Base, get_db, get_read_db
 from nst_ai.models.chats import Chats
 
 from nst_ai.env import SRC_LOG_LEVELS
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import BigInteger, Column, Text, JSON, Boolean
+from sqlalchemy import BigInteger, Column, Index, Text, JSON, Boolean
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["MODELS"])
@@ -31,6 +31,11 @@ class Feedback(Base):
     created_at = Column(BigInteger)
     updated_at = Column(BigInteger)
 
+    __table_args__ = (
+        Index("feedback_user_id_updated_at_idx", "user_id", "updated_at"),
+        Index("feedback_type_updated_at_idx", "type", "updated_at"),
+    )
+
 
 class FeedbackModel(BaseModel):
     id: str
@@ -144,7 +149,7 @@ class FeedbackTable:
             return None
 
     def get_all_feedbacks(self) -> list[FeedbackModel]:
-        with get_db() as db:
+        with get_read_db("feedback") as db:
             return [
                 FeedbackModel.model_validate(feedback)
                 for feedback in db.query(Feedback)
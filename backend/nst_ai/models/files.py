@@ -5,7 +5,7 @@ from typing import Optional
 from nst_ai.internal.db import Base, JSONField, get_db
 from nst_ai.env import SRC_LOG_LEVELS
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import BigInteger, Column, String, Text, JSON
+from sqlalchemy import BigInteger, Column, Index, String, Text, JSON
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["MODELS"])
@@ -32,6 +32,8 @@ class File(Base):
     created_at = Column(BigInteger)
     updated_at = Column(BigInteger)
 
+    __table_args__ = (Index("file_user_id_idx", "user_id"),)
+
 
 class FileModel(BaseModel):
     model_config = ConfigDict(from_attributes=True)
@@ -3,6 +3,7 @@ import time
 from typing import Optional
 
 from nst_ai.internal.db import Base, JSONField, get_db
+from nst_ai.models.models import MODEL_LIST_CACHE
 from nst_ai.models.users import Users
 from nst_ai.env import SRC_LOG_LEVELS
 from pydantic import BaseModel, ConfigDict
@@ -99,6 +100,7 @@ class FunctionsTable:
                 result = Function(**function.model_dump())
                 db.add(result)
                 db.commit()
+                MODEL_LIST_CACHE.invalidate()
                 db.refresh(result)
                 if result:
                     return FunctionModel.model_validate(result)
@@ -147,6 +149,7 @@ class FunctionsTable:
                         db.delete(func)
 
                 db.commit()
+                MODEL_LIST_CACHE.invalidate()
 
                 return [
                     FunctionModel.model_validate(func)
@@ -230,6 +233,7 @@ class FunctionsTable:
                 function.valves = valves
                 function.updated_at = int(time.time())
                 db.commit()
+                MODEL_LIST_CACHE.invalidate()
                 db.refresh(function)
                 return self.get_function_by_id(id)
             except Exception:
@@ -290,6 +294,7 @@ class FunctionsTable:
                     }
                 )
                 db.commit()
+                MODEL_LIST_CACHE.invalidate()
                 return self.get_function_by_id(id)
             except Exception:
                 return None
@@ -304,6 +309,7 @@ class FunctionsTable:
                     }
                 )
                 db.commit()
+                MODEL_LIST_CACHE.invalidate()
                 return True
             except Exception:
                 return None
@@ -313,6 +319,7 @@ class FunctionsTable:
             try:
                 db.query(Function).filter_by(id=id).delete()
                 db.commit()
+                MODEL_LIST_CACHE.invalidate()
 
                 return True
             except Exception:
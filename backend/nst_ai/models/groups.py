@@ -1,17 +1,27 @@
 import json
 import logging
 import time
+from contextlib import contextmanager
+from contextvars import ContextVar
 from typing import Optional
 import uuid
 
 from nst_ai.internal.db import Base, get_db
-from nst_ai.env import SRC_LOG_LEVELS
+from nst_ai.env import GROUP_MEMBERSHIP_CACHE_TTL, SRC_LOG_LEVELS
 
 from nst_ai.models.files import FileMetadataResponse
+from nst_ai.utils.ttl_cache import TTLCache
 
 
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import BigInteger, Column, String, Text, JSON, func
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Index,
+    PrimaryKeyConstraint,
+    Text,
+    JSON,
+)
 
 
 log = logging.getLogger(__name__)
@@ -41,6 +51,24 @@ class Group(Base):
     updated_at = Column(BigInteger)
 
 
+class GroupMember(Base):
+    """
+    Indexed copy of `Group.user_ids`, kept in sync by `GroupTable`, so that a
+    user's groups can be looked up without scanning every group.
+    """
+
+    __tablename__ = "group_member"
+
+    group_id = Column(Text)
+    user_id = Column(Text)
+    created_at = Column(BigInteger)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("group_id", "user_id", name="pk_group_id_user_id"),
+        Index("group_member_user_id_idx", "user_id"),
+    )
+
+
 class GroupModel(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     id: str
@@ -91,7 +119,99 @@ class GroupUpdateForm(GroupForm, UserIdsForm):
     pass
 
 
+####################
+# Group id cache
+####################
+
+
+class GroupIdCache:
+    """
+    A user's group ids, cached for the rest of the request (inside
+    `request_scope`) and for `ttl` seconds per process. Membership changes
+    made through `GroupTable` invalidate the affected users right away.
+
+    `version` is bumped on every group write (membership or permissions) so
+    caches derived from groups can tell when they are out of date.
+    """
+
+    def __init__(self, ttl: float = GROUP_MEMBERSHIP_CACHE_TTL):
+        self.version = 0
+        self.entries = TTLCache(ttl)
+        self._request: ContextVar[Optional[dict[str, list[str]]]] = ContextVar(
+            "request_group_ids", default=None
+        )
+
+    @contextmanager
+    def request_scope(self):
+        token = self._request.set({})
+        try:
+            yield
+        finally:
+            self._request.reset(token)
+
+    def get(self, user_id: str) -> Optional[list[str]]:
+        request = self._request.get()
+        if request is not None and user_id in request:
+            return list(request[user_id])
+
+        group_ids = self.entries.get(user_id)
+        if group_ids is not None:
+            if request is not None:
+                request[user_id] = group_ids
+            return list(group_ids)
+        return None
+
+    def set(self, user_id: str, group_ids: list[str]):
+        group_ids = list(group_ids)
+
+        request = self._request.get()
+        if request is not None:
+            request[user_id] = group_ids
+
+        self.entries.set(user_id, group_ids)
+
+    def invalidate(self, user_ids: Optional[list[str]] = None):
+        """Forget `user_ids` (everyone if None)."""
+        self.version += 1
+        request = self._request.get()
+        if user_ids is None:
+            self.entries.clear()
+            if request is not None:
+                request.clear()
+            return
+
+        for user_id in user_ids:
+            self.entries.pop(user_id)
+            if request is not None:
+                request.pop(user_id, None)
+
+
+GROUP_ID_CACHE = GroupIdCache()
+
+
 class GroupTable:
+    def _set_members(self, db, group_id: str, user_ids: list[str]) -> set[str]:
+        """
+        Make the group_member rows of `group_id` match `user_ids`; returns
+        the users whose membership changed.
+        """
+        rows = {
+            row.user_id: row
+            for row in db.query(GroupMember).filter_by(group_id=group_id).all()
+        }
+        user_ids = set(user_ids or [])
+
+        for user_id in user_ids - rows.keys():
+            db.add(
+                GroupMember(
+                    group_id=group_id, user_id=user_id, created_at=int(time.time())
+                )
+            )
+        for user_id in rows.keys() - user_ids:
+            db.delete(rows[user_id])
+
+        return user_ids ^ rows.keys()
+
     def insert_new_group(
         self, user_id: str, form_data: GroupForm
     ) -> Optional[GroupModel]:
@@ -109,8 +229,10 @@ class GroupTable:
             try:
                 result = Group(**group.model_dump())
                 db.add(result)
+                changed = self._set_members(db, group.id, group.user_ids)
                 db.commit()
                 db.refresh(result)
+                GROUP_ID_CACHE.invalidate(list(changed))
                 if result:
                     return GroupModel.model_validate(result)
                 else:
@@ -126,17 +248,29 @@ class GroupTable:
                 for group in db.query(Group).order_by(Group.updated_at.desc()).all()
             ]
 
+    def get_group_ids_by_member_id(self, user_id: str) -> list[str]:
+        group_ids = GROUP_ID_CACHE.get(user_id)
+        if group_ids is None:
+            with get_db() as db:
+                group_ids = [
+                    group_id
+                    for (group_id,) in db.query(GroupMember.group_id)
+                    .filter_by(user_id=user_id)
+                    .all()
+                ]
+            GROUP_ID_CACHE.set(user_id, group_ids)
+        return group_ids
+
     def get_groups_by_member_id(self, user_id: str) -> list[GroupModel]:
+        group_ids = self.get_group_ids_by_member_id(user_id)
+        if not group_ids:
+            return []
+
         with get_db() as db:
             return [
                 GroupModel.model_validate(group)
                 for group in db.query(Group)
-                .filter(
-                    func.json_array_length(Group.user_ids) > 0
-                )  # Ensure array exists
-                .filter(
-                    Group.user_ids.cast(String).like(f'%"{user_id}"%')
-                )  # String-based check
+                .filter(Group.id.in_(group_ids))
                 .order_by(Group.updated_at.desc())
                 .all()
             ]
@@ -167,7 +301,11 @@ class GroupTable:
                         "updated_at": int(time.time()),
                     }
                 )
+                changed = set()
+                if form_data.user_ids is not None:
+                    changed = self._set_members(db, id, form_data.user_ids)
                 db.commit()
+                GROUP_ID_CACHE.invalidate(list(changed))
                 return self.get_group_by_id(id=id)
         except Exception as e:
             log.exception(e)
@@ -176,8 +314,10 @@ class GroupTable:
     def delete_group_by_id(self, id: str) -> bool:
         try:
             with get_db() as db:
+                changed = self._set_members(db, id, [])
                 db.query(Group).filter_by(id=id).delete()
                 db.commit()
+                GROUP_ID_CACHE.invalidate(list(changed))
                 return True
         except Exception:
             return False
@@ -185,8 +325,10 @@ class GroupTable:
     def delete_all_groups(self) -> bool:
         with get_db() as db:
             try:
+                db.query(GroupMember).delete()
                 db.query(Group).delete()
                 db.commit()
+                GROUP_ID_CACHE.invalidate()
 
                 return True
             except Exception:
@@ -205,7 +347,10 @@ class GroupTable:
                             "updated_at": int(time.time()),
                         }
                     )
-                    db.commit()
+
+                db.query(GroupMember).filter_by(user_id=user_id).delete()
+                db.commit()
+                GROUP_ID_CACHE.invalidate([user_id])
 
                 return True
             except Exception:
@@ -261,6 +406,7 @@ class GroupTable:
                                 "updated_at": int(time.time()),
                             }
                         )
+                        self._set_members(db, group.id, group.user_ids)
 
                 # Add user to new groups
                 for group in groups:
@@ -272,8 +418,10 @@ class GroupTable:
                                 "updated_at": int(time.time()),
                             }
                         )
+                        self._set_members(db, group.id, group.user_ids)
 
                 db.commit()
+                GROUP_ID_CACHE.invalidate([user_id])
                 return True
             except Exception as e:
                 log.exception(e)
@@ -288,16 +436,19 @@ class GroupTable:
                 if not group:
                     return None
 
-                if not group.user_ids:
-                    group.user_ids = []
-
+                # Assign a new list, in-place changes to the JSON column are
+                # not picked up by the session.
+                group_user_ids = list(group.user_ids or [])
                 for user_id in user_ids:
-                    if user_id not in group.user_ids:
-                        group.user_ids.append(user_id)
+                    if user_id not in group_user_ids:
+                        group_user_ids.append(user_id)
 
+                group.user_ids = group_user_ids
                 group.updated_at = int(time.time())
+                changed = self._set_members(db, id, group.user_ids)
                 db.commit()
                 db.refresh(group)
+                GROUP_ID_CACHE.invalidate(list(changed))
                 return GroupModel.model_validate(group)
         except Exception as e:
             log.exception(e)
@@ -315,13 +466,14 @@ class GroupTable:
                 if not group.user_ids:
                     return GroupModel.model_validate(group)
 
-                for user_id in user_ids:
-                    if user_id in group.user_ids:
-                        group.user_ids.remove(user_id)
-
+                group.user_ids = [
+                    user_id for user_id in group.user_ids if user_id not in user_ids
+                ]
                 group.updated_at = int(time.time())
+                changed = self._set_members(db, id, group.user_ids)
                 db.commit()
                 db.refresh(group)
+                GROUP_ID_CACHE.invalidate(list(changed))
                 return GroupModel.model_validate(group)
         except Exception as e:
             log.exception(e)
@@ -4,17 +4,21 @@ import time
 from typing import Optional
 import uuid
 
-from nst_ai.internal.db import Base, get_db
+from nst_ai.internal.db import Base, get_db, get_read_db
 from nst_ai.env import SRC_LOG_LEVELS
 
 from nst_ai.models.files import FileMetadataResponse
+from nst_ai.models.groups import Groups
 from nst_ai.models.users import Users, UserResponse
 
 
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy import BigInteger, Column, String, Text, JSON
 
-from nst_ai.utils.access_control import has_access
+from nst_ai.utils.access_control import (
+    filter_accessible,
+    get_access_control_filter,
+)
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["MODELS"])
@@ -126,33 +130,52 @@ class KnowledgeTable:
             except Exception:
                 return None
 
+    def _to_user_models(self, knowledge_bases) -> list[KnowledgeUserModel]:
+        users = {
+            user.id: user
+            for user in Users.get_users_by_user_ids(
+                list({knowledge.user_id for knowledge in knowledge_bases})
+            )
+        }
+        return [
+            KnowledgeUserModel.model_validate(
+                {
+                    **KnowledgeModel.model_validate(knowledge).model_dump(),
+                    "user": (
+                        users[knowledge.user_id].model_dump()
+                        if knowledge.user_id in users
+                        else None
+                    ),
+                }
+            )
+            for knowledge in knowledge_bases
+        ]
+
     def get_knowledge_bases(self) -> list[KnowledgeUserModel]:
-        with get_db() as db:
-            knowledge_bases = []
-            for knowledge in (
+        with get_read_db("knowledge") as db:
+            return self._to_user_models(
                 db.query(Knowledge).order_by(Knowledge.updated_at.desc()).all()
-            ):
-                user = Users.get_user_by_id(knowledge.user_id)
-                knowledge_bases.append(
-                    KnowledgeUserModel.model_validate(
-                        {
-                            **KnowledgeModel.model_validate(knowledge).model_dump(),
-                            "user": user.model_dump() if user else None,
-                        }
-                    )
-                )
-            return knowledge_bases
+            )
 
     def get_knowledge_bases_by_user_id(
         self, user_id: str, permission: str = "write"
     ) -> list[KnowledgeUserModel]:
-        knowledge_bases = self.get_knowledge_bases()
-        return [
-            knowledge_base
-            for knowledge_base in knowledge_bases
-            if knowledge_base.user_id == user_id
-            or has_access(user_id, permission, knowledge_base.access_control)
-        ]
+        user_group_ids = Groups.get_group_ids_by_member_id(user_id)
+        with get_read_db("knowledge") as db:
+            query = db.query(Knowledge)
+            access_filter = get_access_control_filter(
+                Knowledge, user_id, user_group_ids, permission
+            )
+            if access_filter is not None:
+                query = query.filter(access_filter)
+            knowledge_bases = query.order_by(Knowledge.updated_at.desc()).all()
+
+            return filter_accessible(
+                user_id,
+                self._to_user_models(knowledge_bases),
+                permission,
+                set(user_group_ids),
+            )
 
     def get_knowledge_by_id(self, id: str) -> Optional[KnowledgeModel]:
         try:
@@ -1,10 +1,16 @@
+import asyncio
 import logging
 import time
-from typing import Optional
+from typing import Awaitable, Callable, Optional
 
 from nst_ai.internal.db import Base, JSONField, get_db
-from nst_ai.env import SRC_LOG_LEVELS
+from nst_ai.env import (
+    MODELS_LIST_CACHE_MAX_STALE,
+    MODELS_LIST_CACHE_TTL,
+    SRC_LOG_LEVELS,
+)
 
+from nst_ai.models.groups import Groups
 from nst_ai.models.users import Users, UserResponse
 
 
@@ -15,7 +21,11 @@ from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy import BigInteger, Column, Text, JSON, Boolean
 
 
-from nst_ai.utils.access_control import has_access
+from nst_ai.utils.access_control import (
+    filter_accessible,
+    get_access_control_filter,
+)
+from nst_ai.utils.ttl_cache import TTLCache
 
 
 log = logging.getLogger(__name__)
@@ -142,6 +152,103 @@ class ModelForm(BaseModel):
     is_active: bool = True
 
 
+class ModelListCache:
+    """
+    The merged model list (base models, custom models, functions and arena
+    models) shared by the requests of this process.
+
+    A list younger than `ttl` is served as is. An older one is still served
+    for up to `max_stale` seconds while a single rebuild runs in the
+    background; past that, callers wait for the rebuild. Writes to models
+    and functions, and connection changes, call `invalidate` so the next
+    request sees them.
+
+    Views derived from the list (e.g. a user's filtered `/api/models`) are
+    memoized per key until the list is replaced.
+    """
+
+    def __init__(
+        self,
+        ttl: float = MODELS_LIST_CACHE_TTL,
+        max_stale: float = MODELS_LIST_CACHE_MAX_STALE,
+    ):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.models: Optional[list[dict]] = None
+        self.updated_at = 0.0
+        self.version = 0
+        # Only valid for `models`, cleared whenever it is replaced
+        self.views = TTLCache(float("inf"))
+        self._rebuild: Optional[asyncio.Task] = None
+        self._rebuild_version = 0
+
+    async def get(
+        self, build: Callable[[], Awaitable[list[dict]]], refresh: bool = False
+    ) -> list[dict]:
+        if self.ttl <= 0:
+            return await build()
+
+        if self.models is not None and not refresh:
+            age = time.monotonic() - self.updated_at
+            if age < self.ttl:
+                return self.models
+            if age < self.ttl + self.max_stale:
+                if not self._is_rebuilding():
+                    self._start_rebuild(build)
+                return self.models
+
+        rebuild = self._rebuild
+        if refresh or not self._is_rebuilding():
+            rebuild = self._start_rebuild(build)
+        return await asyncio.shield(rebuild)
+
+    def get_view(self, models: list[dict], key, build: Callable[[], list[dict]]):
+        """`build()`, memoized under `key` while `models` is the cached list."""
+        if models is not self.models:
+            return build()
+
+        view = self.views.get(key)
+        if view is None:
+            view = build()
+            self.views.set(key, view)
+        return view
+
+    def invalidate(self):
+        self.version += 1
+        self.models = None
+        self.views.clear()
+
+    def _is_rebuilding(self) -> bool:
+        return (
+            self._rebuild is not None
+            and not self._rebuild.done()
+            and self._rebuild_version == self.version
+        )
+
+    def _start_rebuild(self, build) -> asyncio.Task:
+        self._rebuild_version = self.version
+        self._rebuild = asyncio.create_task(self._run_rebuild(build, self.version))
+        self._rebuild.add_done_callback(self._log_rebuild_error)
+        return self._rebuild
+
+    async def _run_rebuild(self, build, version: int) -> list[dict]:
+        models = await build()
+        # A list built across an invalidation may miss the change, only
+        # the callers that were waiting for it get it.
+        if version == self.version:
+            self.models = models
+            self.updated_at = time.monotonic()
+            self.views.clear()
+        return models
+
+    def _log_rebuild_error(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            log.error(f"Failed to rebuild the model list: {task.exception()}")
+
+
+MODEL_LIST_CACHE = ModelListCache()
+
+
 class ModelsTable:
     def insert_new_model(
         self, form_data: ModelForm, user_id: str
@@ -159,6 +266,7 @@ class ModelsTable:
                 result = Model(**model.model_dump())
                 db.add(result)
                 db.commit()
+                MODEL_LIST_CACHE.invalidate()
                 db.refresh(result)
 
                 if result:
@@ -173,20 +281,32 @@ class ModelsTable:
         with get_db() as db:
             return [ModelModel.model_validate(model) for model in db.query(Model).all()]
 
+    def _to_user_models(self, models) -> list[ModelUserResponse]:
+        users = {
+            user.id: user
+            for user in Users.get_users_by_user_ids(
+                list({model.user_id for model in models})
+            )
+        }
+        return [
+            ModelUserResponse.model_validate(
+                {
+                    **ModelModel.model_validate(model).model_dump(),
+                    "user": (
+                        users[model.user_id].model_dump()
+                        if model.user_id in users
+                        else None
+                    ),
+                }
+            )
+            for model in models
+        ]
+
     def get_models(self) -> list[ModelUserResponse]:
         with get_db() as db:
-            models = []
-            for model in db.query(Model).filter(Model.base_model_id != None).all():
-                user = Users.get_user_by_id(model.user_id)
-                models.append(
-                    ModelUserResponse.model_validate(
-                        {
-                            **ModelModel.model_validate(model).model_dump(),
-                            "user": user.model_dump() if user else None,
-                        }
-                    )
-                )
-            return models
+            return self._to_user_models(
+                db.query(Model).filter(Model.base_model_id != None).all()
+            )
 
     def get_base_models(self) -> list[ModelModel]:
         with get_db() as db:
@@ -198,13 +318,22 @@ class ModelsTable:
     def get_models_by_user_id(
         self, user_id: str, permission: str = "write"
     ) -> list[ModelUserResponse]:
-        models = self.get_models()
-        return [
-            model
-            for model in models
-            if model.user_id == user_id
-            or has_access(user_id, permission, model.access_control)
-        ]
+        user_group_ids = Groups.get_group_ids_by_member_id(user_id)
+        with get_db() as db:
+            query = db.query(Model).filter(Model.base_model_id != None)
+            access_filter = get_access_control_filter(
+                Model, user_id, user_group_ids, permission
+            )
+            if access_filter is not None:
+                query = query.filter(access_filter)
+            models = query.all()
+
+            return filter_accessible(
+                user_id,
+                self._to_user_models(models),
+                permission,
+                set(user_group_ids),
+            )
 
     def get_model_by_id(self, id: str) -> Optional[ModelModel]:
         try:
@@ -214,6 +343,11 @@ class ModelsTable:
         except Exception:
             return None
 
+    def get_models_by_ids(self, ids: list[str]) -> list[ModelModel]:
+        with get_db() as db:
+            models = db.query(Model).filter(Model.id.in_(ids)).all()
+            return [ModelModel.model_validate(model) for model in models]
+
     def toggle_model_by_id(self, id: str) -> Optional[ModelModel]:
         with get_db() as db:
             try:
@@ -226,6 +360,7 @@ class ModelsTable:
                     }
                 )
                 db.commit()
+                MODEL_LIST_CACHE.invalidate()
 
                 return self.get_model_by_id(id)
             except Exception:
@@ -241,6 +376,7 @@ class ModelsTable:
                     .update(model.model_dump(exclude={"id"}))
                 )
                 db.commit()
+                MODEL_LIST_CACHE.invalidate()
 
                 model = db.get(Model, id)
                 db.refresh(model)
@@ -254,6 +390,7 @@ class ModelsTable:
             with get_db() as db:
                 db.query(Model).filter_by(id=id).delete()
                 db.commit()
+                MODEL_LIST_CACHE.invalidate()
 
                 return True
         except Exception:
@@ -264,6 +401,7 @@ class ModelsTable:
             with get_db() as db:
                 db.query(Model).delete()
                 db.commit()
+                MODEL_LIST_CACHE.invalidate()
 
                 return True
         except Exception:
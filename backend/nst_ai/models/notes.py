@@ -4,7 +4,11 @@ import uuid
 from typing import Optional
 
 from nst_ai.internal.db import Base, get_db
-from nst_ai.utils.access_control import has_access
+from nst_ai.models.groups import Groups
+from nst_ai.utils.access_control import (
+    filter_accessible,
+    get_access_control_filter,
+)
 from nst_ai.models.users import Users, UserResponse
 
 
@@ -104,13 +108,22 @@ class NoteTable:
     def get_notes_by_user_id(
         self, user_id: str, permission: str = "write"
     ) -> list[NoteModel]:
-        notes = self.get_notes()
-        return [
-            note
-            for note in notes
-            if note.user_id == user_id
-            or has_access(user_id, permission, note.access_control)
-        ]
+        user_group_ids = Groups.get_group_ids_by_member_id(user_id)
+        with get_db() as db:
+            query = db.query(Note)
+            access_filter = get_access_control_filter(
+                Note, user_id, user_group_ids, permission
+            )
+            if access_filter is not None:
+                query = query.filter(access_filter)
+            notes = query.order_by(Note.updated_at.desc()).all()
+
+            return filter_accessible(
+                user_id,
+                [NoteModel.model_validate(note) for note in notes],
+                permission,
+                set(user_group_ids),
+            )
 
     def get_note_by_id(self, id: str) -> Optional[NoteModel]:
         with get_db() as db:
@@ -2,12 +2,16 @@ import time
 from typing import Optional
 
 from nst_ai.internal.db import Base, get_db
+from nst_ai.models.groups import Groups
 from nst_ai.models.users import Users, UserResponse
 
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy import BigInteger, Column, String, Text, JSON
 
-from nst_ai.utils.access_control import has_access
+from nst_ai.utils.access_control import (
+    filter_accessible,
+    get_access_control_filter,
+)
 
 ####################
 # Prompts DB Schema
@@ -101,34 +105,52 @@ class PromptsTable:
         except Exception:
             return None
 
+    def _to_user_models(self, prompts) -> list[PromptUserResponse]:
+        users = {
+            user.id: user
+            for user in Users.get_users_by_user_ids(
+                list({prompt.user_id for prompt in prompts})
+            )
+        }
+        return [
+            PromptUserResponse.model_validate(
+                {
+                    **PromptModel.model_validate(prompt).model_dump(),
+                    "user": (
+                        users[prompt.user_id].model_dump()
+                        if prompt.user_id in users
+                        else None
+                    ),
+                }
+            )
+            for prompt in prompts
+        ]
+
     def get_prompts(self) -> list[PromptUserResponse]:
         with get_db() as db:
-            prompts = []
-
-            for prompt in db.query(Prompt).order_by(Prompt.timestamp.desc()).all():
-                user = Users.get_user_by_id(prompt.user_id)
-                prompts.append(
-                    PromptUserResponse.model_validate(
-                        {
-                            **PromptModel.model_validate(prompt).model_dump(),
-                            "user": user.model_dump() if user else None,
-                        }
-                    )
-                )
-
-            return prompts
+            return self._to_user_models(
+                db.query(Prompt).order_by(Prompt.timestamp.desc()).all()
+            )
 
     def get_prompts_by_user_id(
         self, user_id: str, permission: str = "write"
     ) -> list[PromptUserResponse]:
-        prompts = self.get_prompts()
-
-        return [
-            prompt
-            for prompt in prompts
-            if prompt.user_id == user_id
-            or has_access(user_id, permission, prompt.access_control)
-        ]
+        user_group_ids = Groups.get_group_ids_by_member_id(user_id)
+        with get_db() as db:
+            query = db.query(Prompt)
+            access_filter = get_access_control_filter(
+                Prompt, user_id, user_group_ids, permission
+            )
+            if access_filter is not None:
+                query = query.filter(access_filter)
+            prompts = query.order_by(Prompt.timestamp.desc()).all()
+
+            return filter_accessible(
+                user_id,
+                self._to_user_models(prompts),
+                permission,
+                set(user_group_ids),
+            )
 
     def update_prompt_by_command(
         self, command: str, form_data: PromptForm
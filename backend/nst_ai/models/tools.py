@@ -3,12 +3,16 @@ import time
 from typing import Optional
 
 from nst_ai.internal.db import Base, JSONField, get_db
+from nst_ai.models.groups import Groups
 from nst_ai.models.users import Users, UserResponse
 from nst_ai.env import SRC_LOG_LEVELS
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy import BigInteger, Column, String, Text, JSON
 
-from nst_ai.utils.access_control import has_access
+from nst_ai.utils.access_control import (
+    filter_accessible,
+    get_access_control_filter,
+)
 
 
 log = logging.getLogger(__name__)
@@ -142,32 +146,52 @@ class ToolsTable:
         except Exception:
             return None
 
+    def _to_user_models(self, tools) -> list[ToolUserModel]:
+        users = {
+            user.id: user
+            for user in Users.get_users_by_user_ids(
+                list({tool.user_id for tool in tools})
+            )
+        }
+        return [
+            ToolUserModel.model_validate(
+                {
+                    **ToolModel.model_validate(tool).model_dump(),
+                    "user": (
+                        users[tool.user_id].model_dump()
+                        if tool.user_id in users
+                        else None
+                    ),
+                }
+            )
+            for tool in tools
+        ]
+
     def get_tools(self) -> list[ToolUserModel]:
         with get_db() as db:
-            tools = []
-            for tool in db.query(Tool).order_by(Tool.updated_at.desc()).all():
-                user = Users.get_user_by_id(tool.user_id)
-                tools.append(
-                    ToolUserModel.model_validate(
-                        {
-                            **ToolModel.model_validate(tool).model_dump(),
-                            "user": user.model_dump() if user else None,
-                        }
-                    )
-                )
-            return tools
+            return self._to_user_models(
+                db.query(Tool).order_by(Tool.updated_at.desc()).all()
+            )
 
     def get_tools_by_user_id(
         self, user_id: str, permission: str = "write"
     ) -> list[ToolUserModel]:
-        tools = self.get_tools()
-
-        return [
-            tool
-            for tool in tools
-            if tool.user_id == user_id
-            or has_access(user_id, permission, tool.access_control)
-        ]
+        user_group_ids = Groups.get_group_ids_by_member_id(user_id)
+        with get_db() as db:
+            query = db.query(Tool)
+            access_filter = get_access_control_filter(
+                Tool, user_id, user_group_ids, permission
+            )
+            if access_filter is not None:
+                query = query.filter(access_filter)
+            tools = query.order_by(Tool.updated_at.desc()).all()
+
+            return filter_accessible(
+                user_id,
+                self._to_user_models(tools),
+                permission,
+                set(user_group_ids),
+            )
 
     def get_tool_valves_by_id(self, id: str) -> Optional[dict]:
         try:
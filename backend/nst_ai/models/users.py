@@ -1,16 +1,28 @@
+import asyncio
+import hashlib
+import logging
 import time
 from typing import Optional
 
-from nst_ai.internal.db import Base, JSONField, get_db
+from nst_ai.internal.db import Base, JSONField, get_db, get_read_db, run_with_db
+from nst_ai.env import (
+    SRC_LOG_LEVELS,
+    USER_CACHE_TTL,
+    USER_LAST_ACTIVE_UPDATE_INTERVAL,
+)
 
 
 from nst_ai.models.chats import Chats
 from nst_ai.models.groups import Groups
+from nst_ai.utils.ttl_cache import TTLCache
 
 
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import BigInteger, Column, String, Text
-from sqlalchemy import or_
+from sqlalchemy import BigInteger, Column, Index, String, Text
+from sqlalchemy import bindparam, or_, update
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
 
 
 ####################
@@ -37,6 +49,8 @@ class User(Base):
 
     oauth_sub = Column(Text, unique=True)
 
+    __table_args__ = (Index("user_email_idx", "email"),)
+
 
 class UserSettings(BaseModel):
     ui: Optional[dict] = {}
@@ -114,6 +128,107 @@ class UserUpdateForm(BaseModel):
     password: Optional[str] = None
 
 
+class UserCache:
+    """
+    Users of recently seen tokens and API keys, cached for `ttl` seconds per
+    process. Changes made through `UsersTable` invalidate the user right away.
+    """
+
+    def __init__(self, ttl: float = USER_CACHE_TTL):
+        self.entries = TTLCache(ttl)
+        # sha256 of the API key -> user id, checked against the cached user
+        self.api_keys = TTLCache(ttl)
+
+    def get(self, id: str) -> Optional[UserModel]:
+        user = self.entries.get(id)
+        if user is not None:
+            return user.model_copy(deep=True)
+        return None
+
+    def set(self, user: UserModel):
+        self.entries.set(user.id, user.model_copy(deep=True))
+
+    def get_by_api_key(self, api_key: str) -> Optional[UserModel]:
+        id = self.api_keys.get(get_api_key_hash(api_key))
+        user = self.get(id) if id is not None else None
+        # The key may have been changed or revoked since
+        if user is not None and user.api_key == api_key:
+            return user
+        return None
+
+    def set_by_api_key(self, api_key: str, user: UserModel):
+        self.set(user)
+        self.api_keys.set(get_api_key_hash(api_key), user.id)
+
+    def invalidate(self, id: Optional[str] = None):
+        """Forget user `id` (everyone if None)."""
+        if id is None:
+            self.entries.clear()
+            self.api_keys.clear()
+        else:
+            self.entries.pop(id)
+
+
+def get_api_key_hash(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+USER_CACHE = UserCache()
+
+
+class LastActiveBatcher:
+    """
+    Collects the users' last active times to write them in one bulk update
+    every `interval` seconds instead of one update per request.
+    """
+
+    def __init__(self, interval: float = USER_LAST_ACTIVE_UPDATE_INTERVAL):
+        self.interval = interval
+        self.pending: dict[str, int] = {}
+
+    def touch(self, id: str):
+        self.pending[id] = int(time.time())
+
+    def _write(self, db, pending: dict[str, int]):
+        # Core executemany, users deleted in the meantime are just skipped
+        db.execute(
+            update(User.__table__)
+            .where(User.__table__.c.id == bindparam("user_id"))
+            .values(last_active_at=bindparam("last_active")),
+            [
+                {"user_id": id, "last_active": last_active_at}
+                for id, last_active_at in pending.items()
+            ],
+        )
+        db.commit()
+
+    async def flush(self):
+        if not self.pending:
+            return
+
+        pending, self.pending = self.pending, {}
+        try:
+            await run_with_db(self._write, pending)
+        except asyncio.CancelledError:
+            self._restore(pending)
+            raise
+        except Exception as e:
+            log.warning(f"Failed to update last active times: {e}")
+            self._restore(pending)
+
+    def _restore(self, pending: dict[str, int]):
+        # Written with the next flush; times touched since are newer
+        self.pending = {**pending, **self.pending}
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+
+LAST_ACTIVE_BATCHER = LastActiveBatcher()
+
+
 class UsersTable:
     def insert_new_user(
         self,
@@ -147,27 +262,46 @@ class UsersTable:
             else:
                 return None
 
+    def _get_user_by(self, db, **kwargs) -> UserModel:
+        user = db.query(User).filter_by(**kwargs).first()
+        return UserModel.model_validate(user)
+
     def get_user_by_id(self, id: str) -> Optional[UserModel]:
         try:
             with get_db() as db:
-                user = db.query(User).filter_by(id=id).first()
-                return UserModel.model_validate(user)
+                return self._get_user_by(db, id=id)
+        except Exception:
+            return None
+
+    async def get_user_by_id_async(self, id: str) -> Optional[UserModel]:
+        try:
+            return await run_with_db(self._get_user_by, id=id)
         except Exception:
             return None
 
     def get_user_by_api_key(self, api_key: str) -> Optional[UserModel]:
         try:
             with get_db() as db:
-                user = db.query(User).filter_by(api_key=api_key).first()
-                return UserModel.model_validate(user)
+                return self._get_user_by(db, api_key=api_key)
+        except Exception:
+            return None
+
+    async def get_user_by_api_key_async(self, api_key: str) -> Optional[UserModel]:
+        try:
+            return await run_with_db(self._get_user_by, api_key=api_key)
         except Exception:
             return None
 
     def get_user_by_email(self, email: str) -> Optional[UserModel]:
         try:
             with get_db() as db:
-                user = db.query(User).filter_by(email=email).first()
-                return UserModel.model_validate(user)
+                return self._get_user_by(db, email=email)
+        except Exception:
+            return None
+
+    async def get_user_by_email_async(self, email: str) -> Optional[UserModel]:
+        try:
+            return await run_with_db(self._get_user_by, email=email)
         except Exception:
             return None
 
@@ -185,7 +319,7 @@ class UsersTable:
         skip: Optional[int] = None,
         limit: Optional[int] = None,
     ) -> UserListResponse:
-        with get_db() as db:
+        with get_read_db("user") as db:
             query = db.query(User)
 
             if filter:
@@ -266,19 +400,28 @@ class UsersTable:
         except Exception:
             return None
 
+    def _get_user_webhook_url_by_id(self, db, id: str) -> Optional[str]:
+        user = db.query(User).filter_by(id=id).first()
+
+        if user.settings is None:
+            return None
+        else:
+            return (
+                user.settings.get("ui", {})
+                .get("notifications", {})
+                .get("webhook_url", None)
+            )
+
     def get_user_webhook_url_by_id(self, id: str) -> Optional[str]:
         try:
             with get_db() as db:
-                user = db.query(User).filter_by(id=id).first()
+                return self._get_user_webhook_url_by_id(db, id)
+        except Exception:
+            return None
 
-                if user.settings is None:
-                    return None
-                else:
-                    return (
-                        user.settings.get("ui", {})
-                        .get("notifications", {})
-                        .get("webhook_url", None)
-                    )
+    async def get_user_webhook_url_by_id_async(self, id: str) -> Optional[str]:
+        try:
+            return await run_with_db(self._get_user_webhook_url_by_id, id)
         except Exception:
             return None
 
@@ -287,6 +430,7 @@ class UsersTable:
             with get_db() as db:
                 db.query(User).filter_by(id=id).update({"role": role})
                 db.commit()
+                USER_CACHE.invalidate(id)
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
         except Exception:
@@ -301,6 +445,7 @@ class UsersTable:
                     {"profile_image_url": profile_image_url}
                 )
                 db.commit()
+                USER_CACHE.invalidate(id)
 
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
@@ -327,6 +472,7 @@ class UsersTable:
             with get_db() as db:
                 db.query(User).filter_by(id=id).update({"oauth_sub": oauth_sub})
                 db.commit()
+                USER_CACHE.invalidate(id)
 
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
@@ -338,6 +484,7 @@ class UsersTable:
             with get_db() as db:
                 db.query(User).filter_by(id=id).update(updated)
                 db.commit()
+                USER_CACHE.invalidate(id)
 
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
@@ -357,6 +504,7 @@ class UsersTable:
 
                 db.query(User).filter_by(id=id).update({"settings": user_settings})
                 db.commit()
+                USER_CACHE.invalidate(id)
 
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
@@ -375,6 +523,7 @@ class UsersTable:
                     # Delete User
                     db.query(User).filter_by(id=id).delete()
                     db.commit()
+                USER_CACHE.invalidate(id)
 
                 return True
             else:
@@ -387,6 +536,7 @@ class UsersTable:
             with get_db() as db:
                 result = db.query(User).filter_by(id=id).update({"api_key": api_key})
                 db.commit()
+                USER_CACHE.invalidate(id)
                 return True if result == 1 else False
         except Exception:
             return False
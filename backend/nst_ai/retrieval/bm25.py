@@ -0,0 +1,411 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Union
+
+from nst_ai.config import RAG_BM25_INDEX_DIR
+from nst_ai.env import SRC_LOG_LEVELS
+from nst_ai.retrieval.vector.main import (
+    GetResult,
+    SearchResult,
+    VectorDBBase,
+    VectorItem,
+)
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+# Same defaults as rank_bm25.BM25Okapi, which BM25Retriever uses.
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS docs (
+    doc INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    content_hash TEXT NOT NULL,
+    length INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    metadata TEXT
+);
+CREATE TABLE IF NOT EXISTS terms (term TEXT PRIMARY KEY, df INTEGER NOT NULL)
+    WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    doc INTEGER NOT NULL,
+    tf INTEGER NOT NULL,
+    PRIMARY KEY (term, doc)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_doc_idx ON postings (doc);
+"""
+
+
+def tokenize(text: str) -> list[str]:
+    # Matches the default preprocessing of langchain's BM25Retriever.
+    return text.split()
+
+
+def get_content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class BM25Index:
+    """
+    On-disk inverted index for a single vector DB collection.
+
+    Documents are keyed by their vector DB id and carry the sha256 of their
+    content, so re-inserting unchanged chunks does not touch the postings.
+    Scoring only reads the postings of the query terms.
+    """
+
+    def __init__(self, collection_name: str, index_dir: str = RAG_BM25_INDEX_DIR):
+        self.collection_name = collection_name
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", collection_name)
+        self.path = os.path.join(index_dir, f"{safe_name}.sqlite3")
+
+    @contextmanager
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def exists(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'built'").fetchone()
+            return row is not None
+
+    def _get_stats(self, conn) -> tuple[int, int]:
+        rows = dict(
+            conn.execute(
+                "SELECT key, value FROM meta WHERE key IN ('n_docs', 'total_length')"
+            ).fetchall()
+        )
+        return int(rows.get("n_docs", 0)), int(rows.get("total_length", 0))
+
+    def _set_stats(self, conn, n_docs: int, total_length: int):
+        conn.executemany(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            [("n_docs", str(n_docs)), ("total_length", str(total_length))],
+        )
+
+    def _remove_docs(self, conn, docs: list[int]) -> tuple[int, int]:
+        removed, removed_length = 0, 0
+        for doc in docs:
+            row = conn.execute(
+                "SELECT length FROM docs WHERE doc = ?", (doc,)
+            ).fetchone()
+            if row is None:
+                continue
+
+            terms = [
+                term
+                for (term,) in conn.execute(
+                    "SELECT term FROM postings WHERE doc = ?", (doc,)
+                )
+            ]
+            conn.executemany(
+                "UPDATE terms SET df = df - 1 WHERE term = ?",
+                [(term,) for term in terms],
+            )
+            conn.execute("DELETE FROM postings WHERE doc = ?", (doc,))
+            conn.execute("DELETE FROM docs WHERE doc = ?", (doc,))
+
+            removed += 1
+            removed_length += row[0]
+
+        conn.execute("DELETE FROM terms WHERE df <= 0")
+        return removed, removed_length
+
+    def _add_items(self, conn, items: list[dict]) -> tuple[int, int]:
+        added, added_length = 0, 0
+        for item in items:
+            text = item["text"] or ""
+            content_hash = get_content_hash(text)
+            metadata = json.dumps(item.get("metadata") or {}, default=str)
+
+            existing = conn.execute(
+                "SELECT doc, content_hash FROM docs WHERE id = ?", (item["id"],)
+            ).fetchone()
+            if existing is not None:
+                if existing[1] == content_hash:
+                    conn.execute(
+                        "UPDATE docs SET metadata = ? WHERE doc = ?",
+                        (metadata, existing[0]),
+                    )
+                    continue
+                removed, removed_length = self._remove_docs(conn, [existing[0]])
+                added -= removed
+                added_length -= removed_length
+
+            term_counts = Counter(tokenize(text))
+            length = sum(term_counts.values())
+            doc = conn.execute(
+                "INSERT INTO docs (id, content_hash, length, text, metadata) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (item["id"], content_hash, length, text, metadata),
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO postings (term, doc, tf) VALUES (?, ?, ?)",
+                [(term, doc, tf) for term, tf in term_counts.items()],
+            )
+            conn.executemany(
+                "INSERT INTO terms (term, df) VALUES (?, 1) "
+                "ON CONFLICT (term) DO UPDATE SET df = df + 1",
+                [(term,) for term in term_counts],
+            )
+
+            added += 1
+            added_length += length
+        return added, added_length
+
+    def build(self, result: Optional[GetResult]):
+        """(Re)build the index from a full collection read."""
+        items = []
+        if result is not None and result.ids:
+            items = [
+                {"id": id, "text": text, "metadata": metadata}
+                for id, text, metadata in zip(
+                    result.ids[0], result.documents[0], result.metadatas[0]
+                )
+            ]
+
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM postings")
+            conn.execute("DELETE FROM terms")
+            conn.execute("DELETE FROM docs")
+            added, added_length = self._add_items(conn, items)
+            self._set_stats(conn, added, added_length)
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('built', '1')"
+            )
+
+        log.info(f"Built BM25 index for {self.collection_name} with {added} documents")
+
+    def add(self, items: List[Union[VectorItem, dict]]):
+        items = [
+            item.model_dump() if isinstance(item, VectorItem) else item
+            for item in items
+        ]
+        with self._transaction() as conn:
+            n_docs, total_length = self._get_stats(conn)
+            added, added_length = self._add_items(conn, items)
+            self._set_stats(conn, n_docs + added, total_length + added_length)
+
+    def delete(self, ids: Optional[List[str]] = None, filter: Optional[Dict] = None):
+        with self._transaction() as conn:
+            if ids:
+                placeholders = ",".join("?" for _ in ids)
+                docs = conn.execute(
+                    f"SELECT doc FROM docs WHERE id IN ({placeholders})", ids
+                ).fetchall()
+            elif filter:
+                conditions = " AND ".join(
+                    "json_extract(metadata, ?) = ?" for _ in filter
+                )
+                params = []
+                for key, value in filter.items():
+                    params.extend([f'$."{key}"', value])
+                docs = conn.execute(
+                    f"SELECT doc FROM docs WHERE {conditions}", params
+                ).fetchall()
+            else:
+                return
+
+            n_docs, total_length = self._get_stats(conn)
+            removed, removed_length = self._remove_docs(conn, [d for (d,) in docs])
+            self._set_stats(conn, n_docs - removed, total_length - removed_length)
+
+    def drop(self):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def search(self, query: str, limit: int) -> list[tuple[float, str, str, Any]]:
+        terms = list(set(tokenize(query)))
+        if not terms or limit <= 0:
+            return []
+
+        with self._connect() as conn:
+            n_docs, total_length = self._get_stats(conn)
+            if n_docs == 0:
+                return []
+            avgdl = total_length / n_docs
+
+            placeholders = ",".join("?" for _ in terms)
+            idf = {
+                term: math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                for term, df in conn.execute(
+                    f"SELECT term, df FROM terms WHERE term IN ({placeholders})",
+                    terms,
+                )
+            }
+
+            scores: dict[int, float] = {}
+            for term, doc, tf, length in conn.execute(
+                "SELECT p.term, p.doc, p.tf, d.length FROM postings p "
+                f"JOIN docs d ON d.doc = p.doc WHERE p.term IN ({placeholders})",
+                terms,
+            ):
+                norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avgdl)
+                scores[doc] = (
+                    scores.get(doc, 0.0) + idf[term] * tf * (BM25_K1 + 1) / norm
+                )
+
+            top = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:limit]
+            results = []
+            for doc, score in top:
+                id, text, metadata = conn.execute(
+                    "SELECT id, text, metadata FROM docs WHERE doc = ?", (doc,)
+                ).fetchone()
+                results.append((score, id, text, json.loads(metadata or "{}")))
+            return results
+
+
+_build_locks: dict[str, threading.Lock] = {}
+_build_locks_lock = threading.Lock()
+
+
+def get_bm25_index(collection_name: str, client: VectorDBBase) -> Optional[BM25Index]:
+    """
+    Return the index for a collection, building it once from a full
+    collection read if it predates the index or was never queried.
+    Returns None if the collection does not exist.
+    """
+    index = BM25Index(collection_name)
+    if index.exists():
+        return index
+
+    with _build_locks_lock:
+        lock = _build_locks.setdefault(collection_name, threading.Lock())
+
+    with lock:
+        if not index.exists():
+            result = client.get(collection_name=collection_name)
+            if result is None:
+                return None
+            index.build(result)
+    return index
+
+
+class BM25IndexedVectorDB(VectorDBBase):
+    """
+    Keeps the BM25 indexes in sync with every write made through the wrapped
+    vector DB client.
+    """
+
+    def __init__(self, client: VectorDBBase):
+        self.client = client
+
+    def _sync(self, collection_name: str, fn):
+        try:
+            fn(BM25Index(collection_name))
+        except Exception as e:
+            # A failed update must not leave a stale index behind; the next
+            # hybrid query rebuilds it from the vector DB.
+            log.exception(f"Error updating BM25 index for {collection_name}: {e}")
+            BM25Index(collection_name).drop()
+
+    def has_collection(self, collection_name: str) -> bool:
+        return self.client.has_collection(collection_name=collection_name)
+
+    def delete_collection(self, collection_name: str) -> None:
+        self.client.delete_collection(collection_name=collection_name)
+        self._sync(collection_name, lambda index: index.drop())
+
+    def _write(self, collection_name: str, items: List[VectorItem], write):
+        is_new = not self.client.has_collection(collection_name=collection_name)
+        write(collection_name=collection_name, items=items)
+
+        def update(index: BM25Index):
+            if is_new:
+                index.build(None)
+            if index.exists():
+                index.add(items)
+
+        self._sync(collection_name, update)
+
+    def insert(self, collection_name: str, items: List[VectorItem]) -> None:
+        self._write(collection_name, items, self.client.insert)
+
+    def upsert(self, collection_name: str, items: List[VectorItem]) -> None:
+        self._write(collection_name, items, self.client.upsert)
+
+    def search(
+        self,
+        collection_name: str,
+        vectors: List[List[Union[float, int]]],
+        limit: int,
+        include_vectors: bool = False,
+    ) -> Optional[SearchResult]:
+        return self.client.search(
+            collection_name=collection_name,
+            vectors=vectors,
+            limit=limit,
+            include_vectors=include_vectors,
+        )
+
+    def query(
+        self, collection_name: str, filter: Dict, limit: Optional[int] = None
+    ) -> Optional[GetResult]:
+        return self.client.query(
+            collection_name=collection_name, filter=filter, limit=limit
+        )
+
+    def get(self, collection_name: str) -> Optional[GetResult]:
+        return self.client.get(collection_name=collection_name)
+
+    def get_vectors(
+        self, collection_name: str, ids: List[str]
+    ) -> Optional[Dict[str, List[float]]]:
+        return self.client.get_vectors(collection_name=collection_name, ids=ids)
+
+    def delete(
+        self,
+        collection_name: str,
+        ids: Optional[List[str]] = None,
+        filter: Optional[Dict] = None,
+    ) -> None:
+        self.client.delete(collection_name=collection_name, ids=ids, filter=filter)
+
+        def update(index: BM25Index):
+            if not index.exists():
+                return
+            if ids or filter:
+                index.delete(ids=ids, filter=filter)
+            else:
+                index.drop()
+
+        self._sync(collection_name, update)
+
+    def reset(self) -> None:
+        self.client.reset()
+        shutil.rmtree(RAG_BM25_INDEX_DIR, ignore_errors=True)
@@ -0,0 +1,419 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Optional, Union
+
+import numpy as np
+
+from nst_ai.config import (
+    ENABLE_RAG_EMBEDDING_CACHE,
+    RAG_EMBEDDING_CACHE_BACKEND,
+    RAG_EMBEDDING_CACHE_DIR,
+    RAG_EMBEDDING_CACHE_MAX_SIZE_MB,
+    RAG_EMBEDDING_CACHE_REDIS_TTL,
+)
+from nst_ai.env import (
+    SRC_LOG_LEVELS,
+    REDIS_URL,
+    REDIS_KEY_PREFIX,
+    REDIS_SENTINEL_HOSTS,
+    REDIS_SENTINEL_PORT,
+)
+from nst_ai.utils.redis import get_redis_connection, get_sentinels_from_env
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+def get_embedding_cache_key(
+    engine: str, model: str, prefix: Optional[str], text: str
+) -> str:
+    text_hash = hashlib.sha256(text.encode()).hexdigest()
+    return hashlib.sha256(
+        json.dumps([engine or "", model or "", prefix or "", text_hash]).encode()
+    ).hexdigest()
+
+
+class EmbeddingCache(ABC):
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def _record(self, hits: int, misses: int):
+        with self._stats_lock:
+            self.hits += hits
+            self.misses += misses
+
+    @abstractmethod
+    def get_many(self, keys: list[str]) -> dict[str, list[float]]:
+        """Return the cached embeddings of the given keys, skipping misses."""
+        pass
+
+    @abstractmethod
+    def set_many(self, items: dict[str, list[float]]):
+        """Store embeddings by key."""
+        pass
+
+    def get_stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entry (
+    key TEXT PRIMARY KEY,
+    dim INTEGER NOT NULL,
+    slot INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entry_last_used_idx ON entry (last_used);
+CREATE TABLE IF NOT EXISTS free_slot (
+    dim INTEGER NOT NULL,
+    slot INTEGER NOT NULL,
+    freed_at REAL NOT NULL,
+    PRIMARY KEY (dim, slot)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS slab (dim INTEGER PRIMARY KEY, slots INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('used_bytes', 0);
+"""
+
+FLOAT32_SIZE = np.dtype(np.float32).itemsize
+
+# Freed slots are only reused after this many seconds, so a reader that looked
+# up a slot just before its entry was evicted never sees another vector in it.
+FREE_SLOT_GRACE_PERIOD = 60
+
+
+class LocalEmbeddingCache(EmbeddingCache):
+    """
+    Vectors are stored as float32 in one fixed-slot file per dimension and
+    read back through a memory map. A SQLite index maps keys to slots and
+    tracks last use; the least recently used entries are evicted once the
+    stored vectors exceed max_bytes, and their slots are reused.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        super().__init__()
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(self.path, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(
+            os.path.join(self.path, "index.sqlite3"), timeout=30, isolation_level=None
+        )
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            yield conn
+        finally:
+            conn.close()
+
+    def _slab_path(self, dim: int) -> str:
+        return os.path.join(self.path, f"vectors-{dim}.f32")
+
+    def get_many(self, keys: list[str]) -> dict[str, list[float]]:
+        if not keys:
+            return {}
+
+        result = {}
+        with self._connect() as conn:
+            rows = []
+            for i in range(0, len(keys), 500):
+                chunk = keys[i : i + 500]
+                placeholders = ",".join("?" for _ in chunk)
+                rows.extend(
+                    conn.execute(
+                        f"SELECT key, dim, slot FROM entry WHERE key IN ({placeholders})",
+                        chunk,
+                    ).fetchall()
+                )
+
+            by_dim: dict[int, list[tuple[str, int]]] = {}
+            for key, dim, slot in rows:
+                by_dim.setdefault(dim, []).append((key, slot))
+
+            for dim, entries in by_dim.items():
+                slab_path = self._slab_path(dim)
+                if not os.path.exists(slab_path):
+                    continue
+                slab = np.memmap(slab_path, dtype=np.float32, mode="r")
+                slab = slab[: (slab.shape[0] // dim) * dim].reshape(-1, dim)
+                for key, slot in entries:
+                    if slot < slab.shape[0]:
+                        result[key] = slab[slot].tolist()
+                del slab
+
+            if result:
+                now = time.time()
+                conn.executemany(
+                    "UPDATE entry SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in result],
+                )
+
+        self._record(len(result), len(keys) - len(result))
+        return result
+
+    def _allocate_slot(self, conn, dim: int) -> int:
+        row = conn.execute(
+            "SELECT slot FROM free_slot WHERE dim = ? AND freed_at < ? LIMIT 1",
+            (dim, time.time() - FREE_SLOT_GRACE_PERIOD),
+        ).fetchone()
+        if row is not None:
+            conn.execute(
+                "DELETE FROM free_slot WHERE dim = ? AND slot = ?", (dim, row[0])
+            )
+            return row[0]
+
+        row = conn.execute("SELECT slots FROM slab WHERE dim = ?", (dim,)).fetchone()
+        slot = row[0] if row else 0
+        conn.execute(
+            "INSERT INTO slab (dim, slots) VALUES (?, ?) "
+            "ON CONFLICT (dim) DO UPDATE SET slots = excluded.slots",
+            (dim, slot + 1),
+        )
+        return slot
+
+    def _add_used_bytes(self, conn, delta: int):
+        conn.execute(
+            "UPDATE meta SET value = value + ? WHERE key = 'used_bytes'", (delta,)
+        )
+
+    def _evict(self, conn):
+        used_bytes = conn.execute(
+            "SELECT value FROM meta WHERE key = 'used_bytes'"
+        ).fetchone()[0]
+        if used_bytes <= self.max_bytes:
+            return
+
+        # Evict down to 90% of the limit so we do not evict on every write.
+        target = int(self.max_bytes * 0.9)
+        evicted = []
+        cursor = conn.execute("SELECT key, dim, slot FROM entry ORDER BY last_used ASC")
+        for key, dim, slot in cursor:
+            if used_bytes <= target:
+                break
+            evicted.append((key, dim, slot))
+            used_bytes -= dim * FLOAT32_SIZE
+        cursor.close()
+
+        conn.executemany(
+            "DELETE FROM entry WHERE key = ?", [(key,) for key, _, _ in evicted]
+        )
+        now = time.time()
+        conn.executemany(
+            "INSERT OR IGNORE INTO free_slot (dim, slot, freed_at) VALUES (?, ?, ?)",
+            [(dim, slot, now) for _, dim, slot in evicted],
+        )
+        self._add_used_bytes(conn, -sum(dim * FLOAT32_SIZE for _, dim, _ in evicted))
+        log.debug(f"Evicted {len(evicted)} embeddings from the local cache")
+
+    def set_many(self, items: dict[str, list[float]]):
+        if not items:
+            return
+
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                writes: dict[int, list[tuple[int, np.ndarray]]] = {}
+                for key, vector in items.items():
+                    vector = np.asarray(vector, dtype=np.float32)
+                    dim = int(vector.shape[0])
+                    if dim == 0:
+                        continue
+
+                    row = conn.execute(
+                        "SELECT dim, slot FROM entry WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row is not None and row[0] == dim:
+                        slot = row[1]
+                    else:
+                        if row is not None:
+                            conn.execute(
+                                "INSERT OR IGNORE INTO free_slot (dim, slot, freed_at) "
+                                "VALUES (?, ?, ?)",
+                                (*row, now),
+                            )
+                            self._add_used_bytes(conn, -row[0] * FLOAT32_SIZE)
+                        slot = self._allocate_slot(conn, dim)
+                        self._add_used_bytes(conn, dim * FLOAT32_SIZE)
+
+                    conn.execute(
+                        "INSERT OR REPLACE INTO entry (key, dim, slot, last_used) "
+                        "VALUES (?, ?, ?, ?)",
+                        (key, dim, slot, now),
+                    )
+                    writes.setdefault(dim, []).append((slot, vector))
+
+                # Vectors are written before the index commits, so readers
+                # never see a key whose slot has not been filled yet.
+                for dim, vectors in writes.items():
+                    fd = os.open(self._slab_path(dim), os.O_RDWR | os.O_CREAT, 0o644)
+                    try:
+                        for slot, vector in vectors:
+                            os.pwrite(fd, vector.tobytes(), slot * dim * FLOAT32_SIZE)
+                    finally:
+                        os.close(fd)
+
+                self._evict(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+
+class RedisEmbeddingCache(EmbeddingCache):
+    """
+    Shares vectors between workers and nodes. Entries expire after ttl
+    seconds; size-bounded eviction is left to the Redis maxmemory policy
+    (allkeys-lru is recommended).
+    """
+
+    def __init__(self, redis, key_prefix: str, ttl: int):
+        super().__init__()
+        self.redis = redis
+        self.key_prefix = key_prefix
+        self.ttl = ttl
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.key_prefix}:embedding:{key}"
+
+    def get_many(self, keys: list[str]) -> dict[str, list[float]]:
+        if not keys:
+            return {}
+
+        values = self.redis.mget([self._redis_key(key) for key in keys])
+        result = {
+            key: np.frombuffer(value, dtype=np.float32).tolist()
+            for key, value in zip(keys, values)
+            if value
+        }
+
+        if result and self.ttl:
+            pipe = self.redis.pipeline()
+            for key in result:
+                pipe.expire(self._redis_key(key), self.ttl)
+            pipe.execute()
+
+        self._record(len(result), len(keys) - len(result))
+        return result
+
+    def set_many(self, items: dict[str, list[float]]):
+        if not items:
+            return
+
+        pipe = self.redis.pipeline()
+        for key, vector in items.items():
+            pipe.set(
+                self._redis_key(key),
+                np.asarray(vector, dtype=np.float32).tobytes(),
+                ex=self.ttl or None,
+            )
+        pipe.execute()
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    global _embedding_cache
+
+    if not ENABLE_RAG_EMBEDDING_CACHE:
+        return None
+
+    if _embedding_cache is None:
+        with _embedding_cache_lock:
+            if _embedding_cache is None:
+                try:
+                    if RAG_EMBEDDING_CACHE_BACKEND == "redis" and REDIS_URL:
+                        _embedding_cache = RedisEmbeddingCache(
+                            get_redis_connection(
+                                REDIS_URL,
+                                get_sentinels_from_env(
+                                    REDIS_SENTINEL_HOSTS, REDIS_SENTINEL_PORT
+                                ),
+                                decode_responses=False,
+                            ),
+                            REDIS_KEY_PREFIX,
+                            RAG_EMBEDDING_CACHE_REDIS_TTL,
+                        )
+                    else:
+                        _embedding_cache = LocalEmbeddingCache(
+                            RAG_EMBEDDING_CACHE_DIR,
+                            RAG_EMBEDDING_CACHE_MAX_SIZE_MB * 1024 * 1024,
+                        )
+                except Exception as e:
+                    log.exception(f"Error initializing the embedding cache: {e}")
+                    return None
+
+    return _embedding_cache
+
+
+def get_cached_embedding_function(func, engine: str, model: str):
+    """
+    Wrap an embedding function so that vectors for texts seen before are
+    served from the embedding cache and only the misses are embedded.
+    """
+    cache = get_embedding_cache()
+    if cache is None:
+        return func
+
+    def cached_func(
+        query: Union[str, list[str]], prefix: Optional[str] = None, user=None
+    ):
+        texts = query if isinstance(query, list) else [query]
+        keys = [get_embedding_cache_key(engine, model, prefix, text) for text in texts]
+
+        try:
+            cached = cache.get_many(list(set(keys)))
+        except Exception as e:
+            log.warning(f"Embedding cache lookup failed: {e}")
+            cached = {}
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached:
+                missing.setdefault(key, text)
+
+        if missing:
+            if isinstance(query, list):
+                embeddings = func(list(missing.values()), prefix=prefix, user=user)
+            else:
+                embeddings = [func(query, prefix=prefix, user=user)]
+
+            if (
+                embeddings is None
+                or len(embeddings) != len(missing)
+                or any(embedding is None for embedding in embeddings)
+            ):
+                # The uncached path returns None when the engine fails.
+                return None
+
+            computed = dict(zip(missing.keys(), embeddings))
+            try:
+                cache.set_many(computed)
+            except Exception as e:
+                log.warning(f"Embedding cache store failed: {e}")
+            cached.update(computed)
+
+        embeddings = [cached[key] for key in keys]
+        return embeddings if isinstance(query, list) else embeddings[0]
+
+    return cached_func
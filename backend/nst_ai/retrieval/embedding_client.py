@@ -0,0 +1,300 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from urllib.parse import quote
+
+import aiohttp
+
+from nst_ai.config import (
+    RAG_EMBEDDING_CONCURRENT_REQUESTS,
+    RAG_EMBEDDING_MAX_RETRIES,
+    RAG_EMBEDDING_PREFIX_FIELD_NAME,
+)
+from nst_ai.env import (
+    AIOHTTP_CLIENT_SESSION_SSL,
+    AIOHTTP_CLIENT_TIMEOUT,
+    ENABLE_FORWARD_USER_INFO_HEADERS,
+    SRC_LOG_LEVELS,
+)
+from nst_ai.models.users import UserModel
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+MAX_RETRY_DELAY = 300
+
+
+def get_retry_delay(retry_after: Optional[str], attempt: int) -> float:
+    """
+    Seconds to wait before the next attempt: the upstream's Retry-After
+    (delta-seconds or HTTP date) if present, exponential backoff otherwise.
+    """
+    if retry_after:
+        try:
+            return min(max(float(retry_after), 0.0), MAX_RETRY_DELAY)
+        except ValueError:
+            pass
+        try:
+            delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+            return min(max(delay, 0.0), MAX_RETRY_DELAY)
+        except (TypeError, ValueError):
+            pass
+
+    return min(2**attempt, 30) * (0.5 + random.random() / 2)
+
+
+class EmbeddingClient:
+    """
+    Client for the remote embedding engines (ollama, openai, azure_openai).
+
+    Requests run on a private event loop thread that owns a single keep-alive
+    aiohttp session, so async callers and sync (threadpool) callers share the
+    same connection pool. Batches are sent concurrently up to
+    `concurrency`, and rate-limited batches are retried with backoff.
+    """
+
+    def __init__(self, concurrency: int, max_retries: int):
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max(0, max_retries)
+
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # Per endpoint, the loop time before which no new request is sent.
+        # Pushed forward on every 429 so that the other in-flight batches back
+        # off too instead of piling onto a rate-limited upstream.
+        self._resume_at: dict[str, float] = {}
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+
+                def run():
+                    asyncio.set_event_loop(loop)
+                    loop.run_forever()
+                    loop.close()
+
+                self._thread = threading.Thread(
+                    target=run, name="embedding-client", daemon=True
+                )
+                self._thread.start()
+                self._loop = loop
+            return self._loop
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.concurrency, ttl_dns_cache=300
+                ),
+                timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT),
+                trust_env=True,
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._session
+
+    def _build_request(
+        self,
+        engine: str,
+        model: str,
+        texts: list[str],
+        url: str,
+        key: str,
+        prefix: Optional[str],
+        user: Optional[UserModel],
+        azure_api_version: Optional[str],
+    ) -> tuple[str, dict, dict]:
+        if engine == "ollama":
+            endpoint = f"{url}/api/embed"
+            headers = {"Authorization": f"Bearer {key}"}
+            payload = {"input": texts, "model": model}
+        elif engine == "openai":
+            endpoint = f"{url}/embeddings"
+            headers = {"Authorization": f"Bearer {key}"}
+            payload = {"input": texts, "model": model}
+        elif engine == "azure_openai":
+            endpoint = f"{url}/openai/deployments/{model}/embeddings?api-version={azure_api_version}"
+            headers = {"api-key": key}
+            payload = {"input": texts}
+        else:
+            raise ValueError(f"Unknown embedding engine: {engine}")
+
+        headers["Content-Type"] = "application/json"
+        if ENABLE_FORWARD_USER_INFO_HEADERS and user:
+            headers.update(
+                {
+                    "X-NST-AI-User-Name": quote(user.name, safe=" "),
+                    "X-NST-AI-User-Id": user.id,
+                    "X-NST-AI-User-Email": user.email,
+                    "X-NST-AI-User-Role": user.role,
+                }
+            )
+
+        if isinstance(RAG_EMBEDDING_PREFIX_FIELD_NAME, str) and isinstance(prefix, str):
+            payload[RAG_EMBEDDING_PREFIX_FIELD_NAME] = prefix
+
+        return endpoint, headers, payload
+
+    @staticmethod
+    def _parse_response(engine: str, data: dict) -> list[list[float]]:
+        if engine == "ollama":
+            if "embeddings" in data:
+                return data["embeddings"]
+        elif "data" in data:
+            items = data["data"]
+            if all("index" in item for item in items):
+                items = sorted(items, key=lambda item: item["index"])
+            return [item["embedding"] for item in items]
+        raise Exception("Something went wrong :/")
+
+    async def _post(
+        self, engine: str, endpoint: str, headers: dict, payload: dict
+    ) -> list[list[float]]:
+        session = self._get_session()
+        loop = asyncio.get_running_loop()
+
+        for attempt in range(self.max_retries + 1):
+            wait = self._resume_at.get(endpoint, 0) - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            async with self._semaphore:
+                try:
+                    async with session.post(
+                        endpoint,
+                        headers=headers,
+                        json=payload,
+                        ssl=AIOHTTP_CLIENT_SESSION_SSL,
+                    ) as r:
+                        if (
+                            r.status not in RETRY_STATUS_CODES
+                            or attempt == self.max_retries
+                        ):
+                            r.raise_for_status()
+                            return self._parse_response(engine, await r.json())
+
+                        delay = get_retry_delay(r.headers.get("Retry-After"), attempt)
+                        log.warning(
+                            f"Embedding request to {endpoint} returned {r.status}, "
+                            f"retrying in {delay:.1f}s"
+                        )
+                        if r.status == 429:
+                            self._resume_at[endpoint] = max(
+                                self._resume_at.get(endpoint, 0), loop.time() + delay
+                            )
+                except aiohttp.ServerDisconnectedError as e:
+                    # Usually a pooled keep-alive connection the upstream
+                    # already closed; anything else is not worth retrying.
+                    if attempt == self.max_retries:
+                        raise
+                    delay = get_retry_delay(None, attempt)
+                    log.warning(
+                        f"Embedding request to {endpoint} failed: {e}, "
+                        f"retrying in {delay:.1f}s"
+                    )
+
+            await asyncio.sleep(delay)
+
+    async def _embed(
+        self,
+        engine: str,
+        model: str,
+        texts: list[str],
+        url: str = "",
+        key: str = "",
+        prefix: Optional[str] = None,
+        user: Optional[UserModel] = None,
+        azure_api_version: Optional[str] = None,
+        batch_size: Optional[int] = None,
+    ) -> Optional[list[list[float]]]:
+        batch_size = batch_size or len(texts) or 1
+
+        async def embed_batch(batch: list[str]) -> list[list[float]]:
+            embeddings = await self._post(
+                engine,
+                *self._build_request(
+                    engine, model, batch, url, key, prefix, user, azure_api_version
+                ),
+            )
+            if len(embeddings) != len(batch):
+                raise Exception(
+                    f"Expected {len(batch)} embeddings, got {len(embeddings)}"
+                )
+            return embeddings
+
+        tasks = [
+            asyncio.ensure_future(embed_batch(texts[i : i + batch_size]))
+            for i in range(0, len(texts), batch_size)
+        ]
+        try:
+            results = await asyncio.gather(*tasks)
+        except Exception as e:
+            for task in tasks:
+                task.cancel()
+            log.exception(f"Error generating {engine} embeddings: {e}")
+            return None
+
+        return [embedding for batch in results for embedding in batch]
+
+    async def embed(
+        self, engine: str, model: str, texts: list[str], **kwargs
+    ) -> Optional[list[list[float]]]:
+        """
+        Embed `texts`, split into batches of `batch_size` that are sent
+        concurrently. Returns None if any batch fails.
+        """
+        future = asyncio.run_coroutine_threadsafe(
+            self._embed(engine, model, texts, **kwargs), self._get_loop()
+        )
+        return await asyncio.wrap_future(future)
+
+    def embed_sync(
+        self, engine: str, model: str, texts: list[str], **kwargs
+    ) -> Optional[list[list[float]]]:
+        """Blocking variant of `embed` for sync (threadpool) callers."""
+        loop = self._get_loop()
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("embed_sync cannot be called from the client loop")
+        return asyncio.run_coroutine_threadsafe(
+            self._embed(engine, model, texts, **kwargs), loop
+        ).result()
+
+    async def close(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+
+        async def close_session():
+            if self._session is not None:
+                await self._session.close()
+                self._session = None
+
+        await asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(close_session(), loop)
+        )
+        loop.call_soon_threadsafe(loop.stop)
+
+
+_embedding_client: Optional[EmbeddingClient] = None
+_embedding_client_lock = threading.Lock()
+
+
+def get_embedding_client() -> EmbeddingClient:
+    global _embedding_client
+
+    if _embedding_client is None:
+        with _embedding_client_lock:
+            if _embedding_client is None:
+                _embedding_client = EmbeddingClient(
+                    RAG_EMBEDDING_CONCURRENT_REQUESTS, RAG_EMBEDDING_MAX_RETRIES
+                )
+    return _embedding_client
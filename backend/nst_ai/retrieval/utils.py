@@ -2,19 +2,20 @@ import logging
 import os
 from typing import Optional, Union
 
-import requests
 import hashlib
+import numpy as np
 from concurrent.futures import ThreadPoolExecutor
-import time
 
-from urllib.parse import quote
 from huggingface_hub import snapshot_download
 from langchain.retrievers import ContextualCompressionRetriever, EnsembleRetriever
 from langchain_community.retrievers import BM25Retriever
 from langchain_core.documents import Document
 
-from nst_ai.config import VECTOR_DB
+from nst_ai.config import VECTOR_DB, ENABLE_RAG_BM25_INDEX
 from nst_ai.retrieval.vector.factory import VECTOR_DB_CLIENT
+from nst_ai.retrieval.bm25 import BM25Index, get_bm25_index
+from nst_ai.retrieval.embedding_cache import get_cached_embedding_function
+from nst_ai.retrieval.embedding_client import get_embedding_client
 
 from nst_ai.models.users import UserModel
 from nst_ai.models.files import Files
@@ -28,7 +29,6 @@ from nst_ai.utils.access_control import has_access
 from nst_ai.env import (
     SRC_LOG_LEVELS,
     OFFLINE_MODE,
-    ENABLE_FORWARD_USER_INFO_HEADERS,
 )
 from nst_ai.config import (
     RAG_EMBEDDING_QUERY_PREFIX,
@@ -50,6 +50,9 @@ class VectorSearchRetriever(BaseRetriever):
     collection_name: Any
     embedding_function: Any
     top_k: int
+    # Optional dict shared with RerankCompressor, filled with the query
+    # embedding and the stored vectors of the hits so they are not recomputed.
+    vectors: Any = None
 
     def _get_relevant_documents(
         self,
@@ -57,20 +60,30 @@ class VectorSearchRetriever(BaseRetriever):
         *,
         run_manager: CallbackManagerForRetrieverRun,
     ) -> list[Document]:
+        query_embedding = self.embedding_function(query, RAG_EMBEDDING_QUERY_PREFIX)
         result = VECTOR_DB_CLIENT.search(
             collection_name=self.collection_name,
-            vectors=[self.embedding_function(query, RAG_EMBEDDING_QUERY_PREFIX)],
+            vectors=[query_embedding],
             limit=self.top_k,
+            include_vectors=self.vectors is not None,
         )
 
         ids = result.ids[0]
         metadatas = result.metadatas[0]
         documents = result.documents[0]
 
+        if self.vectors is not None:
+            self.vectors[(query, RAG_EMBEDDING_QUERY_PREFIX)] = query_embedding
+            if result.embeddings:
+                for id, vector in zip(ids, result.embeddings[0]):
+                    if vector is not None:
+                        self.vectors[id] = vector
+
         results = []
         for idx in range(len(ids)):
             results.append(
                 Document(
+                    id=ids[idx],
                     metadata=metadatas[idx],
                     page_content=documents[idx],
                 )
@@ -78,6 +91,22 @@ class VectorSearchRetriever(BaseRetriever):
         return results
 
 
+class BM25IndexRetriever(BaseRetriever):
+    bm25_index: Any
+    top_k: int
+
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun,
+    ) -> list[Document]:
+        return [
+            Document(id=id, metadata=metadata, page_content=text)
+            for _, id, text, metadata in self.bm25_index.search(query, self.top_k)
+        ]
+
+
 def query_doc(
     collection_name: str, query_embedding: list[float], k: int, user: UserModel = None
 ):
@@ -114,7 +143,7 @@ def get_doc(collection_name: str, user: UserModel = None):
 
 def query_doc_with_hybrid_search(
     collection_name: str,
-    collection_result: GetResult,
+    collection_result: Union[GetResult, BM25Index],
     query: str,
     embedding_function,
     k: int,
@@ -125,16 +154,25 @@ def query_doc_with_hybrid_search(
 ) -> dict:
     try:
         log.debug(f"query_doc_with_hybrid_search:doc {collection_name}")
-        bm25_retriever = BM25Retriever.from_texts(
-            texts=collection_result.documents[0],
-            metadatas=collection_result.metadatas[0],
-        )
-        bm25_retriever.k = k
+        if isinstance(collection_result, BM25Index):
+            bm25_retriever = BM25IndexRetriever(bm25_index=collection_result, top_k=k)
+        else:
+            bm25_retriever = BM25Retriever.from_texts(
+                texts=collection_result.documents[0],
+                metadatas=collection_result.metadatas[0],
+                ids=collection_result.ids[0],
+            )
+            bm25_retriever.k = k
+
+        # Without a reranker, candidates are scored by cosine similarity against
+        # the vectors already stored in the vector DB instead of re-embedding them.
+        vectors = {} if reranking_function is None else None
 
         vector_search_retriever = VectorSearchRetriever(
             collection_name=collection_name,
             embedding_function=embedding_function,
             top_k=k,
+            vectors=vectors,
         )
 
         if hybrid_bm25_weight <= 0:
@@ -156,6 +194,8 @@ def query_doc_with_hybrid_search(
             top_n=k_reranker,
             reranking_function=reranking_function,
             r_score=r,
+            collection_name=collection_name,
+            vectors=vectors,
         )
 
         compression_retriever = ContextualCompressionRetriever(
@@ -336,9 +376,20 @@ def query_collection_with_hybrid_search(
     error = False
     # Fetch collection data once per collection sequentially
     # Avoid fetching the same data multiple times later
+    # With the BM25 index enabled only the on-disk index is opened, the
+    # collection is read in full just once to build it if it is missing.
     collection_results = {}
     for collection_name in collection_names:
         try:
+            if ENABLE_RAG_BM25_INDEX:
+                log.debug(
+                    f"query_collection_with_hybrid_search:get_bm25_index:collection {collection_name}"
+                )
+                collection_results[collection_name] = get_bm25_index(
+                    collection_name, VECTOR_DB_CLIENT
+                )
+                continue
+
             log.debug(
                 f"query_collection_with_hybrid_search:VECTOR_DB_CLIENT.get:collection {collection_name}"
             )
@@ -408,38 +459,28 @@ def get_embedding_function(
     azure_api_version=None,
 ):
     if embedding_engine == "":
-        return lambda query, prefix=None, user=None: embedding_function.encode(
-            query, **({"prompt": prefix} if prefix else {})
-        ).tolist()
-    elif embedding_engine in ["ollama", "openai", "azure_openai"]:
-        func = lambda query, prefix=None, user=None: generate_embeddings(
-            engine=embedding_engine,
-            model=embedding_model,
-            text=query,
-            prefix=prefix,
-            url=url,
-            key=key,
-            user=user,
-            azure_api_version=azure_api_version,
+        return get_cached_embedding_function(
+            lambda query, prefix=None, user=None: embedding_function.encode(
+                query, **({"prompt": prefix} if prefix else {})
+            ).tolist(),
+            embedding_engine,
+            embedding_model,
         )
-
-        def generate_multiple(query, prefix, user, func):
-            if isinstance(query, list):
-                embeddings = []
-                for i in range(0, len(query), embedding_batch_size):
-                    embeddings.extend(
-                        func(
-                            query[i : i + embedding_batch_size],
-                            prefix=prefix,
-                            user=user,
-                        )
-                    )
-                return embeddings
-            else:
-                return func(query, prefix, user)
-
-        return lambda query, prefix=None, user=None: generate_multiple(
-            query, prefix, user, func
+    elif embedding_engine in ["ollama", "openai", "azure_openai"]:
+        return get_cached_embedding_function(
+            lambda query, prefix=None, user=None: generate_embeddings(
+                engine=embedding_engine,
+                model=embedding_model,
+                text=query,
+                prefix=prefix,
+                url=url,
+                key=key,
+                user=user,
+                azure_api_version=azure_api_version,
+                batch_size=embedding_batch_size,
+            ),
+            embedding_engine,
+            embedding_model,
         )
     else:
         raise ValueError(f"Unknown embedding engine: {embedding_engine}")
@@ -732,41 +773,12 @@ def generate_openai_batch_embeddings(
     prefix: str = None,
     user: UserModel = None,
 ) -> Optional[list[list[float]]]:
-    try:
-        log.debug(
-            f"generate_openai_batch_embeddings:model {model} batch size: {len(texts)}"
-        )
-        json_data = {"input": texts, "model": model}
-        if isinstance(RAG_EMBEDDING_PREFIX_FIELD_NAME, str) and isinstance(prefix, str):
-            json_data[RAG_EMBEDDING_PREFIX_FIELD_NAME] = prefix
-
-        r = requests.post(
-            f"{url}/embeddings",
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {key}",
-                **(
-                    {
-                        "X-NST-AI-User-Name": quote(user.name, safe=" "),
-                        "X-NST-AI-User-Id": user.id,
-                        "X-NST-AI-User-Email": user.email,
-                        "X-NST-AI-User-Role": user.role,
-                    }
-                    if ENABLE_FORWARD_USER_INFO_HEADERS and user
-                    else {}
-                ),
-            },
-            json=json_data,
-        )
-        r.raise_for_status()
-        data = r.json()
-        if "data" in data:
-            return [elem["embedding"] for elem in data["data"]]
-        else:
-            raise "Something went wrong :/"
-    except Exception as e:
-        log.exception(f"Error generating openai batch embeddings: {e}")
-        return None
+    log.debug(
+        f"generate_openai_batch_embeddings:model {model} batch size: {len(texts)}"
+    )
+    return get_embedding_client().embed_sync(
+        "openai", model, texts, url=url, key=key, prefix=prefix, user=user
+    )
 
 
 def generate_azure_openai_batch_embeddings(
@@ -778,49 +790,19 @@ def generate_azure_openai_batch_embeddings(
     prefix: str = None,
     user: UserModel = None,
 ) -> Optional[list[list[float]]]:
-    try:
-        log.debug(
-            f"generate_azure_openai_batch_embeddings:deployment {model} batch size: {len(texts)}"
-        )
-        json_data = {"input": texts}
-        if isinstance(RAG_EMBEDDING_PREFIX_FIELD_NAME, str) and isinstance(prefix, str):
-            json_data[RAG_EMBEDDING_PREFIX_FIELD_NAME] = prefix
-
-        url = f"{url}/openai/deployments/{model}/embeddings?api-version={version}"
-
-        for _ in range(5):
-            r = requests.post(
-                url,
-                headers={
-                    "Content-Type": "application/json",
-                    "api-key": key,
-                    **(
-                        {
-                            "X-NST-AI-User-Name": quote(user.name, safe=" "),
-                            "X-NST-AI-User-Id": user.id,
-                            "X-NST-AI-User-Email": user.email,
-                            "X-NST-AI-User-Role": user.role,
-                        }
-                        if ENABLE_FORWARD_USER_INFO_HEADERS and user
-                        else {}
-                    ),
-                },
-                json=json_data,
-            )
-            if r.status_code == 429:
-                retry = float(r.headers.get("Retry-After", "1"))
-                time.sleep(retry)
-                continue
-            r.raise_for_status()
-            data = r.json()
-            if "data" in data:
-                return [elem["embedding"] for elem in data["data"]]
-            else:
-                raise Exception("Something went wrong :/")
-        return None
-    except Exception as e:
-        log.exception(f"Error generating azure openai batch embeddings: {e}")
-        return None
+    log.debug(
+        f"generate_azure_openai_batch_embeddings:deployment {model} batch size: {len(texts)}"
+    )
+    return get_embedding_client().embed_sync(
+        "azure_openai",
+        model,
+        texts,
+        url=url,
+        key=key,
+        prefix=prefix,
+        user=user,
+        azure_api_version=version,
+    )
 
 
 def generate_ollama_batch_embeddings(
@@ -831,42 +813,12 @@ def generate_ollama_batch_embeddings(
     prefix: str = None,
     user: UserModel = None,
 ) -> Optional[list[list[float]]]:
-    try:
-        log.debug(
-            f"generate_ollama_batch_embeddings:model {model} batch size: {len(texts)}"
-        )
-        json_data = {"input": texts, "model": model}
-        if isinstance(RAG_EMBEDDING_PREFIX_FIELD_NAME, str) and isinstance(prefix, str):
-            json_data[RAG_EMBEDDING_PREFIX_FIELD_NAME] = prefix
-
-        r = requests.post(
-            f"{url}/api/embed",
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {key}",
-                **(
-                    {
-                        "X-NST-AI-User-Name": quote(user.name, safe=" "),
-                        "X-NST-AI-User-Id": user.id,
-                        "X-NST-AI-User-Email": user.email,
-                        "X-NST-AI-User-Role": user.role,
-                    }
-                    if ENABLE_FORWARD_USER_INFO_HEADERS
-                    else {}
-                ),
-            },
-            json=json_data,
-        )
-        r.raise_for_status()
-        data = r.json()
-
-        if "embeddings" in data:
-            return data["embeddings"]
-        else:
-            raise "Something went wrong :/"
-    except Exception as e:
-        log.exception(f"Error generating ollama batch embeddings: {e}")
-        return None
+    log.debug(
+        f"generate_ollama_batch_embeddings:model {model} batch size: {len(texts)}"
+    )
+    return get_embedding_client().embed_sync(
+        "ollama", model, texts, url=url, key=key, prefix=prefix, user=user
+    )
 
 
 def generate_embeddings(
@@ -876,45 +828,31 @@ def generate_embeddings(
     prefix: Union[str, None] = None,
     **kwargs,
 ):
-    url = kwargs.get("url", "")
-    key = kwargs.get("key", "")
-    user = kwargs.get("user")
-
     if prefix is not None and RAG_EMBEDDING_PREFIX_FIELD_NAME is None:
         if isinstance(text, list):
             text = [f"{prefix}{text_element}" for text_element in text]
         else:
             text = f"{prefix}{text}"
 
-    if engine == "ollama":
-        embeddings = generate_ollama_batch_embeddings(
-            **{
-                "model": model,
-                "texts": text if isinstance(text, list) else [text],
-                "url": url,
-                "key": key,
-                "prefix": prefix,
-                "user": user,
-            }
-        )
-        return embeddings[0] if isinstance(text, str) else embeddings
-    elif engine == "openai":
-        embeddings = generate_openai_batch_embeddings(
-            model, text if isinstance(text, list) else [text], url, key, prefix, user
-        )
-        return embeddings[0] if isinstance(text, str) else embeddings
-    elif engine == "azure_openai":
-        azure_api_version = kwargs.get("azure_api_version", "")
-        embeddings = generate_azure_openai_batch_embeddings(
-            model,
-            text if isinstance(text, list) else [text],
-            url,
-            key,
-            azure_api_version,
-            prefix,
-            user,
-        )
-        return embeddings[0] if isinstance(text, str) else embeddings
+    if engine not in ["ollama", "openai", "azure_openai"]:
+        return None
+
+    # Lists are split into batches of `batch_size` that are embedded
+    # concurrently; without a batch size the whole list is one request.
+    embeddings = get_embedding_client().embed_sync(
+        engine,
+        model,
+        text if isinstance(text, list) else [text],
+        url=kwargs.get("url", ""),
+        key=kwargs.get("key", ""),
+        prefix=prefix,
+        user=kwargs.get("user"),
+        azure_api_version=kwargs.get("azure_api_version", ""),
+        batch_size=kwargs.get("batch_size"),
+    )
+    if isinstance(text, str):
+        return embeddings[0] if embeddings else None
+    return embeddings
 
 
 import operator
@@ -929,6 +867,8 @@ class RerankCompressor(BaseDocumentCompressor):
     top_n: int
     reranking_function: Any
     r_score: float
+    collection_name: Any = None
+    vectors: Any = None
 
     class Config:
         extra = "forbid"
@@ -947,13 +887,8 @@ class RerankCompressor(BaseDocumentCompressor):
                 [(query, doc.page_content) for doc in documents]
             )
         else:
-            from sentence_transformers import util
-
-            query_embedding = self.embedding_function(query, RAG_EMBEDDING_QUERY_PREFIX)
-            document_embedding = self.embedding_function(
-                [doc.page_content for doc in documents], RAG_EMBEDDING_CONTENT_PREFIX
-            )
-            scores = util.cos_sim(query_embedding, document_embedding)[0]
+            query_embedding, document_embedding = self._get_embeddings(documents, query)
+            scores = cosine_similarity(query_embedding, document_embedding)
 
         docs_with_scores = list(
             zip(documents, scores.tolist() if not isinstance(scores, list) else scores)
@@ -974,3 +909,72 @@ class RerankCompressor(BaseDocumentCompressor):
             )
             final_results.append(doc)
         return final_results
+
+    def _get_embeddings(
+        self, documents: Sequence[Document], query: str
+    ) -> tuple[list[float], list[list[float]]]:
+        vectors = self.vectors if self.vectors is not None else {}
+
+        query_embedding = vectors.get((query, RAG_EMBEDDING_QUERY_PREFIX))
+        if query_embedding is None:
+            query_embedding = self.embedding_function(query, RAG_EMBEDDING_QUERY_PREFIX)
+
+        # Candidates that only came from BM25 were not part of the vector search
+        # hits, fetch their stored vectors by id in one round-trip.
+        missing_ids = [
+            doc.id for doc in documents if doc.id is not None and doc.id not in vectors
+        ]
+        if missing_ids and self.collection_name is not None:
+            vectors.update(
+                VECTOR_DB_CLIENT.get_vectors(
+                    collection_name=self.collection_name, ids=missing_ids
+                )
+                or {}
+            )
+
+        # Backends that cannot return stored vectors fall back to embedding.
+        missing_docs = [doc for doc in documents if vectors.get(doc.id) is None]
+        if missing_docs:
+            log.debug(f"RerankCompressor: embedding {len(missing_docs)} documents")
+            embedded = self.embedding_function(
+                [doc.page_content for doc in missing_docs],
+                RAG_EMBEDDING_CONTENT_PREFIX,
+            )
+            embedded_by_doc = {
+                id(doc): vector for doc, vector in zip(missing_docs, embedded)
+            }
+        else:
+            embedded_by_doc = {}
+
+        document_embedding = [
+            (
+                embedded_by_doc[id(doc)]
+                if id(doc) in embedded_by_doc
+                else vectors[doc.id]
+            )
+            for doc in documents
+        ]
+        return query_embedding, document_embedding
+
+
+def cosine_similarity(
+    query_embedding: list[float], document_embedding: list[list[float]]
+) -> list[float]:
+    if not document_embedding:
+        return []
+
+    # Stored vectors may be zero-padded (pgvector), which does not change the
+    # cosine similarity, so pad everything to the same dimension.
+    dimension = max(len(query_embedding), *(len(v) for v in document_embedding))
+    query_matrix = np.zeros((1, dimension), dtype=np.float32)
+    query_matrix[0, : len(query_embedding)] = query_embedding
+    document_matrix = np.zeros((len(document_embedding), dimension), dtype=np.float32)
+    for idx, vector in enumerate(document_embedding):
+        document_matrix[idx, : len(vector)] = vector
+
+    query_norm = np.linalg.norm(query_matrix, axis=1, keepdims=True)
+    document_norm = np.linalg.norm(document_matrix, axis=1, keepdims=True)
+    query_matrix /= np.where(query_norm == 0, 1, query_norm)
+    document_matrix /= np.where(document_norm == 0, 1, document_norm)
+
+    return (document_matrix @ query_matrix.T)[:, 0].tolist()
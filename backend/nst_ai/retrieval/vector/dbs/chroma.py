@@ -69,15 +69,24 @@ class ChromaClient(VectorDBBase):
         return self.client.delete_collection(name=collection_name)
 
     def search(
-        self, collection_name: str, vectors: list[list[float | int]], limit: int
+        self,
+        collection_name: str,
+        vectors: list[list[float | int]],
+        limit: int,
+        include_vectors: bool = False,
     ) -> Optional[SearchResult]:
         # Search for the nearest neighbor items based on the vectors and return 'limit' number of results.
         try:
             collection = self.client.get_collection(name=collection_name)
             if collection:
+                include = ["metadatas", "documents", "distances"]
+                if include_vectors:
+                    include.append("embeddings")
+
                 result = collection.query(
                     query_embeddings=vectors,
                     n_results=limit,
+                    include=include,
                 )
 
                 # chromadb has cosine distance, 2 (worst) -> 0 (best). Re-odering to 0 -> 1
@@ -86,12 +95,20 @@ class ChromaClient(VectorDBBase):
                 distances = [2 - dist for dist in distances]
                 distances = [[dist / 2 for dist in distances]]
 
+                embeddings = None
+                if include_vectors and result.get("embeddings") is not None:
+                    embeddings = [
+                        [list(map(float, vector)) for vector in query_vectors]
+                        for query_vectors in result["embeddings"]
+                    ]
+
                 return SearchResult(
                     **{
                         "ids": result["ids"],
                         "distances": distances,
                         "documents": result["documents"],
                         "metadatas": result["metadatas"],
+                        "embeddings": embeddings,
                     }
                 )
             return None
@@ -135,6 +152,23 @@ class ChromaClient(VectorDBBase):
             )
         return None
 
+    def get_vectors(
+        self, collection_name: str, ids: list[str]
+    ) -> Optional[dict[str, list[float]]]:
+        # Get the stored vectors of the given items.
+        try:
+            collection = self.client.get_collection(name=collection_name)
+            if collection:
+                result = collection.get(ids=ids, include=["embeddings"])
+                return {
+                    id: list(map(float, vector))
+                    for id, vector in zip(result["ids"], result["embeddings"])
+                }
+            return None
+        except Exception as e:
+            log.debug(f"Error getting vectors from {collection_name}: {e}")
+            return None
+
     def insert(self, collection_name: str, items: list[VectorItem]):
         # Insert the items into the collection, if the collection does not exist, it will be created.
         collection = self.client.get_or_create_collection(
@@ -151,7 +151,11 @@ class ElasticsearchClient(VectorDBBase):
 
     # Status: works
     def search(
-        self, collection_name: str, vectors: list[list[float]], limit: int
+        self,
+        collection_name: str,
+        vectors: list[list[float]],
+        limit: int,
+        include_vectors: bool = False,
     ) -> Optional[SearchResult]:
         query = {
             "size": limit,
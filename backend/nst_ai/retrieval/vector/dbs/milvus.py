@@ -56,11 +56,14 @@ class MilvusClient(VectorDBBase):
             }
         )
 
-    def _result_to_search_result(self, result) -> SearchResult:
+    def _result_to_search_result(
+        self, result, include_vectors: bool = False
+    ) -> SearchResult:
         ids = []
         distances = []
         documents = []
         metadatas = []
+        embeddings = []
         for match in result:
             _ids = []
             _distances = []
@@ -78,12 +81,14 @@ class MilvusClient(VectorDBBase):
             distances.append(_distances)
             documents.append(_documents)
             metadatas.append(_metadatas)
+            embeddings.append([item.get("entity", {}).get("vector") for item in match])
         return SearchResult(
             **{
                 "ids": ids,
                 "distances": distances,
                 "documents": documents,
                 "metadatas": metadatas,
+                "embeddings": embeddings if include_vectors else None,
             }
         )
 
@@ -169,7 +174,11 @@ class MilvusClient(VectorDBBase):
         )
 
     def search(
-        self, collection_name: str, vectors: list[list[float | int]], limit: int
+        self,
+        collection_name: str,
+        vectors: list[list[float | int]],
+        limit: int,
+        include_vectors: bool = False,
     ) -> Optional[SearchResult]:
         # Search for the nearest neighbor items based on the vectors and return 'limit' number of results.
         collection_name = collection_name.replace("-", "_")
@@ -180,10 +189,30 @@ class MilvusClient(VectorDBBase):
             collection_name=f"{self.collection_prefix}_{collection_name}",
             data=vectors,
             limit=limit,
-            output_fields=["data", "metadata"],
+            output_fields=[
+                "data",
+                "metadata",
+                *(["vector"] if include_vectors else []),
+            ],
             # search_params=search_params # Potentially add later if needed
         )
-        return self._result_to_search_result(result)
+        return self._result_to_search_result(result, include_vectors)
+
+    def get_vectors(
+        self, collection_name: str, ids: list[str]
+    ) -> Optional[dict[str, list[float]]]:
+        # Get the stored vectors of the given items.
+        collection_name = collection_name.replace("-", "_")
+        try:
+            results = self.client.query(
+                collection_name=f"{self.collection_prefix}_{collection_name}",
+                filter=f"id in {json.dumps(ids)}",
+                output_fields=["id", "vector"],
+            )
+            return {item.get("id"): item.get("vector") for item in results}
+        except Exception as e:
+            log.exception(f"Error getting vectors from '{collection_name}': {e}")
+            return None
 
     def query(self, collection_name: str, filter: dict, limit: Optional[int] = None):
         # Construct the filter string for querying
@@ -319,6 +319,7 @@ class PgvectorClient(VectorDBBase):
         collection_name: str,
         vectors: List[List[float]],
         limit: Optional[int] = None,
+        include_vectors: bool = False,
     ) -> Optional[SearchResult]:
         try:
             if not vectors:
@@ -359,6 +360,8 @@ class PgvectorClient(VectorDBBase):
             else:
                 result_fields.append(DocumentChunk.text)
                 result_fields.append(DocumentChunk.vmetadata)
+            if include_vectors:
+                result_fields.append(DocumentChunk.vector)
             result_fields.append(
                 (DocumentChunk.vector.cosine_distance(query_vectors.c.q_vector)).label(
                     "distance"
@@ -385,6 +388,7 @@ class PgvectorClient(VectorDBBase):
                     subq.c.text,
                     subq.c.vmetadata,
                     subq.c.distance,
+                    *([subq.c.vector] if include_vectors else []),
                 )
                 .select_from(query_vectors)
                 .join(subq, true())
@@ -398,6 +402,7 @@ class PgvectorClient(VectorDBBase):
             distances = [[] for _ in range(num_queries)]
             documents = [[] for _ in range(num_queries)]
             metadatas = [[] for _ in range(num_queries)]
+            embeddings = [[] for _ in range(num_queries)] if include_vectors else None
 
             if not results:
                 return SearchResult(
@@ -405,6 +410,7 @@ class PgvectorClient(VectorDBBase):
                     distances=distances,
                     documents=documents,
                     metadatas=metadatas,
+                    embeddings=embeddings,
                 )
 
             for row in results:
@@ -415,9 +421,19 @@ class PgvectorClient(VectorDBBase):
                 distances[qid].append((2.0 - row.distance) / 2.0)
                 documents[qid].append(row.text)
                 metadatas[qid].append(row.vmetadata)
+                if include_vectors:
+                    embeddings[qid].append(
+                        [float(x) for x in row.vector]
+                        if row.vector is not None
+                        else None
+                    )
 
             return SearchResult(
-                ids=ids, distances=distances, documents=documents, metadatas=metadatas
+                ids=ids,
+                distances=distances,
+                documents=documents,
+                metadatas=metadatas,
+                embeddings=embeddings,
             )
         except Exception as e:
             log.exception(f"Error during search: {e}")
@@ -523,6 +539,28 @@ class PgvectorClient(VectorDBBase):
             log.exception(f"Error during get: {e}")
             return None
 
+    def get_vectors(
+        self, collection_name: str, ids: List[str]
+    ) -> Optional[Dict[str, List[float]]]:
+        try:
+            results = (
+                self.session.query(DocumentChunk.id, DocumentChunk.vector)
+                .filter(
+                    DocumentChunk.collection_name == collection_name,
+                    DocumentChunk.id.in_(ids),
+                )
+                .all()
+            )
+            return {
+                row.id: [float(x) for x in row.vector]
+                for row in results
+                if row.vector is not None
+            }
+        except Exception as e:
+            self.session.rollback()
+            log.exception(f"Error during get_vectors: {e}")
+            return None
+
     def delete(
         self,
         collection_name: str,
@@ -136,7 +136,11 @@ class QdrantClient(VectorDBBase):
         )
 
     def search(
-        self, collection_name: str, vectors: list[list[float | int]], limit: int
+        self,
+        collection_name: str,
+        vectors: list[list[float | int]],
+        limit: int,
+        include_vectors: bool = False,
     ) -> Optional[SearchResult]:
         # Search for the nearest neighbor items based on the vectors and return 'limit' number of results.
         if limit is None:
@@ -146,6 +150,7 @@ class QdrantClient(VectorDBBase):
             collection_name=f"{self.collection_prefix}_{collection_name}",
             query=vectors[0],
             limit=limit,
+            with_vectors=include_vectors,
         )
         get_result = self._result_to_get_result(query_response.points)
         return SearchResult(
@@ -154,8 +159,29 @@ class QdrantClient(VectorDBBase):
             metadatas=get_result.metadatas,
             # qdrant distance is [-1, 1], normalize to [0, 1]
             distances=[[(point.score + 1.0) / 2.0 for point in query_response.points]],
+            embeddings=(
+                [[point.vector for point in query_response.points]]
+                if include_vectors
+                else None
+            ),
         )
 
+    def get_vectors(
+        self, collection_name: str, ids: list[str]
+    ) -> Optional[dict[str, list[float]]]:
+        # Get the stored vectors of the given points.
+        try:
+            points = self.client.retrieve(
+                collection_name=f"{self.collection_prefix}_{collection_name}",
+                ids=ids,
+                with_payload=False,
+                with_vectors=True,
+            )
+            return {str(point.id): point.vector for point in points}
+        except Exception as e:
+            log.exception(f"Error getting vectors from '{collection_name}': {e}")
+            return None
+
     def query(self, collection_name: str, filter: dict, limit: Optional[int] = None):
         # Construct the filter string for querying
         if not self.has_collection(collection_name):
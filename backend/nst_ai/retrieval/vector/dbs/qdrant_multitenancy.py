@@ -234,7 +234,11 @@ class QdrantClient(VectorDBBase):
         )
 
     def search(
-        self, collection_name: str, vectors: List[List[float | int]], limit: int
+        self,
+        collection_name: str,
+        vectors: List[List[float | int]],
+        limit: int,
+        include_vectors: bool = False,
     ) -> Optional[SearchResult]:
         """
         Search for the nearest neighbor items based on the vectors with tenant isolation.
@@ -252,6 +256,7 @@ class QdrantClient(VectorDBBase):
             query=vectors[0],
             limit=limit,
             query_filter=models.Filter(must=[tenant_filter]),
+            with_vectors=include_vectors,
         )
         get_result = self._result_to_get_result(query_response.points)
         return SearchResult(
@@ -259,7 +264,34 @@ class QdrantClient(VectorDBBase):
             documents=get_result.documents,
             metadatas=get_result.metadatas,
             distances=[[(point.score + 1.0) / 2.0 for point in query_response.points]],
+            embeddings=(
+                [[point.vector for point in query_response.points]]
+                if include_vectors
+                else None
+            ),
+        )
+
+    def get_vectors(
+        self, collection_name: str, ids: List[str]
+    ) -> Optional[Dict[str, List[float]]]:
+        """
+        Get the stored vectors of the given points with tenant isolation.
+        """
+        if not self.client or not ids:
+            return None
+        mt_collection, tenant_id = self._get_collection_and_tenant_id(collection_name)
+        if not self.client.collection_exists(collection_name=mt_collection):
+            return None
+        points = self.client.query_points(
+            collection_name=mt_collection,
+            query_filter=models.Filter(
+                must=[_tenant_filter(tenant_id), models.HasIdCondition(has_id=ids)]
+            ),
+            limit=len(ids),
+            with_payload=False,
+            with_vectors=True,
         )
+        return {str(point.id): point.vector for point in points.points}
 
     def query(
         self, collection_name: str, filter: Dict[str, Any], limit: Optional[int] = None
@@ -1,6 +1,10 @@
 from nst_ai.retrieval.vector.main import VectorDBBase
 from nst_ai.retrieval.vector.type import VectorType
-from nst_ai.config import VECTOR_DB, ENABLE_QDRANT_MULTITENANCY_MODE
+from nst_ai.config import (
+    VECTOR_DB,
+    ENABLE_QDRANT_MULTITENANCY_MODE,
+    ENABLE_RAG_BM25_INDEX,
+)
 
 
 class Vector:
@@ -53,3 +57,8 @@ class Vector:
 
 
 VECTOR_DB_CLIENT = Vector.get_vector(VECTOR_DB)
+
+if ENABLE_RAG_BM25_INDEX:
+    from nst_ai.retrieval.bm25 import BM25IndexedVectorDB
+
+    VECTOR_DB_CLIENT = BM25IndexedVectorDB(VECTOR_DB_CLIENT)
@@ -14,6 +14,7 @@ class GetResult(BaseModel):
     ids: Optional[List[List[str]]]
     documents: Optional[List[List[str]]]
     metadatas: Optional[List[List[Any]]]
+    embeddings: Optional[List[List[Any]]] = None
 
 
 class SearchResult(GetResult):
@@ -53,9 +54,18 @@ class VectorDBBase(ABC):
 
     @abstractmethod
     def search(
-        self, collection_name: str, vectors: List[List[Union[float, int]]], limit: int
+        self,
+        collection_name: str,
+        vectors: List[List[Union[float, int]]],
+        limit: int,
+        include_vectors: bool = False,
     ) -> Optional[SearchResult]:
-        """Search for similar vectors in a collection."""
+        """
+        Search for similar vectors in a collection.
+
+        With include_vectors, backends that can return the stored vectors of
+        the hits put them in SearchResult.embeddings.
+        """
         pass
 
     @abstractmethod
@@ -70,6 +80,15 @@ class VectorDBBase(ABC):
         """Retrieve all vectors from a collection."""
         pass
 
+    def get_vectors(
+        self, collection_name: str, ids: List[str]
+    ) -> Optional[Dict[str, List[float]]]:
+        """
+        Retrieve the stored vectors for the given ids, keyed by id.
+        Returns None if the backend does not support fetching vectors.
+        """
+        return None
+
     @abstractmethod
     def delete(
         self,
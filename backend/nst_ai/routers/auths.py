@@ -465,14 +465,14 @@ async def signin(request: Request, response: Response, form_data: SigninForm):
         if WEBUI_AUTH_TRUSTED_NAME_HEADER:
             name = request.headers.get(WEBUI_AUTH_TRUSTED_NAME_HEADER, email)
 
-        if not Users.get_user_by_email(email.lower()):
+        if not await Users.get_user_by_email_async(email.lower()):
             await signup(
                 request,
                 response,
                 SignupForm(email=email, password=str(uuid.uuid4()), name=name),
             )
 
-        user = Auths.authenticate_user_by_email(email)
+        user = await Auths.authenticate_user_by_email_async(email)
         if WEBUI_AUTH_TRUSTED_GROUPS_HEADER and user and user.role != "admin":
             group_names = request.headers.get(
                 WEBUI_AUTH_TRUSTED_GROUPS_HEADER, ""
@@ -486,8 +486,10 @@ async def signin(request: Request, response: Response, form_data: SigninForm):
         admin_email = "admin@localhost"
         admin_password = "admin"
 
-        if Users.get_user_by_email(admin_email.lower()):
-            user = Auths.authenticate_user(admin_email.lower(), admin_password)
+        if await Users.get_user_by_email_async(admin_email.lower()):
+            user = await Auths.authenticate_user_async(
+                admin_email.lower(), admin_password
+            )
         else:
             if Users.get_num_users() != 0:
                 raise HTTPException(400, detail=ERROR_MESSAGES.EXISTING_USERS)
@@ -498,9 +500,13 @@ async def signin(request: Request, response: Response, form_data: SigninForm):
                 SignupForm(email=admin_email, password=admin_password, name="User"),
             )
 
-            user = Auths.authenticate_user(admin_email.lower(), admin_password)
+            user = await Auths.authenticate_user_async(
+                admin_email.lower(), admin_password
+            )
     else:
-        user = Auths.authenticate_user(form_data.email.lower(), form_data.password)
+        user = await Auths.authenticate_user_async(
+            form_data.email.lower(), form_data.password
+        )
 
     if user:
 
@@ -6,6 +6,7 @@ from typing import Optional
 from nst_ai.utils.auth import get_admin_user, get_verified_user
 from nst_ai.config import get_config, save_config
 from nst_ai.config import BannerModel
+from nst_ai.models.models import MODEL_LIST_CACHE
 
 from nst_ai.utils.tools import get_tool_server_data, get_tool_servers_data
 
@@ -25,6 +26,7 @@ class ImportConfigForm(BaseModel):
 @router.post("/import", response_model=dict)
 async def import_config(form_data: ImportConfigForm, user=Depends(get_admin_user)):
     save_config(form_data.config)
+    MODEL_LIST_CACHE.invalidate()
     return get_config()
 
 
@@ -68,6 +70,7 @@ async def set_connections_config(
     request.app.state.config.ENABLE_BASE_MODELS_CACHE = (
         form_data.ENABLE_BASE_MODELS_CACHE
     )
+    MODEL_LIST_CACHE.invalidate()
 
     return {
         "ENABLE_DIRECT_CONNECTIONS": request.app.state.config.ENABLE_DIRECT_CONNECTIONS,
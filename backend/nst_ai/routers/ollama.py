@@ -1,7 +1,3 @@
-# TODO: Implement a more intelligent load balancing mechanism for distributing requests among multiple backend instances.
-# Current implementation uses a simple round-robin approach (random.choice). Consider incorporating algorithms like weighted round-robin,
-# least connections, or least response time for better resource utilization and performance optimization.
-
 import asyncio
 import json
 import logging
@@ -40,7 +36,7 @@ from pydantic import BaseModel, ConfigDict, validator
 from starlette.background import BackgroundTask
 
 
-from nst_ai.models.models import Models
+from nst_ai.models.models import MODEL_LIST_CACHE, Models
 from nst_ai.utils.misc import (
     calculate_sha256,
 )
@@ -50,11 +46,16 @@ from nst_ai.utils.payload import (
     apply_model_system_prompt_to_body,
 )
 from nst_ai.utils.auth import get_admin_user, get_verified_user
-from nst_ai.utils.access_control import has_access
+from nst_ai.utils.session_pool import HTTP_SESSION_POOL
+from nst_ai.utils.routing import UpstreamRouter
+from nst_ai.utils.circuit_breaker import ConnectionHealth
+from nst_ai.utils.access_control import filter_accessible, has_access
 
 
 from nst_ai.config import (
     UPLOAD_DIR,
+    OLLAMA_ROUTING_STRATEGY,
+    OLLAMA_ROUTING_RESIDENT_TTL,
 )
 from nst_ai.env import (
     ENV,
@@ -70,6 +71,15 @@ from nst_ai.constants import ERROR_MESSAGES
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["OLLAMA"])
 
+OLLAMA_ROUTER = UpstreamRouter(
+    "ollama", OLLAMA_ROUTING_STRATEGY, OLLAMA_ROUTING_RESIDENT_TTL
+)
+OLLAMA_HEALTH = ConnectionHealth("Ollama")
+
+# The event loop only keeps weak references to tasks, these are held until
+# they are done.
+RESIDENT_REFRESH_TASKS: set[asyncio.Task] = set()
+
 
 ##########################################
 #
@@ -81,26 +91,26 @@ log.setLevel(SRC_LOG_LEVELS["OLLAMA"])
 async def send_get_request(url, key=None, user: UserModel = None):
     timeout = aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT_MODEL_LIST)
     try:
-        async with aiohttp.ClientSession(timeout=timeout, trust_env=True) as session:
-            async with session.get(
-                url,
-                headers={
-                    "Content-Type": "application/json",
-                    **({"Authorization": f"Bearer {key}"} if key else {}),
-                    **(
-                        {
-                            "X-NST-AI-User-Name": quote(user.name, safe=" "),
-                            "X-NST-AI-User-Id": user.id,
-                            "X-NST-AI-User-Email": user.email,
-                            "X-NST-AI-User-Role": user.role,
-                        }
-                        if ENABLE_FORWARD_USER_INFO_HEADERS and user
-                        else {}
-                    ),
-                },
-                ssl=AIOHTTP_CLIENT_SESSION_SSL,
-            ) as response:
-                return await response.json()
+        async with HTTP_SESSION_POOL.get_session(url).get(
+            url,
+            headers={
+                "Content-Type": "application/json",
+                **({"Authorization": f"Bearer {key}"} if key else {}),
+                **(
+                    {
+                        "X-NST-AI-User-Name": quote(user.name, safe=" "),
+                        "X-NST-AI-User-Id": user.id,
+                        "X-NST-AI-User-Email": user.email,
+                        "X-NST-AI-User-Role": user.role,
+                    }
+                    if ENABLE_FORWARD_USER_INFO_HEADERS and user
+                    else {}
+                ),
+            },
+            ssl=AIOHTTP_CLIENT_SESSION_SSL,
+            timeout=timeout,
+        ) as response:
+            return await response.json()
     except Exception as e:
         # Handle connection error here
         log.error(f"Connection error: {e}")
@@ -109,10 +119,12 @@ async def send_get_request(url, key=None, user: UserModel = None):
 
 async def cleanup_response(
     response: Optional[aiohttp.ClientResponse],
-    session: Optional[aiohttp.ClientSession],
+    session: Optional[aiohttp.ClientSession] = None,
 ):
+    # Pooled sessions stay open; releasing hands the connection back for
+    # reuse, or closes it if the body was not read to the end.
     if response:
-        response.close()
+        response.release()
     if session:
         await session.close()
 
@@ -125,15 +137,24 @@ async def send_post_request(
     content_type: Optional[str] = None,
     user: UserModel = None,
     metadata: Optional[dict] = None,
+    route_url: Optional[str] = None,
 ):
-
+    # `route_url` is the OLLAMA_BASE_URLS entry picked by the router; the
+    # request counts as in flight there until its response is released.
     r = None
-    try:
-        session = aiohttp.ClientSession(
-            trust_env=True, timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT)
-        )
+    streaming = False
+    token = await OLLAMA_ROUTER.acquire(route_url) if route_url else None
 
-        r = await session.post(
+    async def cleanup():
+        nonlocal token
+        await cleanup_response(r)
+        if token:
+            await OLLAMA_ROUTER.release(route_url, token)
+            token = None
+
+    try:
+        start = time.monotonic()
+        r = await HTTP_SESSION_POOL.get_session(url).post(
             url,
             data=payload,
             headers={
@@ -156,12 +177,19 @@ async def send_post_request(
                 ),
             },
             ssl=AIOHTTP_CLIENT_SESSION_SSL,
+            timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT),
         )
+        if route_url:
+            OLLAMA_ROUTER.record_latency(route_url, time.monotonic() - start)
+            if r.status >= 500:
+                OLLAMA_HEALTH.record_failure(route_url, f"HTTP {r.status}")
+            else:
+                OLLAMA_HEALTH.record_success(route_url)
 
         if r.ok is False:
             try:
                 res = await r.json()
-                await cleanup_response(r, session)
+                await cleanup()
                 if "error" in res:
                     raise HTTPException(status_code=r.status, detail=res["error"])
             except HTTPException as e:
@@ -180,13 +208,12 @@ async def send_post_request(
             if content_type:
                 response_headers["Content-Type"] = content_type
 
+            streaming = True
             return StreamingResponse(
                 r.content,
                 status_code=r.status,
                 headers=response_headers,
-                background=BackgroundTask(
-                    cleanup_response, response=r, session=session
-                ),
+                background=BackgroundTask(cleanup),
             )
         else:
             res = await r.json()
@@ -196,14 +223,48 @@ async def send_post_request(
         raise e  # Re-raise HTTPException to be handled by FastAPI
     except Exception as e:
         detail = f"Ollama: {e}"
+        if route_url and r is None:
+            OLLAMA_HEALTH.record_failure(route_url, str(e))
 
         raise HTTPException(
             status_code=r.status if r else 500,
             detail=detail if e else "NST-Ai: Server Connection Error",
         )
     finally:
-        if not stream:
-            await cleanup_response(r, session)
+        if not streaming:
+            await cleanup()
+
+
+async def send_get_request_with_health(
+    url: str, base_url: str, key=None, user: UserModel = None
+):
+    response = await send_get_request(url, key, user=user)
+    if response is None:
+        OLLAMA_HEALTH.record_failure(base_url, f"GET {url} failed")
+    else:
+        OLLAMA_HEALTH.record_success(base_url)
+    return response
+
+
+def get_health_checks(app: FastAPI) -> dict:
+    """Health check per enabled connection, for OLLAMA_HEALTH.run."""
+    checks = {}
+    if not app.state.config.ENABLE_OLLAMA_API:
+        return checks
+
+    for idx, url in enumerate(app.state.config.OLLAMA_BASE_URLS):
+        api_config = app.state.config.OLLAMA_API_CONFIGS.get(
+            str(idx),
+            app.state.config.OLLAMA_API_CONFIGS.get(url, {}),  # Legacy support
+        )
+        if not api_config.get("enable", True):
+            continue
+
+        async def check(url=url, key=api_config.get("key", None)):
+            return await send_get_request(f"{url}/api/version", key) is not None
+
+        checks[url] = check
+    return checks
 
 
 def get_api_key(idx, url, configs):
@@ -293,6 +354,11 @@ async def get_config(request: Request, user=Depends(get_admin_user)):
     }
 
 
+@router.get("/health")
+async def get_connection_health(request: Request, user=Depends(get_admin_user)):
+    return OLLAMA_HEALTH.get_status(request.app.state.config.OLLAMA_BASE_URLS)
+
+
 class OllamaConfigForm(BaseModel):
     ENABLE_OLLAMA_API: Optional[bool] = None
     OLLAMA_BASE_URLS: list[str]
@@ -316,6 +382,8 @@ async def update_config(
         if key in keys
     }
 
+    MODEL_LIST_CACHE.invalidate()
+
     return {
         "ENABLE_OLLAMA_API": request.app.state.config.ENABLE_OLLAMA_API,
         "OLLAMA_BASE_URLS": request.app.state.config.OLLAMA_BASE_URLS,
@@ -345,10 +413,15 @@ async def get_all_models(request: Request, user: UserModel = None):
     if request.app.state.config.ENABLE_OLLAMA_API:
         request_tasks = []
         for idx, url in enumerate(request.app.state.config.OLLAMA_BASE_URLS):
-            if (str(idx) not in request.app.state.config.OLLAMA_API_CONFIGS) and (
+            if not OLLAMA_HEALTH.allow_request(url):
+                # Circuit open: don't wait on a connection known to be down.
+                request_tasks.append(asyncio.ensure_future(asyncio.sleep(0, None)))
+            elif (str(idx) not in request.app.state.config.OLLAMA_API_CONFIGS) and (
                 url not in request.app.state.config.OLLAMA_API_CONFIGS  # Legacy support
             ):
-                request_tasks.append(send_get_request(f"{url}/api/tags", user=user))
+                request_tasks.append(
+                    send_get_request_with_health(f"{url}/api/tags", url, user=user)
+                )
             else:
                 api_config = request.app.state.config.OLLAMA_API_CONFIGS.get(
                     str(idx),
@@ -362,7 +435,9 @@ async def get_all_models(request: Request, user: UserModel = None):
 
                 if enable:
                     request_tasks.append(
-                        send_get_request(f"{url}/api/tags", key, user=user)
+                        send_get_request_with_health(
+                            f"{url}/api/tags", url, key, user=user
+                        )
                     )
                 else:
                     request_tasks.append(asyncio.ensure_future(asyncio.sleep(0, None)))
@@ -439,15 +514,15 @@ async def get_all_models(request: Request, user: UserModel = None):
 
 async def get_filtered_models(models, user):
     # Filter models based on user access control
-    filtered_models = []
-    for model in models.get("models", []):
-        model_info = Models.get_model_by_id(model["model"])
-        if model_info:
-            if user.id == model_info.user_id or has_access(
-                user.id, type="read", access_control=model_info.access_control
-            ):
-                filtered_models.append(model)
-    return filtered_models
+    model_infos = Models.get_models_by_ids(
+        [model["model"] for model in models.get("models", [])]
+    )
+    accessible_ids = {
+        model_info.id for model_info in filter_accessible(user.id, model_infos, "read")
+    }
+    return [
+        model for model in models.get("models", []) if model["model"] in accessible_ids
+    ]
 
 
 @router.get("/api/tags")
@@ -516,7 +591,9 @@ async def get_ollama_loaded_models(request: Request, user=Depends(get_admin_user
     if request.app.state.config.ENABLE_OLLAMA_API:
         request_tasks = []
         for idx, url in enumerate(request.app.state.config.OLLAMA_BASE_URLS):
-            if (str(idx) not in request.app.state.config.OLLAMA_API_CONFIGS) and (
+            if OLLAMA_HEALTH.is_open(url):
+                request_tasks.append(asyncio.ensure_future(asyncio.sleep(0, None)))
+            elif (str(idx) not in request.app.state.config.OLLAMA_API_CONFIGS) and (
                 url not in request.app.state.config.OLLAMA_API_CONFIGS  # Legacy support
             ):
                 request_tasks.append(send_get_request(f"{url}/api/ps", user=user))
@@ -1037,7 +1114,7 @@ async def embed(
             model = f"{model}:latest"
 
         if model in models:
-            url_idx = random.choice(models[model]["urls"])
+            url_idx = await select_url_idx(request, model)
         else:
             raise HTTPException(
                 status_code=400,
@@ -1124,7 +1201,7 @@ async def embeddings(
             model = f"{model}:latest"
 
         if model in models:
-            url_idx = random.choice(models[model]["urls"])
+            url_idx = await select_url_idx(request, model)
         else:
             raise HTTPException(
                 status_code=400,
@@ -1217,7 +1294,7 @@ async def generate_completion(
             model = f"{model}:latest"
 
         if model in models:
-            url_idx = random.choice(models[model]["urls"])
+            url_idx = await select_url_idx(request, model)
         else:
             raise HTTPException(
                 status_code=400,
@@ -1239,6 +1316,7 @@ async def generate_completion(
         payload=form_data.model_dump_json(exclude_none=True).encode(),
         key=get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS),
         user=user,
+        route_url=url,
     )
 
 
@@ -1276,6 +1354,56 @@ class GenerateChatCompletionForm(BaseModel):
     )
 
 
+async def refresh_resident_models(request: Request, url_idx: int, url: str):
+    api_config = request.app.state.config.OLLAMA_API_CONFIGS.get(
+        str(url_idx),
+        request.app.state.config.OLLAMA_API_CONFIGS.get(url, {}),  # Legacy support
+    )
+    res = await send_get_request(
+        f"{url}/api/ps",
+        get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS),
+    )
+
+    models = set()
+    prefix_id = api_config.get("prefix_id", None)
+    for model in (res or {}).get("models", []):
+        name = model.get("model") or model.get("name")
+        models.add(f"{prefix_id}.{name}" if prefix_id else name)
+    OLLAMA_ROUTER.set_resident(url, models)
+
+
+async def select_url_idx(request: Request, model: str) -> int:
+    url_indices = request.app.state.OLLAMA_MODELS[model].get("urls", [])
+    candidates = {
+        url_idx: request.app.state.config.OLLAMA_BASE_URLS[url_idx]
+        for url_idx in url_indices
+    }
+    # Skip connections whose circuit is open, unless that leaves nothing.
+    candidates = {
+        url_idx: url
+        for url_idx, url in candidates.items()
+        if not OLLAMA_HEALTH.is_open(url)
+    } or candidates
+
+    if OLLAMA_ROUTER.strategy == "resident" and len(candidates) > 1:
+        # Refresh in the background; until then the last known state (or
+        # none at all) is used so that routing never waits on /api/ps.
+        for url_idx, url in candidates.items():
+            if OLLAMA_ROUTER.is_resident_stale(url):
+                # Bump the timestamp first so concurrent requests don't all
+                # schedule their own refresh.
+                OLLAMA_ROUTER.set_resident(
+                    url, OLLAMA_ROUTER.resident.get(url, (0.0, set()))[1]
+                )
+                task = asyncio.create_task(
+                    refresh_resident_models(request, url_idx, url)
+                )
+                RESIDENT_REFRESH_TASKS.add(task)
+                task.add_done_callback(RESIDENT_REFRESH_TASKS.discard)
+
+    return await OLLAMA_ROUTER.select(model, candidates)
+
+
 async def get_ollama_url(request: Request, model: str, url_idx: Optional[int] = None):
     if url_idx is None:
         models = request.app.state.OLLAMA_MODELS
@@ -1284,7 +1412,7 @@ async def get_ollama_url(request: Request, model: str, url_idx: Optional[int] =
                 status_code=400,
                 detail=ERROR_MESSAGES.MODEL_NOT_FOUND(model),
             )
-        url_idx = random.choice(models[model].get("urls", []))
+        url_idx = await select_url_idx(request, model)
     url = request.app.state.config.OLLAMA_BASE_URLS[url_idx]
     return url, url_idx
 
@@ -1372,6 +1500,7 @@ async def generate_chat_completion(
         content_type="application/x-ndjson",
         user=user,
         metadata=metadata,
+        route_url=url,
     )
 
 
@@ -1478,6 +1607,7 @@ async def generate_openai_completion(
         key=get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS),
         user=user,
         metadata=metadata,
+        route_url=url,
     )
 
 
@@ -1560,6 +1690,7 @@ async def generate_openai_chat_completion(
         key=get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS),
         user=user,
         metadata=metadata,
+        route_url=url,
     )
 
 
@@ -1619,15 +1750,12 @@ async def get_openai_models(
 
     if user.role == "user" and not BYPASS_MODEL_ACCESS_CONTROL:
         # Filter models based on user access control
-        filtered_models = []
-        for model in models:
-            model_info = Models.get_model_by_id(model["id"])
-            if model_info:
-                if user.id == model_info.user_id or has_access(
-                    user.id, type="read", access_control=model_info.access_control
-                ):
-                    filtered_models.append(model)
-        models = filtered_models
+        model_infos = Models.get_models_by_ids([model["id"] for model in models])
+        accessible_ids = {
+            model_info.id
+            for model_info in filter_accessible(user.id, model_infos, "read")
+        }
+        models = [model for model in models if model["id"] in accessible_ids]
 
     return {
         "data": models,
@@ -16,7 +16,7 @@ from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
 from starlette.background import BackgroundTask
 
-from nst_ai.models.models import Models
+from nst_ai.models.models import MODEL_LIST_CACHE, Models
 from nst_ai.config import (
     CACHE_DIR,
 )
@@ -43,12 +43,16 @@ from nst_ai.utils.misc import (
 )
 
 from nst_ai.utils.auth import get_admin_user, get_verified_user
-from nst_ai.utils.access_control import has_access
+from nst_ai.utils.session_pool import HTTP_SESSION_POOL
+from nst_ai.utils.circuit_breaker import ConnectionHealth
+from nst_ai.utils.access_control import filter_accessible, has_access
 
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["OPENAI"])
 
+OPENAI_HEALTH = ConnectionHealth("OpenAI")
+
 
 ##########################################
 #
@@ -60,37 +64,75 @@ log.setLevel(SRC_LOG_LEVELS["OPENAI"])
 async def send_get_request(url, key=None, user: UserModel = None):
     timeout = aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT_MODEL_LIST)
     try:
-        async with aiohttp.ClientSession(timeout=timeout, trust_env=True) as session:
-            async with session.get(
-                url,
-                headers={
-                    **({"Authorization": f"Bearer {key}"} if key else {}),
-                    **(
-                        {
-                            "X-NST-AI-User-Name": quote(user.name, safe=" "),
-                            "X-NST-AI-User-Id": user.id,
-                            "X-NST-AI-User-Email": user.email,
-                            "X-NST-AI-User-Role": user.role,
-                        }
-                        if ENABLE_FORWARD_USER_INFO_HEADERS and user
-                        else {}
-                    ),
-                },
-                ssl=AIOHTTP_CLIENT_SESSION_SSL,
-            ) as response:
-                return await response.json()
+        async with HTTP_SESSION_POOL.get_session(url).get(
+            url,
+            headers={
+                **({"Authorization": f"Bearer {key}"} if key else {}),
+                **(
+                    {
+                        "X-NST-AI-User-Name": quote(user.name, safe=" "),
+                        "X-NST-AI-User-Id": user.id,
+                        "X-NST-AI-User-Email": user.email,
+                        "X-NST-AI-User-Role": user.role,
+                    }
+                    if ENABLE_FORWARD_USER_INFO_HEADERS and user
+                    else {}
+                ),
+            },
+            ssl=AIOHTTP_CLIENT_SESSION_SSL,
+            timeout=timeout,
+        ) as response:
+            return await response.json()
     except Exception as e:
         # Handle connection error here
         log.error(f"Connection error: {e}")
         return None
 
 
+async def send_get_request_with_health(
+    url: str, base_url: str, key=None, user: UserModel = None
+):
+    response = await send_get_request(url, key, user=user)
+    if response is None:
+        OPENAI_HEALTH.record_failure(base_url, f"GET {url} failed")
+    else:
+        OPENAI_HEALTH.record_success(base_url)
+    return response
+
+
+def get_health_checks(app: FastAPI) -> dict:
+    """Health check per enabled connection, for OPENAI_HEALTH.run."""
+    checks = {}
+    if not app.state.config.ENABLE_OPENAI_API:
+        return checks
+
+    for idx, url in enumerate(app.state.config.OPENAI_API_BASE_URLS):
+        api_config = app.state.config.OPENAI_API_CONFIGS.get(
+            str(idx),
+            app.state.config.OPENAI_API_CONFIGS.get(url, {}),  # Legacy support
+        )
+        # Azure deployments have no model listing endpoint to probe; they are
+        # only tracked through live traffic.
+        if not api_config.get("enable", True) or api_config.get("azure", False):
+            continue
+
+        keys = app.state.config.OPENAI_API_KEYS
+
+        async def check(url=url, key=keys[idx] if idx < len(keys) else ""):
+            return await send_get_request(f"{url}/models", key) is not None
+
+        checks[url] = check
+    return checks
+
+
 async def cleanup_response(
     response: Optional[aiohttp.ClientResponse],
-    session: Optional[aiohttp.ClientSession],
+    session: Optional[aiohttp.ClientSession] = None,
 ):
+    # Pooled sessions stay open; releasing hands the connection back for
+    # reuse, or closes it if the body was not read to the end.
     if response:
-        response.close()
+        response.release()
     if session:
         await session.close()
 
@@ -135,6 +177,11 @@ async def get_config(request: Request, user=Depends(get_admin_user)):
     }
 
 
+@router.get("/health")
+async def get_connection_health(request: Request, user=Depends(get_admin_user)):
+    return OPENAI_HEALTH.get_status(request.app.state.config.OPENAI_API_BASE_URLS)
+
+
 class OpenAIConfigForm(BaseModel):
     ENABLE_OPENAI_API: Optional[bool] = None
     OPENAI_API_BASE_URLS: list[str]
@@ -178,6 +225,8 @@ async def update_config(
         if key in keys
     }
 
+    MODEL_LIST_CACHE.invalidate()
+
     return {
         "ENABLE_OPENAI_API": request.app.state.config.ENABLE_OPENAI_API,
         "OPENAI_API_BASE_URLS": request.app.state.config.OPENAI_API_BASE_URLS,
@@ -291,12 +340,16 @@ async def get_all_models_responses(request: Request, user: UserModel) -> list:
 
     request_tasks = []
     for idx, url in enumerate(request.app.state.config.OPENAI_API_BASE_URLS):
-        if (str(idx) not in request.app.state.config.OPENAI_API_CONFIGS) and (
+        if not OPENAI_HEALTH.allow_request(url):
+            # Circuit open: don't wait on a connection known to be down.
+            request_tasks.append(asyncio.ensure_future(asyncio.sleep(0, None)))
+        elif (str(idx) not in request.app.state.config.OPENAI_API_CONFIGS) and (
             url not in request.app.state.config.OPENAI_API_CONFIGS  # Legacy support
         ):
             request_tasks.append(
-                send_get_request(
+                send_get_request_with_health(
                     f"{url}/models",
+                    url,
                     request.app.state.config.OPENAI_API_KEYS[idx],
                     user=user,
                 )
@@ -315,8 +368,9 @@ async def get_all_models_responses(request: Request, user: UserModel) -> list:
             if enable:
                 if len(model_ids) == 0:
                     request_tasks.append(
-                        send_get_request(
+                        send_get_request_with_health(
                             f"{url}/models",
+                            url,
                             request.app.state.config.OPENAI_API_KEYS[idx],
                             user=user,
                         )
@@ -376,15 +430,13 @@ async def get_all_models_responses(request: Request, user: UserModel) -> list:
 
 async def get_filtered_models(models, user):
     # Filter models based on user access control
-    filtered_models = []
-    for model in models.get("data", []):
-        model_info = Models.get_model_by_id(model["id"])
-        if model_info:
-            if user.id == model_info.user_id or has_access(
-                user.id, type="read", access_control=model_info.access_control
-            ):
-                filtered_models.append(model)
-    return filtered_models
+    model_infos = Models.get_models_by_ids(
+        [model["id"] for model in models.get("data", [])]
+    )
+    accessible_ids = {
+        model_info.id for model_info in filter_accessible(user.id, model_infos, "read")
+    }
+    return [model for model in models.get("data", []) if model["id"] in accessible_ids]
 
 
 @cached(ttl=MODELS_CACHE_TTL)
@@ -846,22 +898,22 @@ async def generate_chat_completion(
     payload = json.dumps(payload)
 
     r = None
-    session = None
     streaming = False
     response = None
 
     try:
-        session = aiohttp.ClientSession(
-            trust_env=True, timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT)
-        )
-
-        r = await session.request(
+        r = await HTTP_SESSION_POOL.get_session(request_url).request(
             method="POST",
             url=request_url,
             data=payload,
             headers=headers,
             ssl=AIOHTTP_CLIENT_SESSION_SSL,
+            timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT),
         )
+        if r.status >= 500:
+            OPENAI_HEALTH.record_failure(url, f"HTTP {r.status}")
+        else:
+            OPENAI_HEALTH.record_success(url)
 
         # Check if response is SSE
         if "text/event-stream" in r.headers.get("Content-Type", ""):
@@ -870,9 +922,7 @@ async def generate_chat_completion(
                 r.content,
                 status_code=r.status,
                 headers=dict(r.headers),
-                background=BackgroundTask(
-                    cleanup_response, response=r, session=session
-                ),
+                background=BackgroundTask(cleanup_response, response=r),
             )
         else:
             try:
@@ -885,6 +935,8 @@ async def generate_chat_completion(
             return response
     except Exception as e:
         log.exception(e)
+        if r is None:
+            OPENAI_HEALTH.record_failure(url, str(e))
 
         detail = None
         if isinstance(response, dict):
@@ -899,7 +951,7 @@ async def generate_chat_completion(
         )
     finally:
         if not streaming:
-            await cleanup_response(r, session)
+            await cleanup_response(r)
 
 
 async def embeddings(request: Request, form_data: dict, user):
@@ -926,11 +978,9 @@ async def embeddings(request: Request, form_data: dict, user):
     url = request.app.state.config.OPENAI_API_BASE_URLS[idx]
     key = request.app.state.config.OPENAI_API_KEYS[idx]
     r = None
-    session = None
     streaming = False
     try:
-        session = aiohttp.ClientSession(trust_env=True)
-        r = await session.request(
+        r = await HTTP_SESSION_POOL.get_session(url).request(
             method="POST",
             url=f"{url}/embeddings",
             data=body,
@@ -956,9 +1006,7 @@ async def embeddings(request: Request, form_data: dict, user):
                 r.content,
                 status_code=r.status,
                 headers=dict(r.headers),
-                background=BackgroundTask(
-                    cleanup_response, response=r, session=session
-                ),
+                background=BackgroundTask(cleanup_response, response=r),
             )
         else:
             response_data = await r.json()
@@ -979,7 +1027,7 @@ async def embeddings(request: Request, form_data: dict, user):
         )
     finally:
         if not streaming:
-            await cleanup_response(r, session)
+            await cleanup_response(r)
 
 
 @router.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
@@ -1001,7 +1049,6 @@ async def proxy(path: str, request: Request, user=Depends(get_verified_user)):
     )
 
     r = None
-    session = None
     streaming = False
 
     try:
@@ -1033,8 +1080,7 @@ async def proxy(path: str, request: Request, user=Depends(get_verified_user)):
             headers["Authorization"] = f"Bearer {key}"
             request_url = f"{url}/{path}"
 
-        session = aiohttp.ClientSession(trust_env=True)
-        r = await session.request(
+        r = await HTTP_SESSION_POOL.get_session(request_url).request(
             method=request.method,
             url=request_url,
             data=body,
@@ -1050,9 +1096,7 @@ async def proxy(path: str, request: Request, user=Depends(get_verified_user)):
                 r.content,
                 status_code=r.status,
                 headers=dict(r.headers),
-                background=BackgroundTask(
-                    cleanup_response, response=r, session=session
-                ),
+                background=BackgroundTask(cleanup_response, response=r),
             )
         else:
             response_data = await r.json()
@@ -1076,4 +1120,4 @@ async def proxy(path: str, request: Request, user=Depends(get_verified_user)):
         )
     finally:
         if not streaming:
-            await cleanup_response(r, session)
+            await cleanup_response(r)
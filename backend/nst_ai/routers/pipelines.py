@@ -21,6 +21,7 @@ from typing import Optional
 from nst_ai.env import SRC_LOG_LEVELS, AIOHTTP_CLIENT_SESSION_SSL
 from nst_ai.config import CACHE_DIR
 from nst_ai.constants import ERROR_MESSAGES
+from nst_ai.models.models import MODEL_LIST_CACHE
 
 
 from nst_ai.routers.openai import get_all_models_responses
@@ -237,6 +238,7 @@ async def upload_pipeline(
 
         r.raise_for_status()
         data = r.json()
+        MODEL_LIST_CACHE.invalidate()
 
         return {**data}
     except Exception as e:
@@ -288,6 +290,7 @@ async def add_pipeline(
 
         r.raise_for_status()
         data = r.json()
+        MODEL_LIST_CACHE.invalidate()
 
         return {**data}
     except Exception as e:
@@ -333,6 +336,7 @@ async def delete_pipeline(
 
         r.raise_for_status()
         data = r.json()
+        MODEL_LIST_CACHE.invalidate()
 
         return {**data}
     except Exception as e:
@@ -488,6 +492,7 @@ async def update_pipeline_valves(
 
         r.raise_for_status()
         data = r.json()
+        MODEL_LIST_CACHE.invalidate()
 
         return {**data}
     except Exception as e:
@@ -19,7 +19,7 @@ from nst_ai.constants import ERROR_MESSAGES
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 from nst_ai.utils.tools import get_tool_specs
 from nst_ai.utils.auth import get_admin_user, get_verified_user
-from nst_ai.utils.access_control import has_access, has_permission
+from nst_ai.utils.access_control import filter_accessible, has_access, has_permission
 from nst_ai.env import SRC_LOG_LEVELS
 
 from nst_ai.utils.tools import get_tool_servers_data
@@ -75,12 +75,7 @@ async def get_tools(request: Request, user=Depends(get_verified_user)):
         )
 
     if user.role != "admin":
-        tools = [
-            tool
-            for tool in tools
-            if tool.user_id == user.id
-            or has_access(user.id, "read", tool.access_control)
-        ]
+        tools = filter_accessible(user.id, tools, "read")
 
     return tools
 
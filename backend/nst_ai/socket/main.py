@@ -25,9 +25,20 @@ from nst_ai.env import (
     WEBSOCKET_REDIS_LOCK_TIMEOUT,
     WEBSOCKET_SENTINEL_PORT,
     WEBSOCKET_SENTINEL_HOSTS,
+    WEBSOCKET_POOL_CACHE_TTL,
+    WEBSOCKET_EVENT_FLUSH_INTERVAL,
+    WEBSOCKET_EVENT_MAX_BATCH_SIZE,
 )
 from nst_ai.utils.auth import decode_token
-from nst_ai.socket.utils import RedisDict, RedisLock, YdocManager
+from nst_ai.socket.utils import (
+    ChatEventCoalescer,
+    RedisDict,
+    RedisLock,
+    RedisUsagePool,
+    UsagePool,
+    YdocManager,
+    is_content_update,
+)
 from nst_ai.tasks import create_task, stop_item_tasks
 from nst_ai.utils.redis import get_redis_connection
 from nst_ai.utils.access_control import has_access, get_users_with_access
@@ -95,16 +106,19 @@ if WEBSOCKET_MANAGER == "redis":
         "NST-Ai:session_pool",
         redis_url=WEBSOCKET_REDIS_URL,
         redis_sentinels=redis_sentinels,
+        cache_ttl=WEBSOCKET_POOL_CACHE_TTL,
     )
     USER_POOL = RedisDict(
         "NST-Ai:user_pool",
         redis_url=WEBSOCKET_REDIS_URL,
         redis_sentinels=redis_sentinels,
+        cache_ttl=WEBSOCKET_POOL_CACHE_TTL,
     )
-    USAGE_POOL = RedisDict(
+    USAGE_POOL = RedisUsagePool(
         "NST-Ai:usage_pool",
         redis_url=WEBSOCKET_REDIS_URL,
         redis_sentinels=redis_sentinels,
+        timeout=TIMEOUT_DURATION,
     )
 
     clean_up_lock = RedisLock(
@@ -119,7 +133,7 @@ if WEBSOCKET_MANAGER == "redis":
 else:
     SESSION_POOL = {}
     USER_POOL = {}
-    USAGE_POOL = {}
+    USAGE_POOL = UsagePool(timeout=TIMEOUT_DURATION)
 
     aquire_func = release_func = renew_func = lambda: True
 
@@ -157,26 +171,9 @@ async def periodic_usage_pool_cleanup():
                 log.error(f"Unable to renew cleanup lock. Exiting usage pool cleanup.")
                 raise Exception("Unable to renew usage pool cleanup lock.")
 
-            now = int(time.time())
-            send_usage = False
-            for model_id, connections in list(USAGE_POOL.items()):
-                # Creating a list of sids to remove if they have timed out
-                expired_sids = [
-                    sid
-                    for sid, details in connections.items()
-                    if now - details["updated_at"] > TIMEOUT_DURATION
-                ]
-
-                for sid in expired_sids:
-                    del connections[sid]
-
-                if not connections:
-                    log.debug(f"Cleaning up model {model_id} from usage pool")
-                    del USAGE_POOL[model_id]
-                else:
-                    USAGE_POOL[model_id] = connections
-
-                send_usage = True
+            for model_id in USAGE_POOL.remove_expired():
+                log.debug(f"Cleaning up model {model_id} from usage pool")
+
             await asyncio.sleep(TIMEOUT_DURATION)
     finally:
         release_func()
@@ -190,7 +187,7 @@ app = socketio.ASGIApp(
 
 def get_models_in_use():
     # List models that are currently in use
-    models_in_use = list(USAGE_POOL.keys())
+    models_in_use = USAGE_POOL.get_models_in_use()
     return models_in_use
 
 
@@ -223,9 +220,13 @@ def get_session_ids_from_room(room):
 def get_user_ids_from_room(room):
     active_session_ids = get_session_ids_from_room(room)
 
-    active_user_ids = list(
-        set([SESSION_POOL.get(session_id)["id"] for session_id in active_session_ids])
-    )
+    if isinstance(SESSION_POOL, RedisDict):
+        # One round trip for all sessions
+        sessions = SESSION_POOL.get_many(active_session_ids)
+    else:
+        sessions = [SESSION_POOL.get(session_id) for session_id in active_session_ids]
+
+    active_user_ids = list(set([session["id"] for session in sessions if session]))
     return active_user_ids
 
 
@@ -238,15 +239,8 @@ def get_active_status_by_user_id(user_id):
 @sio.on("usage")
 async def usage(sid, data):
     if sid in SESSION_POOL:
-        model_id = data["model"]
         # Record the timestamp for the last update
-        current_time = int(time.time())
-
-        # Store the new usage data and task
-        USAGE_POOL[model_id] = {
-            **(USAGE_POOL[model_id] if model_id in USAGE_POOL else {}),
-            sid: {"updated_at": current_time},
-        }
+        USAGE_POOL.heartbeat(data["model"], sid)
 
 
 @sio.event
@@ -256,7 +250,7 @@ async def connect(sid, environ, auth):
         data = decode_token(auth["token"])
 
         if data is not None and "id" in data:
-            user = Users.get_user_by_id(data["id"])
+            user = await Users.get_user_by_id_async(data["id"])
 
         if user:
             SESSION_POOL[sid] = user.model_dump()
@@ -277,7 +271,7 @@ async def user_join(sid, data):
     if data is None or "id" not in data:
         return
 
-    user = Users.get_user_by_id(data["id"])
+    user = await Users.get_user_by_id_async(data["id"])
     if not user:
         return
 
@@ -305,7 +299,7 @@ async def join_channel(sid, data):
     if data is None or "id" not in data:
         return
 
-    user = Users.get_user_by_id(data["id"])
+    user = await Users.get_user_by_id_async(data["id"])
     if not user:
         return
 
@@ -326,7 +320,7 @@ async def join_note(sid, data):
     if token_data is None or "id" not in token_data:
         return
 
-    user = Users.get_user_by_id(token_data["id"])
+    user = await Users.get_user_by_id_async(token_data["id"])
     if not user:
         return
 
@@ -629,8 +623,28 @@ async def disconnect(sid):
         # print(f"Unknown session ID {sid} disconnected")
 
 
+# Coalescers of the chat events of the messages being streamed, by
+# (chat_id, message_id)
+CHAT_EVENT_COALESCERS: dict[tuple[str, str], ChatEventCoalescer] = {}
+
+
+def get_chat_event_coalescer(key, emit) -> ChatEventCoalescer:
+    coalescer = CHAT_EVENT_COALESCERS.get(key)
+    if coalescer is None:
+        if len(CHAT_EVENT_COALESCERS) >= 1000:
+            for k, c in list(CHAT_EVENT_COALESCERS.items()):
+                if c.is_idle():
+                    del CHAT_EVENT_COALESCERS[k]
+
+        coalescer = ChatEventCoalescer(
+            emit, WEBSOCKET_EVENT_FLUSH_INTERVAL, WEBSOCKET_EVENT_MAX_BATCH_SIZE
+        )
+        CHAT_EVENT_COALESCERS[key] = coalescer
+    return coalescer
+
+
 def get_event_emitter(request_info, update_db=True):
-    async def __event_emitter__(event_data):
+    async def emit(event_data):
         user_id = request_info["user_id"]
 
         session_ids = list(
@@ -659,16 +673,38 @@ def get_event_emitter(request_info, update_db=True):
 
         await asyncio.gather(*emit_tasks)
 
+    async def __event_emitter__(event_data):
+        key = (request_info.get("chat_id"), request_info.get("message_id"))
+
+        if WEBSOCKET_EVENT_FLUSH_INTERVAL <= 0 or not all(key):
+            await emit(event_data)
+        elif is_content_update(event_data):
+            await get_chat_event_coalescer(key, emit).send(event_data)
+        elif key in CHAT_EVENT_COALESCERS:
+            # Sent after the content updates merged so far
+            coalescer = CHAT_EVENT_COALESCERS[key]
+            await coalescer.send(event_data)
+
+            if event_data.get("type") == "task-cancelled" or (
+                event_data.get("type") == "chat:completion"
+                and isinstance(event_data.get("data"), dict)
+                and event_data["data"].get("done")
+            ):
+                if CHAT_EVENT_COALESCERS.get(key) is coalescer:
+                    del CHAT_EVENT_COALESCERS[key]
+        else:
+            await emit(event_data)
+
         if update_db:
             if "type" in event_data and event_data["type"] == "status":
-                Chats.add_message_status_to_chat_by_id_and_message_id(
+                await Chats.add_message_status_to_chat_by_id_and_message_id_async(
                     request_info["chat_id"],
                     request_info["message_id"],
                     event_data.get("data", {}),
                 )
 
             if "type" in event_data and event_data["type"] == "message":
-                message = Chats.get_message_by_id_and_message_id(
+                message = await Chats.get_message_by_id_and_message_id_async(
                     request_info["chat_id"],
                     request_info["message_id"],
                 )
@@ -677,7 +713,7 @@ def get_event_emitter(request_info, update_db=True):
                     content = message.get("content", "")
                     content += event_data.get("data", {}).get("content", "")
 
-                    Chats.upsert_message_to_chat_by_id_and_message_id(
+                    await Chats.upsert_message_to_chat_by_id_and_message_id_async(
                         request_info["chat_id"],
                         request_info["message_id"],
                         {
@@ -688,7 +724,7 @@ def get_event_emitter(request_info, update_db=True):
             if "type" in event_data and event_data["type"] == "replace":
                 content = event_data.get("data", {}).get("content", "")
 
-                Chats.upsert_message_to_chat_by_id_and_message_id(
+                await Chats.upsert_message_to_chat_by_id_and_message_id_async(
                     request_info["chat_id"],
                     request_info["message_id"],
                     {
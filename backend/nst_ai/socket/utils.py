@@ -1,9 +1,18 @@
+import asyncio
 import json
+import logging
+import threading
+import time
 import uuid
 from nst_ai.utils.redis import get_redis_connection
+from nst_ai.utils.ttl_cache import TTLCache
 from typing import Optional, List, Tuple
 import pycrdt as Y
 
+log = logging.getLogger(__name__)
+
+_MISSING = object()
+
 
 class RedisLock:
     def __init__(self, redis_url, lock_name, timeout_secs, redis_sentinels=[]):
@@ -35,41 +44,68 @@ class RedisLock:
 
 
 class RedisDict:
-    def __init__(self, name, redis_url, redis_sentinels=[]):
+    """
+    A dict kept in a Redis hash, shared by all workers.
+
+    With `cache_ttl`, what is read is also kept in a per-worker near-cache
+    for up to that many seconds. Writes publish the key changed on
+    `<name>:invalidate` in the same round trip, and every worker drops it
+    from its cache when the message arrives; the TTL only bounds how stale a
+    value can get should messages be lost.
+    """
+
+    def __init__(self, name, redis_url, redis_sentinels=[], cache_ttl: float = 0):
         self.name = name
         self.redis = get_redis_connection(
             redis_url, redis_sentinels, decode_responses=True
         )
 
+        self.cache_ttl = cache_ttl
+        # Serialized values by key (None if not in the hash), and of the whole
+        # hash with the time it was read
+        self.entries = TTLCache(cache_ttl)
+        self.all_entries: Optional[tuple[float, dict[str, str]]] = None
+        # Bumped on every invalidation, so that reads racing with one are not
+        # cached
+        self.version = 0
+        self.lock = threading.Lock()
+
+        self.worker_id = str(uuid.uuid4())
+        self.channel = f"{name}:invalidate"
+        if self.cache_ttl > 0:
+            self._subscribe()
+
     def __setitem__(self, key, value):
         serialized_value = json.dumps(value)
-        self.redis.hset(self.name, key, serialized_value)
+        self._write(
+            key, serialized_value, lambda r: r.hset(self.name, key, serialized_value)
+        )
 
     def __getitem__(self, key):
-        value = self.redis.hget(self.name, key)
+        value = self._get(key)
         if value is None:
             raise KeyError(key)
         return json.loads(value)
 
     def __delitem__(self, key):
-        result = self.redis.hdel(self.name, key)
+        result = self._write(key, None, lambda r: r.hdel(self.name, key))
         if result == 0:
             raise KeyError(key)
 
     def __contains__(self, key):
-        return self.redis.hexists(self.name, key)
+        return self._get(key) is not None
 
     def __len__(self):
-        return self.redis.hlen(self.name)
+        return len(self._get_all())
 
     def keys(self):
-        return self.redis.hkeys(self.name)
+        return list(self._get_all().keys())
 
     def values(self):
-        return [json.loads(v) for v in self.redis.hvals(self.name)]
+        return [json.loads(v) for v in self._get_all().values()]
 
     def items(self):
-        return [(k, json.loads(v)) for k, v in self.redis.hgetall(self.name).items()]
+        return [(k, json.loads(v)) for k, v in self._get_all().items()]
 
     def get(self, key, default=None):
         try:
@@ -77,8 +113,30 @@ class RedisDict:
         except KeyError:
             return default
 
+    def get_many(self, keys, default=None) -> list:
+        """The values of `keys`, reading those not cached in a single HMGET."""
+        values = {}
+        if self.cache_ttl > 0:
+            for key in keys:
+                value = self.entries.get(key, _MISSING)
+                if value is not _MISSING:
+                    values[key] = value
+
+        missing = list({key: None for key in keys if key not in values})
+        if missing:
+            version = self.version
+            for key, value in zip(missing, self.redis.hmget(self.name, missing)):
+                values[key] = value
+                if self.cache_ttl > 0:
+                    self._cache(key, value, version)
+
+        return [
+            json.loads(values[key]) if values[key] is not None else default
+            for key in keys
+        ]
+
     def clear(self):
-        self.redis.delete(self.name)
+        self._write(None, None, lambda r: r.delete(self.name))
 
     def update(self, other=None, **kwargs):
         if other is not None:
@@ -92,6 +150,186 @@ class RedisDict:
             self[key] = default
         return self[key]
 
+    def _get(self, key) -> Optional[str]:
+        if self.cache_ttl <= 0:
+            return self.redis.hget(self.name, key)
+
+        value = self.entries.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        version = self.version
+        value = self.redis.hget(self.name, key)
+        self._cache(key, value, version)
+        return value
+
+    def _get_all(self) -> dict[str, str]:
+        if self.cache_ttl <= 0:
+            return self.redis.hgetall(self.name)
+
+        all_entries = self.all_entries
+        if (
+            all_entries is not None
+            and time.monotonic() - all_entries[0] < self.cache_ttl
+        ):
+            return all_entries[1]
+
+        version = self.version
+        values = self.redis.hgetall(self.name)
+        with self.lock:
+            if version == self.version:
+                self.all_entries = (time.monotonic(), values)
+        return values
+
+    def _cache(self, key, value: Optional[str], version: int):
+        with self.lock:
+            if version != self.version:
+                return
+            self.entries.set(key, value)
+
+    def _write(self, key, value: Optional[str], command):
+        """
+        Run `command` on Redis, along with the invalidation of `key` (all keys
+        if None) when caching, and cache `value` as the new one.
+        """
+        if self.cache_ttl <= 0:
+            return command(self.redis)
+
+        pipe = self.redis.pipeline(transaction=False)
+        command(pipe)
+        pipe.publish(self.channel, json.dumps([self.worker_id, key]))
+        result = pipe.execute()[0]
+
+        self._invalidate(key)
+        if key is not None:
+            self._cache(key, value, self.version)
+        return result
+
+    def _invalidate(self, key=None):
+        with self.lock:
+            self.version += 1
+            self.all_entries = None
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key)
+
+    def _subscribe(self):
+        def on_message(message):
+            try:
+                worker_id, key = json.loads(message["data"])
+            except Exception:
+                worker_id, key = None, None
+            if worker_id != self.worker_id:
+                self._invalidate(key)
+
+        def on_error(e, pubsub, thread):
+            # Invalidations may have been missed while disconnected
+            log.debug(f"Error receiving {self.channel}: {e}")
+            self._invalidate()
+            time.sleep(1)
+
+        try:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{self.channel: on_message})
+            pubsub.run_in_thread(sleep_time=1, daemon=True, exception_handler=on_error)
+        except Exception as e:
+            log.warning(f"Not caching {self.name}, subscribing failed: {e}")
+            self.cache_ttl = 0
+
+
+class UsagePool:
+    """
+    The sessions using each model, by the time of their last heartbeat. A
+    model is in use while one of its sessions sent one within `timeout`
+    seconds.
+    """
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.sessions: dict[str, dict[str, float]] = {}
+        self.last_seen: dict[str, float] = {}
+
+    def heartbeat(self, model_id: str, sid: str):
+        now = time.time()
+        self.sessions.setdefault(model_id, {})[sid] = now
+        self.last_seen[model_id] = now
+
+    def get_models_in_use(self) -> list[str]:
+        cutoff = time.time() - self.timeout
+        return [
+            model_id
+            for model_id, last_seen in self.last_seen.items()
+            if last_seen >= cutoff
+        ]
+
+    def remove_expired(self) -> list[str]:
+        """Drop the sessions which timed out, returns the models no longer in use."""
+        cutoff = time.time() - self.timeout
+        expired = []
+        for model_id, sessions in list(self.sessions.items()):
+            for sid in [sid for sid, seen in sessions.items() if seen < cutoff]:
+                del sessions[sid]
+            if not sessions:
+                del self.sessions[model_id]
+                del self.last_seen[model_id]
+                expired.append(model_id)
+        return expired
+
+
+class RedisUsagePool:
+    """
+    `UsagePool` kept in Redis: a sorted set of sessions per model, and one
+    of the models, scored by the time of their last heartbeat. Expiring
+    sessions is a range removal by score, so it costs as much as there are
+    expired entries, whatever the number of sessions.
+    """
+
+    def __init__(self, name, redis_url, redis_sentinels=[], timeout: float = 3):
+        self.name = name
+        self.timeout = timeout
+        self.models_key = f"{name}:models"
+        self.redis = get_redis_connection(
+            redis_url, redis_sentinels, decode_responses=True
+        )
+
+    def get_sessions_key(self, model_id: str) -> str:
+        return f"{self.name}:sessions:{model_id}"
+
+    def heartbeat(self, model_id: str, sid: str):
+        now = time.time()
+        sessions_key = self.get_sessions_key(model_id)
+
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zadd(sessions_key, {sid: now})
+        # Sessions of a model in use only expire here
+        pipe.zremrangebyscore(sessions_key, "-inf", f"({now - self.timeout}")
+        pipe.zadd(self.models_key, {model_id: now})
+        pipe.execute()
+
+    def get_models_in_use(self) -> list[str]:
+        return self.redis.zrangebyscore(
+            self.models_key, time.time() - self.timeout, "+inf"
+        )
+
+    def remove_expired(self) -> list[str]:
+        """Drop the models no longer in use and their sessions, returns them."""
+        cutoff = f"({time.time() - self.timeout}"
+        expired = self.redis.zrangebyscore(self.models_key, "-inf", cutoff)
+        if not expired:
+            return []
+
+        pipe = self.redis.pipeline(transaction=False)
+        for model_id in expired:
+            # By score, should a heartbeat have come in since
+            pipe.zremrangebyscore(self.get_sessions_key(model_id), "-inf", cutoff)
+        pipe.zremrangebyscore(self.models_key, "-inf", cutoff)
+        for model_id in expired:
+            pipe.zscore(self.models_key, model_id)
+        scores = pipe.execute()[-len(expired) :]
+        # Models heartbeated in the meantime are still in use
+        return [model_id for model_id, score in zip(expired, scores) if score is None]
+
 
 class YdocManager:
     def __init__(
@@ -197,3 +435,110 @@ class YdocManager:
                 del self._updates[document_id]
             if document_id in self._users:
                 del self._users[document_id]
+
+
+def is_content_update(event_data: dict) -> bool:
+    """Whether the event only updates the content of the message."""
+    data = event_data.get("data")
+    return (
+        event_data.get("type") == "chat:completion"
+        and isinstance(data, dict)
+        and ("content" in data or "content_delta" in data)
+        and data.keys() <= {"content", "content_offset", "content_delta"}
+    )
+
+
+def merge_content_updates(event_data: Optional[dict], update: dict) -> dict:
+    """One `chat:completion` content update applying `event_data`, then `update`."""
+    data = update["data"]
+    if event_data is None or "content" in data:
+        return update
+
+    offset, delta = data["content_offset"], data["content_delta"]
+    previous = event_data["data"]
+    if "content" in previous:
+        merged = {"content": previous["content"][:offset] + delta}
+    elif offset >= previous["content_offset"]:
+        merged = {
+            "content_offset": previous["content_offset"],
+            "content_delta": previous["content_delta"][
+                : offset - previous["content_offset"]
+            ]
+            + delta,
+        }
+    else:
+        merged = {"content_offset": offset, "content_delta": delta}
+    return {**update, "data": merged}
+
+
+class ChatEventCoalescer:
+    """
+    Sends the events of a chat message, merging the content updates of a
+    streamed response made within `interval` seconds into a single event
+    (after at most `max_batch_size` updates, it is sent right away).
+
+    Only one merged update is kept: while an event is being sent, further
+    updates are merged into it rather than queued. Other events are sent in
+    order, after the pending update.
+    """
+
+    def __init__(self, emit, interval: float, max_batch_size: int):
+        self.emit = emit
+        self.interval = interval
+        self.max_batch_size = max_batch_size
+
+        self.pending: Optional[dict] = None
+        self.pending_count = 0
+        self.emitted_at = 0.0
+        self.lock = asyncio.Lock()
+        self.flush_task: Optional[asyncio.Task] = None
+
+    async def send(self, event_data: dict):
+        if not is_content_update(event_data):
+            async with self.lock:
+                await self._flush()
+                await self.emit(event_data)
+            return
+
+        self.pending = merge_content_updates(self.pending, event_data)
+        self.pending_count += 1
+
+        if not self.lock.locked() and (
+            self.pending_count >= self.max_batch_size
+            or time.monotonic() - self.emitted_at >= self.interval
+        ):
+            async with self.lock:
+                await self._flush()
+        elif self.flush_task is None:
+            self.flush_task = asyncio.create_task(self._flush_later())
+
+    def is_idle(self) -> bool:
+        """Whether nothing is pending or being sent, nor was sent lately."""
+        return (
+            self.pending is None
+            and self.flush_task is None
+            and not self.lock.locked()
+            and time.monotonic() - self.emitted_at >= self.interval
+        )
+
+    async def _flush_later(self):
+        try:
+            await asyncio.sleep(
+                max(0.0, self.emitted_at + self.interval - time.monotonic())
+            )
+            async with self.lock:
+                await self._flush()
+        except Exception as e:
+            log.exception(f"Error sending chat event: {e}")
+        finally:
+            self.flush_task = None
+            if self.pending is not None:
+                # Merged while this one was being sent
+                self.flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush(self):
+        if self.pending is None:
+            return
+        event_data, self.pending, self.pending_count = self.pending, None, 0
+        self.emitted_at = time.monotonic()
+        await self.emit(event_data)
@@ -0,0 +1,62 @@
+from contextlib import contextmanager
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.orm import sessionmaker
+
+from nst_ai.models import chats, groups, knowledge, models, users
+from nst_ai.models.chats import Chat, ChatMessage
+from nst_ai.models.groups import Group, GroupMember
+from nst_ai.models.knowledge import Knowledge
+from nst_ai.models.models import Model
+from nst_ai.models.users import User
+
+
+def use_sqlite(monkeypatch, path, tables, modules):
+    """Create `tables` in a SQLite database and point `modules` at it."""
+    engine = sa.create_engine(f"sqlite:///{path}")
+    for table in tables:
+        table.__table__.create(engine)
+    SessionLocal = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+    @contextmanager
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    for module in modules:
+        monkeypatch.setattr(module, "get_db", get_db)
+        if hasattr(module, "get_read_db"):
+            monkeypatch.setattr(module, "get_read_db", lambda *keys: get_db())
+    return engine, SessionLocal
+
+
+@pytest.fixture
+def session_factory(monkeypatch, tmp_path):
+    """Point the chat table at a fresh SQLite database."""
+    engine, SessionLocal = use_sqlite(
+        monkeypatch, tmp_path / "chats.db", [Chat, ChatMessage], [chats]
+    )
+    yield SessionLocal
+    engine.dispose()
+
+
+@pytest.fixture
+def group_session_factory(monkeypatch, tmp_path):
+    """
+    Point the group, user, model and knowledge tables at a fresh SQLite
+    database, with an empty group id cache.
+    """
+    engine, SessionLocal = use_sqlite(
+        monkeypatch,
+        tmp_path / "groups.db",
+        [Group, GroupMember, User, Model, Knowledge],
+        [groups, users, models, knowledge],
+    )
+    groups.GROUP_ID_CACHE.invalidate()
+    yield SessionLocal
+    groups.GROUP_ID_CACHE.invalidate()
+    engine.dispose()
@@ -0,0 +1,166 @@
+import pytest
+import sqlalchemy as sa
+
+from nst_ai.models.groups import GroupForm, Groups
+from nst_ai.models.knowledge import Knowledge, Knowledges
+from nst_ai.models.models import Model, Models
+from nst_ai.utils.access_control import (
+    filter_accessible,
+    get_access_control_filter,
+    has_access,
+)
+
+USERS = ["alice", "bob", "carol", "jürgen"]
+
+
+def access(read=(), write=(), read_groups=(), write_groups=()) -> dict:
+    return {
+        "read": {"user_ids": list(read), "group_ids": list(read_groups)},
+        "write": {"user_ids": list(write), "group_ids": list(write_groups)},
+    }
+
+
+@pytest.fixture
+def items(group_session_factory):
+    """
+    The same access controls on models and knowledge bases; alice is in the
+    "editors" group, carol owns everything but "owned".
+    """
+    editors = Groups.insert_new_group(
+        "admin", GroupForm(name="editors", description="")
+    )
+    Groups.add_users_to_group(editors.id, ["alice"])
+
+    access_controls = {
+        "owned": ("alice", access()),
+        "public": ("carol", None),
+        "public-sql-null": ("carol", sa.null()),
+        "private": ("carol", access()),
+        "user-read": ("carol", access(read=["alice"])),
+        "user-write": ("carol", access(write=["alice", "jürgen"])),
+        "group-read": ("carol", access(read_groups=[editors.id])),
+        "group-write": ("carol", access(write_groups=[editors.id])),
+        "similar-id": ("carol", access(read=["alice2", "xalice"])),
+        "non-ascii": ("carol", access(read=["jürgen"])),
+    }
+    with group_session_factory() as db:
+        for i, (id, (user_id, access_control)) in enumerate(access_controls.items()):
+            db.add(
+                Model(
+                    id=id,
+                    user_id=user_id,
+                    base_model_id="llama",
+                    name=id,
+                    params={},
+                    meta={},
+                    access_control=access_control,
+                    updated_at=i,
+                    created_at=i,
+                )
+            )
+            db.add(
+                Knowledge(
+                    id=id,
+                    user_id=user_id,
+                    name=id,
+                    description="",
+                    access_control=access_control,
+                    updated_at=i,
+                    created_at=i,
+                )
+            )
+        db.commit()
+    return editors
+
+
+def old_get_models_by_user_id(user_id: str, permission: str) -> list:
+    """`get_models_by_user_id` as it was before filtering in SQL"""
+    return [
+        model
+        for model in Models.get_models()
+        if model.user_id == user_id
+        or has_access(user_id, permission, model.access_control)
+    ]
+
+
+def old_get_knowledge_bases_by_user_id(user_id: str, permission: str) -> list:
+    """`get_knowledge_bases_by_user_id` as it was before filtering in SQL"""
+    return [
+        knowledge_base
+        for knowledge_base in Knowledges.get_knowledge_bases()
+        if knowledge_base.user_id == user_id
+        or has_access(user_id, permission, knowledge_base.access_control)
+    ]
+
+
+def ids(items) -> list[str]:
+    return [item.id for item in items]
+
+
+class TestAccessControlFilter:
+    """Test listing accessible rows with an SQL pre-filter"""
+
+    @pytest.mark.parametrize("permission", ["read", "write"])
+    @pytest.mark.parametrize("user_id", USERS)
+    def test_matches_per_item_check(self, items, user_id, permission):
+        """Test that the lists equal checking every row with `has_access`"""
+        assert Models.get_models_by_user_id(
+            user_id, permission
+        ) == old_get_models_by_user_id(user_id, permission)
+        assert Knowledges.get_knowledge_bases_by_user_id(
+            user_id, permission
+        ) == old_get_knowledge_bases_by_user_id(user_id, permission)
+
+    def test_owner_user_and_group_grants(self, items):
+        """Test which rows each kind of grant gives read and write access to"""
+        assert sorted(ids(Models.get_models_by_user_id("alice", "read"))) == [
+            "group-read",
+            "owned",
+            "public",
+            "public-sql-null",
+            "user-read",
+        ]
+        assert sorted(ids(Models.get_models_by_user_id("alice", "write"))) == [
+            "group-write",
+            "owned",
+            "user-write",
+        ]
+        assert sorted(ids(Models.get_models_by_user_id("bob", "read"))) == [
+            "public",
+            "public-sql-null",
+        ]
+        assert Models.get_models_by_user_id("bob", "write") == []
+
+    def test_non_ascii_id_falls_back(self, items):
+        """Test that ids not stored verbatim in the JSON are checked per row"""
+        assert get_access_control_filter(Model, "jürgen", []) is None
+        assert get_access_control_filter(Model, "alice", ['a"b']) is None
+
+        assert sorted(ids(Models.get_models_by_user_id("jürgen", "read"))) == [
+            "non-ascii",
+            "public",
+            "public-sql-null",
+        ]
+        assert ids(Knowledges.get_knowledge_bases_by_user_id("jürgen", "write")) == [
+            "user-write"
+        ]
+
+    @pytest.mark.parametrize("permission", ["read", "write"])
+    def test_filter_narrows_the_query(self, items, group_session_factory, permission):
+        """Test that the SQL filter keeps every accessible row and drops others"""
+        group_ids = Groups.get_group_ids_by_member_id("alice")
+        with group_session_factory() as db:
+            rows = (
+                db.query(Model)
+                .filter(
+                    get_access_control_filter(Model, "alice", group_ids, permission)
+                )
+                .all()
+            )
+            everything = db.query(Model).all()
+
+        accessible = ids(filter_accessible("alice", everything, permission))
+        assert set(accessible) <= set(ids(rows))
+        assert "private" not in ids(rows)
+        assert "similar-id" not in ids(rows)
+        assert ids(filter_accessible("alice", rows, permission)) == accessible
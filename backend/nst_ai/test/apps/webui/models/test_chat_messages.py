@@ -0,0 +1,239 @@
+import importlib.util
+import time
+from pathlib import Path
+
+import pytest
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+
+from nst_ai.models import chats
+from nst_ai.models.chats import Chat, ChatForm, ChatMessage, Chats
+
+MIGRATION_PATH = (
+    Path(chats.__file__).resolve().parent.parent
+    / "migrations/versions/e4b1c6f0a2d3_add_chat_message_table.py"
+)
+
+
+def make_chat():
+    messages = {
+        "m1": {
+            "id": "m1",
+            "parentId": None,
+            "childrenIds": ["m2"],
+            "role": "user",
+            "content": "Hello",
+            "timestamp": 1700000000,
+        },
+        "m2": {
+            "id": "m2",
+            "parentId": "m1",
+            "childrenIds": [],
+            "role": "assistant",
+            "content": "Hi!",
+            "model": "llama3",
+            "timestamp": 1700000001,
+            "sources": [{"source": {"name": "doc"}}],
+        },
+    }
+    return {
+        "title": "Greetings",
+        "models": ["llama3"],
+        "history": {"messages": messages, "currentId": "m2"},
+        "messages": [messages["m1"], messages["m2"]],
+    }
+
+
+def insert_legacy_chat(SessionLocal, chat: dict, id="legacy") -> str:
+    with SessionLocal() as db:
+        now = int(time.time())
+        db.add(
+            Chat(
+                id=id,
+                user_id="user",
+                title=chat["title"],
+                chat=chat,
+                created_at=now,
+                updated_at=now,
+                meta={},
+            )
+        )
+        db.commit()
+    return id
+
+
+def test_chat_round_trip(session_factory):
+    chat = make_chat()
+    id = Chats.insert_new_chat("user", ChatForm(chat=chat)).id
+
+    with session_factory() as db:
+        assert "messages" not in db.get(Chat, id).chat["history"]
+        rows = db.query(ChatMessage).filter_by(chat_id=id).all()
+        assert {row.message_id for row in rows} == {"m1", "m2"}
+
+    assert Chats.get_chat_by_id(id).chat == chat
+    assert Chats.get_messages_by_chat_id(id) == chat["history"]["messages"]
+    assert Chats.get_message_by_id_and_message_id(id, "m2") == (
+        chat["history"]["messages"]["m2"]
+    )
+
+
+def test_update_chat_prunes_removed_messages(session_factory):
+    chat = make_chat()
+    id = Chats.insert_new_chat("user", ChatForm(chat=chat)).id
+
+    del chat["history"]["messages"]["m2"]
+    chat["history"]["messages"]["m1"]["childrenIds"] = []
+    chat["history"]["currentId"] = "m1"
+    chat["messages"] = [chat["history"]["messages"]["m1"]]
+    Chats.update_chat_by_id(id, chat)
+
+    assert Chats.get_chat_by_id(id).chat == chat
+    with session_factory() as db:
+        assert [row.message_id for row in db.query(ChatMessage)] == ["m1"]
+
+
+def test_legacy_chat_is_read_as_is_and_split_on_write(session_factory):
+    chat = make_chat()
+    id = insert_legacy_chat(session_factory, chat)
+
+    assert Chats.get_chat_by_id(id).chat == chat
+    assert Chats.get_message_by_id_and_message_id(id, "m1")["content"] == "Hello"
+
+    Chats.upsert_message_to_chat_by_id_and_message_id(id, "m2", {"content": "Bye"})
+
+    with session_factory() as db:
+        assert "messages" not in db.get(Chat, id).chat["history"]
+        assert db.query(ChatMessage).filter_by(chat_id=id).count() == 2
+
+    messages = Chats.get_chat_by_id(id).chat["history"]["messages"]
+    assert messages["m1"] == chat["history"]["messages"]["m1"]
+    assert messages["m2"] == {**chat["history"]["messages"]["m2"], "content": "Bye"}
+
+
+def test_upsert_message_returns_the_message(session_factory):
+    id = Chats.insert_new_chat("user", ChatForm(chat=make_chat())).id
+
+    message = Chats.upsert_message_to_chat_by_id_and_message_id(
+        id, "m2", {"content": "Hi\x00 again", "done": True}
+    )
+    assert message["content"] == "Hi again"
+    assert message["done"] is True
+    assert message["sources"] == [{"source": {"name": "doc"}}]
+
+    message = Chats.upsert_message_to_chat_by_id_and_message_id(
+        id, "m3", {"role": "assistant", "content": "New", "parentId": "m1"}
+    )
+    assert message == {"role": "assistant", "content": "New", "parentId": "m1"}
+
+    chat = Chats.get_chat_by_id(id).chat
+    assert chat["history"]["currentId"] == "m3"
+    assert chat["history"]["messages"]["m3"]["content"] == "New"
+    assert [m["id"] for m in chat["messages"]] == ["m1", "m3"]
+
+    assert (
+        Chats.upsert_message_to_chat_by_id_and_message_id("missing", "m1", {}) is None
+    )
+
+
+def test_add_message_status(session_factory):
+    id = Chats.insert_new_chat("user", ChatForm(chat=make_chat())).id
+
+    Chats.add_message_status_to_chat_by_id_and_message_id(id, "m2", {"a": 1})
+    message = Chats.add_message_status_to_chat_by_id_and_message_id(id, "m2", {"b": 2})
+
+    assert message["statusHistory"] == [{"a": 1}, {"b": 2}]
+    assert Chats.get_message_by_id_and_message_id(id, "m2")["statusHistory"] == [
+        {"a": 1},
+        {"b": 2},
+    ]
+
+
+def test_upsert_retries_after_losing_an_insert_race(session_factory, monkeypatch):
+    id = Chats.insert_new_chat("user", ChatForm(chat=make_chat())).id
+
+    write_messages = chats.ChatTable._write_messages
+    raced = []
+
+    def write_messages_racing(self, db, chat_id, messages, *args, **kwargs):
+        if not raced:
+            # Another writer inserts the same new message in the meantime
+            raced.append(True)
+            Chats.update_chat_by_id(
+                chat_id,
+                {
+                    **make_chat(),
+                    "history": {
+                        "messages": {
+                            **make_chat()["history"]["messages"],
+                            "m3": {"id": "m3", "parentId": "m1", "role": "user"},
+                        },
+                        "currentId": "m3",
+                    },
+                },
+            )
+        return write_messages(self, db, chat_id, messages, *args, **kwargs)
+
+    monkeypatch.setattr(chats.ChatTable, "_write_messages", write_messages_racing)
+
+    message = Chats.upsert_message_to_chat_by_id_and_message_id(
+        id, "m3", {"content": "Written"}
+    )
+
+    assert raced
+    assert message["role"] == "user"
+    assert Chats.get_message_by_id_and_message_id(id, "m3")["content"] == "Written"
+
+
+def run_migration(conn, direction: str):
+    spec = importlib.util.spec_from_file_location("migration", MIGRATION_PATH)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+
+    with Operations.context(MigrationContext.configure(conn)):
+        getattr(migration, direction)()
+
+
+def test_migration_moves_messages_and_back():
+    engine = sa.create_engine("sqlite://")
+    metadata = sa.MetaData()
+    chat_table = sa.Table(
+        "chat",
+        metadata,
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("chat", sa.JSON()),
+    )
+    chat = make_chat()
+
+    with engine.begin() as conn:
+        metadata.create_all(conn)
+        conn.execute(
+            chat_table.insert(),
+            [
+                {"id": "c1", "chat": chat},
+                {"id": "c2", "chat": {"title": "No history"}},
+            ],
+        )
+
+        run_migration(conn, "upgrade")
+
+        rows = {
+            row.message_id: row
+            for row in conn.execute(sa.text("SELECT * FROM chat_message"))
+        }
+        assert set(rows) == {"m1", "m2"}
+        assert rows["m2"].model == "llama3"
+        assert rows["m2"].created_at == 1700000001
+
+        blobs = dict(conn.execute(sa.select(chat_table.c.id, chat_table.c.chat)).all())
+        assert "messages" not in blobs["c1"]
+        assert "messages" not in blobs["c1"]["history"]
+        assert blobs["c2"] == {"title": "No history"}
+
+        run_migration(conn, "downgrade")
+
+        blobs = dict(conn.execute(sa.select(chat_table.c.id, chat_table.c.chat)).all())
+        assert blobs["c1"] == chat
+        assert blobs["c2"] == {"title": "No history"}
+        assert not sa.inspect(conn).has_table("chat_message")
@@ -0,0 +1,98 @@
+import pytest
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+
+from nst_ai.internal import chat_search
+from nst_ai.internal.chat_search import (
+    create_chat_search_index,
+    rebuild_chat_search_index,
+)
+from nst_ai.models.chats import ChatForm, Chats
+
+
+def make_chat(title: str, content: str) -> dict:
+    message = {"id": "m1", "parentId": None, "childrenIds": [], "content": content}
+    return {
+        "title": title,
+        "history": {"messages": {"m1": message}, "currentId": "m1"},
+    }
+
+
+def search(text: str) -> list[str]:
+    chats = Chats.get_chats_by_user_id_and_search_text("user", text)
+    return sorted(chat.title for chat in chats)
+
+
+@pytest.fixture
+def search_index(session_factory, monkeypatch):
+    monkeypatch.setattr(chat_search, "_index_available", {})
+    engine = session_factory.kw["bind"]
+    with engine.begin() as conn:
+        assert create_chat_search_index(conn)
+    return engine
+
+
+def test_search_follows_writes(search_index):
+    a = Chats.insert_new_chat("user", ChatForm(chat=make_chat("Apples", "red"))).id
+    b = Chats.insert_new_chat("user", ChatForm(chat=make_chat("Pears", "green"))).id
+    Chats.insert_new_chat("other", ChatForm(chat=make_chat("Apples", "red")))
+
+    assert search("apple") == ["Apples"]
+    assert search("gree") == ["Pears"]
+
+    Chats.update_chat_title_by_id(a, "Plums")
+    Chats.upsert_message_to_chat_by_id_and_message_id(b, "m1", {"content": "ripe"})
+
+    assert search("apples") == []
+    assert search("plums") == ["Plums"]
+    assert search("green") == []
+    assert search("ripe") == ["Pears"]
+
+    Chats.delete_chat_by_id(b)
+
+    assert search("ripe") == []
+
+
+def test_index_survives_vacuum_and_table_rebuilds(search_index):
+    ids = [
+        Chats.insert_new_chat("user", ChatForm(chat=make_chat(f"Chat {i}", "x"))).id
+        for i in range(10)
+    ]
+    for id in ids[:5]:
+        Chats.delete_chat_by_id(id)
+
+    with search_index.begin() as conn:
+        with Operations.context(MigrationContext.configure(conn)) as op:
+            for table_name in ("chat", "chat_message"):
+                with op.batch_alter_table(table_name, recreate="always"):
+                    pass
+        create_chat_search_index(conn)
+    with search_index.connect() as conn:
+        conn.execute(sa.text("VACUUM"))
+
+    Chats.update_chat_title_by_id(ids[5], "Renamed")
+    Chats.upsert_message_to_chat_by_id_and_message_id(ids[6], "m1", {"content": "y"})
+    Chats.delete_chat_by_id(ids[7])
+
+    assert search("chat") == ["Chat 6", "Chat 8", "Chat 9"]
+    assert search("renamed") == ["Renamed"]
+    assert search("y") == ["Chat 6"]
+
+
+def test_rebuild(search_index):
+    Chats.insert_new_chat("user", ChatForm(chat=make_chat("Apples", "red")))
+    with search_index.begin() as conn:
+        conn.execute(sa.text("INSERT INTO chat_fts(chat_fts) VALUES ('delete-all')"))
+        conn.execute(
+            sa.text(
+                "INSERT INTO chat_message_fts(chat_message_fts) VALUES ('delete-all')"
+            )
+        )
+    assert search("apples") == []
+
+    with search_index.begin() as conn:
+        assert rebuild_chat_search_index(conn)
+
+    assert search("apples") == ["Apples"]
+    assert search("red") == ["Apples"]
@@ -0,0 +1,231 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+
+from nst_ai.models.groups import (
+    GROUP_ID_CACHE,
+    Group,
+    GroupForm,
+    GroupMember,
+    GroupUpdateForm,
+    Groups,
+)
+from nst_ai.utils.ttl_cache import TTLCache
+
+MIGRATION = (
+    Path(__file__).parents[4]
+    / "migrations"
+    / "versions"
+    / "a1c5e8f2b7d4_add_group_member_table.py"
+)
+
+
+def load_migration():
+    spec = importlib.util.spec_from_file_location("add_group_member", MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    return migration
+
+
+def get_members(db) -> set[tuple[str, str]]:
+    return {
+        (group_id, user_id)
+        for group_id, user_id in db.query(GroupMember.group_id, GroupMember.user_id)
+    }
+
+
+def assert_in_sync(session_factory):
+    """group_member holds exactly the members listed in `Group.user_ids`"""
+    with session_factory() as db:
+        expected = {
+            (group.id, user_id)
+            for group in db.query(Group).all()
+            for user_id in group.user_ids or []
+        }
+        assert get_members(db) == expected
+
+
+@pytest.fixture
+def group_id_cache(monkeypatch):
+    monkeypatch.setattr(GROUP_ID_CACHE, "entries", TTLCache(60))
+    return GROUP_ID_CACHE
+
+
+def create_group(name: str, user_ids: list[str] = None):
+    return Groups.insert_new_group(
+        "admin", GroupUpdateForm(name=name, description="", user_ids=user_ids)
+    )
+
+
+class TestGroupMembers:
+    """Test that group_member follows every membership change"""
+
+    def test_create_and_update(self, group_session_factory):
+        """Test creating groups and replacing their members"""
+        empty = Groups.insert_new_group(
+            "admin", GroupForm(name="empty", description="")
+        )
+        staff = create_group("staff", ["alice", "bob"])
+        assert_in_sync(group_session_factory)
+
+        Groups.update_group_by_id(
+            staff.id,
+            GroupUpdateForm(name="staff", description="", user_ids=["bob", "carol"]),
+        )
+        assert_in_sync(group_session_factory)
+
+        Groups.update_group_by_id(
+            empty.id, GroupUpdateForm(name="renamed", description="")
+        )
+        assert_in_sync(group_session_factory)
+        assert sorted(Groups.get_group_ids_by_member_id("bob")) == [staff.id]
+        assert Groups.get_group_ids_by_member_id("alice") == []
+
+    def test_add_and_remove(self, group_session_factory):
+        """Test adding and removing members, including ones already there"""
+        staff = create_group("staff", ["alice"])
+
+        Groups.add_users_to_group(staff.id, ["alice", "bob", "carol"])
+        assert_in_sync(group_session_factory)
+        assert Groups.get_group_by_id(staff.id).user_ids == ["alice", "bob", "carol"]
+
+        Groups.remove_users_from_group(staff.id, ["alice", "dave"])
+        assert_in_sync(group_session_factory)
+        assert Groups.get_group_by_id(staff.id).user_ids == ["bob", "carol"]
+
+    def test_delete(self, group_session_factory):
+        """Test that deleted groups leave no members behind"""
+        staff = create_group("staff", ["alice", "bob"])
+        admins = create_group("admins", ["alice"])
+        create_group("others", ["carol"])
+
+        Groups.delete_group_by_id(staff.id)
+        assert_in_sync(group_session_factory)
+        assert Groups.get_group_ids_by_member_id("alice") == [admins.id]
+
+        Groups.delete_all_groups()
+        assert_in_sync(group_session_factory)
+        with group_session_factory() as db:
+            assert get_members(db) == set()
+
+    def test_remove_user_from_all_groups(self, group_session_factory):
+        """Test removing a user from every group at once"""
+        staff = create_group("staff", ["alice", "bob"])
+        admins = create_group("admins", ["alice"])
+
+        assert Groups.remove_user_from_all_groups("alice")
+        assert_in_sync(group_session_factory)
+        assert Groups.get_group_ids_by_member_id("alice") == []
+        assert Groups.get_group_by_id(staff.id).user_ids == ["bob"]
+        assert Groups.get_group_by_id(admins.id).user_ids == []
+
+    def test_sync_groups_by_group_names(self, group_session_factory):
+        """Test replacing a user's groups by name"""
+        staff = create_group("staff", ["alice"])
+        admins = create_group("admins", ["bob"])
+
+        assert Groups.sync_groups_by_group_names("alice", ["admins"])
+        assert_in_sync(group_session_factory)
+        assert Groups.get_group_ids_by_member_id("alice") == [admins.id]
+        assert Groups.get_group_by_id(staff.id).user_ids == []
+
+
+class TestGroupIdCache:
+    """Test that membership changes reach cached group ids"""
+
+    def test_changes_invalidate_the_affected_users(
+        self, group_session_factory, group_id_cache
+    ):
+        """Test that only the users whose membership changed are dropped"""
+        staff = create_group("staff", ["alice"])
+        assert Groups.get_group_ids_by_member_id("alice") == [staff.id]
+        assert Groups.get_group_ids_by_member_id("bob") == []
+
+        version = group_id_cache.version
+        Groups.add_users_to_group(staff.id, ["bob"])
+
+        assert group_id_cache.version > version
+        assert "alice" in group_id_cache.entries
+        assert Groups.get_group_ids_by_member_id("bob") == [staff.id]
+
+        Groups.remove_user_from_all_groups("alice")
+        assert Groups.get_group_ids_by_member_id("alice") == []
+
+        Groups.delete_group_by_id(staff.id)
+        assert Groups.get_group_ids_by_member_id("bob") == []
+
+    def test_cached_ids_are_served_without_a_query(
+        self, group_session_factory, group_id_cache
+    ):
+        """Test that cached group ids are used until invalidated"""
+        staff = create_group("staff", ["alice"])
+        assert Groups.get_group_ids_by_member_id("alice") == [staff.id]
+
+        with group_session_factory() as db:
+            db.query(GroupMember).delete()
+            db.commit()
+        assert Groups.get_group_ids_by_member_id("alice") == [staff.id]
+
+        group_id_cache.invalidate(["alice"])
+        assert Groups.get_group_ids_by_member_id("alice") == []
+
+    def test_request_scope(self, group_session_factory, group_id_cache):
+        """Test that changes within a request are seen by the same request"""
+        staff = create_group("staff")
+        with group_id_cache.request_scope():
+            assert Groups.get_group_ids_by_member_id("alice") == []
+            Groups.add_users_to_group(staff.id, ["alice"])
+            assert Groups.get_group_ids_by_member_id("alice") == [staff.id]
+
+
+class TestGroupMemberMigration:
+    """Test the a1c5e8f2b7d4 backfill of group_member"""
+
+    def test_backfill(self, tmp_path):
+        """Test that existing `group.user_ids` lists are copied over"""
+        engine = sa.create_engine(f"sqlite:///{tmp_path / 'migration.db'}")
+        Group.__table__.create(engine)
+        with engine.begin() as conn:
+            conn.execute(
+                Group.__table__.insert(),
+                [
+                    {"id": "staff", "user_ids": ["alice", "bob", "alice"]},
+                    {"id": "admins", "user_ids": ["alice"]},
+                    {"id": "empty", "user_ids": []},
+                    {"id": "none", "user_ids": None},
+                ],
+            )
+            conn.execute(
+                sa.text(
+                    "INSERT INTO \"group\" (id, user_ids) VALUES ('legacy', :user_ids)"
+                ),
+                {"user_ids": '"[\\"carol\\"]"'},
+            )
+
+        migration = load_migration()
+        with engine.begin() as conn:
+            with Operations.context(MigrationContext.configure(conn)):
+                migration.upgrade()
+
+        with engine.connect() as conn:
+            members = set(
+                conn.execute(sa.text("SELECT group_id, user_id FROM group_member"))
+            )
+            indexes = sa.inspect(conn).get_indexes("group_member")
+        assert members == {
+            ("staff", "alice"),
+            ("staff", "bob"),
+            ("admins", "alice"),
+            ("legacy", "carol"),
+        }
+        assert [index["name"] for index in indexes] == ["group_member_user_id_idx"]
+
+        with engine.begin() as conn:
+            with Operations.context(MigrationContext.configure(conn)):
+                migration.downgrade()
+            assert not sa.inspect(conn).has_table("group_member")
+        engine.dispose()
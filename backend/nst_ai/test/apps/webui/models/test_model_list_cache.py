@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from nst_ai.models.models import ModelListCache
+
+
+class Builder:
+    def __init__(self):
+        self.builds = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self) -> list[dict]:
+        self.builds += 1
+        await self.release.wait()
+        return [{"id": f"model-{self.builds}"}]
+
+
+@pytest.mark.asyncio
+async def test_list_is_cached_until_invalidated():
+    cache = ModelListCache(ttl=60, max_stale=0)
+    build = Builder()
+
+    assert await cache.get(build) == [{"id": "model-1"}]
+    assert await cache.get(build) == [{"id": "model-1"}]
+
+    cache.invalidate()
+    assert await cache.get(build) == [{"id": "model-2"}]
+
+    assert await cache.get(build, refresh=True) == [{"id": "model-3"}]
+    assert build.builds == 3
+
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_rebuild():
+    cache = ModelListCache(ttl=60, max_stale=0)
+    build = Builder()
+    build.release.clear()
+
+    callers = [asyncio.create_task(cache.get(build)) for _ in range(5)]
+    await asyncio.sleep(0)
+    build.release.set()
+
+    assert await asyncio.gather(*callers) == [[{"id": "model-1"}]] * 5
+    assert build.builds == 1
+
+
+@pytest.mark.asyncio
+async def test_stale_list_is_served_while_rebuilding():
+    cache = ModelListCache(ttl=60, max_stale=60)
+    build = Builder()
+    await cache.get(build)
+    cache.updated_at -= 90
+
+    build.release.clear()
+    assert await cache.get(build) == [{"id": "model-1"}]
+    assert await cache.get(build) == [{"id": "model-1"}]
+
+    build.release.set()
+    await cache._rebuild
+    assert await cache.get(build) == [{"id": "model-2"}]
+    assert build.builds == 2
+
+
+@pytest.mark.asyncio
+async def test_rebuild_across_an_invalidation_is_not_cached():
+    cache = ModelListCache(ttl=60, max_stale=0)
+    build = Builder()
+    build.release.clear()
+
+    caller = asyncio.create_task(cache.get(build))
+    await asyncio.sleep(0)
+    cache.invalidate()
+    build.release.set()
+
+    assert await caller == [{"id": "model-1"}]
+    assert cache.models is None
+
+
+@pytest.mark.asyncio
+async def test_views_are_memoized_per_list():
+    cache = ModelListCache(ttl=60, max_stale=0)
+    models = await cache.get(Builder())
+    views = []
+
+    def build_view():
+        views.append(1)
+        return [model["id"] for model in models]
+
+    assert cache.get_view(models, "user", build_view) == ["model-1"]
+    assert cache.get_view(models, "user", build_view) == ["model-1"]
+    assert cache.get_view([{"id": "other"}], "user", build_view) == ["model-1"]
+    assert len(views) == 2
+
+
+@pytest.mark.asyncio
+async def test_disabled_cache_always_builds():
+    cache = ModelListCache(ttl=0)
+    build = Builder()
+
+    await cache.get(build)
+    await cache.get(build)
+
+    assert build.builds == 2
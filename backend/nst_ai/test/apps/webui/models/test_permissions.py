@@ -0,0 +1,195 @@
+import copy
+import json
+
+import pytest
+
+from nst_ai.config import DEFAULT_USER_PERMISSIONS
+from nst_ai.models.groups import GROUP_ID_CACHE, GroupForm, GroupUpdateForm, Groups
+from nst_ai.utils import access_control
+from nst_ai.utils.access_control import (
+    PermissionCache,
+    combine_permissions,
+    fill_missing_permissions,
+    get_permissions,
+    has_permission,
+)
+
+
+def old_get_permissions(user_id: str, default_permissions: dict) -> dict:
+    """`get_permissions` as it was before permissions were compiled"""
+    permissions = json.loads(json.dumps(default_permissions))
+    for group in Groups.get_groups_by_member_id(user_id):
+        permissions = combine_permissions(permissions, group.permissions or {})
+    return fill_missing_permissions(permissions, default_permissions)
+
+
+def old_has_permission(
+    user_id: str, permission_key: str, default_permissions: dict
+) -> bool:
+    """`has_permission` as it was before permissions were compiled"""
+
+    def get_permission(permissions: dict, keys: list[str]) -> bool:
+        for key in keys:
+            if key not in permissions:
+                return False
+            permissions = permissions[key]
+        return bool(permissions)
+
+    keys = permission_key.split(".")
+    for group in Groups.get_groups_by_member_id(user_id):
+        if get_permission(group.permissions, keys):
+            return True
+
+    default_permissions = fill_missing_permissions(
+        default_permissions, DEFAULT_USER_PERMISSIONS
+    )
+    return get_permission(default_permissions, keys)
+
+
+USERS = ["alice", "bob", "carol"]
+
+DEFAULTS = [
+    {},
+    {"chat": {"file_upload": False, "delete": True}, "workspace": {"models": False}},
+    {"chat": {"file_upload": True}, "features": {"web_search": True, "beta": {}}},
+]
+
+KEYS = [
+    "chat",
+    "chat.file_upload",
+    "chat.delete",
+    "chat.missing",
+    "workspace",
+    "workspace.models",
+    "workspace.tools",
+    "features",
+    "features.web_search",
+    "features.beta",
+    "sharing.public_models",
+    "missing",
+    "missing.nested",
+]
+
+
+@pytest.fixture
+def permission_cache(monkeypatch):
+    cache = PermissionCache(ttl=60)
+    monkeypatch.setattr(access_control, "PERMISSION_CACHE", cache)
+    return cache
+
+
+@pytest.fixture
+def user_groups(group_session_factory, permission_cache):
+    """alice is in both groups, bob in the second one, carol in none"""
+    chat = Groups.insert_new_group(
+        "admin",
+        GroupForm(
+            name="chat",
+            description="",
+            permissions={
+                "chat": {"file_upload": True, "delete": False},
+                "sharing": {"public_models": True},
+            },
+        ),
+    )
+    workspace = Groups.insert_new_group(
+        "admin",
+        GroupForm(
+            name="workspace",
+            description="",
+            permissions={"workspace": {"models": False, "tools": True}, "chat": {}},
+        ),
+    )
+    Groups.add_users_to_group(chat.id, ["alice"])
+    Groups.add_users_to_group(workspace.id, ["alice", "bob"])
+    return chat, workspace
+
+
+class TestPermissions:
+    """Test compiled permissions against the original lookups"""
+
+    def test_has_permission_matches_old_lookup(self, user_groups):
+        """Test every user, permission key and set of defaults"""
+        for default_permissions in DEFAULTS:
+            for user_id in USERS:
+                for key in KEYS:
+                    assert has_permission(
+                        user_id, key, copy.deepcopy(default_permissions)
+                    ) == old_has_permission(
+                        user_id, key, copy.deepcopy(default_permissions)
+                    ), (
+                        user_id,
+                        key,
+                        default_permissions,
+                    )
+
+    def test_get_permissions_matches_old_lookup(self, user_groups):
+        """Test that groups are combined with each set of defaults alike"""
+        for default_permissions in DEFAULTS:
+            for user_id in USERS:
+                assert get_permissions(
+                    user_id, copy.deepcopy(default_permissions)
+                ) == old_get_permissions(user_id, copy.deepcopy(default_permissions))
+
+    def test_changed_defaults_are_picked_up(self, user_groups):
+        """Test that defaults changed in place are not served from the cache"""
+        default_permissions = {"chat": {"delete": False}}
+        assert not has_permission("carol", "chat.delete", default_permissions)
+        assert get_permissions("carol", default_permissions)["chat"]["delete"] is False
+
+        default_permissions["chat"]["delete"] = True
+        assert has_permission("carol", "chat.delete", default_permissions)
+        assert get_permissions("carol", default_permissions)["chat"]["delete"] is True
+
+    def test_result_is_a_copy(self, user_groups):
+        """Test that changing a returned dict does not change the cached one"""
+        permissions = get_permissions("alice", DEFAULTS[1])
+        permissions["chat"]["file_upload"] = False
+
+        assert get_permissions("alice", DEFAULTS[1])["chat"]["file_upload"] is True
+
+    def test_group_update_invalidates(self, user_groups):
+        """Test that a group permission change applies on the next lookup"""
+        chat, _ = user_groups
+        assert has_permission("alice", "sharing.public_models")
+        assert not has_permission("alice", "workspace.knowledge")
+
+        version = GROUP_ID_CACHE.version
+        Groups.update_group_by_id(
+            chat.id,
+            GroupUpdateForm(
+                name="chat",
+                description="",
+                permissions={"workspace": {"knowledge": True}},
+            ),
+        )
+
+        assert GROUP_ID_CACHE.version > version
+        assert has_permission("alice", "workspace.knowledge")
+        assert not has_permission("alice", "sharing.public_models")
+        assert get_permissions("alice", {})["workspace"] == {
+            "models": False,
+            "tools": True,
+            "knowledge": True,
+        }
+
+    def test_membership_change_invalidates(self, user_groups):
+        """Test that a user added to a group gets its permissions"""
+        chat, _ = user_groups
+        assert not has_permission("bob", "sharing.public_models")
+
+        Groups.add_users_to_group(chat.id, ["bob"])
+        assert has_permission("bob", "sharing.public_models")
+
+        Groups.remove_users_from_group(chat.id, ["bob"])
+        assert not has_permission("bob", "sharing.public_models")
+
+    def test_compiled_permissions_are_reused(self, user_groups, permission_cache):
+        """Test that groups are read once until a group is written"""
+        assert has_permission("alice", "workspace.tools")
+
+        compiled = permission_cache.get_user("alice")
+        assert permission_cache.get_user("alice") is compiled
+
+        GROUP_ID_CACHE.invalidate(["bob"])
+        assert permission_cache.get_user("alice") is not compiled
@@ -0,0 +1,164 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from nst_ai.models import users
+from nst_ai.models.users import LastActiveBatcher, User, UserCache, Users
+from nst_ai.utils import ttl_cache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    clock = FakeClock()
+    with patch.object(ttl_cache.time, "monotonic", clock):
+        yield clock
+
+
+@pytest.fixture
+def user_cache(monkeypatch):
+    cache = UserCache(ttl=5)
+    monkeypatch.setattr(users, "USER_CACHE", cache)
+    return cache
+
+
+@pytest.fixture
+def alice(group_session_factory):
+    user = Users.insert_new_user("alice", "Alice", "alice@example.com")
+    Users.update_user_api_key_by_id("alice", "sk-alice")
+    return Users.get_user_by_id(user.id)
+
+
+@pytest.fixture
+def run_with_db(group_session_factory, monkeypatch):
+    """Run batched writes on the test database"""
+
+    async def run_with_db(fn, *args, **kwargs):
+        with group_session_factory() as db:
+            return fn(db, *args, **kwargs)
+
+    monkeypatch.setattr(users, "run_with_db", run_with_db)
+
+
+def get_last_active_at(session_factory) -> dict[str, int]:
+    with session_factory() as db:
+        return {user.id: user.last_active_at for user in db.query(User).all()}
+
+
+class TestUserCache:
+    """Test caching of the users of tokens and API keys"""
+
+    def test_users_expire(self, alice, user_cache, clock):
+        """Test that a user is cached for `ttl` seconds"""
+        user_cache.set(alice)
+        assert user_cache.get("alice") == alice
+
+        clock.now += 5
+        assert user_cache.get("alice") is None
+
+    def test_cached_user_is_a_copy(self, alice, user_cache, clock):
+        """Test that changing a returned user does not change the cached one"""
+        user_cache.set(alice)
+        alice.role = "admin"
+        user_cache.get("alice").name = "Mallory"
+
+        assert user_cache.get("alice").role == "pending"
+        assert user_cache.get("alice").name == "Alice"
+
+    def test_api_keys(self, alice, user_cache, clock):
+        """Test that a cached API key only matches the user's current key"""
+        user_cache.set_by_api_key("sk-alice", alice)
+        assert user_cache.get_by_api_key("sk-alice") == alice
+        assert user_cache.get_by_api_key("sk-other") is None
+
+        user_cache.set(alice.model_copy(update={"api_key": "sk-new"}))
+        assert user_cache.get_by_api_key("sk-alice") is None
+
+    def test_disabled(self, alice):
+        """Test that nothing is cached without a ttl"""
+        cache = UserCache(ttl=0)
+        cache.set_by_api_key("sk-alice", alice)
+
+        assert cache.get("alice") is None
+        assert cache.get_by_api_key("sk-alice") is None
+
+    def test_writes_invalidate(self, alice, user_cache, clock):
+        """Test that updating a user drops it from the cache"""
+        user_cache.set_by_api_key("sk-alice", alice)
+        user_cache.set(Users.insert_new_user("bob", "Bob", "bob@example.com"))
+
+        Users.update_user_role_by_id("alice", "admin")
+        assert user_cache.get("alice") is None
+        assert user_cache.get_by_api_key("sk-alice") is None
+        assert user_cache.get("bob") is not None
+
+        user_cache.invalidate()
+        assert user_cache.get("bob") is None
+
+
+class TestLastActiveBatcher:
+    """Test batched updates of the users' last active times"""
+
+    @pytest.mark.asyncio
+    async def test_flush_writes_the_latest_times(
+        self, group_session_factory, run_with_db
+    ):
+        """Test that touched users are written at once, unknown ones skipped"""
+        for id in ["alice", "bob", "carol"]:
+            Users.insert_new_user(id, id, f"{id}@example.com")
+        batcher = LastActiveBatcher(interval=60)
+
+        with patch.object(users.time, "time", return_value=2_000_000_000):
+            batcher.touch("alice")
+            batcher.touch("deleted")
+        with patch.object(users.time, "time", return_value=2_000_000_010):
+            batcher.touch("alice")
+            batcher.touch("bob")
+        await batcher.flush()
+
+        last_active_at = get_last_active_at(group_session_factory)
+        assert last_active_at["alice"] == last_active_at["bob"] == 2_000_000_010
+        assert last_active_at["carol"] < 2_000_000_000
+        assert batcher.pending == {}
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_is_retried(self, group_session_factory, run_with_db):
+        """Test that a batch failing to write is merged back into pending"""
+        batcher = LastActiveBatcher(interval=60)
+        batcher.pending = {"alice": 100, "bob": 100}
+
+        async def fail(fn, pending):
+            batcher.pending["alice"] = 200
+            raise Exception("database is locked")
+
+        with patch.object(users, "run_with_db", fail):
+            await batcher.flush()
+        assert batcher.pending == {"alice": 200, "bob": 100}
+
+    @pytest.mark.asyncio
+    async def test_cancelled_flush_is_retried(self):
+        """Test that a batch cancelled while writing is kept for the last flush"""
+        batcher = LastActiveBatcher(interval=60)
+        batcher.pending = {"alice": 100}
+        writing = asyncio.Event()
+
+        async def hang(fn, pending):
+            writing.set()
+            await asyncio.Event().wait()
+
+        with patch.object(users, "run_with_db", hang):
+            task = asyncio.create_task(batcher.flush())
+            await writing.wait()
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        assert batcher.pending == {"alice": 100}
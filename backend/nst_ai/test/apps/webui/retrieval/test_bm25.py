@@ -0,0 +1,93 @@
+import pytest
+
+from nst_ai.retrieval.bm25 import BM25Index
+from nst_ai.retrieval.vector.main import GetResult
+
+DOCUMENTS = {
+    "a": "the cat sat on the mat",
+    "b": "the dog chased the cat",
+    "c": "a bird sang in the tree",
+}
+
+
+def get_result(documents: dict) -> GetResult:
+    return GetResult(
+        ids=[list(documents)],
+        documents=[list(documents.values())],
+        metadatas=[[{"file_id": id} for id in documents]],
+    )
+
+
+def get_scores(index: BM25Index, query: str) -> dict:
+    return {id: score for score, id, _, _ in index.search(query, limit=100)}
+
+
+@pytest.fixture
+def index_dir(tmp_path):
+    return str(tmp_path)
+
+
+@pytest.fixture
+def index(index_dir):
+    index = BM25Index("test/collection", index_dir=index_dir)
+    index.build(get_result(DOCUMENTS))
+    return index
+
+
+def test_build_and_search(index):
+    assert index.exists()
+
+    results = index.search("dog cat", limit=2)
+    assert [id for _, id, _, _ in results] == ["b", "a"]
+    assert results[0][2] == DOCUMENTS["b"]
+    assert results[0][3] == {"file_id": "b"}
+
+    assert index.search("fish", limit=2) == []
+    assert index.search("", limit=2) == []
+
+
+def test_incremental_updates_match_a_rebuild(index, index_dir):
+    index.add(
+        [
+            {"id": "d", "text": "the dog sat in the tree", "metadata": {}},
+            {"id": "a", "text": "the cat sat on the mat", "metadata": {}},
+            {"id": "b", "text": "a cat chased a bird", "metadata": {}},
+        ]
+    )
+    index.delete(ids=["c"])
+
+    rebuilt = BM25Index("rebuilt", index_dir=index_dir)
+    rebuilt.build(
+        get_result(
+            {
+                "a": "the cat sat on the mat",
+                "b": "a cat chased a bird",
+                "d": "the dog sat in the tree",
+            }
+        )
+    )
+
+    for query in ["dog", "the cat", "bird tree", "sat"]:
+        assert get_scores(index, query) == pytest.approx(get_scores(rebuilt, query))
+
+
+def test_delete_by_filter(index):
+    index.delete(filter={"file_id": "b"})
+
+    assert set(get_scores(index, "the")) == {"a", "c"}
+
+
+def test_drop(index):
+    index.drop()
+
+    assert not index.exists()
+
+
+def test_empty_collection_is_built(index_dir):
+    index = BM25Index("empty", index_dir=index_dir)
+    assert not index.exists()
+
+    index.build(None)
+
+    assert index.exists()
+    assert index.search("cat", limit=1) == []
@@ -0,0 +1,55 @@
+import fakeredis
+import numpy as np
+import pytest
+
+from nst_ai.retrieval.embedding_cache import (
+    EmbeddingCache,
+    LocalEmbeddingCache,
+    RedisEmbeddingCache,
+)
+
+FLOAT32_SIZE = 4
+
+
+def vector(seed: int, dim: int = 4) -> list[float]:
+    return np.random.default_rng(seed).random(dim, dtype=np.float32).tolist()
+
+
+def test_embedding_cache_is_abstract():
+    with pytest.raises(TypeError):
+        EmbeddingCache()
+
+
+@pytest.fixture(params=["local", "redis"])
+def cache(request, tmp_path) -> EmbeddingCache:
+    if request.param == "local":
+        return LocalEmbeddingCache(str(tmp_path), max_bytes=1024 * 1024)
+    return RedisEmbeddingCache(fakeredis.FakeRedis(), "test", ttl=60)
+
+
+def test_round_trip(cache):
+    items = {"a": vector(0), "b": vector(1), "c": vector(2, dim=8)}
+    cache.set_many(items)
+
+    assert cache.get_many(["a", "b", "c", "missing"]) == items
+    assert cache.get_many([]) == {}
+    assert cache.get_stats()["misses"] == 1
+
+
+def test_overwrite(cache):
+    cache.set_many({"a": vector(0)})
+    cache.set_many({"a": vector(1, dim=8)})
+
+    assert cache.get_many(["a"]) == {"a": vector(1, dim=8)}
+
+
+def test_local_cache_evicts_least_recently_used(tmp_path):
+    # Room for two and a half vectors, so one eviction gets back under 90%
+    cache = LocalEmbeddingCache(str(tmp_path), max_bytes=10 * FLOAT32_SIZE)
+
+    cache.set_many({"a": vector(0)})
+    cache.set_many({"b": vector(1)})
+    cache.get_many(["a"])
+    cache.set_many({"c": vector(2)})
+
+    assert set(cache.get_many(["a", "b", "c"])) == {"a", "c"}
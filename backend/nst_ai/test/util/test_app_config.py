@@ -0,0 +1,69 @@
+import time
+from unittest.mock import patch
+
+import fakeredis
+import pytest
+
+from nst_ai import config as config_module
+from nst_ai.config import AppConfig, PersistentConfig
+
+
+@pytest.fixture(autouse=True)
+def no_database(monkeypatch):
+    monkeypatch.setattr(config_module, "save_to_db", lambda data: None)
+
+
+def make_config(**kwargs) -> AppConfig:
+    config = AppConfig(**kwargs)
+    config.PERMISSIONS = PersistentConfig(
+        "PERMISSIONS", "test.permissions", {"chat": {"delete": True}, "tags": []}
+    )
+    return config
+
+
+def wait_for_listener(config: AppConfig):
+    deadline = time.monotonic() + 5
+    while not config._cache_listening:
+        assert time.monotonic() < deadline, "invalidation listener did not start"
+        time.sleep(0.01)
+
+
+class TestAppConfigValues:
+    """Test that config values cannot be mutated in place by callers"""
+
+    def test_local_value_is_copied(self):
+        """Test mutating a value read without Redis leaves the config intact"""
+        config = make_config()
+
+        permissions = config.PERMISSIONS
+        permissions["chat"]["delete"] = False
+        permissions["tags"].append("new")
+
+        assert config.PERMISSIONS == {"chat": {"delete": True}, "tags": []}
+
+    def test_cached_value_is_copied(self):
+        """Test mutating a value served from the Redis read cache"""
+        server = fakeredis.FakeServer()
+        with patch.object(
+            config_module,
+            "get_redis_connection",
+            return_value=fakeredis.FakeRedis(server=server, decode_responses=True),
+        ):
+            config = make_config(redis_url="redis://localhost:6379/0")
+        wait_for_listener(config)
+
+        config.PERMISSIONS["chat"]["delete"] = False
+        config.PERMISSIONS["tags"].append("new")
+
+        assert config._cache_hits > 0
+        assert config.PERMISSIONS == {"chat": {"delete": True}, "tags": []}
+
+    def test_assignment_still_saves(self):
+        """Test that a modified copy is persisted when assigned back"""
+        config = make_config()
+
+        permissions = config.PERMISSIONS
+        permissions["chat"]["delete"] = False
+        config.PERMISSIONS = permissions
+
+        assert config.PERMISSIONS == {"chat": {"delete": False}, "tags": []}
@@ -0,0 +1,151 @@
+import asyncio
+
+import pytest
+
+from nst_ai.socket.utils import ChatEventCoalescer, merge_content_updates
+
+
+def completion(**data) -> dict:
+    return {"type": "chat:completion", "data": data}
+
+
+def apply(content: str, event_data: dict) -> str:
+    data = event_data["data"]
+    if "content" in data:
+        return data["content"]
+    return content[: data["content_offset"]] + data["content_delta"]
+
+
+class TestMergeContentUpdates:
+    """Test merging content updates into one equivalent update"""
+
+    def test_first_update(self):
+        """Test that nothing pending keeps the update as is"""
+        update = completion(content_offset=3, content_delta="lo")
+
+        assert merge_content_updates(None, update) is update
+
+    def test_full_content_replaces(self):
+        """Test that a full content supersedes anything pending"""
+        update = completion(content="New")
+
+        assert merge_content_updates(completion(content="Old"), update) is update
+
+    def test_full_then_delta(self):
+        """Test a delta applied on top of a full content"""
+        merged = merge_content_updates(
+            completion(content="Hello"),
+            completion(content_offset=3, content_delta="p!"),
+        )
+
+        assert merged == completion(content="Help!")
+
+    def test_delta_then_forward_delta(self):
+        """Test a delta starting within or after the pending one"""
+        merged = merge_content_updates(
+            completion(content_offset=5, content_delta=" world"),
+            completion(content_offset=8, content_delta="ld!"),
+        )
+
+        assert merged == completion(content_offset=5, content_delta=" wold!")
+        assert apply("Hello", merged) == "Hello wold!"
+
+    def test_delta_then_backward_delta(self):
+        """Test a delta rewriting content before the pending one"""
+        merged = merge_content_updates(
+            completion(content_offset=5, content_delta=" world"),
+            completion(content_offset=2, content_delta="y"),
+        )
+
+        assert merged == completion(content_offset=2, content_delta="y")
+        assert apply("Hello", merged) == "Hey"
+
+    def test_sequences_match_applying_each_update(self):
+        """Test that merging any sequence equals applying it step by step"""
+        updates = [
+            completion(content="Hello"),
+            completion(content_offset=5, content_delta=" there"),
+            completion(content_offset=11, content_delta=", you"),
+            completion(content_offset=6, content_delta="world"),
+            completion(content_offset=11, content_delta="!"),
+            completion(content_offset=0, content_delta="Bye"),
+        ]
+        for start in range(len(updates)):
+            content = apply("", updates[0])
+            for update in updates[1:start]:
+                content = apply(content, update)
+
+            expected, merged = content, None
+            for update in updates[start:]:
+                expected = apply(expected, update)
+                merged = merge_content_updates(merged, update)
+
+            if merged is not None:
+                assert apply(content, merged) == expected
+
+
+class Emitter:
+    def __init__(self):
+        self.events = []
+
+    async def __call__(self, event_data):
+        self.events.append(event_data)
+
+
+class TestChatEventCoalescer:
+    """Test batching of streamed content updates"""
+
+    @pytest.mark.asyncio
+    async def test_updates_within_interval_are_merged(self):
+        """Test that updates are merged until the interval has passed"""
+        emit = Emitter()
+        coalescer = ChatEventCoalescer(emit, interval=0.05, max_batch_size=100)
+
+        await coalescer.send(completion(content="He"))
+        await coalescer.send(completion(content_offset=2, content_delta="llo"))
+        await coalescer.send(completion(content_offset=5, content_delta="!"))
+        assert emit.events == [completion(content="He")]
+
+        await asyncio.sleep(0.1)
+
+        assert emit.events == [
+            completion(content="He"),
+            completion(content_offset=2, content_delta="llo!"),
+        ]
+        assert coalescer.is_idle()
+
+    @pytest.mark.asyncio
+    async def test_other_events_flush_pending_updates_first(self):
+        """Test that other events are sent after the pending update"""
+        emit = Emitter()
+        coalescer = ChatEventCoalescer(emit, interval=60, max_batch_size=100)
+        status = {"type": "status", "data": {"done": True}}
+
+        await coalescer.send(completion(content="Hi"))
+        await coalescer.send(completion(content_offset=2, content_delta="!"))
+        await coalescer.send(status)
+
+        assert emit.events == [
+            completion(content="Hi"),
+            completion(content_offset=2, content_delta="!"),
+            status,
+        ]
+        assert coalescer.pending is None
+        coalescer.flush_task.cancel()
+
+    @pytest.mark.asyncio
+    async def test_flush_on_max_batch_size(self):
+        """Test that a full batch is sent without waiting for the interval"""
+        emit = Emitter()
+        coalescer = ChatEventCoalescer(emit, interval=60, max_batch_size=3)
+
+        await coalescer.send(completion(content=""))
+        for i in range(6):
+            await coalescer.send(completion(content_offset=i, content_delta="x"))
+
+        assert emit.events == [
+            completion(content=""),
+            completion(content_offset=0, content_delta="xxx"),
+            completion(content_offset=3, content_delta="xxx"),
+        ]
+        coalescer.flush_task.cancel()
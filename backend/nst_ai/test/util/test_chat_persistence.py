@@ -0,0 +1,122 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from nst_ai.utils import chat_persistence
+from nst_ai.utils.chat_persistence import ChatMessageWriter, ChatSaveStats
+
+
+class FakeHistogram:
+    def __init__(self):
+        self.values = []
+
+    def record(self, value, attributes=None):
+        self.values.append(value)
+
+
+@pytest.fixture
+def stats():
+    stats = ChatSaveStats()
+    with patch.object(chat_persistence, "CHAT_SAVE_STATS", stats):
+        yield stats
+
+
+@pytest.fixture
+def upserts():
+    upserts = []
+
+    async def upsert(chat_id, message_id, message):
+        upserts.append((chat_id, message_id, dict(message)))
+        return message
+
+    with patch.object(
+        chat_persistence.Chats,
+        "upsert_message_to_chat_by_id_and_message_id_async",
+        side_effect=upsert,
+    ):
+        yield upserts
+
+
+class TestChatMessageWriter:
+    """Test write-behind persistence of streamed messages"""
+
+    @pytest.mark.asyncio
+    async def test_writes_are_coalesced_until_close(self, stats, upserts):
+        """Test that writes within the interval reach the database once"""
+        writer = ChatMessageWriter("chat", "message", interval=60, max_bytes=1000)
+
+        await writer.write({"content": "Hel"})
+        await writer.write({"content": "Hello", "done": False})
+        assert upserts == []
+
+        await writer.close()
+
+        assert upserts == [("chat", "message", {"content": "Hello", "done": False})]
+        assert stats.get_stats()["writes"] == 2
+        assert stats.get_stats()["coalesced_writes"] == 1
+
+    @pytest.mark.asyncio
+    async def test_flush_on_max_bytes(self, stats, upserts):
+        """Test that enough new content is flushed without waiting"""
+        writer = ChatMessageWriter("chat", "message", interval=60, max_bytes=5)
+
+        await writer.write({"content": "Hel"})
+        await writer.write({"content": "Hello world"})
+
+        assert upserts == [("chat", "message", {"content": "Hello world"})]
+        await writer.close()
+        assert len(upserts) == 1
+
+    @pytest.mark.asyncio
+    async def test_flush_on_timer(self, stats, upserts):
+        """Test that a stalled stream is flushed after the interval"""
+        writer = ChatMessageWriter("chat", "message", interval=0.01, max_bytes=1000)
+
+        await writer.write({"content": "Hello"})
+        await asyncio.sleep(0.05)
+
+        assert upserts == [("chat", "message", {"content": "Hello"})]
+
+    @pytest.mark.asyncio
+    async def test_flushes_are_recorded_in_the_histogram(self, stats, upserts):
+        """Test that every flush records its duration in milliseconds"""
+        stats.flush_histogram = FakeHistogram()
+        writer = ChatMessageWriter("chat", "message", interval=60, max_bytes=1000)
+
+        await writer.write({"content": "Hello"})
+        await writer.close()
+        await writer.close()
+
+        assert len(stats.flush_histogram.values) == 1
+        assert 0 <= stats.flush_histogram.values[0] < 1000
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_is_retried(self, stats):
+        """Test that a message failing to save is merged back into pending"""
+        upserts = []
+
+        async def upsert(chat_id, message_id, message):
+            if not upserts:
+                upserts.append(None)
+                raise Exception("database is locked")
+            upserts.append(dict(message))
+            return message
+
+        with patch.object(
+            chat_persistence.Chats,
+            "upsert_message_to_chat_by_id_and_message_id_async",
+            side_effect=upsert,
+        ):
+            writer = ChatMessageWriter("chat", "message", interval=60, max_bytes=5)
+            await writer.write({"content": "Hello world", "sources": ["doc"]})
+            assert writer.pending == {"content": "Hello world", "sources": ["doc"]}
+            assert writer.flushed_size == 0
+
+            await writer.write({"content": "Hello world!", "done": True})
+            await writer.close()
+
+        assert upserts[1:] == [
+            {"content": "Hello world!", "sources": ["doc"], "done": True}
+        ]
+        assert writer.pending == {}
@@ -0,0 +1,136 @@
+from unittest.mock import patch
+
+import pytest
+
+from nst_ai.utils import circuit_breaker
+from nst_ai.utils.circuit_breaker import CircuitBreaker, ConnectionHealth
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    clock = FakeClock()
+    with patch.object(circuit_breaker.time, "time", clock):
+        yield clock
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker(failure_threshold=3, recovery_timeout=30)
+
+
+class TestCircuitBreaker:
+    """Test the closed -> open -> half_open state machine"""
+
+    def test_opens_after_consecutive_failures(self, breaker):
+        """Test that only `failure_threshold` consecutive failures open it"""
+        breaker.record_failure("HTTP 502")
+        breaker.record_failure("HTTP 502")
+        breaker.record_success()
+        breaker.record_failure("HTTP 503")
+        breaker.record_failure("HTTP 503")
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.allow_request()
+
+        breaker.record_failure("HTTP 504")
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.last_error == "HTTP 504"
+        assert not breaker.allow_request()
+
+    def test_half_open_trial_success_closes(self, breaker, clock):
+        """Test that a successful trial after the recovery timeout closes it"""
+        for _ in range(3):
+            breaker.record_failure()
+
+        clock.now += 29
+        assert not breaker.allow_request()
+
+        clock.now += 1
+        assert breaker.allow_request()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert not breaker.allow_request()
+
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.failures == 0
+        assert breaker.allow_request()
+
+    def test_half_open_trial_failure_reopens(self, breaker, clock):
+        """Test that a failed trial re-opens it for another recovery timeout"""
+        for _ in range(3):
+            breaker.record_failure()
+        clock.now += 30
+        assert breaker.allow_request()
+
+        breaker.record_failure("HTTP 503")
+        assert breaker.state == CircuitBreaker.OPEN
+
+        clock.now += 29
+        assert not breaker.allow_request()
+        clock.now += 1
+        assert breaker.allow_request()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    def test_unreported_trial_is_retried(self, breaker, clock):
+        """Test that a trial that never reports back does not block forever"""
+        for _ in range(3):
+            breaker.record_failure()
+        clock.now += 30
+        assert breaker.allow_request()
+
+        clock.now += 30
+        assert breaker.allow_request()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+class TestConnectionHealth:
+    """Test circuit breakers kept per connection URL"""
+
+    def test_breakers_are_per_url(self, clock):
+        """Test that failures of one connection do not affect another"""
+        health = ConnectionHealth(
+            "Test", interval=0, failure_threshold=1, recovery_timeout=30
+        )
+
+        health.record_failure("http://a", "HTTP 500")
+        health.record_success("http://b")
+
+        assert health.is_open("http://a")
+        assert not health.allow_request("http://a")
+        assert not health.is_open("http://b")
+        assert not health.is_open("http://unknown")
+        assert [
+            status["state"] for status in health.get_status(["http://a", "http://b"])
+        ] == [CircuitBreaker.OPEN, CircuitBreaker.CLOSED]
+
+    @pytest.mark.asyncio
+    async def test_probe(self, clock):
+        """Test that a failing or raising health check counts as a failure"""
+        health = ConnectionHealth(
+            "Test", interval=0, failure_threshold=2, recovery_timeout=30
+        )
+
+        async def unhealthy():
+            return False
+
+        async def raises():
+            raise ConnectionError("refused")
+
+        async def healthy():
+            return True
+
+        await health.probe("http://a", unhealthy)
+        await health.probe("http://a", raises)
+        assert health.is_open("http://a")
+
+        clock.now += 30
+        assert health.allow_request("http://a")
+        await health.probe("http://a", healthy)
+        assert health.get("http://a").state == CircuitBreaker.CLOSED
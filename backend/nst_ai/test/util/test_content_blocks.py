@@ -0,0 +1,112 @@
+import random
+from unittest.mock import patch
+
+import pytest
+
+from nst_ai.utils import content_blocks
+from nst_ai.utils.content_blocks import (
+    ContentBlocksSerializer,
+    serialize_content_blocks,
+)
+
+TOKENS = ["a", " b", "\n", "```", "> q", "x\n\n", "`", "<details>", "é"]
+
+
+def apply_event_data(content, data: dict) -> str:
+    """What the client makes of a `chat:completion` event"""
+    if "content" in data:
+        return data["content"]
+    return content[: data["content_offset"]] + data["content_delta"]
+
+
+def stream(seed: int, steps: int = 300):
+    """
+    Yield the content blocks of a random response after each change, made
+    the way the middleware makes them: mostly appending to the last block,
+    sometimes replacing or dropping earlier ones.
+    """
+    rng = random.Random(seed)
+    blocks = [{"type": "text", "content": ""}]
+    for _ in range(steps):
+        r = rng.random()
+        last = blocks[-1]
+        if r < 0.6 and isinstance(last["content"], str):
+            last["content"] += rng.choice(TOKENS)
+        elif r < 0.7:
+            blocks.append(
+                {
+                    "type": "reasoning",
+                    "start_tag": "<think>",
+                    "end_tag": "</think>",
+                    "attributes": {},
+                    "content": "",
+                }
+            )
+        elif r < 0.75 and last["type"] == "reasoning":
+            last["duration"] = 3
+            blocks.append({"type": "text", "content": ""})
+        elif r < 0.8:
+            blocks.append(
+                {
+                    "type": "tool_calls",
+                    "content": [
+                        {"id": "1", "function": {"name": "f", "arguments": "{}"}}
+                    ],
+                }
+            )
+        elif r < 0.83 and last["type"] == "tool_calls":
+            last["results"] = [{"tool_call_id": "1", "content": "ok"}]
+            blocks.append({"type": "text", "content": ""})
+        elif r < 0.88:
+            blocks.append(
+                {
+                    "type": "code_interpreter",
+                    "attributes": {"lang": "python"},
+                    "content": "print(1)",
+                }
+            )
+        elif r < 0.9 and last["type"] == "code_interpreter":
+            last["output"] = {"stdout": "1"}
+            blocks.append({"type": "text", "content": ""})
+        elif r < 0.92:
+            blocks[0] = {"type": "text", "content": "replaced"}
+        elif r < 0.94 and len(blocks) > 1:
+            blocks.pop()
+        yield blocks
+
+
+class TestContentBlocksSerializer:
+    """Test incremental serialization against `serialize_content_blocks`"""
+
+    @pytest.mark.parametrize("seed", range(50))
+    def test_matches_full_serialization(self, seed):
+        """Test every intermediate state of a random stream"""
+        serializer = ContentBlocksSerializer()
+        client = None
+        for blocks in stream(seed):
+            content = serializer.serialize(blocks)
+            assert content == serialize_content_blocks(blocks)
+
+            client = apply_event_data(client, serializer.get_event_data(content))
+            assert client == content
+
+    def test_event_data(self):
+        """Test that deltas are sent between periodic full contents"""
+        serializer = ContentBlocksSerializer()
+        with patch.object(content_blocks.time, "monotonic", return_value=100.0):
+            assert serializer.get_event_data("Hello") == {"content": "Hello"}
+            assert serializer.get_event_data("Hello world") == {
+                "content_offset": 5,
+                "content_delta": " world",
+            }
+            assert serializer.get_event_data("Help") == {
+                "content_offset": 3,
+                "content_delta": "p",
+            }
+
+        with patch.object(
+            content_blocks.time,
+            "monotonic",
+            return_value=100.0 + ContentBlocksSerializer.FULL_CONTENT_INTERVAL,
+        ):
+            assert serializer.get_event_data("Help!") == {"content": "Help!"}
@@ -0,0 +1,57 @@
+from unittest.mock import patch
+
+from nst_ai.internal import db
+from nst_ai.internal.db import DatabaseReplicas
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestDatabaseReplicas:
+    """Test routing of lag-tolerant reads to read replicas"""
+
+    def test_no_replicas(self):
+        """Test that reads go to the primary without replicas"""
+        replicas = DatabaseReplicas([], max_lag=5)
+
+        replicas.mark_written("user")
+
+        assert replicas.get_replica("user") is None
+        assert not replicas.was_written("user")
+
+    def test_recent_writes_are_read_from_the_primary(self):
+        """Test that keys written within max_lag are not read from a replica"""
+        clock = FakeClock()
+        with patch.object(db.time, "monotonic", clock):
+            replicas = DatabaseReplicas(["sqlite://", "sqlite://"], max_lag=5)
+
+            replicas.mark_written("chat", "user", None)
+            assert replicas.was_written("user")
+            assert replicas.get_replica("user") is None
+            assert replicas.get_replica("other") is not None
+
+            clock.now += 5
+            assert not replicas.was_written("chat", "user")
+            assert replicas.get_replica("user") is not None
+
+    def test_replicas_are_used_in_turn(self):
+        """Test that reads are spread over the replicas"""
+        replicas = DatabaseReplicas(["sqlite://", "sqlite://"], max_lag=5)
+
+        assert {id(replicas.get_replica()) for _ in range(4)} == {
+            id(replica) for replica in replicas.replicas
+        }
+
+    def test_lagging_replica_is_skipped(self):
+        """Test that a replica further behind than max_lag is not used"""
+        replicas = DatabaseReplicas(["sqlite://", "sqlite://"], max_lag=5)
+        lagging, current = replicas.replicas
+        lagging.lag_checked_at = current.lag_checked_at = db.time.monotonic()
+        lagging.lag = 10
+
+        assert all(replicas.get_replica() is current for _ in range(4))
@@ -0,0 +1,113 @@
+import time
+from unittest.mock import patch
+
+import fakeredis
+import pytest
+
+from nst_ai.socket.utils import RedisDict
+
+
+@pytest.fixture
+def redis_server():
+    """Every connection made by RedisDict talks to the same fake server"""
+    server = fakeredis.FakeServer()
+    with patch(
+        "nst_ai.socket.utils.get_redis_connection",
+        side_effect=lambda *args, **kwargs: fakeredis.FakeRedis(
+            server=server, decode_responses=True
+        ),
+    ):
+        yield server
+
+
+def wait_for(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+class TestRedisDict:
+    """Test the Redis hash backed dict and its per-worker near-cache"""
+
+    @pytest.mark.parametrize("cache_ttl", [0, 60])
+    def test_dict_operations(self, redis_server, cache_ttl):
+        """Test the dict interface with and without caching"""
+        pool = RedisDict("test:pool", redis_url="redis://", cache_ttl=cache_ttl)
+
+        pool["a"] = {"id": "a"}
+        pool.update({"b": 1}, c=[2])
+
+        assert pool["a"] == {"id": "a"}
+        assert "b" in pool and "missing" not in pool
+        assert pool.get("missing", "default") == "default"
+        assert sorted(pool.keys()) == ["a", "b", "c"]
+        assert len(pool) == 3
+        assert pool.setdefault("b", 5) == 1
+
+        del pool["b"]
+        with pytest.raises(KeyError):
+            pool["b"]
+        with pytest.raises(KeyError):
+            del pool["b"]
+
+        pool.clear()
+        assert len(pool) == 0
+
+    def test_writes_invalidate_other_workers(self, redis_server):
+        """Test that a value cached by one worker is dropped when another writes it"""
+        writer = RedisDict("test:pool", redis_url="redis://", cache_ttl=60)
+        reader = RedisDict("test:pool", redis_url="redis://", cache_ttl=60)
+
+        writer["sid"] = "alice"
+        assert reader["sid"] == "alice"
+        assert len(reader) == 1
+
+        writer["sid"] = "bob"
+        writer["other"] = "carol"
+        wait_for(lambda: reader.get("sid") == "bob")
+        wait_for(lambda: len(reader) == 2)
+
+        del writer["sid"]
+        wait_for(lambda: "sid" not in reader)
+
+        writer.clear()
+        wait_for(lambda: reader.get("other") is None)
+
+    def test_reads_are_served_from_the_cache(self, redis_server):
+        """Test that cached values do not hit Redis again"""
+        pool = RedisDict("test:pool", redis_url="redis://", cache_ttl=60)
+        pool["sid"] = "alice"
+
+        with patch.object(pool.redis, "hget") as hget:
+            assert pool["sid"] == "alice"
+            assert "sid" in pool
+        hget.assert_not_called()
+
+    def test_get_many(self, redis_server):
+        """Test reading several keys, the uncached ones in a single HMGET"""
+        writer = RedisDict("test:pool", redis_url="redis://")
+        pool = RedisDict("test:pool", redis_url="redis://", cache_ttl=60)
+        writer.update(a=1, b=2, c=3)
+        assert pool["a"] == 1
+
+        with patch.object(pool.redis, "hmget", wraps=pool.redis.hmget) as hmget:
+            assert pool.get_many(["a", "b", "missing", "c", "b"], default=0) == [
+                1,
+                2,
+                0,
+                3,
+                2,
+            ]
+            hmget.assert_called_once_with("test:pool", ["b", "missing", "c"])
+
+            assert pool.get_many(["b", "c", "missing"]) == [2, 3, None]
+            hmget.assert_called_once()
+
+    def test_get_many_without_cache(self, redis_server):
+        """Test that get_many reads everything from Redis without caching"""
+        pool = RedisDict("test:pool", redis_url="redis://")
+        pool.update(a=1, b=2)
+
+        assert pool.get_many(["b", "missing", "a"]) == [2, None, 1]
+        assert len(pool.entries) == 0
@@ -0,0 +1,322 @@
+import random
+import re
+import time
+
+import pytest
+
+from nst_ai.utils.content_blocks import StreamingTagParser, serialize_content_blocks
+
+REASONING_TAGS = [
+    ("<think>", "</think>"),
+    ("<thinking>", "</thinking>"),
+    ("<reason>", "</reason>"),
+    ("<reasoning>", "</reasoning>"),
+    ("<thought>", "</thought>"),
+    ("<Thought>", "</Thought>"),
+    ("<|begin_of_thought|>", "<|end_of_thought|>"),
+    ("◁think▷", "◁/think▷"),
+]
+CODE_INTERPRETER_TAGS = [("<code_interpreter>", "</code_interpreter>")]
+SOLUTION_TAGS = [("<|begin_of_solution|>", "<|end_of_solution|>")]
+
+WORDS = [
+    "Let",
+    " me",
+    " think",
+    " about",
+    " this",
+    ".",
+    "\n",
+    "\n\n",
+    " x < y",
+    " a > b",
+    " <b>bold</b>",
+    " 3<4",
+]
+
+
+# `tag_content_handler` as it was in utils/middleware.py before
+# StreamingTagParser replaced it, kept as the reference implementation.
+def tag_content_handler(content_type, tags, content, content_blocks):
+    end_flag = False
+
+    def extract_attributes(tag_content):
+        """Extract attributes from a tag if they exist."""
+        attributes = {}
+        if not tag_content:  # Ensure tag_content is not None
+            return attributes
+        # Match attributes in the format: key="value" (ignores single quotes for simplicity)
+        matches = re.findall(r'(\w+)\s*=\s*"([^"]+)"', tag_content)
+        for key, value in matches:
+            attributes[key] = value
+        return attributes
+
+    if content_blocks[-1]["type"] == "text":
+        for start_tag, end_tag in tags:
+
+            start_tag_pattern = rf"{re.escape(start_tag)}"
+            if start_tag.startswith("<") and start_tag.endswith(">"):
+                # Match start tag e.g., <tag> or <tag attr="value">
+                # remove both '<' and '>' from start_tag
+                # Match start tag with attributes
+                start_tag_pattern = rf"<{re.escape(start_tag[1:-1])}(\s.*?)?>"
+
+            match = re.search(start_tag_pattern, content)
+            if match:
+                attr_content = (
+                    match.group(1) if match.group(1) else ""
+                )  # Ensure it's not None
+                attributes = extract_attributes(
+                    attr_content
+                )  # Extract attributes safely
+
+                # Capture everything before and after the matched tag
+                before_tag = content[: match.start()]  # Content before opening tag
+                after_tag = content[match.end() :]  # Content after opening tag
+
+                # Remove the start tag and after from the currently handling text block
+                content_blocks[-1]["content"] = content_blocks[-1]["content"].replace(
+                    match.group(0) + after_tag, ""
+                )
+
+                if before_tag:
+                    content_blocks[-1]["content"] = before_tag
+
+                if not content_blocks[-1]["content"]:
+                    content_blocks.pop()
+
+                # Append the new block
+                content_blocks.append(
+                    {
+                        "type": content_type,
+                        "start_tag": start_tag,
+                        "end_tag": end_tag,
+                        "attributes": attributes,
+                        "content": "",
+                        "started_at": time.time(),
+                    }
+                )
+
+                if after_tag:
+                    content_blocks[-1]["content"] = after_tag
+                    tag_content_handler(content_type, tags, after_tag, content_blocks)
+
+                break
+    elif content_blocks[-1]["type"] == content_type:
+        start_tag = content_blocks[-1]["start_tag"]
+        end_tag = content_blocks[-1]["end_tag"]
+
+        if end_tag.startswith("<") and end_tag.endswith(">"):
+            # Match end tag e.g., </tag>
+            end_tag_pattern = rf"{re.escape(end_tag)}"
+        else:
+            # Handle cases where end_tag is just a tag name
+            end_tag_pattern = rf"{re.escape(end_tag)}"
+
+        # Check if the content has the end tag
+        if re.search(end_tag_pattern, content):
+            end_flag = True
+
+            block_content = content_blocks[-1]["content"]
+            # Strip start and end tags from the content
+            start_tag_pattern = rf"<{re.escape(start_tag)}(.*?)>"
+            block_content = re.sub(start_tag_pattern, "", block_content).strip()
+
+            end_tag_regex = re.compile(end_tag_pattern, re.DOTALL)
+            split_content = end_tag_regex.split(block_content, maxsplit=1)
+
+            # Content inside the tag
+            block_content = split_content[0].strip() if split_content else ""
+
+            # Leftover content (everything after `</tag>`)
+            leftover_content = (
+                split_content[1].strip() if len(split_content) > 1 else ""
+            )
+
+            if block_content:
+                content_blocks[-1]["content"] = block_content
+                content_blocks[-1]["ended_at"] = time.time()
+                content_blocks[-1]["duration"] = int(
+                    content_blocks[-1]["ended_at"] - content_blocks[-1]["started_at"]
+                )
+
+                # Reset the content_blocks by appending a new text block
+                if content_type != "code_interpreter":
+                    if leftover_content:
+
+                        content_blocks.append(
+                            {
+                                "type": "text",
+                                "content": leftover_content,
+                            }
+                        )
+                    else:
+                        content_blocks.append(
+                            {
+                                "type": "text",
+                                "content": "",
+                            }
+                        )
+
+            else:
+                # Remove the block if content is empty
+                content_blocks.pop()
+
+                if leftover_content:
+                    content_blocks.append(
+                        {
+                            "type": "text",
+                            "content": leftover_content,
+                        }
+                    )
+                else:
+                    content_blocks.append(
+                        {
+                            "type": "text",
+                            "content": "",
+                        }
+                    )
+
+            # Clean processed content
+            start_tag_pattern = rf"{re.escape(start_tag)}"
+            if start_tag.startswith("<") and start_tag.endswith(">"):
+                # Match start tag e.g., <tag> or <tag attr="value">
+                # remove both '<' and '>' from start_tag
+                # Match start tag with attributes
+                start_tag_pattern = rf"<{re.escape(start_tag[1:-1])}(\s.*?)?>"
+
+            content = re.sub(
+                rf"{start_tag_pattern}(.|\n)*?{re.escape(end_tag)}",
+                "",
+                content,
+                flags=re.DOTALL,
+            )
+
+    return content, content_blocks, end_flag
+
+
+def run_tag_content_handler(chunks: list[str], code_interpreter: bool):
+    content, blocks, rendered = "", [{"type": "text", "content": ""}], []
+    for value in chunks:
+        content = f"{content}{value}"
+        blocks[-1]["content"] += value
+        content, blocks, _ = tag_content_handler(
+            "reasoning", REASONING_TAGS, content, blocks
+        )
+        if code_interpreter:
+            content, blocks, end = tag_content_handler(
+                "code_interpreter", CODE_INTERPRETER_TAGS, content, blocks
+            )
+            if end:
+                break
+        content, blocks, _ = tag_content_handler(
+            "solution", SOLUTION_TAGS, content, blocks
+        )
+        rendered.append(serialize_content_blocks(blocks))
+    return rendered, blocks, content
+
+
+def run_streaming_tag_parser(chunks: list[str], code_interpreter: bool):
+    parser = StreamingTagParser(
+        [("reasoning", REASONING_TAGS)]
+        + ([("code_interpreter", CODE_INTERPRETER_TAGS)] if code_interpreter else [])
+        + [("solution", SOLUTION_TAGS)]
+    )
+    blocks, rendered = [{"type": "text", "content": ""}], []
+    for value in chunks:
+        if "code_interpreter" in parser.feed(value, blocks):
+            break
+        rendered.append(serialize_content_blocks(blocks))
+    return rendered, blocks, parser.content
+
+
+def make_response(rng: random.Random) -> tuple[str, bool]:
+    """A response with tags, and whether code interpreter is enabled"""
+
+    def text(n):
+        return "".join(rng.choice(WORDS) for _ in range(n))
+
+    # The literal tags crashed `tag_content_handler`, see test_literal_tags
+    start_tag, end_tag = rng.choice(REASONING_TAGS[:-1])
+    if start_tag == "<think>" and rng.random() < 0.2:
+        start_tag = '<think type="x">'
+
+    r = rng.random()
+    if r < 0.5:
+        return f"{start_tag}\n{text(40)}\n{end_tag}\n\n{text(30)}", False
+    if r < 0.7:
+        return (
+            f"{text(10)}\n<|begin_of_solution|>\n{text(20)}\n"
+            f"<|end_of_solution|>\n{text(5)}",
+            False,
+        )
+    if r < 0.9:
+        return (
+            f"{start_tag}{text(20)}{end_tag}\n\n{text(10)}\n"
+            '<code_interpreter type="code" lang="python">\n'
+            "print(1 < 2)\n</code_interpreter>\nignored",
+            True,
+        )
+    return text(60), False
+
+
+def split_into_chunks(rng: random.Random, response: str) -> list[str]:
+    chunks, i = [], 0
+    while i < len(response):
+        n = rng.choice([1, 2, 3, 4, 5, 8])
+        chunks.append(response[i : i + n])
+        i += n
+    return chunks
+
+
+def without_whitespace(value: str) -> str:
+    return re.sub(r"\s", "", value)
+
+
+def get_block_fields(blocks: list[dict]) -> list[dict]:
+    return [
+        {
+            key: without_whitespace(value) if isinstance(value, str) else value
+            for key, value in block.items()
+            if key not in ("started_at", "ended_at", "duration")
+        }
+        for block in blocks
+    ]
+
+
+class TestStreamingTagParser:
+    """Test StreamingTagParser against the handler it replaced"""
+
+    @pytest.mark.parametrize("seed", range(20))
+    def test_matches_tag_content_handler(self, seed):
+        """Test random responses streamed in random chunks"""
+        rng = random.Random(seed)
+        for _ in range(25):
+            response, code_interpreter = make_response(rng)
+            chunks = split_into_chunks(rng, response)
+
+            expected = run_tag_content_handler(chunks, code_interpreter)
+            actual = run_streaming_tag_parser(chunks, code_interpreter)
+
+            # Identical apart from whitespace around the blocks
+            assert [without_whitespace(x) for x in actual[0]] == [
+                without_whitespace(x) for x in expected[0]
+            ], chunks
+            assert get_block_fields(actual[1]) == get_block_fields(expected[1])
+            assert actual[2].strip() == expected[2].strip()
+
+    def test_literal_tags(self):
+        """Test tags that are not of the <tag> form"""
+        blocks = [{"type": "text", "content": ""}]
+        parser = StreamingTagParser([("reasoning", REASONING_TAGS)])
+
+        closed = []
+        for value in ["Hi ◁thi", "nk▷Hmm", "m◁/think", "▷Done"]:
+            closed += parser.feed(value, blocks)
+
+        assert closed == ["reasoning"]
+        assert [(block["type"], block["content"]) for block in blocks] == [
+            ("text", "Hi "),
+            ("reasoning", "Hmmm"),
+            ("text", "Done"),
+        ]
@@ -0,0 +1,93 @@
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from nst_ai.utils import ttl_cache
+from nst_ai.utils.ttl_cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    clock = FakeClock()
+    with patch.object(ttl_cache.time, "monotonic", clock):
+        yield clock
+
+
+class TestTTLCache:
+    """Test the bounded per-process cache with expiring entries"""
+
+    def test_entries_expire(self, clock):
+        """Test that entries are served until `ttl` seconds after being set"""
+        cache = TTLCache(ttl=5)
+        cache.set("a", None)
+        cache.set("b", [1])
+
+        assert "a" in cache and cache.get("a", "missing") is None
+        assert cache.get("b") == [1]
+
+        clock.now += 4
+        cache.set("b", [2])
+        clock.now += 1
+        assert "a" not in cache
+        assert cache.get("b") == [2]
+
+        cache.pop("b")
+        cache.pop("unknown")
+        assert cache.get("b") is None
+
+    def test_disabled(self, clock):
+        """Test that nothing is kept without a ttl"""
+        cache = TTLCache(ttl=0)
+        cache.set("a", 1)
+
+        assert "a" not in cache
+        assert len(cache) == 0
+
+    def test_expired_entries_are_dropped_on_write(self, clock):
+        """Test that expired entries do not pile up"""
+        cache = TTLCache(ttl=5)
+        for i in range(100):
+            cache.set(i, i)
+            clock.now += 1
+
+        assert len(cache) == 5
+        assert list(cache.entries) == [95, 96, 97, 98, 99]
+
+    def test_oldest_entries_are_dropped_when_full(self, clock):
+        """Test that the least recently set entries go beyond `max_size`"""
+        cache = TTLCache(ttl=60, max_size=3)
+        for key in ["a", "b", "c"]:
+            cache.set(key, key)
+        cache.set("a", "a")
+        cache.set("d", "d")
+
+        assert list(cache.entries) == ["c", "a", "d"]
+
+        cache.clear()
+        assert len(cache) == 0
+
+    def test_concurrent_writes(self):
+        """Test that writes from several threads keep the size bounded"""
+        cache = TTLCache(ttl=60, max_size=100)
+
+        def write(offset):
+            for i in range(2000):
+                cache.set(offset + i, i)
+                cache.get(offset + i - 1)
+
+        threads = [threading.Thread(target=write, args=(n * 10000,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(cache) == 100
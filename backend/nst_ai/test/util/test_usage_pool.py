@@ -0,0 +1,86 @@
+from unittest.mock import patch
+
+import fakeredis
+import pytest
+
+from nst_ai.socket import utils
+from nst_ai.socket.utils import RedisUsagePool, UsagePool
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    clock = FakeClock()
+    with patch.object(utils.time, "time", clock):
+        yield clock
+
+
+@pytest.fixture(params=["local", "redis"])
+def pool(request, clock):
+    if request.param == "local":
+        return UsagePool(timeout=3)
+
+    with patch(
+        "nst_ai.socket.utils.get_redis_connection",
+        return_value=fakeredis.FakeRedis(decode_responses=True),
+    ):
+        return RedisUsagePool("test:usage_pool", redis_url="redis://", timeout=3)
+
+
+class TestUsagePool:
+    """Test tracking of the models in use by heartbeat time"""
+
+    def test_models_in_use(self, pool, clock):
+        """Test that a model is in use until its last heartbeat times out"""
+        pool.heartbeat("llama", "sid1")
+        clock.now += 2
+        pool.heartbeat("mistral", "sid2")
+
+        assert sorted(pool.get_models_in_use()) == ["llama", "mistral"]
+
+        clock.now += 2
+        assert pool.get_models_in_use() == ["mistral"]
+
+    def test_remove_expired(self, pool, clock):
+        """Test that only models without a recent heartbeat are removed"""
+        pool.heartbeat("llama", "sid1")
+        pool.heartbeat("mistral", "sid1")
+        clock.now += 4
+        pool.heartbeat("mistral", "sid2")
+
+        assert pool.remove_expired() == ["llama"]
+        assert pool.remove_expired() == []
+        assert pool.get_models_in_use() == ["mistral"]
+
+        clock.now += 4
+        assert pool.remove_expired() == ["mistral"]
+        assert pool.get_models_in_use() == []
+
+    def test_remove_expired_keeps_a_model_that_just_heartbeated(self, pool, clock):
+        """Test a heartbeat arriving while the expired models are removed"""
+        pool.heartbeat("llama", "sid1")
+        clock.now += 4
+
+        if isinstance(pool, RedisUsagePool):
+            zrangebyscore = pool.redis.zrangebyscore
+
+            def heartbeat_after_listing(*args, **kwargs):
+                result = zrangebyscore(*args, **kwargs)
+                pool.heartbeat("llama", "sid2")
+                return result
+
+            with patch.object(pool.redis, "zrangebyscore", heartbeat_after_listing):
+                assert pool.remove_expired() == []
+            assert pool.redis.zrange(pool.get_sessions_key("llama"), 0, -1) == ["sid2"]
+        else:
+            pool.heartbeat("llama", "sid2")
+            assert pool.remove_expired() == []
+
+        assert pool.get_models_in_use() == ["llama"]
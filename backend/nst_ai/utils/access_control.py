@@ -1,11 +1,14 @@
 from typing import Optional, Union, List, Dict, Any
 from nst_ai.models.users import Users, UserModel
-from nst_ai.models.groups import Groups
-from nst_ai.env import SRC_LOG_LEVELS
+from nst_ai.models.groups import GROUP_ID_CACHE, Groups
+from nst_ai.env import GROUP_MEMBERSHIP_CACHE_TTL, SRC_LOG_LEVELS
+from nst_ai.utils.ttl_cache import TTLCache
 
 
 from nst_ai.config import DEFAULT_USER_PERMISSIONS
-import json
+from sqlalchemy import Text, cast, or_
+import copy
+import threading
 
 
 def fill_missing_permissions(
@@ -26,6 +29,125 @@ def fill_missing_permissions(
     return permissions
 
 
+def combine_permissions(
+    permissions: Dict[str, Any], group_permissions: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Combine permissions from multiple groups by taking the most permissive value."""
+    for key, value in group_permissions.items():
+        if isinstance(value, dict):
+            if key not in permissions:
+                permissions[key] = {}
+            permissions[key] = combine_permissions(permissions[key], value)
+        else:
+            if key not in permissions:
+                permissions[key] = value
+            else:
+                permissions[key] = (
+                    permissions[key] or value
+                )  # Use the most permissive value (True > False)
+    return permissions
+
+
+def flatten_permissions(
+    permissions: Dict[str, Any], flat: Optional[Dict[str, bool]] = None, prefix=""
+) -> Dict[str, bool]:
+    """
+    Map every dotted permission key (e.g. "chat.file_upload") to whether it is
+    granted, OR-ing into `flat`. Intermediate keys are granted when their
+    dict is non-empty, as a hierarchical lookup would see them.
+    """
+    if flat is None:
+        flat = {}
+    for key, value in permissions.items():
+        path = f"{prefix}{key}"
+        flat[path] = flat.get(path, False) or bool(value)
+        if isinstance(value, dict):
+            flatten_permissions(value, flat, f"{path}.")
+    return flat
+
+
+class CompiledDefaults:
+    """One set of default permissions, compiled once per distinct value."""
+
+    def __init__(self, version: int, default_permissions: Dict[str, Any]):
+        self.version = version
+        self.snapshot = copy.deepcopy(default_permissions)
+        self.flat: Optional[Dict[str, bool]] = None
+
+    def matches(self, default_permissions: Dict[str, Any]) -> bool:
+        # Compared by value: the configured defaults may be replaced or
+        # filled in place, and come back as a new dict on every Redis read.
+        return default_permissions == self.snapshot
+
+
+class CompiledUserPermissions:
+    """A user's group permissions, combined and flattened."""
+
+    def __init__(self, groups_version: int, user_groups):
+        self.groups_version = groups_version
+        self.permission_sets = [group.permissions or {} for group in user_groups]
+        self.flat: Dict[str, bool] = {}
+        for group_permissions in self.permission_sets:
+            flatten_permissions(group_permissions, self.flat)
+        # Combined with each set of defaults, keyed by `CompiledDefaults.version`
+        self.combined: Dict[int, Dict[str, Any]] = {}
+
+
+class PermissionCache:
+    """
+    Compiled permissions per (user, group version, defaults version), so
+    `has_permission` is a dict lookup instead of a walk over every group's
+    permissions and a deep copy of the defaults.
+
+    Group writes through `GroupTable` bump `GROUP_ID_CACHE.version`, which
+    drops every compiled user; defaults are matched by value, so changing
+    `USER_PERMISSIONS` compiles a new set. Group changes made by other
+    workers are picked up after `ttl` seconds, like group memberships.
+    """
+
+    def __init__(self, ttl: float = GROUP_MEMBERSHIP_CACHE_TTL):
+        self.users = TTLCache(ttl)
+        self.defaults: list[CompiledDefaults] = []
+        self._defaults_version = 0
+        self._lock = threading.Lock()
+
+    def get_defaults(self, default_permissions: Dict[str, Any]) -> CompiledDefaults:
+        for compiled in self.defaults:
+            if compiled.matches(default_permissions):
+                return compiled
+
+        with self._lock:
+            self._defaults_version += 1
+            compiled = CompiledDefaults(self._defaults_version, default_permissions)
+            # A handful of distinct defaults are live at any time (the
+            # configured ones and the empty fallback); keep the newest few.
+            self.defaults = [compiled, *self.defaults[:7]]
+        return compiled
+
+    def get_user(self, user_id: str) -> CompiledUserPermissions:
+        groups_version = GROUP_ID_CACHE.version
+        compiled = self.users.get(user_id)
+        if compiled is not None and compiled.groups_version == groups_version:
+            return compiled
+
+        compiled = CompiledUserPermissions(
+            groups_version, Groups.get_groups_by_member_id(user_id)
+        )
+        self.users.set(user_id, compiled)
+        return compiled
+
+    def invalidate(self, user_ids: Optional[list[str]] = None):
+        """Forget `user_ids` (everyone if None)."""
+        if user_ids is None:
+            self.users.clear()
+            return
+        for user_id in user_ids:
+            self.users.pop(user_id)
+
+
+PERMISSION_CACHE = PermissionCache()
+
+
 def get_permissions(
     user_id: str,
     default_permissions: Dict[str, Any],
@@ -35,39 +157,24 @@ def get_permissions(
     If a permission is defined in multiple groups, the most permissive value is used (True > False).
     Permissions are nested in a dict with the permission key as the key and a boolean as the value.
     """
+    defaults = PERMISSION_CACHE.get_defaults(default_permissions)
+    compiled = PERMISSION_CACHE.get_user(user_id)
 
-    def combine_permissions(
-        permissions: Dict[str, Any], group_permissions: Dict[str, Any]
-    ) -> Dict[str, Any]:
-        """Combine permissions from multiple groups by taking the most permissive value."""
-        for key, value in group_permissions.items():
-            if isinstance(value, dict):
-                if key not in permissions:
-                    permissions[key] = {}
-                permissions[key] = combine_permissions(permissions[key], value)
-            else:
-                if key not in permissions:
-                    permissions[key] = value
-                else:
-                    permissions[key] = (
-                        permissions[key] or value
-                    )  # Use the most permissive value (True > False)
-        return permissions
-
-    user_groups = Groups.get_groups_by_member_id(user_id)
+    permissions = compiled.combined.get(defaults.version)
+    if permissions is None:
+        # Deep copy default permissions to avoid modifying the original dict
+        permissions = copy.deepcopy(defaults.snapshot)
 
-    # Deep copy default permissions to avoid modifying the original dict
-    permissions = json.loads(json.dumps(default_permissions))
+        # Combine permissions from all user groups
+        for group_permissions in compiled.permission_sets:
+            permissions = combine_permissions(permissions, group_permissions)
 
-    # Combine permissions from all user groups
-    for group in user_groups:
-        group_permissions = group.permissions or {}
-        permissions = combine_permissions(permissions, group_permissions)
+        # Ensure all fields from default_permissions are present and filled in
+        permissions = fill_missing_permissions(permissions, defaults.snapshot)
+        compiled.combined[defaults.version] = permissions
 
-    # Ensure all fields from default_permissions are present and filled in
-    permissions = fill_missing_permissions(permissions, default_permissions)
-
-    return permissions
+    # Callers may modify the result, the compiled copy has to stay intact
+    return copy.deepcopy(permissions)
 
 
 def has_permission(
@@ -81,52 +188,95 @@ def has_permission(
 
     Permission keys can be hierarchical and separated by dots ('.').
     """
-
-    def get_permission(permissions: Dict[str, Any], keys: List[str]) -> bool:
-        """Traverse permissions dict using a list of keys (from dot-split permission_key)."""
-        for key in keys:
-            if key not in permissions:
-                return False  # If any part of the hierarchy is missing, deny access
-            permissions = permissions[key]  # Traverse one level deeper
-
-        return bool(permissions)  # Return the boolean at the final level
-
-    permission_hierarchy = permission_key.split(".")
-
-    # Retrieve user group permissions
-    user_groups = Groups.get_groups_by_member_id(user_id)
-
-    for group in user_groups:
-        group_permissions = group.permissions
-        if get_permission(group_permissions, permission_hierarchy):
-            return True
+    if PERMISSION_CACHE.get_user(user_id).flat.get(permission_key, False):
+        return True
 
     # Check default permissions afterward if the group permissions don't allow it
-    default_permissions = fill_missing_permissions(
-        default_permissions, DEFAULT_USER_PERMISSIONS
-    )
-    return get_permission(default_permissions, permission_hierarchy)
+    defaults = PERMISSION_CACHE.get_defaults(default_permissions)
+    if defaults.flat is None:
+        default_permissions = fill_missing_permissions(
+            default_permissions, DEFAULT_USER_PERMISSIONS
+        )
+        defaults.flat = flatten_permissions(default_permissions)
+    return defaults.flat.get(permission_key, False)
 
 
 def has_access(
     user_id: str,
     type: str = "write",
     access_control: Optional[dict] = None,
+    user_group_ids: Optional[set[str]] = None,
 ) -> bool:
     if access_control is None:
         return type == "read"
 
-    user_groups = Groups.get_groups_by_member_id(user_id)
-    user_group_ids = [group.id for group in user_groups]
+    if user_group_ids is None:
+        user_group_ids = Groups.get_group_ids_by_member_id(user_id)
     permission_access = access_control.get(type, {})
     permitted_group_ids = permission_access.get("group_ids", [])
     permitted_user_ids = permission_access.get("user_ids", [])
 
     return user_id in permitted_user_ids or any(
-        group_id in permitted_group_ids for group_id in user_group_ids
+        group_id in user_group_ids for group_id in permitted_group_ids
     )
 
 
+def filter_accessible(
+    user_id: str,
+    items: list,
+    type: str = "write",
+    user_group_ids: Optional[set[str]] = None,
+) -> list:
+    """
+    The `items` (anything with `user_id` and `access_control`) that the user
+    owns or has `type` access to, resolving the user's groups once for the
+    whole list.
+    """
+    if user_group_ids is None:
+        user_group_ids = set(Groups.get_group_ids_by_member_id(user_id))
+    return [
+        item
+        for item in items
+        if item.user_id == user_id
+        or has_access(user_id, type, item.access_control, user_group_ids)
+    ]
+
+
+def get_access_control_filter(
+    table, user_id: str, user_group_ids: list[str], type: str = "write"
+):
+    """
+    SQL criterion narrowing `table` rows to those the user owns or may have
+    `type` access to, or None if it cannot be expressed for these ids.
+
+    `access_control` is matched as text, which may let a few extra rows
+    through (e.g. an id only listed for the other access type), so results
+    still go through `filter_accessible`.
+    """
+    principals = [user_id, *user_group_ids]
+    # Ids are looked up as JSON strings, which only works for ids json.dumps
+    # writes out verbatim (uuids always are).
+    if not all(
+        principal.isascii()
+        and principal.isprintable()
+        and '"' not in principal
+        and "\\" not in principal
+        for principal in principals
+    ):
+        return None
+
+    access_control = cast(table.access_control, Text)
+    criteria = [table.user_id == user_id] + [
+        access_control.contains(f'"{principal}"', autoescape=True)
+        for principal in principals
+    ]
+    if type == "read":
+        # No access control means public read access; None may be stored as
+        # SQL NULL or as JSON null.
+        criteria += [table.access_control.is_(None), access_control == "null"]
+    return or_(*criteria)
+
+
 # Get all users with access to a resource
 def get_users_with_access(
     type: str = "write", access_control: Optional[dict] = None
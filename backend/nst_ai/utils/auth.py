@@ -15,7 +15,8 @@ from typing import Optional, Union, List, Dict
 
 from opentelemetry import trace
 
-from nst_ai.models.users import Users
+from nst_ai.internal.db import DATABASE_REPLICAS
+from nst_ai.models.users import LAST_ACTIVE_BATCHER, USER_CACHE, Users
 
 from nst_ai.constants import ERROR_MESSAGES
 from nst_ai.env import (
@@ -26,7 +27,7 @@ from nst_ai.env import (
     WEBUI_AUTH_TRUSTED_EMAIL_HEADER,
 )
 
-from fastapi import BackgroundTasks, Depends, HTTPException, Request, Response, status
+from fastapi import Depends, HTTPException, Request, Response, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from passlib.context import CryptContext
 
@@ -162,10 +163,16 @@ def get_http_authorization_cred(auth_header: Optional[str]):
         return None
 
 
-def get_current_user(
+def mark_user_writes(request: Request, user):
+    # Requests that may write keep the user's reads on the primary database
+    # for a while, see `DATABASE_REPLICAS`
+    if request.method not in ("GET", "HEAD", "OPTIONS"):
+        DATABASE_REPLICAS.mark_written(user.id)
+
+
+async def get_current_user(
     request: Request,
     response: Response,
-    background_tasks: BackgroundTasks,
     auth_token: HTTPAuthorizationCredentials = Depends(bearer_security),
 ):
     token = None
@@ -204,7 +211,7 @@ def get_current_user(
                     status.HTTP_403_FORBIDDEN, detail=ERROR_MESSAGES.API_KEY_NOT_ALLOWED
                 )
 
-        user = get_current_user_by_api_key(token)
+        user = await get_current_user_by_api_key(token)
 
         # Add user info to current span
         current_span = trace.get_current_span()
@@ -214,6 +221,7 @@ def get_current_user(
             current_span.set_attribute("client.user.role", user.role)
             current_span.set_attribute("client.auth.type", "api_key")
 
+        mark_user_writes(request, user)
         return user
 
     # auth by jwt token
@@ -226,7 +234,12 @@ def get_current_user(
         )
 
     if data is not None and "id" in data:
-        user = Users.get_user_by_id(data["id"])
+        user = USER_CACHE.get(data["id"])
+        if user is None:
+            user = await Users.get_user_by_id_async(data["id"])
+            if user is not None:
+                USER_CACHE.set(user)
+
         if user is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -256,10 +269,10 @@ def get_current_user(
                 current_span.set_attribute("client.user.role", user.role)
                 current_span.set_attribute("client.auth.type", "jwt")
 
-            # Refresh the user's last active timestamp asynchronously
-            # to prevent blocking the request
-            if background_tasks:
-                background_tasks.add_task(Users.update_user_last_active_by_id, user.id)
+            # Refresh the user's last active timestamp with the next batch
+            LAST_ACTIVE_BATCHER.touch(user.id)
+
+            mark_user_writes(request, user)
         return user
     else:
         raise HTTPException(
@@ -268,8 +281,12 @@ def get_current_user(
         )
 
 
-def get_current_user_by_api_key(api_key: str):
-    user = Users.get_user_by_api_key(api_key)
+async def get_current_user_by_api_key(api_key: str):
+    user = USER_CACHE.get_by_api_key(api_key)
+    if user is None:
+        user = await Users.get_user_by_api_key_async(api_key)
+        if user is not None:
+            USER_CACHE.set_by_api_key(api_key, user)
 
     if user is None:
         raise HTTPException(
@@ -285,7 +302,7 @@ def get_current_user_by_api_key(api_key: str):
             current_span.set_attribute("client.user.role", user.role)
             current_span.set_attribute("client.auth.type", "api_key")
 
-        Users.update_user_last_active_by_id(user.id)
+        LAST_ACTIVE_BATCHER.touch(user.id)
 
     return user
 
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Optional
+
+from nst_ai.models.chats import Chats
+from nst_ai.env import (
+    REALTIME_CHAT_SAVE_INTERVAL,
+    REALTIME_CHAT_SAVE_MAX_BYTES,
+    SRC_LOG_LEVELS,
+)
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+
+class ChatSaveStats:
+    def __init__(self):
+        self.writes = 0
+        self.flushes = 0
+        # OTel histogram set by setup_metrics when metrics are enabled
+        self.flush_histogram = None
+        self._lock = threading.Lock()
+
+    def record_write(self):
+        with self._lock:
+            self.writes += 1
+
+    def record_flush(self, seconds: float):
+        with self._lock:
+            self.flushes += 1
+        if self.flush_histogram is not None:
+            self.flush_histogram.record(seconds * 1000)
+
+    def get_stats(self) -> dict:
+        return {
+            "writes": self.writes,
+            "flushes": self.flushes,
+            # Writes that were merged into a later flush instead of hitting
+            # the database on their own.
+            "coalesced_writes": max(self.writes - self.flushes, 0),
+        }
+
+
+CHAT_SAVE_STATS = ChatSaveStats()
+
+
+def get_message_size(message: dict) -> int:
+    return sum(len(value) for value in message.values() if isinstance(value, str))
+
+
+class ChatMessageWriter:
+    """
+    Write-behind persistence for a message that is being streamed.
+
+    `write` only records the latest fields of the message; they reach the
+    database through `Chats.upsert_message_to_chat_by_id_and_message_id_async`
+    once `interval` seconds have passed since the last flush, once
+    `max_bytes` of new content is pending, or on `close`. Flushes of one
+    writer are serialized, so a timed flush still in flight lands before
+    the final one.
+    """
+
+    def __init__(
+        self,
+        chat_id: str,
+        message_id: str,
+        interval: float = REALTIME_CHAT_SAVE_INTERVAL,
+        max_bytes: int = REALTIME_CHAT_SAVE_MAX_BYTES,
+    ):
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.interval = interval
+        self.max_bytes = max_bytes
+
+        self.pending: dict = {}
+        self.flushed_size = 0
+        self.last_flush = time.monotonic()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_flush: Optional[asyncio.Future] = None
+        self._lock = asyncio.Lock()
+
+    async def write(self, message: dict):
+        CHAT_SAVE_STATS.record_write()
+        self.pending.update(message)
+
+        if (
+            time.monotonic() - self.last_flush >= self.interval
+            or abs(get_message_size(self.pending) - self.flushed_size) >= self.max_bytes
+        ):
+            await self.flush()
+        elif self._timer is None:
+            # Make sure a stalled stream still lands within `interval`.
+            self._timer = asyncio.get_running_loop().call_later(
+                self.interval, self._flush_later
+            )
+
+    def _flush_later(self):
+        self._timer = None
+        self._timer_flush = asyncio.ensure_future(self.flush())
+
+    async def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        async with self._lock:
+            if not self.pending:
+                return
+
+            message, self.pending = self.pending, {}
+            start = time.monotonic()
+            try:
+                await Chats.upsert_message_to_chat_by_id_and_message_id_async(
+                    self.chat_id, self.message_id, message
+                )
+                self.flushed_size = get_message_size(message)
+            except Exception as e:
+                log.exception(f"Error saving message {self.message_id}: {e}")
+                # Retried with the next flush; fields written since are newer
+                self.pending = {**message, **self.pending}
+            finally:
+                self.last_flush = time.monotonic()
+                CHAT_SAVE_STATS.record_flush(self.last_flush - start)
+
+    async def close(self):
+        """Flush whatever is pending; safe to call from cancellation paths."""
+        await self.flush()
@@ -0,0 +1,186 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+from nst_ai.env import (
+    MODEL_CONNECTION_FAILURE_THRESHOLD,
+    MODEL_CONNECTION_HEALTH_CHECK_INTERVAL,
+    MODEL_CONNECTION_RECOVERY_TIMEOUT,
+    SRC_LOG_LEVELS,
+)
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+
+class CircuitBreaker:
+    """
+    closed: requests go through; `failure_threshold` consecutive failures
+    open the circuit.
+    open: requests are skipped until `recovery_timeout` has passed, then a
+    single trial request is let through (half-open).
+    half_open: the trial's outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, recovery_timeout: float):
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_timeout = recovery_timeout
+
+        self.state = self.CLOSED
+        self.failures = 0
+        self.changed_at = time.time()
+        self.last_error: Optional[str] = None
+        self.last_success_at: Optional[float] = None
+        self.last_failure_at: Optional[float] = None
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            self.state = state
+            self.changed_at = time.time()
+
+    def allow_request(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+
+        # A trial that never reported back (e.g. cancelled) does not keep the
+        # circuit half-open forever.
+        if time.time() - self.changed_at >= self.recovery_timeout:
+            self.state = self.HALF_OPEN
+            self.changed_at = time.time()
+            return True
+        return False
+
+    def is_open(self) -> bool:
+        return self.state == self.OPEN
+
+    def record_success(self):
+        self.failures = 0
+        self.last_success_at = time.time()
+        self._set_state(self.CLOSED)
+
+    def record_failure(self, error: Optional[str] = None):
+        self.failures += 1
+        self.last_failure_at = time.time()
+        self.last_error = error
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self._set_state(self.OPEN)
+            # Restart the recovery timeout from this failure.
+            self.changed_at = self.last_failure_at
+
+    def to_dict(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "changed_at": int(self.changed_at),
+            "last_error": self.last_error,
+            "last_success_at": (
+                int(self.last_success_at) if self.last_success_at else None
+            ),
+            "last_failure_at": (
+                int(self.last_failure_at) if self.last_failure_at else None
+            ),
+        }
+
+
+class ConnectionHealth:
+    """
+    Circuit breakers for a set of upstream connections, keyed by URL, fed
+    by live traffic and by a background probe per connection.
+
+    State is per process.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        interval: int = MODEL_CONNECTION_HEALTH_CHECK_INTERVAL,
+        failure_threshold: int = MODEL_CONNECTION_FAILURE_THRESHOLD,
+        recovery_timeout: int = MODEL_CONNECTION_RECOVERY_TIMEOUT,
+    ):
+        self.name = name
+        self.interval = interval
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.breakers: dict[str, CircuitBreaker] = {}
+
+    def get(self, url: str) -> CircuitBreaker:
+        breaker = self.breakers.get(url)
+        if breaker is None:
+            breaker = CircuitBreaker(self.failure_threshold, self.recovery_timeout)
+            self.breakers[url] = breaker
+        return breaker
+
+    def allow_request(self, url: str) -> bool:
+        return self.get(url).allow_request()
+
+    def is_open(self, url: str) -> bool:
+        return url in self.breakers and self.breakers[url].is_open()
+
+    def record_success(self, url: str):
+        breaker = self.get(url)
+        if breaker.state != CircuitBreaker.CLOSED:
+            log.info(f"{self.name} connection {url} recovered")
+        breaker.record_success()
+
+    def record_failure(self, url: str, error: Optional[str] = None):
+        breaker = self.get(url)
+        was_open = breaker.is_open()
+        breaker.record_failure(error)
+        if breaker.is_open() and not was_open:
+            log.warning(f"{self.name} connection {url} marked unavailable: {error}")
+
+    def get_status(self, urls: list[str]) -> list[dict]:
+        return [
+            {"idx": idx, "url": url, **self.get(url).to_dict()}
+            for idx, url in enumerate(urls)
+        ]
+
+    async def probe(self, url: str, check: Callable[[], Awaitable[bool]]):
+        try:
+            healthy = await check()
+        except Exception as e:
+            healthy = False
+            log.debug(f"Health check for {url} failed: {e}")
+
+        if healthy:
+            self.record_success(url)
+        else:
+            self.record_failure(url, "health check failed")
+
+    async def run(
+        self,
+        get_targets: Callable[[], dict[str, Callable[[], Awaitable[bool]]]],
+    ):
+        """
+        Periodically probe every target ({url: check}) whose circuit lets a
+        request through. Closed circuits are probed so failures are noticed
+        before a user hits them; open ones once their recovery timeout ends.
+        """
+        if self.interval <= 0:
+            return
+
+        while True:
+            try:
+                targets = get_targets()
+                for url in list(self.breakers.keys()):
+                    if url not in targets:
+                        del self.breakers[url]
+
+                await asyncio.gather(
+                    *[
+                        self.probe(url, check)
+                        for url, check in targets.items()
+                        if self.allow_request(url)
+                    ]
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.exception(f"Error checking {self.name} connections: {e}")
+
+            await asyncio.sleep(self.interval)
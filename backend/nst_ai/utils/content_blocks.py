@@ -0,0 +1,425 @@
+import html
+import json
+import re
+import time
+from typing import Optional
+
+
+####################
+# Rendering of a streamed response's content blocks (text, reasoning, tool
+# calls, code interpreter) into the message content.
+####################
+
+
+def split_content_and_whitespace(content):
+    content_stripped = content.rstrip()
+    original_whitespace = (
+        content[len(content_stripped) :] if len(content) > len(content_stripped) else ""
+    )
+    return content_stripped, original_whitespace
+
+
+def is_opening_code_block(content):
+    backtick_segments = content.split("```")
+    # Even number of segments means the last backticks are opening a new block
+    return len(backtick_segments) > 1 and len(backtick_segments) % 2 == 0
+
+
+def trim_opening_code_block(content: str) -> str:
+    """Drop trailing backticks of `content` that would open a code block."""
+    content_stripped, original_whitespace = split_content_and_whitespace(content)
+    if is_opening_code_block(content_stripped):
+        # Remove trailing backticks that would open a new block
+        return content_stripped.rstrip("`").rstrip() + original_whitespace
+    else:
+        # Keep content as is - either closing backticks or no backticks
+        return content_stripped + original_whitespace
+
+
+def get_reasoning_display_content(content: str) -> str:
+    return "\n".join(
+        (f"> {line}" if not line.startswith(">") else line)
+        for line in content.splitlines()
+    )
+
+
+def serialize_code_interpreter_block(content: str, block: dict, raw=False) -> str:
+    attributes = block.get("attributes", {})
+    output = block.get("output", None)
+    lang = attributes.get("lang", "")
+
+    if output:
+        output = html.escape(json.dumps(output))
+
+        if raw:
+            return f'{content}\n<code_interpreter type="code" lang="{lang}">\n{block["content"]}\n</code_interpreter>\n```output\n{output}\n```\n'
+        else:
+            return f'{content}\n<details type="code_interpreter" done="true" output="{output}">\n<summary>Analyzed</summary>\n```{lang}\n{block["content"]}\n```\n</details>\n'
+    else:
+        if raw:
+            return f'{content}\n<code_interpreter type="code" lang="{lang}">\n{block["content"]}\n</code_interpreter>\n'
+        else:
+            return f'{content}\n<details type="code_interpreter" done="false">\n<summary>Analyzing...</summary>\n```{lang}\n{block["content"]}\n```\n</details>\n'
+
+
+def serialize_content_block(
+    content: str,
+    block: dict,
+    raw=False,
+    reasoning_display_content: Optional[str] = None,
+) -> str:
+    """`content` followed by the rendering of `block`."""
+    if block["type"] == "text":
+        return f"{content}{block['content'].strip()}\n"
+    elif block["type"] == "tool_calls":
+        tool_calls = block.get("content", [])
+        results = block.get("results", [])
+
+        tool_calls_display_content = ""
+        for tool_call in tool_calls:
+            tool_call_id = tool_call.get("id", "")
+            tool_name = tool_call.get("function", {}).get("name", "")
+            tool_arguments = tool_call.get("function", {}).get("arguments", "")
+
+            tool_result = None
+            tool_result_files = None
+            for result in results:
+                if tool_call_id == result.get("tool_call_id", ""):
+                    tool_result = result.get("content", None)
+                    tool_result_files = result.get("files", None)
+                    break
+
+            if tool_result:
+                tool_calls_display_content = f'{tool_calls_display_content}\n<details type="tool_calls" done="true" id="{tool_call_id}" name="{tool_name}" arguments="{html.escape(json.dumps(tool_arguments))}" result="{html.escape(json.dumps(tool_result, ensure_ascii=False))}" files="{html.escape(json.dumps(tool_result_files)) if tool_result_files else ""}">\n<summary>Tool Executed</summary>\n</details>\n'
+            else:
+                tool_calls_display_content = f'{tool_calls_display_content}\n<details type="tool_calls" done="false" id="{tool_call_id}" name="{tool_name}" arguments="{html.escape(json.dumps(tool_arguments))}">\n<summary>Executing...</summary>\n</details>'
+
+        if not raw:
+            return f"{content}\n{tool_calls_display_content}\n\n"
+        return content
+    elif block["type"] == "reasoning":
+        if raw:
+            return (
+                f'{content}\n{block["start_tag"]}{block["content"]}{block["end_tag"]}\n'
+            )
+
+        if reasoning_display_content is None:
+            reasoning_display_content = get_reasoning_display_content(block["content"])
+
+        reasoning_duration = block.get("duration", None)
+        if reasoning_duration is not None:
+            return f'{content}\n<details type="reasoning" done="true" duration="{reasoning_duration}">\n<summary>Thought for {reasoning_duration} seconds</summary>\n{reasoning_display_content}\n</details>\n'
+        else:
+            return f'{content}\n<details type="reasoning" done="false">\n<summary>Thinking…</summary>\n{reasoning_display_content}\n</details>\n'
+    elif block["type"] == "code_interpreter":
+        return serialize_code_interpreter_block(
+            trim_opening_code_block(content), block, raw
+        )
+    else:
+        block_content = str(block["content"]).strip()
+        return f"{content}{block['type']}: {block_content}\n"
+
+
+def serialize_content_blocks(content_blocks: list[dict], raw=False) -> str:
+    content = ""
+    for block in content_blocks:
+        content = serialize_content_block(content, block, raw)
+    return content.strip()
+
+
+def get_common_prefix_length(a: str, b: str) -> int:
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        # Only compare the part not known to match yet
+        if a.startswith(b[lo:mid], lo):
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+class ContentBlocksSerializer:
+    """
+    `serialize_content_blocks` for the blocks of a response while it streams,
+    without rendering the whole message again on every delta.
+
+    Only the last block of the list changes, so the rendering of the blocks
+    before it is kept and only the last one is rendered each time; the lines
+    of a reasoning block are rendered once, as they complete. If an earlier
+    block is replaced or modified anyway, everything is rendered again.
+    """
+
+    # Seconds between events sending the whole content, so that a client which
+    # missed earlier events (e.g. opened the chat mid-response) catches up
+    FULL_CONTENT_INTERVAL = 5.0
+
+    def __init__(self):
+        self.blocks: list[dict] = []
+        self.snapshots: list[list] = []
+        self.prefix = ""
+        # Content the client was sent last, see `get_event_data`
+        self.sent: Optional[str] = None
+        self.sent_full_at = 0.0
+        self._trimmed_prefix: Optional[tuple[str, str]] = None
+        self._reasoning: Optional[tuple[dict, str, int, str]] = None
+
+    def serialize(self, content_blocks: list[dict]) -> str:
+        if not self._is_rendered(content_blocks):
+            self.blocks, self.snapshots, self.prefix = [], [], ""
+
+        for block in content_blocks[len(self.blocks) : -1]:
+            self.prefix = serialize_content_block(self.prefix, block)
+            self.blocks.append(block)
+            self.snapshots.append(list(block.values()))
+
+        if not content_blocks:
+            return self.prefix.strip()
+
+        block = content_blocks[-1]
+        if block["type"] == "reasoning":
+            content = serialize_content_block(
+                self.prefix,
+                block,
+                reasoning_display_content=self._get_reasoning_display_content(block),
+            )
+        elif block["type"] == "code_interpreter":
+            content = serialize_code_interpreter_block(
+                self._get_trimmed_prefix(), block
+            )
+        else:
+            content = serialize_content_block(self.prefix, block)
+        return content.strip()
+
+    def get_event_data(self, content: str) -> dict:
+        """
+        `chat:completion` data updating the client from the content it was
+        sent last: the offset up to which that is unchanged, and what follows.
+        """
+        now = time.monotonic()
+        if self.sent is None or now - self.sent_full_at >= self.FULL_CONTENT_INTERVAL:
+            data = {"content": content}
+            self.sent_full_at = now
+        else:
+            offset = get_common_prefix_length(self.sent, content)
+            data = {"content_offset": offset, "content_delta": content[offset:]}
+        self.sent = content
+        return data
+
+    def _is_rendered(self, content_blocks: list[dict]) -> bool:
+        """Whether the rendered blocks still start `content_blocks`, unchanged."""
+        if len(content_blocks) <= len(self.blocks):
+            return False
+        for block, rendered, snapshot in zip(
+            content_blocks, self.blocks, self.snapshots
+        ):
+            if block is not rendered or len(block) != len(snapshot):
+                return False
+            if any(a is not b for a, b in zip(block.values(), snapshot)):
+                return False
+        return True
+
+    def _get_trimmed_prefix(self) -> str:
+        if self._trimmed_prefix is None or self._trimmed_prefix[0] is not self.prefix:
+            self._trimmed_prefix = (self.prefix, trim_opening_code_block(self.prefix))
+        return self._trimmed_prefix[1]
+
+    def _get_reasoning_display_content(self, block: dict) -> str:
+        content = block["content"]
+
+        length, display = 0, ""
+        if self._reasoning is not None:
+            cached_block, cached_content, cached_length, cached_display = (
+                self._reasoning
+            )
+            # Reasoning is appended to; anything else starts over
+            if cached_block is block and content.startswith(cached_content):
+                length, display = cached_length, cached_display
+
+        end = content.rfind("\n", length) + 1
+        if end > length:
+            lines = get_reasoning_display_content(content[length:end])
+            display = f"{display}\n{lines}" if display else lines
+            length = end
+        self._reasoning = (block, content, length, display)
+
+        tail = get_reasoning_display_content(content[length:])
+        if display and tail:
+            return f"{display}\n{tail}"
+        return display or tail
+
+
+####################
+# Detection of tagged sections (reasoning, code interpreter, solution) in the
+# streamed text of a response.
+####################
+
+
+def extract_attributes(tag_content: str) -> dict:
+    """Extract attributes from a tag if they exist."""
+    # Match attributes in the format: key="value" (ignores single quotes for simplicity)
+    return dict(re.findall(r'(\w+)\s*=\s*"([^"]+)"', tag_content or ""))
+
+
+class StreamingTagParser:
+    """
+    Splits the text of a response into content blocks as it streams: a start
+    tag in a text block opens a block of its content type, and its end tag
+    closes it again, continuing with a new text block.
+
+    Each delta is only scanned along with the few characters before it that
+    could still be the beginning of a tag, so the work per delta does not
+    depend on the length of the response. `content` is the streamed text with
+    the closed tagged sections removed.
+    """
+
+    def __init__(self, tags: list[tuple[str, list[tuple[str, str]]]], content=""):
+        """`tags` are the (start tag, end tag) pairs of each content type."""
+        self.content = content
+        self.tags = [
+            (content_type, start_tag, end_tag)
+            for content_type, pairs in tags
+            for start_tag, end_tag in pairs
+        ]
+
+        patterns = []
+        for i, (_, start_tag, _) in enumerate(self.tags):
+            if start_tag.startswith("<") and start_tag.endswith(">"):
+                # Match start tag e.g., <tag> or <tag attr="value">
+                pattern = rf"<{re.escape(start_tag[1:-1])}(?P<attributes{i}>\s.*?)?>"
+            else:
+                pattern = re.escape(start_tag)
+            patterns.append(f"(?P<tag{i}>{pattern})")
+        self.start_tag_regex = re.compile("|".join(patterns)) if patterns else None
+        self.start_chars = {start_tag[0] for _, start_tag, _ in self.tags}
+
+        # The block being scanned, its length when last scanned, and from
+        # where on it may still contain a tag
+        self._block: Optional[dict] = None
+        self._block_length = 0
+        self._scan_from = 0
+        # The block opened by a start tag, and where its raw text starts in
+        # `content`
+        self._open: Optional[tuple[dict, int]] = None
+
+    def feed(self, value: str, content_blocks: list[dict]) -> list[str]:
+        """
+        Append `value` to the last of `content_blocks`, opening and closing
+        blocks at the tags it completes. Returns the content types of the
+        blocks closed; a closed code interpreter block ends the parsing, the
+        rest of the response is not used.
+        """
+        self.content = f"{self.content}{value}"
+        content_blocks[-1]["content"] = content_blocks[-1]["content"] + value
+
+        closed = []
+        while True:
+            block = content_blocks[-1]
+            if block is not self._block or len(block["content"]) < self._block_length:
+                # A new block, or one changed outside of the parser
+                self._scan_from = 0
+            self._block = block
+
+            if self._open is not None and self._open[0] is block:
+                if not self._close(content_blocks):
+                    break
+                closed.append(block["type"])
+                if block["type"] == "code_interpreter":
+                    break
+            elif block["type"] == "text" and self.start_tag_regex is not None:
+                if not self._open_tag(content_blocks):
+                    break
+            else:
+                break
+
+        self._block_length = len(content_blocks[-1]["content"])
+        return closed
+
+    def _open_tag(self, content_blocks: list[dict]) -> bool:
+        block = content_blocks[-1]
+        text = block["content"]
+
+        match = self.start_tag_regex.search(text, self._scan_from)
+        if match is None:
+            self._scan_from = self._get_partial_tag_start(text, self._scan_from)
+            return False
+
+        i = int(match.lastgroup[len("tag") :])
+        content_type, start_tag, end_tag = self.tags[i]
+
+        block["content"] = text[: match.start()]
+        if not block["content"]:
+            content_blocks.pop()
+
+        after_tag = text[match.end() :]
+        content_blocks.append(
+            {
+                "type": content_type,
+                "start_tag": start_tag,
+                "end_tag": end_tag,
+                "attributes": extract_attributes(
+                    match.groupdict().get(f"attributes{i}")
+                ),
+                "content": after_tag,
+                "started_at": time.time(),
+            }
+        )
+        self._open = (
+            content_blocks[-1],
+            len(self.content) - len(text) + match.start(),
+        )
+        return True
+
+    def _close(self, content_blocks: list[dict]) -> bool:
+        block, span_start = self._open
+        text = block["content"]
+        end_tag = block["end_tag"]
+
+        end = text.find(end_tag, self._scan_from)
+        if end == -1:
+            self._scan_from = max(0, len(text) - len(end_tag) + 1)
+            return False
+
+        self._open = None
+        # Drop the tagged section from the streamed text
+        span_end = len(self.content) - len(text) + end + len(end_tag)
+        self.content = self.content[: max(0, span_start)] + self.content[span_end:]
+
+        block_content = text[:end].strip()
+        # Leftover content (everything after the end tag)
+        leftover_content = text[end + len(end_tag) :].lstrip()
+
+        if block_content:
+            block["content"] = block_content
+            block["ended_at"] = time.time()
+            block["duration"] = int(block["ended_at"] - block["started_at"])
+
+            if block["type"] == "code_interpreter":
+                return True
+        else:
+            # Remove the block if content is empty
+            content_blocks.pop()
+
+        content_blocks.append({"type": "text", "content": leftover_content})
+        return True
+
+    def _get_partial_tag_start(self, text: str, start: int) -> int:
+        """Where the start tag `text` may end with begins, else its length."""
+        for i in range(start, len(text)):
+            if text[i] not in self.start_chars:
+                continue
+            rest = text[i:]
+            for _, start_tag, _ in self.tags:
+                if start_tag.startswith(rest):
+                    return i
+                if (
+                    start_tag.startswith("<")
+                    and start_tag.endswith(">")
+                    and rest.startswith(start_tag[:-1])
+                    and len(rest) > len(start_tag) - 1
+                    and rest[len(start_tag) - 1].isspace()
+                    and "\n" not in rest[len(start_tag) :]
+                ):
+                    # Start tag with attributes, up to its closing ">"
+                    return i
+        return len(text)
@@ -11,7 +11,7 @@ from nst_ai.functions import get_function_models
 
 
 from nst_ai.models.functions import Functions
-from nst_ai.models.models import Models
+from nst_ai.models.models import MODEL_LIST_CACHE, Models
 
 
 from nst_ai.utils.plugin import (
@@ -25,7 +25,11 @@ from nst_ai.config import (
     DEFAULT_ARENA_MODEL,
 )
 
-from nst_ai.env import SRC_LOG_LEVELS, GLOBAL_LOG_LEVEL
+from nst_ai.env import (
+    SRC_LOG_LEVELS,
+    GLOBAL_LOG_LEVEL,
+    ENABLE_FORWARD_USER_INFO_HEADERS,
+)
 from nst_ai.models.users import UserModel
 
 
@@ -77,6 +81,22 @@ async def get_all_base_models(request: Request, user: UserModel = None):
 
 
 async def get_all_models(request, refresh: bool = False, user: UserModel = None):
+    """
+    The merged model list, served from `MODEL_LIST_CACHE`; `refresh` forces
+    a rebuild that also refetches the base models. With user info headers
+    forwarded, upstreams may answer each user differently, so the shared
+    cache is bypassed.
+    """
+    if ENABLE_FORWARD_USER_INFO_HEADERS:
+        return await build_all_models(request, refresh=refresh, user=user)
+
+    return await MODEL_LIST_CACHE.get(
+        lambda: build_all_models(request, refresh=refresh, user=user),
+        refresh=refresh,
+    )
+
+
+async def build_all_models(request, refresh: bool = False, user: UserModel = None):
     if (
         request.app.state.MODELS
         and request.app.state.BASE_MODELS
@@ -0,0 +1,175 @@
+import logging
+import random
+import time
+import uuid
+from collections import defaultdict
+
+from nst_ai.env import (
+    REDIS_KEY_PREFIX,
+    REDIS_SENTINEL_HOSTS,
+    REDIS_SENTINEL_PORT,
+    REDIS_URL,
+    SRC_LOG_LEVELS,
+)
+from nst_ai.utils.redis import get_redis_connection, get_sentinels_from_env
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+ROUTING_STRATEGIES = [
+    "random",
+    "round_robin",
+    "least_in_flight",
+    "ewma_latency",
+    "resident",
+]
+
+# Streams still counted as in flight after this many seconds are assumed to
+# belong to a worker that died before releasing them.
+IN_FLIGHT_MAX_AGE = 60 * 60
+
+EWMA_ALPHA = 0.3
+
+
+class UpstreamRouter:
+    """
+    Picks one of several upstream base URLs that can serve a model.
+
+    In-flight requests are counted per base URL, in Redis when configured
+    (so that all workers see each other's streams) and in memory otherwise.
+    Latency and resident models are tracked per process.
+    """
+
+    def __init__(self, name: str, strategy: str, resident_ttl: int = 10):
+        if strategy not in ROUTING_STRATEGIES:
+            log.warning(f"Unknown routing strategy {strategy!r}, using random")
+            strategy = "random"
+
+        self.name = name
+        self.strategy = strategy
+        self.resident_ttl = resident_ttl
+
+        self.in_flight: dict[str, int] = defaultdict(int)
+        self.latency: dict[str, float] = {}
+        self.resident: dict[str, tuple[float, set[str]]] = {}
+        self.round_robin: dict[str, int] = defaultdict(int)
+
+        self._redis = None
+        self._redis_initialized = False
+
+    def _get_redis(self):
+        if not self._redis_initialized:
+            self._redis_initialized = True
+            if REDIS_URL:
+                try:
+                    self._redis = get_redis_connection(
+                        REDIS_URL,
+                        get_sentinels_from_env(
+                            REDIS_SENTINEL_HOSTS, REDIS_SENTINEL_PORT
+                        ),
+                        async_mode=True,
+                    )
+                except Exception as e:
+                    log.warning(f"Routing falls back to local counters: {e}")
+        return self._redis
+
+    def _in_flight_key(self, base_url: str) -> str:
+        return f"{REDIS_KEY_PREFIX}:routing:{self.name}:in_flight:{base_url}"
+
+    async def acquire(self, base_url: str) -> str:
+        """Count a request to `base_url` as in flight; returns its token."""
+        token = str(uuid.uuid4())
+        self.in_flight[base_url] += 1
+
+        redis = self._get_redis()
+        if redis is not None:
+            try:
+                await redis.zadd(self._in_flight_key(base_url), {token: time.time()})
+            except Exception as e:
+                log.debug(f"Error recording in-flight request: {e}")
+        return token
+
+    async def release(self, base_url: str, token: str):
+        self.in_flight[base_url] = max(self.in_flight[base_url] - 1, 0)
+
+        redis = self._get_redis()
+        if redis is not None:
+            try:
+                await redis.zrem(self._in_flight_key(base_url), token)
+            except Exception as e:
+                log.debug(f"Error releasing in-flight request: {e}")
+
+    async def get_in_flight(self, base_urls: list[str]) -> dict[str, int]:
+        redis = self._get_redis()
+        if redis is not None:
+            try:
+                cutoff = time.time() - IN_FLIGHT_MAX_AGE
+                pipe = redis.pipeline()
+                for base_url in base_urls:
+                    key = self._in_flight_key(base_url)
+                    pipe.zremrangebyscore(key, "-inf", cutoff)
+                    pipe.zcard(key)
+                results = await pipe.execute()
+                return dict(zip(base_urls, results[1::2]))
+            except Exception as e:
+                log.debug(f"Error reading in-flight requests: {e}")
+
+        return {base_url: self.in_flight[base_url] for base_url in base_urls}
+
+    def record_latency(self, base_url: str, seconds: float):
+        previous = self.latency.get(base_url)
+        self.latency[base_url] = (
+            seconds
+            if previous is None
+            else EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * previous
+        )
+
+    def set_resident(self, base_url: str, models: set[str]):
+        self.resident[base_url] = (time.monotonic(), set(models))
+
+    def is_resident_stale(self, base_url: str) -> bool:
+        fetched_at, _ = self.resident.get(base_url, (0.0, set()))
+        return time.monotonic() - fetched_at > self.resident_ttl
+
+    def _is_resident(self, base_url: str, model: str) -> bool:
+        _, models = self.resident.get(base_url, (0.0, set()))
+        return model in models
+
+    async def select(self, model: str, candidates: dict[int, str]) -> int:
+        """
+        Pick one of `candidates` ({url_idx: base_url}) for `model` and
+        return its url_idx.
+        """
+        url_indices = list(candidates.keys())
+        if len(url_indices) <= 1 or self.strategy == "random":
+            return random.choice(url_indices)
+
+        if self.strategy == "round_robin":
+            url_idx = url_indices[self.round_robin[model] % len(url_indices)]
+            self.round_robin[model] += 1
+            return url_idx
+
+        in_flight = await self.get_in_flight(list(set(candidates.values())))
+
+        if self.strategy == "resident":
+            warm = [i for i in url_indices if self._is_resident(candidates[i], model)]
+            url_indices = warm or url_indices
+
+        if self.strategy == "ewma_latency":
+            # Nodes without a measurement yet score 0 so they get tried.
+            score = lambda i: self.latency.get(candidates[i], 0.0) * (
+                in_flight[candidates[i]] + 1
+            )
+        else:
+            score = lambda i: in_flight[candidates[i]]
+
+        best = min(score(i) for i in url_indices)
+        url_idx = random.choice([i for i in url_indices if score(i) == best])
+
+        if self.strategy == "resident":
+            # The model gets loaded on the chosen node, so it is warm there
+            # for the next request even before the next /api/ps refresh.
+            fetched_at, models = self.resident.get(candidates[url_idx], (0.0, set()))
+            self.resident[candidates[url_idx]] = (fetched_at, models | {model})
+
+        return url_idx
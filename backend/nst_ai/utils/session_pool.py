@@ -0,0 +1,89 @@
+import logging
+from urllib.parse import urlparse
+
+import aiohttp
+
+from nst_ai.env import (
+    AIOHTTP_CLIENT_POOL_DNS_CACHE_TTL,
+    AIOHTTP_CLIENT_POOL_KEEPALIVE_TIMEOUT,
+    AIOHTTP_CLIENT_POOL_LIMIT,
+    SRC_LOG_LEVELS,
+)
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+
+def get_base_url(url: str) -> str:
+    parsed_url = urlparse(url)
+    return f"{parsed_url.scheme}://{parsed_url.netloc}"
+
+
+class ClientSessionPool:
+    """
+    App-lifetime aiohttp sessions, one per upstream base URL, so that
+    proxied requests reuse keep-alive connections instead of paying for a
+    new TCP/TLS handshake each time.
+
+    Callers that need a specific timeout pass `timeout=` per request.
+    """
+
+    def __init__(
+        self,
+        limit: int = AIOHTTP_CLIENT_POOL_LIMIT,
+        keepalive_timeout: float = AIOHTTP_CLIENT_POOL_KEEPALIVE_TIMEOUT,
+        ttl_dns_cache: int = AIOHTTP_CLIENT_POOL_DNS_CACHE_TTL,
+    ):
+        self.limit = limit
+        self.keepalive_timeout = keepalive_timeout
+        self.ttl_dns_cache = ttl_dns_cache
+        self.sessions: dict[str, aiohttp.ClientSession] = {}
+
+    def get_session(self, url: str) -> aiohttp.ClientSession:
+        base_url = get_base_url(url)
+        session = self.sessions.get(base_url)
+        if session is None or session.closed:
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.limit,
+                    keepalive_timeout=self.keepalive_timeout,
+                    ttl_dns_cache=self.ttl_dns_cache,
+                ),
+                trust_env=True,
+            )
+            self.sessions[base_url] = session
+        return session
+
+    def get_stats(self) -> dict[str, dict]:
+        """
+        Per upstream: connections in use, idle keep-alive connections and
+        requests waiting for a free connection.
+        """
+        stats = {}
+        for base_url, session in list(self.sessions.items()):
+            connector = session.connector
+            if session.closed or connector is None:
+                continue
+            stats[base_url] = {
+                "limit": connector.limit,
+                "in_use": len(getattr(connector, "_acquired", ())),
+                "idle": sum(
+                    len(conns) for conns in getattr(connector, "_conns", {}).values()
+                ),
+                "waiting": sum(
+                    len(waiters)
+                    for waiters in getattr(connector, "_waiters", {}).values()
+                ),
+            }
+        return stats
+
+    async def close(self):
+        sessions, self.sessions = self.sessions, {}
+        for base_url, session in sessions.items():
+            try:
+                await session.close()
+            except Exception as e:
+                log.warning(f"Error closing session for {base_url}: {e}")
+
+
+HTTP_SESSION_POOL = ClientSessionPool()
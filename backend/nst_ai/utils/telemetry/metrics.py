@@ -8,6 +8,12 @@ Metrics collected:
 
 * http.server.requests (counter)
 * http.server.duration (histogram, milliseconds)
+* webui.config.cache.hits / webui.config.cache.misses (counters)
+* webui.embedding.cache.hits / webui.embedding.cache.misses (counters)
+* webui.http.pool.connections.in_use / .idle / .waiting / .limit (gauges,
+  per upstream base URL)
+* webui.chat.save.flushes / .coalesced_writes (counters, realtime chat save)
+* webui.chat.save.flush_latency (histogram, milliseconds)
 
 Attributes used: http.method, http.route, http.status_code
 
@@ -36,6 +42,9 @@ from nst_ai.env import OTEL_SERVICE_NAME, OTEL_EXPORTER_OTLP_ENDPOINT
 
 from nst_ai.socket.main import get_active_user_ids
 from nst_ai.models.users import Users
+from nst_ai.retrieval.embedding_cache import get_embedding_cache
+from nst_ai.utils.session_pool import HTTP_SESSION_POOL
+from nst_ai.utils.chat_persistence import CHAT_SAVE_STATS
 
 _EXPORT_INTERVAL_MILLIS = 10_000  # 10 seconds
 
@@ -67,6 +76,43 @@ def _build_meter_provider() -> MeterProvider:
         View(
             instrument_name="webui.users.active",
         ),
+        View(
+            instrument_name="webui.config.cache.hits",
+        ),
+        View(
+            instrument_name="webui.config.cache.misses",
+        ),
+        View(
+            instrument_name="webui.embedding.cache.hits",
+        ),
+        View(
+            instrument_name="webui.embedding.cache.misses",
+        ),
+        View(
+            instrument_name="webui.chat.save.flushes",
+        ),
+        View(
+            instrument_name="webui.chat.save.coalesced_writes",
+        ),
+        View(
+            instrument_name="webui.chat.save.flush_latency",
+        ),
+        View(
+            instrument_name="webui.http.pool.connections.in_use",
+            attribute_keys=["upstream"],
+        ),
+        View(
+            instrument_name="webui.http.pool.connections.idle",
+            attribute_keys=["upstream"],
+        ),
+        View(
+            instrument_name="webui.http.pool.connections.waiting",
+            attribute_keys=["upstream"],
+        ),
+        View(
+            instrument_name="webui.http.pool.connections.limit",
+            attribute_keys=["upstream"],
+        ),
     ]
 
     provider = MeterProvider(
@@ -127,6 +173,100 @@ def setup_metrics(app: FastAPI) -> None:
         callbacks=[observe_active_users],
     )
 
+    def observe_config_cache_hits(
+        options: metrics.CallbackOptions,
+    ) -> Sequence[metrics.Observation]:
+        return [
+            metrics.Observation(
+                value=app.state.config.get_cache_stats()["hits"],
+            )
+        ]
+
+    def observe_config_cache_misses(
+        options: metrics.CallbackOptions,
+    ) -> Sequence[metrics.Observation]:
+        return [
+            metrics.Observation(
+                value=app.state.config.get_cache_stats()["misses"],
+            )
+        ]
+
+    meter.create_observable_counter(
+        name="webui.config.cache.hits",
+        description="Config reads served from the process-local cache",
+        unit="1",
+        callbacks=[observe_config_cache_hits],
+    )
+
+    meter.create_observable_counter(
+        name="webui.config.cache.misses",
+        description="Config reads that went through to Redis",
+        unit="1",
+        callbacks=[observe_config_cache_misses],
+    )
+
+    def observe_embedding_cache(key: str) -> Sequence[metrics.Observation]:
+        cache = get_embedding_cache()
+        if cache is None:
+            return []
+        return [metrics.Observation(value=cache.get_stats()[key])]
+
+    meter.create_observable_counter(
+        name="webui.embedding.cache.hits",
+        description="Embeddings served from the embedding cache",
+        unit="1",
+        callbacks=[lambda options: observe_embedding_cache("hits")],
+    )
+
+    meter.create_observable_counter(
+        name="webui.embedding.cache.misses",
+        description="Embeddings that had to be computed by the engine",
+        unit="1",
+        callbacks=[lambda options: observe_embedding_cache("misses")],
+    )
+
+    def observe_chat_save(key: str) -> Sequence[metrics.Observation]:
+        return [metrics.Observation(value=CHAT_SAVE_STATS.get_stats()[key])]
+
+    meter.create_observable_counter(
+        name="webui.chat.save.flushes",
+        description="Database writes of streamed messages",
+        unit="1",
+        callbacks=[lambda options: observe_chat_save("flushes")],
+    )
+
+    meter.create_observable_counter(
+        name="webui.chat.save.coalesced_writes",
+        description="Streamed message updates merged into a later write",
+        unit="1",
+        callbacks=[lambda options: observe_chat_save("coalesced_writes")],
+    )
+
+    CHAT_SAVE_STATS.flush_histogram = meter.create_histogram(
+        name="webui.chat.save.flush_latency",
+        description="Duration of each write of a streamed message",
+        unit="ms",
+    )
+
+    def observe_session_pool(key: str) -> Sequence[metrics.Observation]:
+        return [
+            metrics.Observation(value=stats[key], attributes={"upstream": upstream})
+            for upstream, stats in HTTP_SESSION_POOL.get_stats().items()
+        ]
+
+    for key, description in [
+        ("in_use", "Upstream connections currently serving a request"),
+        ("idle", "Idle keep-alive upstream connections"),
+        ("waiting", "Requests waiting for a free upstream connection"),
+        ("limit", "Maximum connections per upstream"),
+    ]:
+        meter.create_observable_gauge(
+            name=f"webui.http.pool.connections.{key}",
+            description=description,
+            unit="connections",
+            callbacks=[lambda options, key=key: observe_session_pool(key)],
+        )
+
     # FastAPI middleware
     @app.middleware("http")
     async def _metrics_middleware(request: Request, call_next):
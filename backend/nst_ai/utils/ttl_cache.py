@@ -0,0 +1,58 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    A per-process dict whose entries expire `ttl` seconds after they were
+    set. It holds at most `max_size` entries: every write drops the expired
+    ones, then the oldest ones beyond the limit, so the cost of eviction
+    stays proportional to what is evicted.
+
+    Writes hold a lock, so instances can be shared between threads.
+    """
+
+    def __init__(self, ttl: float, max_size: int = 10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        # key -> (time set, value), least recently set first
+        self.entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        entry = self.entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl:
+            return entry[1]
+        return default
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            self.entries[key] = (now, value)
+            self.entries.move_to_end(key)
+            while self.entries:
+                set_at, _ = next(iter(self.entries.values()))
+                if len(self.entries) <= self.max_size and now - set_at < self.ttl:
+                    break
+                self.entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
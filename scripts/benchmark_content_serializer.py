@@ -0,0 +1,114 @@
+"""
+Benchmark rendering the content of a streamed response on every delta: the
+whole message re-serialized each time against the incremental
+ContentBlocksSerializer (backend/nst_ai/utils/content_blocks.py), along with
+how much content each sends to the client.
+
+The script synthesizes a response made of a long reasoning block followed by
+an answer, streamed a few characters per delta.
+
+    python scripts/benchmark_content_serializer.py
+    python scripts/benchmark_content_serializer.py --reasoning-words 30000 --chunk 4
+"""
+
+import argparse
+import importlib.util
+import random
+import time
+from pathlib import Path
+
+CONTENT_BLOCKS_PATH = (
+    Path(__file__).resolve().parent.parent / "backend/nst_ai/utils/content_blocks.py"
+)
+
+WORDS = ["the", "model", "is", "thinking", "about", "this", "problem", "so", "we"]
+
+
+def load_content_blocks():
+    spec = importlib.util.spec_from_file_location("content_blocks", CONTENT_BLOCKS_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def synthesize_text(words: int) -> str:
+    parts = []
+    for _ in range(words):
+        parts.append(random.choice(WORDS))
+        parts.append("\n" if random.random() < 0.05 else " ")
+    return "".join(parts)
+
+
+def stream(reasoning: str, answer: str, chunk: int):
+    """Yield the content blocks after each delta, as the middleware builds them."""
+    blocks = [
+        {
+            "type": "reasoning",
+            "start_tag": "<think>",
+            "end_tag": "</think>",
+            "attributes": {},
+            "content": "",
+        }
+    ]
+    for i in range(0, len(reasoning), chunk):
+        blocks[-1]["content"] = reasoning[: i + chunk]
+        yield blocks
+
+    blocks[-1]["duration"] = 42
+    blocks.append({"type": "text", "content": ""})
+    for i in range(0, len(answer), chunk):
+        blocks[-1]["content"] = answer[: i + chunk]
+        yield blocks
+
+
+def run(name, reasoning, answer, chunk, render):
+    events = sent = 0
+    start = time.perf_counter()
+    for blocks in stream(reasoning, answer, chunk):
+        data = render(blocks)
+        sent += len(data.get("content", "")) + len(data.get("content_delta", ""))
+        events += 1
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:<12} {elapsed:8.3f} s  {elapsed / events * 1e6:9.1f} µs/delta  "
+        f"{sent / 1e6:10.2f} MB sent"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--reasoning-words", type=int, default=30_000)
+    parser.add_argument("--answer-words", type=int, default=2_000)
+    parser.add_argument("--chunk", type=int, default=4, help="characters per delta")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    content_blocks = load_content_blocks()
+    reasoning = synthesize_text(args.reasoning_words)
+    answer = synthesize_text(args.answer_words)
+    print(
+        f"{len(reasoning) + len(answer)} characters, "
+        f"{-(-len(reasoning) // args.chunk) + -(-len(answer) // args.chunk)} deltas"
+    )
+
+    run(
+        "full",
+        reasoning,
+        answer,
+        args.chunk,
+        lambda blocks: {"content": content_blocks.serialize_content_blocks(blocks)},
+    )
+
+    serializer = content_blocks.ContentBlocksSerializer()
+    run(
+        "incremental",
+        reasoning,
+        answer,
+        args.chunk,
+        lambda blocks: serializer.get_event_data(serializer.serialize(blocks)),
+    )
+
+
+if __name__ == "__main__":
+    main()